@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 # Root route for health check and Vercel base URL
 app = Flask(__name__)
 @app.route("/")
@@ -12,10 +12,29 @@ import math
 import textwrap
 import re
 import copy
+import tempfile
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 import logging
-from groq import Groq
 import os
+from diagram_edits import (DiagramEditError, apply_edit_prompt, embed_model_metadata, extract_diagram_model,
+                           model_metadata_element, replace_svg_labels, with_model_metadata)
+from diagram_export import EXPORT_MIMETYPES, EXPORT_TYPES, export_diagram
+from diagram_links import get_architecture_links, get_flowchart_edges
+from diagram_store import DiagramStore, content_hash
+from edge_router import route_edges, route_label_point, route_to_path
+from force_layout import compute_force_layout, snap_to_grid
+from gantt_scheduler import choose_time_axis, schedule_tasks
+from layered_layout import compute_layered_layout, waypoints_to_path
+from model_store import ModelStore
+from packing_layout import measure_text_width, pack_rectangles
+from raster_renderer import RASTER_MIMETYPES, RasterService, available_raster_formats, clamp_raster_width
+from document_routes import document_stored, document_subsystem_info, documents
+from response_compression import available_encodings, get_compression_stats, immutable_artifact_response, init_compression
+from services import (GROQ_API_KEY, client, document_cache, history_access_error, history_store, llm_scheduler,
+                      note_llm_usage, record_history)
+from svg_minify import get_svg_size_stats, minify_svg_for_type, minify_svg_fragment, record_svg_size
 
 # Configure enhanced logging with UTF-8 encoding
 logging.basicConfig(
@@ -77,6 +96,8 @@ def safe_svg_text(text, max_length=None):
 
 
 app = Flask(__name__)
+# Returned diagram models keep their key order (flowchart steps are sequential by default)
+app.json.sort_keys = False
 # Enhanced CORS configuration for Flutter mobile and web
 CORS(app, origins=['*'], supports_credentials=True, allow_headers=['Content-Type', 'Authorization'])
 
@@ -85,14 +106,67 @@ CORS(app, origins=['*'], supports_credentials=True, allow_headers=['Content-Type
 def index():
     return "Backend is running!"
 
-# Initialize Groq client with enhanced error handling
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-try:
-    client = Groq(api_key=GROQ_API_KEY)
-    logger.info("Groq client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Groq client: {str(e)}")
-    client = None
+# Document routes; their implementation in document_generator is imported on the first document request
+app.register_blueprint(documents)
+
+@app.before_request
+def start_request_timer():
+    """Request start time, for the latency recorded in the generation history"""
+    g.request_started = time.perf_counter()
+
+# Compact generated SVGs before they are returned (set SVG_MINIFY=false to disable)
+SVG_MINIFY = os.environ.get("SVG_MINIFY", "true").lower() != "false"
+
+# The flowchart node frame is defined once as <symbol> and placed with <use> (set SVG_SYMBOLS=false to inline it);
+# other types draw one element per box, which a <use> would not shrink
+SVG_SYMBOLS = os.environ.get("SVG_SYMBOLS", "true").lower() != "false"
+
+# gzip/brotli negotiation for JSON and SVG responses (set RESPONSE_COMPRESSION=false to disable);
+# the CACHED levels apply to stable payloads that are compressed once and kept
+RESPONSE_COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "true").lower() != "false"
+compression_cache = None
+if RESPONSE_COMPRESSION:
+    compression_cache = init_compression(
+        app,
+        gzip_level=int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4")),
+        cached_gzip_level=int(os.environ.get("COMPRESSION_CACHED_GZIP_LEVEL", "9")),
+        cached_brotli_quality=int(os.environ.get("COMPRESSION_CACHED_BROTLI_QUALITY", "11")),
+        min_size=int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+    )
+
+# Rendered SVGs addressable by content hash at /diagrams/<hash>.svg, kept on disk under
+# DIAGRAM_STORE_DIR (a temp directory by default). Hosts do not share the store, so on
+# serverless deployments a URL only resolves on the instance that rendered it, while it lives.
+diagram_store = DiagramStore(
+    directory=os.environ.get("DIAGRAM_STORE_DIR") or os.path.join(tempfile.gettempdir(), "napkin_diagrams"),
+    max_bytes=int(os.environ.get("DIAGRAM_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_disk_bytes=int(os.environ.get("DIAGRAM_STORE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+)
+
+SUPPORTED_DIAGRAM_TYPES = [
+    "flowchart", "sequence", "state", "mind map", "swot analysis",
+    "timeline", "gantt", "journey", "erd", "class", "network", "architecture"
+]
+
+# Batch generation: rough output tokens per diagram model, and the output budget of one LLM call
+BATCH_TOKENS_PER_DIAGRAM = {"gantt": 900, "class": 900, "erd": 800, "journey": 900, "sequence": 800}
+BATCH_DEFAULT_TOKENS_PER_DIAGRAM = 600
+BATCH_MAX_OUTPUT_TOKENS = int(os.environ.get("BATCH_MAX_OUTPUT_TOKENS", "3000"))
+
+# Validated diagram models by hash so /render can re-theme without another LLM call
+model_store = ModelStore(
+    ttl_seconds=int(os.environ.get("MODEL_STORE_TTL_SECONDS", "3600")),
+    max_entries=int(os.environ.get("MODEL_STORE_MAX_ENTRIES", "5000"))
+)
+
+# Optional PNG/WebP output for clients that render filter-heavy SVGs slowly (needs cairosvg, Pillow for WebP)
+raster_service = RasterService(
+    cache_dir=os.environ.get("RASTER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "napkin_raster_cache"),
+    cache_max_bytes=int(os.environ.get("RASTER_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    max_workers=int(os.environ.get("RASTER_WORKERS", "2")),
+    timeout=float(os.environ.get("RASTER_TIMEOUT_SECONDS", "30"))
+)
 
 def generate_error_svg(message):
     """Generate a simple error SVG when diagram generation fails"""
@@ -105,6 +179,34 @@ def generate_error_svg(message):
         <text x="200" y="130" font-family="Arial, sans-serif" font-size="10" fill="#7F1D1D" text-anchor="middle">Please try again or contact support</text>
     </svg>'''
 
+def join_svg_chunks(chunks):
+    """Assemble the chunks yielded by an iter_*_svg renderer into one SVG document"""
+    svg_content = '\n'.join(chunks)
+    logger.info(f"Generated SVG with {len(svg_content)} chars")
+    return svg_content
+
+def stream_svg_chunks(chunks, buffer_size=16384):
+    """
+    Re-batch renderer chunks into writes of roughly buffer_size characters.
+
+    The separators match join_svg_chunks(), so the streamed document is byte for
+    byte the one the buffered path returns, without holding it all in memory.
+    """
+    pending = []
+    pending_size = 0
+    separator = ''
+    for chunk in chunks:
+        pending.append(separator)
+        pending.append(chunk)
+        separator = '\n'
+        pending_size += len(chunk) + 1
+        if pending_size >= buffer_size:
+            yield ''.join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield ''.join(pending)
+
 def get_fallback_data(diagram_type, user_input):
     """Generate fallback data when AI is not available"""
     
@@ -296,7 +398,8 @@ Requirements:
 - Use professional terminology appropriate for the domain
 
 Return ONLY valid JSON in this exact format:
-{{"steps": {{"Step 1 Name": ["Brief description"], "Step 2 Name": ["Brief description"], ...}}}}
+{{"steps": {{"Step 1 Name": ["Brief description"], "Step 2 Name": ["Brief description"], ...}}, "edges": [{{"from": "Step 1 Name", "to": "Step 2 Name", "label": ""}}, ...]}}
+"edges" is optional: include it only when the flow branches (use the label for decision outcomes such as "Yes"/"No"); without it the steps are connected in order.
 
 Topic: {safe_svg_text(user_input)}""",
 
@@ -373,6 +476,7 @@ Requirements:
 - Identify 6-8 parallel and sequential tasks
 - Include duration estimates for "{safe_svg_text(user_input)}"
 - Show task dependencies and overlaps
+- Name dependencies exactly as the tasks they refer to
 - Focus on resource allocation
 - Use project management terminology
 
@@ -603,10 +707,11 @@ def validate_diagram_json(json_data, diagram_type):
         logger.error(f"Validation error for {diagram_type}: {str(e)}")
         raise
 
-def generate_enhanced_sequence_svg(actors, interactions):
-    """Generate proper sequence diagram"""
+def iter_enhanced_sequence_svg(actors, interactions):
+    """Yield the SVG of generate_enhanced_sequence_svg() element by element"""
     if not actors or not interactions:
-        return generate_error_svg("Sequence diagram requires actors and interactions")
+        yield generate_error_svg("Sequence diagram requires actors and interactions")
+        return
 
     width, height = 1400, 800
     actor_width = 120
@@ -617,7 +722,8 @@ def generate_enhanced_sequence_svg(actors, interactions):
     actor_spacing = (width - 100) // max(len(actors), 1)
     actor_positions = {}
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         '<linearGradient id="actorGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:#4F46E5;stop-opacity:1"/><stop offset="100%" style="stop-color:#7C3AED;stop-opacity:1"/></linearGradient>',
         '<marker id="seqArrow" markerWidth="10" markerHeight="7" refX="9" refY="3.5" orient="auto"><polygon points="0 0, 10 3.5, 0 7" fill="#4B5563"/></marker>',
@@ -637,7 +743,7 @@ def generate_enhanced_sequence_svg(actors, interactions):
         actor_positions[actor_name] = x
         
         # Actor box
-        svg_elements.extend([
+        yield from [
             f'<rect x="{x-actor_width//2}" y="{y}" width="{actor_width}" height="{actor_height}" '
             'rx="8" fill="url(#actorGrad)" stroke="#FFFFFF" stroke-width="2"/>',
             
@@ -650,7 +756,7 @@ def generate_enhanced_sequence_svg(actors, interactions):
             # Lifeline
             f'<line x1="{x}" y1="{y+actor_height}" x2="{x}" y2="{height-50}" '
             'stroke="#9CA3AF" stroke-width="2" stroke-dasharray="5,5"/>',
-        ])
+        ]
 
     # Draw interactions
     sorted_interactions = sorted(interactions, key=lambda x: x.get('order', 0))
@@ -664,29 +770,24 @@ def generate_enhanced_sequence_svg(actors, interactions):
             x2 = actor_positions[to_actor]
             y = 180 + i * message_height
             
-            svg_elements.extend([
+            yield from [
                 f'<line x1="{x1}" y1="{y}" x2="{x2}" y2="{y}" '
                 'stroke="#4B5563" stroke-width="2" marker-end="url(#seqArrow)"/>',
                 
                 f'<text x="{(x1+x2)/2}" y="{y-10}" font-family="Inter, sans-serif" '
                 f'font-size="12" fill="#374151" text-anchor="middle">{safe_svg_text(message, 30)}</text>'
-            ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
+            ]
+    yield '</svg>'
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_enhanced_sequence_svg(actors, interactions):
+    """Generate proper sequence diagram"""
+    return join_svg_chunks(iter_enhanced_sequence_svg(actors, interactions))
 
-def generate_enhanced_state_svg(states, transitions):
-    """Generate proper state diagram"""
+def iter_enhanced_state_svg(states, transitions):
+    """Yield the SVG of generate_enhanced_state_svg() element by element"""
     if not states:
-        return generate_error_svg("State diagram requires states")
+        yield generate_error_svg("State diagram requires states")
+        return
 
     width, height = 1400, 800
     state_radius = 80
@@ -698,7 +799,8 @@ def generate_enhanced_state_svg(states, transitions):
     
     state_positions = {}
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         '<linearGradient id="stateGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:#DC2626;stop-opacity:1"/><stop offset="100%" style="stop-color:#EF4444;stop-opacity:1"/></linearGradient>',
         '<marker id="stateArrow" markerWidth="10" markerHeight="7" refX="9" refY="3.5" orient="auto"><polygon points="0 0, 10 3.5, 0 7" fill="#4B5563"/></marker>',
@@ -719,7 +821,7 @@ def generate_enhanced_state_svg(states, transitions):
         state_positions[state_name] = (x, y)
         
         # State circle
-        svg_elements.extend([
+        yield from [
             f'<circle cx="{x}" cy="{y}" r="{state_radius}" fill="url(#stateGrad)" stroke="#FFFFFF" stroke-width="3"/>',
             
             f'<text x="{x}" y="{y-10}" font-family="Inter, sans-serif" '
@@ -727,58 +829,132 @@ def generate_enhanced_state_svg(states, transitions):
             
             f'<text x="{x}" y="{y+10}" font-family="Inter, sans-serif" '
             f'font-size="10" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(state_desc, 20)}</text>',
-        ])
+        ]
 
-    # Draw transitions
-    for transition in transitions:
-        from_state = transition.get('from', '')
-        to_state = transition.get('to', '')
+    # Draw transitions routed around the states (circles are routed by their bounding boxes)
+    state_rects = {name: (x - state_radius, y - state_radius, 2 * state_radius, 2 * state_radius)
+                   for name, (x, y) in state_positions.items()}
+    connectors = route_connectors(state_rects, [(t.get('from', ''), t.get('to', '')) for t in transitions])
+    for transition, connector in zip(transitions, connectors):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
         trigger = transition.get('trigger', '')
         
-        if from_state in state_positions and to_state in state_positions:
-            x1, y1 = state_positions[from_state]
-            x2, y2 = state_positions[to_state]
+        yield from [
+            f'<path d="{path_data}" fill="none" '
+            'stroke="#4B5563" stroke-width="2" marker-end="url(#stateArrow)"/>',
             
-            # Calculate arrow positions on circle edges
-            dx, dy = x2 - x1, y2 - y1
-            length = math.sqrt(dx*dx + dy*dy)
-            if length > 0:
-                dx, dy = dx/length, dy/length
-                start_x, start_y = x1 + dx * state_radius, y1 + dy * state_radius
-                end_x, end_y = x2 - dx * state_radius, y2 - dy * state_radius
-                
-                svg_elements.extend([
-                    f'<line x1="{start_x}" y1="{start_y}" x2="{end_x}" y2="{end_y}" '
-                    'stroke="#4B5563" stroke-width="2" marker-end="url(#stateArrow)"/>',
-                    
-                    f'<text x="{(start_x+end_x)/2}" y="{(start_y+end_y)/2-10}" font-family="Inter, sans-serif" '
-                    f'font-size="10" fill="#374151" text-anchor="middle">{safe_svg_text(trigger, 15)}</text>'
-                ])
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="10" fill="#374151" text-anchor="middle">{safe_svg_text(trigger, 15)}</text>'
+        ]
+    yield '</svg>'
 
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
+def generate_enhanced_state_svg(states, transitions):
+    """Generate proper state diagram"""
+    return join_svg_chunks(iter_enhanced_state_svg(states, transitions))
+
+def layout_gantt(tasks):
+    """Schedule Gantt tasks and size the chart from the project span and task count"""
+    schedule = schedule_tasks(tasks)
+    axis = choose_time_axis(schedule["span"])
+    task_height, task_spacing = (24, 36) if len(tasks) > 30 else (40, 60)
+    logger.info(f"Scheduled {len(tasks)} Gantt tasks over {schedule['span']:g} months "
+                f"({len(schedule['critical_path'])} on the critical path) in {schedule['elapsed_ms']:.1f} ms")
+    return {
+        "schedule": schedule,
+        "axis": axis,
+        "task_height": task_height,
+        "task_spacing": task_spacing,
+        "width": int(300 + axis["chart_width"] + 50),
+        "height": 120 + len(tasks) * task_spacing + 90,
+    }
 
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def get_gantt_chart_elements(gantt, chart_start_x, critical_color):
+    """Time axis, task bars with slack, critical path links and legend for a scheduled Gantt chart"""
+    schedule, axis = gantt["schedule"], gantt["axis"]
+    task_height, task_spacing = gantt["task_height"], gantt["task_spacing"]
+    month_px = axis["month_px"]
+    elements = [
+        f'<line x1="{chart_start_x}" y1="80" x2="{gantt["width"]-50}" y2="80" stroke="#9CA3AF" stroke-width="2"/>',
+    ]
+
+    # Tick marks on period boundaries, labels centered in each period
+    tick_px = axis["tick_step"] * month_px
+    for i in range(axis["tick_count"] + 1):
+        x = round(chart_start_x + i * tick_px, 1)
+        elements.append(f'<line x1="{x}" y1="75" x2="{x}" y2="85" stroke="#9CA3AF" stroke-width="1"/>')
+        if i < axis["tick_count"]:
+            elements.append(
+                f'<text x="{round(x + tick_px / 2, 1)}" y="100" font-family="Inter, sans-serif" '
+                f'font-size="10" fill="#6B7280" text-anchor="middle">{axis["tick_prefix"]}{i+1}</text>'
+            )
+
+    row_y = {}
+    for i, task_name in enumerate(schedule["order"]):
+        task = schedule["tasks"][task_name]
+        y = 120 + i * task_spacing
+        row_y[task_name] = y
+        bar_x = round(chart_start_x + task["start"] * month_px, 1)
+        bar_width = round(max(task["duration"] * month_px, 2), 1)
+
+        elements.append(
+            f'<text x="20" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
+            f'font-size="12" fill="#374151" font-weight="600">{safe_svg_text(task_name, 25)}</text>'
+        )
+        if task["slack"] > 0:
+            elements.append(
+                f'<rect x="{round(bar_x + bar_width, 1)}" y="{y+task_height//2-3}" width="{round(task["slack"] * month_px, 1)}" '
+                f'height="6" rx="3" fill="#CBD5E1" opacity="0.6"/>'
+            )
+        stroke = f'stroke="{critical_color}" stroke-width="3"' if task["critical"] else 'stroke="#FFFFFF" stroke-width="1"'
+        elements.extend([
+            f'<rect x="{bar_x}" y="{y}" width="{bar_width}" height="{task_height}" '
+            f'rx="4" fill="url(#ganttGrad)" {stroke}/>',
+            
+            f'<text x="{round(bar_x + bar_width / 2, 1)}" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
+            f'font-size="10" fill="#FFFFFF" text-anchor="middle">{task["duration"]:g}M</text>'
+        ])
+
+    # Links along the critical path: each task starts where its predecessor ends
+    for previous, current in zip(schedule["critical_path"], schedule["critical_path"][1:]):
+        x = round(chart_start_x + schedule["tasks"][current]["start"] * month_px, 1)
+        y1, y2 = row_y[previous], row_y[current]
+        y_from, y_to = (y1 + task_height, y2) if y2 > y1 else (y1, y2 + task_height)
+        elements.append(
+            f'<line x1="{x}" y1="{y_from}" x2="{x}" y2="{y_to}" stroke="{critical_color}" '
+            'stroke-width="2" marker-end="url(#ganttArrow)"/>'
+        )
+
+    legend_y = gantt["height"] - 50
+    elements.extend([
+        f'<rect x="20" y="{legend_y}" width="24" height="12" rx="3" fill="url(#ganttGrad)" stroke="{critical_color}" stroke-width="3"/>',
+        f'<text x="52" y="{legend_y+11}" font-family="Inter, sans-serif" font-size="11" fill="#374151">Critical path</text>',
+        f'<rect x="160" y="{legend_y+3}" width="24" height="6" rx="3" fill="#CBD5E1" opacity="0.6"/>',
+        f'<text x="192" y="{legend_y+11}" font-family="Inter, sans-serif" font-size="11" fill="#374151">Slack</text>',
+    ])
+    if schedule["cycles"]:
+        cycle_text = ", ".join(f"{a} → {b}" for a, b in schedule["cycles"][:3])
+        elements.append(
+            f'<text x="260" y="{legend_y+11}" font-family="Inter, sans-serif" font-size="11" fill="#B91C1C">'
+            f'Circular dependencies ignored: {safe_svg_text(cycle_text, 120)}</text>'
+        )
+    return elements
 
 def generate_enhanced_gantt_svg(tasks):
     """Generate proper Gantt chart"""
     if not tasks:
         return generate_error_svg("Gantt chart requires tasks")
 
-    width, height = 1400, 600
-    task_height = 40
-    task_spacing = 60
+    gantt = layout_gantt(tasks)
+    width, height = gantt["width"], gantt["height"]
     chart_start_x = 300
     
     svg_elements = [
         '<defs>',
         '<linearGradient id="ganttGrad" x1="0%" y1="0%" x2="100%" y2="0%"><stop offset="0%" style="stop-color:#9333EA;stop-opacity:1"/><stop offset="100%" style="stop-color:#A855F7;stop-opacity:1"/></linearGradient>',
+        '<marker id="ganttArrow" markerWidth="8" markerHeight="6" refX="7" refY="3" orient="auto"><polygon points="0 0, 8 3, 0 6" fill="#DC2626"/></marker>',
         '</defs>',
         
         f'<rect width="{width}" height="{height}" fill="#F8FAFC"/>',
@@ -786,47 +962,10 @@ def generate_enhanced_gantt_svg(tasks):
         # Title
         f'<text x="{width//2}" y="40" font-family="Inter, sans-serif" '
         'font-size="28" font-weight="800" fill="#1F2937" text-anchor="middle">Gantt Chart</text>',
-        
-        # Time axis
-        f'<line x1="{chart_start_x}" y1="80" x2="{width-50}" y2="80" stroke="#9CA3AF" stroke-width="2"/>',
     ]
 
-    # Draw time markers
-    time_width = (width - chart_start_x - 50) // 12
-    for i in range(13):
-        x = chart_start_x + i * time_width
-        svg_elements.extend([
-            f'<line x1="{x}" y1="75" x2="{x}" y2="85" stroke="#9CA3AF" stroke-width="1"/>',
-            f'<text x="{x}" y="100" font-family="Inter, sans-serif" '
-            f'font-size="10" fill="#6B7280" text-anchor="middle">M{i+1}</text>'
-        ])
-
-    # Draw tasks
-    for i, (task_name, task_data) in enumerate(tasks.items()):
-        y = 120 + i * task_spacing
-        
-        # Task info
-        description = task_data.get('description', task_name) if isinstance(task_data, dict) else str(task_data)
-        start = task_data.get('start', 1) if isinstance(task_data, dict) else 1
-        duration = task_data.get('duration', 2) if isinstance(task_data, dict) else 2
-        
-        # Task label
-        svg_elements.append(
-            f'<text x="20" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
-            f'font-size="12" fill="#374151" font-weight="600">{safe_svg_text(task_name, 25)}</text>'
-        )
-        
-        # Task bar
-        bar_x = chart_start_x + (start-1) * time_width
-        bar_width = duration * time_width
-        
-        svg_elements.extend([
-            f'<rect x="{bar_x}" y="{y}" width="{bar_width}" height="{task_height}" '
-            'rx="4" fill="url(#ganttGrad)" stroke="#FFFFFF" stroke-width="1"/>',
-            
-            f'<text x="{bar_x + bar_width//2}" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
-            f'font-size="10" fill="#FFFFFF" text-anchor="middle">{duration}M</text>'
-        ])
+    # Time axis, scheduled task bars and critical path
+    svg_elements.extend(get_gantt_chart_elements(gantt, chart_start_x, "#DC2626"))
 
     # Ensure SVG has proper structure and add debugging
     svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
@@ -911,6 +1050,46 @@ def generate_enhanced_journey_svg(touchpoints):
     logger.info(f"Generated themed SVG with {len(svg_content)} chars")
     return svg_content
 
+def route_connectors(node_rects, edges):
+    """Route connectors around node boxes; returns (path data, label anchor) or None per edge"""
+    routing = route_edges(node_rects, edges)
+    logger.info(f"Routed {len(edges)} connectors in {routing['elapsed_ms']:.1f} ms "
+                f"({routing['searched']} searched, {routing['failed']} unresolved)")
+    connectors = []
+    for route in routing["routes"]:
+        if route is None:
+            connectors.append(None)
+            continue
+        label_x, label_y = route_label_point(route)
+        connectors.append((route_to_path(route), (round(label_x, 1), round(label_y, 1))))
+    return connectors
+
+def network_node_size(node_type):
+    """Side length of a network node's square: servers are drawn larger than clients"""
+    return 80 if "server" in node_type.lower() else 60
+
+def layout_network(nodes, connections):
+    """Place network nodes with the force-directed layout and size the canvas to fit them"""
+    node_names = list(nodes.keys())
+    edges = [(c.get("from", ""), c.get("to", "")) for c in connections]
+    # Grow the canvas with the node count so large topologies stay readable
+    width = max(1400, int(math.sqrt(len(node_names)) * 220))
+    height = max(900, int(width * 0.65))
+    layout = compute_force_layout(node_names, edges, width=width, height=height - 60, margin=100)
+    # Dense topologies leave boxes overlapping, which no connector can be routed around;
+    # snapping may push nodes past the margin, so the canvas grows to fit
+    sizes = {name: network_node_size(node_type) for name, node_type in nodes.items()}
+    positions = snap_to_grid(layout["positions"], max(sizes.values()) + 40)
+    min_x = min(x - sizes[name] / 2 for name, (x, _) in positions.items())
+    min_y = min(y - sizes[name] / 2 for name, (_, y) in positions.items())
+    shift_x, shift_y = max(0, 100 - min_x), max(0, 100 - min_y)
+    node_positions = {name: (round(x + shift_x, 1), round(y + shift_y + 60, 1)) for name, (x, y) in positions.items()}
+    width = max(width, int(max(x + sizes[name] / 2 for name, (x, _) in node_positions.items()) + 100))
+    height = max(height, int(max(y + sizes[name] / 2 for name, (_, y) in node_positions.items()) + 100))
+    logger.info(f"Network layout: {len(node_names)} nodes, {layout['iterations']} iterations "
+                f"in {layout['elapsed_ms']:.1f} ms{' (cached)' if layout['cached'] else ''}")
+    return node_positions, width, height
+
 # Keep all existing functions (generate_enhanced_network_svg, generate_enhanced_architecture_svg, etc.)
 def generate_enhanced_network_svg(data):
     """Generate Network Diagram with premium design"""
@@ -920,9 +1099,8 @@ def generate_enhanced_network_svg(data):
     if not nodes:
         return generate_error_svg("Network diagram requires nodes data")
 
-    width, height = 1400, 900
-    center_x, center_y = width // 2, height // 2
-    
+    node_positions, width, height = layout_network(nodes, connections)
+
     theme = data.get("theme", {})
     svg_elements = [
         '<defs>',
@@ -939,20 +1117,14 @@ def generate_enhanced_network_svg(data):
         'font-size="16" fill="#6B7280" text-anchor="middle">System connectivity and data flow</text>',
     ]
 
-    # Position nodes in a circular layout
-    node_positions = {}
-    radius = min(width, height) * 0.35
-    angle_step = 360 / max(len(nodes), 1)
-    
-    for i, (node_name, node_type) in enumerate(nodes.items()):
-        angle = math.radians(i * angle_step)
-        x = center_x + radius * math.cos(angle)
-        y = center_y + radius * math.sin(angle)
-        node_positions[node_name] = (x, y)
-        
+    node_rects = {}
+    for node_name, node_type in nodes.items():
+        x, y = node_positions[node_name]
+
         # Node styling based on type
         node_color = "#1E3A8A" if "server" in node_type.lower() else "#3B82F6"
-        node_size = 80 if "server" in node_type.lower() else 60
+        node_size = network_node_size(node_type)
+        node_rects[node_name] = (x - node_size / 2, y - node_size / 2, node_size, node_size)
         
         svg_elements.extend([
             f'<rect x="{x-node_size//2}" y="{y-node_size//2}" width="{node_size}" height="{node_size}" '
@@ -965,23 +1137,21 @@ def generate_enhanced_network_svg(data):
             f'font-size="11" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(node_type, 15)}</text>',
         ])
 
-    # Draw connections
-    for connection in connections:
-        from_node = connection.get("from", "")
-        to_node = connection.get("to", "")
+    # Draw connections routed around the nodes
+    connectors = route_connectors(node_rects, [(c.get("from", ""), c.get("to", "")) for c in connections])
+    for connection, connector in zip(connections, connectors):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
         label = connection.get("label", "")
         
-        if from_node in node_positions and to_node in node_positions:
-            x1, y1 = node_positions[from_node]
-            x2, y2 = node_positions[to_node]
+        svg_elements.extend([
+            f'<path d="{path_data}" fill="none" '
+            'stroke="#4B5563" stroke-width="3" marker-end="url(#networkArrow)"/>',
             
-            svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
-                'stroke="#4B5563" stroke-width="3" marker-end="url(#networkArrow)"/>',
-                
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-10}" font-family="Inter, sans-serif" '
-                f'font-size="12" fill="#374151" text-anchor="middle">{safe_svg_text(label, 20)}</text>'
-            ])
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="12" fill="#374151" text-anchor="middle">{safe_svg_text(label, 20)}</text>'
+        ])
 
     # Ensure SVG has proper structure and add debugging
     svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
@@ -1025,6 +1195,7 @@ def generate_enhanced_architecture_svg(data):
     component_height = 80
     
     component_positions = {}
+    component_rects = {}
     comp_list = list(components.items())
     comps_per_layer = max(1, len(comp_list) // len(layers))
     
@@ -1055,6 +1226,7 @@ def generate_enhanced_architecture_svg(data):
                 y = layer_y + 30
                 
                 component_positions[comp_name] = (x + component_width//2, y + component_height//2)
+                component_rects[comp_name] = (x, y, component_width, component_height)
                 
                 svg_elements.extend([
                     f'<rect x="{x}" y="{y}" width="{component_width}" height="{component_height}" '
@@ -1067,22 +1239,20 @@ def generate_enhanced_architecture_svg(data):
                     f'font-size="11" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(comp_purpose, 25)}</text>',
                 ])
 
-    # Draw relationships
-    for i in range(len(comp_list)-1):
-        from_comp = comp_list[i][0]
-        to_comp = comp_list[i+1][0]
+    # Draw relationships routed around the components
+    links = get_architecture_links(components, relationships)
+    for link, connector in zip(links, route_connectors(component_rects, [(item["from"], item["to"]) for item in links])):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
         
-        if from_comp in component_positions and to_comp in component_positions:
-            x1, y1 = component_positions[from_comp]
-            x2, y2 = component_positions[to_comp]
+        svg_elements.extend([
+            f'<path d="{path_data}" fill="none" '
+            'stroke="#7C3AED" stroke-width="2" stroke-dasharray="5,3"/>',
             
-            svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
-                'stroke="#7C3AED" stroke-width="2" stroke-dasharray="5,3"/>',
-                
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-8}" font-family="Inter, sans-serif" '
-                f'font-size="11" fill="#7C3AED" text-anchor="middle">depends on</text>'
-            ])
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="11" fill="#7C3AED" text-anchor="middle">{safe_svg_text(link["label"], 24)}</text>'
+        ])
 
     # Ensure SVG has proper structure and add debugging
     svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
@@ -1096,18 +1266,42 @@ def generate_enhanced_architecture_svg(data):
     return svg_content
 
 # Keep all other existing functions (generate_enhanced_erd_svg, generate_enhanced_class_diagram_svg, etc.)
+def get_entity_box_size(entity_name, attributes, max_rows=12):
+    """Size an ERD entity box from its attribute count and measured label widths"""
+    shown = attributes[:max_rows]
+    label_width = max([measure_text_width(entity_name, 16, bold=True)] +
+                      [measure_text_width(attr, 12) for attr in shown])
+    rows = len(shown) + (1 if len(attributes) > max_rows else 0)
+    return min(max(220, label_width + 40), 360), 70 + max(rows, 1) * 20
+
+
+def get_class_box_size(class_name, members, max_rows=10):
+    """Size a class box from its attribute/method counts and measured label widths"""
+    attributes = members.get("attributes", [])[:max_rows]
+    methods = members.get("methods", [])[:max_rows]
+    label_width = max([measure_text_width(class_name, 16, bold=True)] +
+                      [measure_text_width(attr, 12) for attr in attributes] +
+                      [measure_text_width(f"{method}()", 12) for method in methods])
+    return min(max(240, label_width + 40), 360), 110 + (len(attributes) + len(methods)) * 16
+
+
+def layout_packed_boxes(box_sizes, top=100, min_width=1400, min_height=900):
+    """Pack boxes of different sizes onto a canvas that grows to fit them"""
+    packing = pack_rectangles([(key, w, h) for key, (w, h) in box_sizes.items()], gap=60)
+    width = int(max(min_width, packing["width"] + 160))
+    height = int(max(min_height, top + packing["height"] + 80))
+    offset_x = (width - packing["width"]) / 2
+    positions = {key: (round(x + offset_x, 1), round(y + top, 1)) for key, (x, y) in packing["positions"].items()}
+    logger.info(f"Packed {len(box_sizes)} boxes into {width}x{height} in {packing['elapsed_ms']:.1f} ms")
+    return positions, width, height
+
 def generate_enhanced_erd_svg(entities):
     """Generate Entity Relationship Diagram with premium design"""
     if not entities or not isinstance(entities, dict):
         return generate_error_svg("ERD requires entities data")
 
-    width, height = 1400, 900
-    node_width = 220
-    node_height = 120
-    spacing = 100
-    
-    # Calculate required height based on entities
-    height = max(height, 200 + len(entities) * (node_height + spacing))
+    box_sizes = {name: get_entity_box_size(name, attributes) for name, attributes in entities.items()}
+    entity_positions, width, height = layout_packed_boxes(box_sizes)
 
     svg_elements = [
         '<defs>',
@@ -1129,62 +1323,56 @@ def generate_enhanced_erd_svg(entities):
         'font-size="16" fill="#6B7280" text-anchor="middle">Database schema visualization</text>',
     ]
 
-    # Calculate positions for entities in a circular layout
-    center_x, center_y = width // 2, height // 2
-    radius = min(width, height) * 0.35
-    angle_step = 360 / max(len(entities), 1)
-    
-    entity_positions = {}
-    for i, (entity_name, attributes) in enumerate(entities.items()):
-        angle = math.radians(i * angle_step)
-        x = center_x + radius * math.cos(angle)
-        y = center_y + radius * math.sin(angle)
-        entity_positions[safe_svg_text(entity_name)] = (x, y)
-        
+    # Entities are packed as boxes sized to their attributes
+    for entity_name, attributes in entities.items():
+        left, top = entity_positions[entity_name]
+        node_width, node_height = box_sizes[entity_name]
+        x = left + node_width / 2
+
         # Entity box
         svg_elements.extend([
-            f'<rect x="{x-node_width//2}" y="{y-node_height//2}" width="{node_width}" height="{node_height}" '
+            f'<rect x="{left}" y="{top}" width="{node_width}" height="{node_height}" '
             'rx="8" fill="url(#entityGrad)" stroke="#FFFFFF" stroke-width="2" filter="url(#premiumShadow)"/>',
             
             # Entity name
-            f'<text x="{x}" y="{y-node_height//2+30}" font-family="Inter, -apple-system, sans-serif" '
-            f'font-size="16" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(entity_name)}</text>',
+            f'<text x="{x}" y="{top+30}" font-family="Inter, -apple-system, sans-serif" '
+            f'font-size="16" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(entity_name, 40)}</text>',
             
             # Attributes
-            f'<rect x="{x-node_width//2+10}" y="{y-node_height//2+40}" width="{node_width-20}" height="{node_height-50}" '
+            f'<rect x="{left+10}" y="{top+40}" width="{node_width-20}" height="{node_height-50}" '
             'rx="4" fill="#FFFFFF" fill-opacity="0.2" stroke="#FFFFFF" stroke-width="1" stroke-opacity="0.3"/>',
         ])
         
-        # Add attributes (limited to 3 for space)
-        for j, attr in enumerate(attributes[:3]):
+        for j, attr in enumerate(attributes[:12]):
             svg_elements.append(
-                f'<text x="{x}" y="{y-node_height//2+60+j*20}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="12" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(attr, 20)}</text>'
+                f'<text x="{x}" y="{top+60+j*20}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="12" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(attr, 40)}</text>'
             )
         
-        if len(attributes) > 3:
+        if len(attributes) > 12:
             svg_elements.append(
-                f'<text x="{x}" y="{y-node_height//2+60+3*20}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="10" fill="#FFFFFF" text-anchor="middle">+{len(attributes)-3} more</text>'
+                f'<text x="{x}" y="{top+60+12*20}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="10" fill="#FFFFFF" text-anchor="middle">+{len(attributes)-12} more</text>'
             )
 
     # Add relationships (simplified for this example)
     # In a real implementation, you'd parse actual relationships from the data
     if len(entities) > 1:
-        entities_list = list(entities.items())
-        for i in range(len(entities_list)-1):
-            from_ent = entities_list[i][0]
-            to_ent = entities_list[i+1][0]
-            x1, y1 = entity_positions[from_ent]
-            x2, y2 = entity_positions[to_ent]
+        entity_names = list(entities.keys())
+        entity_rects = {name: entity_positions[name] + box_sizes[name] for name in entity_names}
+        relationships = list(zip(entity_names, entity_names[1:]))
+        for connector in route_connectors(entity_rects, relationships):
+            if connector is None:
+                continue
+            path_data, (label_x, label_y) = connector
             
-            # Draw relationship line
+            # Draw relationship routed around the other entities
             svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1+node_height//2}" x2="{x2}" y2="{y2-node_height//2}" '
+                f'<path d="{path_data}" fill="none" '
                 'stroke="url(#relationshipGrad)" stroke-width="3" stroke-dasharray="5,3" marker-end="url(#erdArrow)"/>',
                 
                 # Relationship label
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-10}" font-family="Inter, -apple-system, sans-serif" '
+                f'<text x="{label_x}" y="{label_y-10}" font-family="Inter, -apple-system, sans-serif" '
                 'font-size="12" fill="#374151" text-anchor="middle">1:N</text>'
             ])
 
@@ -1195,15 +1383,8 @@ def generate_enhanced_class_diagram_svg(classes):
     if not classes or not isinstance(classes, dict):
         return generate_error_svg("Class diagram requires classes data")
 
-    width, height = 1400, 900
-    class_width = 240
-    min_class_height = 100
-    spacing = 120
-    
-    # Calculate positions in a grid layout
-    cols = min(3, len(classes))
-    rows = math.ceil(len(classes) / cols)
-    height = max(height, 150 + rows * (min_class_height + spacing))
+    box_sizes = {name: get_class_box_size(name, members) for name, members in classes.items()}
+    class_positions, width, height = layout_packed_boxes(box_sizes)
 
     svg_elements = [
         '<defs>',
@@ -1224,23 +1405,14 @@ def generate_enhanced_class_diagram_svg(classes):
         'font-size="16" fill="#6B7280" text-anchor="middle">Object-oriented design visualization</text>',
     ]
 
-    # Calculate positions for classes in a grid
-    class_positions = {}
-    col_width = width // (cols + 1)
-    row_height = (height - 100) // (rows + 1)
-    
-    for i, (class_name, members) in enumerate(classes.items()):
-        col = i % cols
-        row = i // cols
-        x = (col + 1) * col_width
-        y = 100 + row * row_height
-        class_positions[safe_svg_text(class_name)] = (x, y)
-        
-        # Calculate class box height based on content
-        attr_count = len(members.get("attributes", []))
-        method_count = len(members.get("methods", []))
-        class_height = min_class_height + (max(attr_count, method_count) * 20)
-        
+    # Classes are packed as boxes sized to their members
+    for class_name, members in classes.items():
+        left, y = class_positions[class_name]
+        class_width, class_height = box_sizes[class_name]
+        x = left + class_width / 2
+        attributes = members.get("attributes", [])[:10]
+        methods = members.get("methods", [])[:10]
+
         # Class box
         svg_elements.extend([
             f'<rect x="{x-class_width//2}" y="{y}" width="{class_width}" height="{class_height}" '
@@ -1252,7 +1424,7 @@ def generate_enhanced_class_diagram_svg(classes):
             
             # Class name
             f'<text x="{x}" y="{y+28}" font-family="Inter, -apple-system, sans-serif" '
-            f'font-size="16" font-weight="700" fill="#1F2937" text-anchor="middle">{safe_svg_text(class_name)}</text>',
+            f'font-size="16" font-weight="700" fill="#1F2937" text-anchor="middle">{safe_svg_text(class_name, 40)}</text>',
             
             # Separator line
             f'<line x1="{x-class_width//2}" y1="{y+40}" x2="{x+class_width//2}" y2="{y+40}" '
@@ -1265,22 +1437,22 @@ def generate_enhanced_class_diagram_svg(classes):
             'font-size="12" font-weight="600" fill="#FFFFFF" opacity="0.9">Attributes:</text>'
         )
         
-        for j, attr in enumerate(members.get("attributes", [])[:5]):  # Limit to 5 attributes
+        for j, attr in enumerate(attributes):
             svg_elements.append(
-                f'<text x="{x-class_width//2+15}" y="{y+80+j*16}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="12" fill="#FFFFFF">{safe_svg_text(attr, 20)}</text>'
+                f'<text x="{left+15}" y="{y+80+j*16}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="12" fill="#FFFFFF">{safe_svg_text(attr, 40)}</text>'
             )
         
         # Methods section
         svg_elements.append(
-            f'<text x="{x-class_width//2+10}" y="{y+80+len(members.get("attributes", []))*16}" '
+            f'<text x="{left+10}" y="{y+84+len(attributes)*16}" '
             'font-family="Inter, -apple-system, sans-serif" font-size="12" font-weight="600" fill="#FFFFFF" opacity="0.9">Methods:</text>'
         )
         
-        for k, method in enumerate(members.get("methods", [])[:5]):  # Limit to 5 methods
+        for k, method in enumerate(methods):
             svg_elements.append(
-                f'<text x="{x-class_width//2+15}" y="{y+100+len(members.get("attributes", []))*16+k*16}" '
-                f'font-family="Inter, -apple-system, sans-serif" font-size="12" fill="#FFFFFF">{safe_svg_text(method, 20)}()</text>'
+                f'<text x="{left+15}" y="{y+104+len(attributes)*16+k*16}" '
+                f'font-family="Inter, -apple-system, sans-serif" font-size="12" fill="#FFFFFF">{safe_svg_text(method, 40)}()</text>'
             )
     
     # Add inheritance relationships (simplified example)
@@ -1289,8 +1461,10 @@ def generate_enhanced_class_diagram_svg(classes):
         for i in range(len(class_list)-1):
             from_class = class_list[i][0]
             to_class = class_list[i+1][0]
-            x1, y1 = class_positions[from_class]
-            x2, y2 = class_positions[to_class]
+            x1 = class_positions[from_class][0] + box_sizes[from_class][0] / 2
+            y1 = class_positions[from_class][1]
+            x2 = class_positions[to_class][0] + box_sizes[to_class][0] / 2
+            y2 = class_positions[to_class][1]
             
             # Draw inheritance arrow
             svg_elements.extend([
@@ -1304,16 +1478,53 @@ def generate_enhanced_class_diagram_svg(classes):
 
     return f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">\n' + '\n'.join(svg_elements) + '\n</svg>'
 
-def generate_enhanced_flowchart_svg(steps):
-    """Ultra-enhanced flowchart with premium design"""
+def get_flowchart_step_description(step_content):
+    """Extract the display description from any of the supported step formats"""
+    if isinstance(step_content, dict):
+        return str(step_content.get("description", ""))
+    if isinstance(step_content, (list, tuple)):
+        return str(step_content[0]) if step_content else ""
+    return str(step_content or "")
+
+def layout_flowchart(steps, edges, node_width, node_height):
+    """Run the layered layout for a flowchart and return it with canvas size and offsets"""
+    flow_edges = get_flowchart_edges(steps, edges)
+    layout = compute_layered_layout(
+        list(steps.keys()),
+        [(edge["from"], edge["to"]) for edge in flow_edges],
+        node_width=node_width,
+        node_height=node_height,
+        h_gap=80,
+        v_gap=90,
+        max_layers_per_column=8,
+    )
+    width = max(1400, int(layout["width"]) + 200)
+    height = 140 + int(layout["height"]) + 100
+    offset_x = (width - layout["width"]) / 2
+    logger.info(f"Flowchart layout: {len(steps)} steps, {len(flow_edges)} edges, "
+                f"{layout['layer_count']} layers in {layout['elapsed_ms']:.2f} ms")
+    return layout, flow_edges, width, height, offset_x
+
+def get_flowchart_connector(layout, edge, offset_x, offset_y):
+    """Return (path data, label x, label y) for a laid-out flowchart edge"""
+    key = (edge["from"], edge["to"])
+    points = [(x + offset_x, y + offset_y) for x, y in layout["edges"].get(key, [])]
+    if len(points) < 2:
+        return None
+    path_data = waypoints_to_path(points, upward=key in layout["back_edges"])
+    mid = len(points) // 2
+    (ax, ay), (bx, by) = points[mid - 1], points[mid]
+    return path_data, (ax + bx) / 2, (ay + by) / 2
+
+def iter_enhanced_flowchart_svg(steps, edges=None):
+    """Yield the SVG of generate_enhanced_flowchart_svg() element by element"""
     if not steps or len(steps) < 2:
-        return generate_error_svg("Flowchart needs at least 2 steps")
+        yield generate_error_svg("Flowchart needs at least 2 steps")
+        return
 
-    width = 1400
     node_width = 320
     node_height = 120
-    spacing = 160
-    height = 180 + len(steps) * (node_height + spacing)
+    layout, flow_edges, width, height, offset_x = layout_flowchart(steps, edges, node_width, node_height)
 
     # Premium color palette
     colors = [
@@ -1325,7 +1536,8 @@ def generate_enhanced_flowchart_svg(steps):
         {'primary': '#a8edea', 'secondary': '#fed6e3'},
     ]
 
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">'
+    yield from [
         '<defs>',
         # Premium gradients
         *[f'<linearGradient id="nodeGrad{i+1}" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{colors[i % len(colors)]["primary"]};stop-opacity:1"/><stop offset="100%" style="stop-color:{colors[i % len(colors)]["secondary"]};stop-opacity:1"/></linearGradient>' for i in range(len(steps))],
@@ -1341,42 +1553,81 @@ def generate_enhanced_flowchart_svg(steps):
         
         # Background pattern
         '<pattern id="bgPattern" x="0" y="0" width="40" height="40" patternUnits="userSpaceOnUse"><circle cx="20" cy="20" r="1" fill="#e2e8f0"/></pattern>',
-        
+    ]
+    if SVG_SYMBOLS:
+        # Node frame shared by every step; the gradient comes from the fill of each <use>
+        yield (
+            '<symbol id="flowNode" overflow="visible">'
+            f'<rect x="-5" y="-5" width="{node_width+10}" height="{node_height+10}" rx="20" ry="20" opacity="0.2" filter="url(#glow)"/>'
+            f'<rect width="{node_width}" height="{node_height}" rx="18" ry="18" filter="url(#premiumShadow)" '
+            'stroke="rgba(255,255,255,0.4)" stroke-width="2"/>'
+            f'<rect x="4" y="4" width="{node_width-8}" height="3" rx="2" fill="rgba(255,255,255,0.5)"/>'
+            '<circle cx="25" cy="25" r="15" fill="rgba(255,255,255,0.3)"/>'
+            '</symbol>'
+        )
+    yield from [
         '</defs>',
 
         # Premium background with subtle pattern
         f'<rect width="{width}" height="{height}" fill="#f8fafc"/>',
     ]
 
+    # Connectors first so nodes are painted over their ends
+    for i, edge in enumerate(flow_edges):
+        connector = get_flowchart_connector(layout, edge, offset_x, 140)
+        if not connector:
+            continue
+        path_data, label_x, label_y = connector
+        gradient_id = f"nodeGrad{list(steps).index(edge['from']) + 1}"
+        yield from [
+            # Connection glow
+            f'<path d="{path_data}" stroke="url(#{gradient_id})" stroke-width="8" fill="none" opacity="0.3"/>',
+
+            # Main connection
+            f'<path d="{path_data}" stroke="#4a5568" stroke-width="4" fill="none" opacity="0.8" '
+            'marker-end="url(#premiumArrow)"/>',
+        ]
+        if edge["label"]:
+            yield (
+                f'<text x="{label_x:.1f}" y="{label_y:.1f}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="13" font-weight="600" fill="#4a5568" text-anchor="middle">{safe_svg_text(edge["label"], 24)}</text>'
+            )
+
     for i, (step_name, step_content) in enumerate(steps.items()):
-        x = width // 2
-        y = 140 + i * (node_height + spacing)
+        node_x, y = layout["positions"][step_name]
+        x = node_x + offset_x + node_width / 2
+        y = y + 140
         gradient_id = f"nodeGrad{i + 1}"
 
         # Ultra-premium node design
-        svg_elements.extend([
-            # Outer glow
-            f'<rect x="{x-node_width//2-5}" y="{y-5}" width="{node_width+10}" height="{node_height+10}" '
-            f'rx="20" ry="20" fill="url(#{gradient_id})" opacity="0.2" filter="url(#glow)"/>',
-
-            # Main node
-            f'<rect x="{x-node_width//2}" y="{y}" width="{node_width}" height="{node_height}" '
-            f'rx="18" ry="18" fill="url(#{gradient_id})" filter="url(#premiumShadow)" '
-            'stroke="rgba(255,255,255,0.4)" stroke-width="2"/>',
-
-            # Inner highlight
-            f'<rect x="{x-node_width//2+4}" y="{y+4}" width="{node_width-8}" height="3" '
-            f'rx="2" fill="rgba(255,255,255,0.5)"/>',
-
-            # Step number badge
-            f'<circle cx="{x-node_width//2+25}" cy="{y+25}" r="15" fill="rgba(255,255,255,0.3)"/>',
+        if SVG_SYMBOLS:
+            yield f'<use href="#flowNode" x="{x-node_width//2}" y="{y}" fill="url(#{gradient_id})"/>'
+        else:
+            yield from [
+                # Outer glow
+                f'<rect x="{x-node_width//2-5}" y="{y-5}" width="{node_width+10}" height="{node_height+10}" '
+                f'rx="20" ry="20" fill="url(#{gradient_id})" opacity="0.2" filter="url(#glow)"/>',
+
+                # Main node
+                f'<rect x="{x-node_width//2}" y="{y}" width="{node_width}" height="{node_height}" '
+                f'rx="18" ry="18" fill="url(#{gradient_id})" filter="url(#premiumShadow)" '
+                'stroke="rgba(255,255,255,0.4)" stroke-width="2"/>',
+
+                # Inner highlight
+                f'<rect x="{x-node_width//2+4}" y="{y+4}" width="{node_width-8}" height="3" '
+                f'rx="2" fill="rgba(255,255,255,0.5)"/>',
+
+                # Step number badge
+                f'<circle cx="{x-node_width//2+25}" cy="{y+25}" r="15" fill="rgba(255,255,255,0.3)"/>',
+            ]
+        yield (
             f'<text x="{x-node_width//2+25}" y="{y+30}" font-family="Inter, -apple-system, sans-serif" '
-            f'font-size="14" font-weight="800" fill="white" text-anchor="middle">{i+1}</text>',
-        ])
+            f'font-size="14" font-weight="800" fill="white" text-anchor="middle">{i+1}</text>'
+        )
 
         # Enhanced text with better formatting
         title = str(step_name)[:28]
-        description = (step_content[0] if step_content else "")[:60]
+        description = get_flowchart_step_description(step_content)[:60]
 
         # Smart text wrapping
         title_lines = textwrap.wrap(title, width=25)[:2]
@@ -1384,7 +1635,7 @@ def generate_enhanced_flowchart_svg(steps):
 
         # Title
         for j, line in enumerate(title_lines):
-            svg_elements.append(
+            yield (
                 f'<text x="{x}" y="{y+35+j*20}" font-family="Inter, -apple-system, sans-serif" '
                 f'font-size="18" font-weight="700" fill="white" text-anchor="middle" '
                 f'letter-spacing="0.5px">{safe_svg_text(line)}</text>'
@@ -1393,46 +1644,35 @@ def generate_enhanced_flowchart_svg(steps):
         # Description
         desc_start_y = y + 35 + len(title_lines) * 20 + 10
         for j, line in enumerate(desc_lines):
-            svg_elements.append(
+            yield (
                 f'<text x="{x}" y="{desc_start_y+j*16}" font-family="Inter, -apple-system, sans-serif" '
                 f'font-size="13" fill="rgba(255,255,255,0.9)" text-anchor="middle">{safe_svg_text(line)}</text>'
             )
 
-        # Premium connector with animation-ready design
-        if i < len(steps)-1:
-            next_y = y + node_height + spacing
-            mid_y = y + node_height + spacing//2
-
-            svg_elements.extend([
-                # Connection glow
-                f'<path d="M{x} {y+node_height} Q{x+30} {mid_y} {x} {next_y-25}" '
-                f'stroke="url(#{gradient_id})" stroke-width="8" fill="none" opacity="0.3"/>',
-
-                # Main connection
-                f'<path d="M{x} {y+node_height} Q{x+30} {mid_y} {x} {next_y-25}" '
-                'stroke="#4a5568" stroke-width="4" fill="none" opacity="0.8" '
-                'marker-end="url(#premiumArrow)"/>',
-            ])
-
     # Add title
-    svg_elements.extend([
+    yield from [
         f'<text x="{width//2}" y="40" font-family="Inter, -apple-system, sans-serif" '
         'font-size="28" font-weight="800" fill="#2d3748" text-anchor="middle">Process Flow</text>',
         f'<text x="{width//2}" y="65" font-family="Inter, -apple-system, sans-serif" '
         'font-size="16" fill="#718096" text-anchor="middle">Step-by-step workflow visualization</text>',
-    ])
+    ]
+    yield '</svg>'
 
-    return f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">\n' + '\n'.join(svg_elements) + '\n</svg>'
+def generate_enhanced_flowchart_svg(steps, edges=None):
+    """Ultra-enhanced flowchart with premium design"""
+    return join_svg_chunks(iter_enhanced_flowchart_svg(steps, edges))
 
-def generate_themed_mindmap_svg(central_topic, branches, variation, theme):
-    """Generate mind map with specific theme and style variation"""
+def iter_themed_mindmap_svg(central_topic, branches, variation, theme):
+    """Yield the SVG of generate_themed_mindmap_svg() element by element"""
     if not central_topic or not branches:
-        return generate_error_svg("Mind map requires central topic and branches")
+        yield generate_error_svg("Mind map requires central topic and branches")
+        return
 
     width, height = 1400, 900
     center_x, center_y = width // 2, height // 2
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         f'<linearGradient id="mindmapGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
         f'<filter id="mindmapShadow" x="-20%" y="-20%" width="140%" height="140%"><feGaussianBlur in="SourceAlpha" stdDeviation="3"/><feOffset dx="2" dy="4" result="offset"/><feFlood flood-color="#000000" flood-opacity="0.15"/><feComposite in2="offset" operator="in"/><feMerge><feMergeNode/><feMergeNode in="SourceGraphic"/></feMerge></filter>',
@@ -1446,13 +1686,13 @@ def generate_themed_mindmap_svg(central_topic, branches, variation, theme):
     ]
 
     # Central topic
-    svg_elements.extend([
+    yield from [
         f'<circle cx="{center_x}" cy="{center_y}" r="60" fill="url(#mindmapGrad)" filter="url(#mindmapShadow)"/>',
         f'<text x="{center_x}" y="{center_y-10}" font-family="Inter, sans-serif" '
         f'font-size="18" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(central_topic, 15)}</text>',
         f'<text x="{center_x}" y="{center_y+15}" font-family="Inter, sans-serif" '
         f'font-size="12" fill="#E5E7EB" text-anchor="middle">Central Topic</text>',
-    ])
+    ]
 
     # Draw branches
     branch_count = len(branches)
@@ -1465,7 +1705,7 @@ def generate_themed_mindmap_svg(central_topic, branches, variation, theme):
         y = center_y + radius * math.sin(angle)
         
         # Branch node
-        svg_elements.extend([
+        yield from [
             f'<rect x="{x-50}" y="{y-30}" width="100" height="60" '
             'rx="8" fill="url(#mindmapGrad)" filter="url(#mindmapShadow)"/>',
             
@@ -1474,35 +1714,31 @@ def generate_themed_mindmap_svg(central_topic, branches, variation, theme):
             
             f'<text x="{x}" y="{y+15}" font-family="Inter, sans-serif" '
             f'font-size="10" fill="#E5E7EB" text-anchor="middle">{concepts[0][:15] if concepts else ""}</text>',
-        ])
+        ]
         
         # Connection line
-        svg_elements.append(
+        yield (
             f'<line x1="{center_x}" y1="{center_y}" x2="{x}" y2="{y}" '
             f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="3" opacity="0.6"/>'
         )
+    yield '</svg>'
 
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
-
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_mindmap_svg(central_topic, branches, variation, theme):
+    """Generate mind map with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_mindmap_svg(central_topic, branches, variation, theme))
 
-def generate_themed_swot_svg(swot_data, variation, theme):
-    """Generate SWOT analysis with specific theme and style variation"""
+def iter_themed_swot_svg(swot_data, variation, theme):
+    """Yield the SVG of generate_themed_swot_svg() element by element"""
     if not swot_data:
-        return generate_error_svg("SWOT analysis requires data")
+        yield generate_error_svg("SWOT analysis requires data")
+        return
 
     width, height = 1400, 900
     quadrant_width = width // 2
     quadrant_height = height // 2
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         f'<linearGradient id="swotGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
         '</defs>',
@@ -1531,44 +1767,40 @@ def generate_themed_swot_svg(swot_data, variation, theme):
         y = 100 + quadrant["y"] * quadrant_height
         
         # Quadrant title
-        svg_elements.extend([
+        yield from [
             f'<text x="{x + quadrant_width//2}" y="{y+30}" font-family="Inter, sans-serif" '
             f'font-size="20" font-weight="700" fill="{escape_xml_text(quadrant["color"])}" text-anchor="middle">{escape_xml_text(quadrant["title"])}</text>',
             
             f'<rect x="{x+20}" y="{y+40}" width="{quadrant_width-40}" height="{quadrant_height-60}" '
             f'rx="8" fill="rgba({escape_xml_text(quadrant["color"])}, 0.1)" stroke="{escape_xml_text(quadrant["color"])}" stroke-width="1"/>',
-        ])
+        ]
         
         # Add items from data
         items = swot_data.get(quadrant["title"].lower(), [])
         for i, item in enumerate(items[:5]):  # Limit to 5 items per quadrant
             item_y = y + 70 + i * 25
             if item_y < y + quadrant_height - 20:
-                svg_elements.append(
+                yield (
                     f'<text x="{x+30}" y="{item_y}" font-family="Inter, sans-serif" '
                     f'font-size="12" fill="#374151">• {safe_svg_text(str(item), 30)}</text>'
                 )
+    yield '</svg>'
 
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
-
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_swot_svg(swot_data, variation, theme):
+    """Generate SWOT analysis with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_swot_svg(swot_data, variation, theme))
 
-def generate_themed_timeline_svg(events, variation, theme):
-    """Generate timeline with specific theme and style variation"""
+def iter_themed_timeline_svg(events, variation, theme):
+    """Yield the SVG of generate_themed_timeline_svg() element by element"""
     if not events:
-        return generate_error_svg("Timeline requires events")
+        yield generate_error_svg("Timeline requires events")
+        return
 
     width, height = 1400, 600
     timeline_y = height // 2
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         f'<linearGradient id="timelineGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
         '</defs>',
@@ -1592,17 +1824,17 @@ def generate_themed_timeline_svg(events, variation, theme):
         y = timeline_y
         
         # Event circle
-        svg_elements.extend([
+        yield from [
             f'<circle cx="{x}" cy="{y}" r="20" fill="url(#timelineGrad)" stroke="#FFFFFF" stroke-width="3"/>',
             f'<text x="{x}" y="{y+5}" font-family="Inter, sans-serif" '
             f'font-size="12" font-weight="700" fill="#FFFFFF" text-anchor="middle">{i+1}</text>',
-        ])
+        ]
         
         # Event details above or below timeline
         if i % 2 == 0:
             # Above timeline
             detail_y = y - 60
-            svg_elements.extend([
+            yield from [
                 f'<rect x="{x-80}" y="{detail_y-40}" width="160" height="80" '
                 f'rx="8" fill="#FFFFFF" stroke="{escape_xml_text(theme["primary"])}" stroke-width="2"/>',
                 
@@ -1611,11 +1843,11 @@ def generate_themed_timeline_svg(events, variation, theme):
                 
                 f'<text x="{x}" y="{detail_y}" font-family="Inter, sans-serif" '
                 f'font-size="10" fill="#6B7280" text-anchor="middle">{safe_svg_text(str(event_data), 25)}</text>',
-            ])
+            ]
         else:
             # Below timeline
             detail_y = y + 60
-            svg_elements.extend([
+            yield from [
                 f'<rect x="{x-80}" y="{detail_y}" width="160" height="80" '
                 f'rx="8" fill="#FFFFFF" stroke="{escape_xml_text(theme["primary"])}" stroke-width="2"/>',
                 
@@ -1624,18 +1856,12 @@ def generate_themed_timeline_svg(events, variation, theme):
                 
                 f'<text x="{x}" y="{detail_y+40}" font-family="Inter, sans-serif" '
                 f'font-size="10" fill="#6B7280" text-anchor="middle">{safe_svg_text(str(event_data), 25)}</text>',
-            ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
+            ]
+    yield '</svg>'
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_timeline_svg(events, variation, theme):
+    """Generate timeline with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_timeline_svg(events, variation, theme))
 
 def generate_themed_sequence_svg(actors, interactions, variation, theme):
     """Generate sequence diagram with specific theme and style variation"""
@@ -1765,31 +1991,23 @@ def generate_themed_state_svg(states, transitions, variation, theme):
             f'font-size="10" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(state_desc, 20)}</text>',
         ])
 
-    # Draw transitions
-    for transition in transitions:
-        from_state = transition.get('from', '')
-        to_state = transition.get('to', '')
+    # Draw transitions routed around the states (circles are routed by their bounding boxes)
+    state_rects = {name: (x - state_radius, y - state_radius, 2 * state_radius, 2 * state_radius)
+                   for name, (x, y) in state_positions.items()}
+    connectors = route_connectors(state_rects, [(t.get('from', ''), t.get('to', '')) for t in transitions])
+    for transition, connector in zip(transitions, connectors):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
         trigger = transition.get('trigger', '')
         
-        if from_state in state_positions and to_state in state_positions:
-            x1, y1 = state_positions[from_state]
-            x2, y2 = state_positions[to_state]
+        svg_elements.extend([
+            f'<path d="{path_data}" fill="none" '
+            f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="2" marker-end="url(#stateArrow)"/>',
             
-            # Calculate arrow positions on circle edges
-            dx, dy = x2 - x1, y2 - y1
-            length = math.sqrt(dx*dx + dy*dy)
-            if length > 0:
-                dx, dy = dx/length, dy/length
-                start_x, start_y = x1 + dx * state_radius, y1 + dy * state_radius
-                end_x, end_y = x2 - dx * state_radius, y2 - dy * state_radius
-                
-                svg_elements.extend([
-                    f'<line x1="{start_x}" y1="{start_y}" x2="{end_x}" y2="{end_y}" '
-                    f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="2" marker-end="url(#stateArrow)"/>',
-                    
-                    f'<text x="{(start_x+end_x)/2}" y="{(start_y+end_y)/2-10}" font-family="Inter, sans-serif" '
-                    f'font-size="10" fill="#374151" text-anchor="middle">{safe_svg_text(trigger, 15)}</text>'
-                ])
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="10" fill="#374151" text-anchor="middle">{safe_svg_text(trigger, 15)}</text>'
+        ])
 
     # Ensure SVG has proper structure and add debugging
     svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
@@ -1802,22 +2020,17 @@ def generate_themed_state_svg(states, transitions, variation, theme):
     logger.info(f"Generated themed state SVG with {len(svg_content)} chars")
     return svg_content
 
-def generate_themed_class_svg(classes, variation, theme):
-    """Generate class diagram with specific theme and style variation"""
+def iter_themed_class_svg(classes, variation, theme):
+    """Yield the SVG of generate_themed_class_svg() element by element"""
     if not classes or not isinstance(classes, dict):
-        return generate_error_svg("Class diagram requires classes data")
+        yield generate_error_svg("Class diagram requires classes data")
+        return
 
-    width, height = 1400, 900
-    class_width = 240
-    min_class_height = 100
-    spacing = 120
-    
-    # Calculate positions in a grid layout
-    cols = min(3, len(classes))
-    rows = math.ceil(len(classes) / cols)
-    height = max(height, 150 + rows * (min_class_height + spacing))
+    box_sizes = {name: get_class_box_size(name, members) for name, members in classes.items()}
+    class_positions, width, height = layout_packed_boxes(box_sizes)
 
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">'
+    yield from [
         '<defs>',
         # Class box gradient
         f'<linearGradient id="classGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
@@ -1836,63 +2049,56 @@ def generate_themed_class_svg(classes, variation, theme):
         f'font-size="16" fill="#6B7280" text-anchor="middle">Object-oriented design visualization</text>',
     ]
 
-    # Calculate positions for classes in a grid
-    class_positions = {}
-    col_width = width // (cols + 1)
-    row_height = (height - 100) // (rows + 1)
-    
-    for i, (class_name, members) in enumerate(classes.items()):
-        col = i % cols
-        row = i // cols
-        x = (col + 1) * col_width
-        y = 100 + row * row_height
-        class_positions[safe_svg_text(class_name)] = (x, y)
-        
-        # Calculate class box height based on content
-        attr_count = len(members.get("attributes", []))
-        method_count = len(members.get("methods", []))
-        class_height = min_class_height + (max(attr_count, method_count) * 20)
-        
-        # Class box
-        svg_elements.extend([
+    # Classes are packed as boxes sized to their members
+    for class_name, members in classes.items():
+        left, y = class_positions[class_name]
+        class_width, class_height = box_sizes[class_name]
+        x = left + class_width / 2
+        attributes = members.get("attributes", [])[:10]
+        methods = members.get("methods", [])[:10]
+
+        yield from [
+            # Class box
             f'<rect x="{x-class_width//2}" y="{y}" width="{class_width}" height="{class_height}" '
             'rx="8" fill="url(#classGrad)" stroke="#FFFFFF" stroke-width="2" filter="url(#premiumShadow)"/>',
-            
+
             # Class name section
             f'<rect x="{x-class_width//2}" y="{y}" width="{class_width}" height="40" '
             'rx="8" fill="#FFFFFF" fill-opacity="0.3"/>',
-            
-            # Class name
-            f'<text x="{x}" y="{y+28}" font-family="Inter, -apple-system, sans-serif" '
-            f'font-size="16" font-weight="700" fill="#1F2937" text-anchor="middle">{safe_svg_text(class_name)}</text>',
-            
+
             # Separator line
             f'<line x1="{x-class_width//2}" y1="{y+40}" x2="{x+class_width//2}" y2="{y+40}" '
             'stroke="#FFFFFF" stroke-width="1" stroke-opacity="0.5"/>',
-        ])
+        ]
+
+        # Class name
+        yield (
+            f'<text x="{x}" y="{y+28}" font-family="Inter, -apple-system, sans-serif" '
+            f'font-size="16" font-weight="700" fill="#1F2937" text-anchor="middle">{safe_svg_text(class_name, 40)}</text>'
+        )
         
         # Attributes section
-        svg_elements.append(
+        yield (
             f'<text x="{x-class_width//2+10}" y="{y+60}" font-family="Inter, -apple-system, sans-serif" '
             'font-size="12" font-weight="600" fill="#FFFFFF" opacity="0.9">Attributes:</text>'
         )
         
-        for j, attr in enumerate(members.get("attributes", [])[:5]):  # Limit to 5 attributes
-            svg_elements.append(
-                f'<text x="{x-class_width//2+15}" y="{y+80+j*16}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="12" fill="#FFFFFF">{safe_svg_text(attr, 20)}</text>'
+        for j, attr in enumerate(attributes):
+            yield (
+                f'<text x="{left+15}" y="{y+80+j*16}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="12" fill="#FFFFFF">{safe_svg_text(attr, 40)}</text>'
             )
         
         # Methods section
-        svg_elements.append(
-            f'<text x="{x-class_width//2+10}" y="{y+80+len(members.get("attributes", []))*16}" '
+        yield (
+            f'<text x="{left+10}" y="{y+84+len(attributes)*16}" '
             'font-family="Inter, -apple-system, sans-serif" font-size="12" font-weight="600" fill="#FFFFFF" opacity="0.9">Methods:</text>'
         )
         
-        for k, method in enumerate(members.get("methods", [])[:5]):  # Limit to 5 methods
-            svg_elements.append(
-                f'<text x="{x-class_width//2+15}" y="{y+100+len(members.get("attributes", []))*16+k*16}" '
-                f'font-family="Inter, -apple-system, sans-serif" font-size="12" fill="#FFFFFF">{safe_svg_text(method, 20)}()</text>'
+        for k, method in enumerate(methods):
+            yield (
+                f'<text x="{left+15}" y="{y+104+len(attributes)*16+k*16}" '
+                f'font-family="Inter, -apple-system, sans-serif" font-size="12" fill="#FFFFFF">{safe_svg_text(method, 40)}()</text>'
             )
     
     # Add inheritance relationships (simplified example)
@@ -1901,35 +2107,37 @@ def generate_themed_class_svg(classes, variation, theme):
         for i in range(len(class_list)-1):
             from_class = class_list[i][0]
             to_class = class_list[i+1][0]
-            x1, y1 = class_positions[from_class]
-            x2, y2 = class_positions[to_class]
+            x1 = class_positions[from_class][0] + box_sizes[from_class][0] / 2
+            y1 = class_positions[from_class][1]
+            x2 = class_positions[to_class][0] + box_sizes[to_class][0] / 2
+            y2 = class_positions[to_class][1]
             
             # Draw inheritance arrow
-            svg_elements.extend([
+            yield from [
                 f'<path d="M{x1} {y1+20} Q{x1} {y1-50} {x2} {y2-20}" '
                 'stroke="#1F2937" stroke-width="2" fill="none" marker-end="url(#inheritanceArrow)"/>',
                 
                 # Relationship label
                 f'<text x="{(x1+x2)/2}" y="{y1-30}" font-family="Inter, -apple-system, sans-serif" '
                 'font-size="12" fill="#1F2937" text-anchor="middle">inherits</text>'
-            ])
+            ]
+    yield '</svg>'
 
-    return f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">\n' + '\n'.join(svg_elements) + '\n</svg>'
+def generate_themed_class_svg(classes, variation, theme):
+    """Generate class diagram with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_class_svg(classes, variation, theme))
 
-def generate_themed_erd_svg(entities, variation, theme):
-    """Generate entity relationship diagram with specific theme and style variation"""
+def iter_themed_erd_svg(entities, variation, theme):
+    """Yield the SVG of generate_themed_erd_svg() element by element"""
     if not entities or not isinstance(entities, dict):
-        return generate_error_svg("ERD requires entities data")
+        yield generate_error_svg("ERD requires entities data")
+        return
 
-    width, height = 1400, 900
-    node_width = 220
-    node_height = 120
-    spacing = 100
-    
-    # Calculate required height based on entities
-    height = max(height, 200 + len(entities) * (node_height + spacing))
+    box_sizes = {name: get_entity_box_size(name, attributes) for name, attributes in entities.items()}
+    entity_positions, width, height = layout_packed_boxes(box_sizes)
 
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">'
+    yield from [
         '<defs>',
         # Premium gradients for different entity types
         f'<linearGradient id="entityGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
@@ -1949,76 +2157,78 @@ def generate_themed_erd_svg(entities, variation, theme):
         f'font-size="16" fill="#6B7280" text-anchor="middle">Database schema visualization</text>',
     ]
 
-    # Calculate positions for entities in a circular layout
-    center_x, center_y = width // 2, height // 2
-    radius = min(width, height) * 0.35
-    angle_step = 360 / max(len(entities), 1)
-    
-    entity_positions = {}
-    for i, (entity_name, attributes) in enumerate(entities.items()):
-        angle = math.radians(i * angle_step)
-        x = center_x + radius * math.cos(angle)
-        y = center_y + radius * math.sin(angle)
-        entity_positions[safe_svg_text(entity_name)] = (x, y)
-        
+    # Entities are packed as boxes sized to their attributes
+    for entity_name, attributes in entities.items():
+        left, top = entity_positions[entity_name]
+        node_width, node_height = box_sizes[entity_name]
+        x = left + node_width / 2
+
         # Entity box
-        svg_elements.extend([
-            f'<rect x="{x-node_width//2}" y="{y-node_height//2}" width="{node_width}" height="{node_height}" '
-            'rx="8" fill="url(#entityGrad)" stroke="#FFFFFF" stroke-width="2" filter="url(#premiumShadow)"/>',
-            
-            # Entity name
-            f'<text x="{x}" y="{y-node_height//2+30}" font-family="Inter, -apple-system, sans-serif" '
-            f'font-size="16" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(entity_name)}</text>',
-            
-            # Attributes
-            f'<rect x="{x-node_width//2+10}" y="{y-node_height//2+40}" width="{node_width-20}" height="{node_height-50}" '
-            'rx="4" fill="#FFFFFF" fill-opacity="0.2" stroke="#FFFFFF" stroke-width="1" stroke-opacity="0.3"/>',
-        ])
+        yield (
+            f'<rect x="{left}" y="{top}" width="{node_width}" height="{node_height}" '
+            'rx="8" fill="url(#entityGrad)" stroke="#FFFFFF" stroke-width="2" filter="url(#premiumShadow)"/>'
+        )
+
+        # Entity name
+        yield (
+            f'<text x="{x}" y="{top+30}" font-family="Inter, -apple-system, sans-serif" '
+            f'font-size="16" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(entity_name, 40)}</text>'
+        )
+
+        # Attributes
+        yield (
+            f'<rect x="{left+10}" y="{top+40}" width="{node_width-20}" height="{node_height-50}" '
+            'rx="4" fill="#FFFFFF" fill-opacity="0.2" stroke="#FFFFFF" stroke-width="1" stroke-opacity="0.3"/>'
+        )
         
-        # Add attributes (limited to 3 for space)
-        for j, attr in enumerate(attributes[:3]):
-            svg_elements.append(
-                f'<text x="{x}" y="{y-node_height//2+60+j*20}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="12" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(attr, 20)}</text>'
+        for j, attr in enumerate(attributes[:12]):
+            yield (
+                f'<text x="{x}" y="{top+60+j*20}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="12" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(attr, 40)}</text>'
             )
         
-        if len(attributes) > 3:
-            svg_elements.append(
-                f'<text x="{x}" y="{y-node_height//2+60+3*20}" font-family="Inter, -apple-system, sans-serif" '
-                f'font-size="10" fill="#FFFFFF" text-anchor="middle">+{len(attributes)-3} more</text>'
+        if len(attributes) > 12:
+            yield (
+                f'<text x="{x}" y="{top+60+12*20}" font-family="Inter, -apple-system, sans-serif" '
+                f'font-size="10" fill="#FFFFFF" text-anchor="middle">+{len(attributes)-12} more</text>'
             )
 
     # Add relationships (simplified for this example)
     # In a real implementation, you'd parse actual relationships from the data
     if len(entities) > 1:
-        entities_list = list(entities.items())
-        for i in range(len(entities_list)-1):
-            from_ent = entities_list[i][0]
-            to_ent = entities_list[i+1][0]
-            x1, y1 = entity_positions[from_ent]
-            x2, y2 = entity_positions[to_ent]
+        entity_names = list(entities.keys())
+        entity_rects = {name: entity_positions[name] + box_sizes[name] for name in entity_names}
+        relationships = list(zip(entity_names, entity_names[1:]))
+        for connector in route_connectors(entity_rects, relationships):
+            if connector is None:
+                continue
+            path_data, (label_x, label_y) = connector
             
-            # Draw relationship line
-            svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1+node_height//2}" x2="{x2}" y2="{y2-node_height//2}" '
+            # Draw relationship routed around the other entities
+            yield from [
+                f'<path d="{path_data}" fill="none" '
                 'stroke="url(#relationshipGrad)" stroke-width="3" stroke-dasharray="5,3" marker-end="url(#erdArrow)"/>',
                 
                 # Relationship label
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-10}" font-family="Inter, -apple-system, sans-serif" '
+                f'<text x="{label_x}" y="{label_y-10}" font-family="Inter, -apple-system, sans-serif" '
                 'font-size="12" fill="#374151" text-anchor="middle">1:N</text>'
-            ])
+            ]
+    yield '</svg>'
 
-    return f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">\n' + '\n'.join(svg_elements) + '\n</svg>'
+def generate_themed_erd_svg(entities, variation, theme):
+    """Generate entity relationship diagram with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_erd_svg(entities, variation, theme))
 
-def generate_themed_network_svg(nodes, connections, variation, theme):
-    """Generate network diagram with specific theme and style variation"""
+def iter_themed_network_svg(nodes, connections, variation, theme):
+    """Yield the SVG of generate_themed_network_svg() element by element"""
     if not nodes:
-        return generate_error_svg("Network diagram requires nodes data")
+        yield generate_error_svg("Network diagram requires nodes data")
+        return
 
-    width, height = 1400, 900
-    center_x, center_y = width // 2, height // 2
-    
-    svg_elements = [
+    node_positions, width, height = layout_network(nodes, connections)
+
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         f'<linearGradient id="networkGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
         f'<filter id="networkShadow" x="-30%" y="-30%" width="160%" height="160%"><feGaussianBlur in="SourceAlpha" stdDeviation="4"/><feOffset dx="2" dy="4" result="offset"/><feFlood flood-color="#000000" flood-opacity="0.2"/><feComposite in2="offset" operator="in"/><feMerge><feMergeNode/><feMergeNode in="SourceGraphic"/></feMerge></filter>',
@@ -2033,69 +2243,60 @@ def generate_themed_network_svg(nodes, connections, variation, theme):
         f'font-size="16" fill="#6B7280" text-anchor="middle">System connectivity and data flow</text>',
     ]
 
-    # Position nodes in a circular layout
-    node_positions = {}
-    radius = min(width, height) * 0.35
-    angle_step = 360 / max(len(nodes), 1)
-    
-    for i, (node_name, node_type) in enumerate(nodes.items()):
-        angle = math.radians(i * angle_step)
-        x = center_x + radius * math.cos(angle)
-        y = center_y + radius * math.sin(angle)
-        node_positions[node_name] = (x, y)
-        
+    node_rects = {}
+    for node_name, node_type in nodes.items():
+        x, y = node_positions[node_name]
+
         # Node styling based on type
         node_color = "#1E3A8A" if "server" in node_type.lower() else "#3B82F6"
-        node_size = 80 if "server" in node_type.lower() else 60
+        node_size = network_node_size(node_type)
+        node_rects[node_name] = (x - node_size / 2, y - node_size / 2, node_size, node_size)
         
-        svg_elements.extend([
+        yield (
             f'<rect x="{x-node_size//2}" y="{y-node_size//2}" width="{node_size}" height="{node_size}" '
-            f'rx="12" fill="url(#networkGrad)" filter="url(#networkShadow)" stroke="#FFFFFF" stroke-width="2"/>',
-            
+            f'rx="12" fill="url(#networkGrad)" filter="url(#networkShadow)" stroke="#FFFFFF" stroke-width="2"/>'
+        )
+        yield from [
             f'<text x="{x}" y="{y-10}" font-family="Inter, sans-serif" '
             f'font-size="14" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(node_name, 12)}</text>',
             
             f'<text x="{x}" y="{y+8}" font-family="Inter, sans-serif" '
             f'font-size="11" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(node_type, 15)}</text>',
-        ])
+        ]
 
-    # Draw connections
-    for connection in connections:
-        from_node = connection.get("from", "")
-        to_node = connection.get("to", "")
+    # Draw connections routed around the nodes
+    connectors = route_connectors(node_rects, [(c.get("from", ""), c.get("to", "")) for c in connections])
+    for connection, connector in zip(connections, connectors):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
         label = connection.get("label", "")
         
-        if from_node in node_positions and to_node in node_positions:
-            x1, y1 = node_positions[from_node]
-            x2, y2 = node_positions[to_node]
+        yield from [
+            f'<path d="{path_data}" fill="none" '
+            f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="3" marker-end="url(#networkArrow)"/>',
             
-            svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
-                f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="3" marker-end="url(#networkArrow)"/>',
-                
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-10}" font-family="Inter, sans-serif" '
-                f'font-size="12" fill="#374151" text-anchor="middle">{safe_svg_text(label, 20)}</text>'
-            ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="12" fill="#374151" text-anchor="middle">{safe_svg_text(label, 20)}</text>'
+        ]
+    yield '</svg>'
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_network_svg(nodes, connections, variation, theme):
+    """Generate network diagram with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_network_svg(nodes, connections, variation, theme))
 
-def generate_themed_architecture_svg(components, variation, theme):
-    """Generate architecture diagram with specific theme and style variation"""
+def iter_themed_architecture_svg(components, variation, theme, relationships=None):
+    """Yield the SVG of generate_themed_architecture_svg() element by element"""
     if not components:
-        return generate_error_svg("Architecture diagram requires components data")
+        yield generate_error_svg("Architecture diagram requires components data")
+        return
 
     width, height = 1400, 1000
+    component_width = 200
+    component_height = 80
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         f'<linearGradient id="archGrad" x1="0%" y1="0%" x2="100%" y2="100%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
         f'<filter id="archShadow" x="-20%" y="-20%" width="140%" height="140%"><feGaussianBlur in="SourceAlpha" stdDeviation="3"/><feOffset dx="2" dy="4" result="offset"/><feFlood flood-color="#000000" flood-opacity="0.15"/><feComposite in2="offset" operator="in"/><feMerge><feMergeNode/><feMergeNode in="SourceGraphic"/></feMerge></filter>',
@@ -2112,10 +2313,9 @@ def generate_themed_architecture_svg(components, variation, theme):
     # Arrange components in layers
     layers = ["Presentation", "Business", "Data", "Infrastructure"]
     layer_height = (height - 150) // len(layers)
-    component_width = 200
-    component_height = 80
     
     component_positions = {}
+    component_rects = {}
     comp_list = list(components.items())
     comps_per_layer = max(1, len(comp_list) // len(layers))
     
@@ -2123,12 +2323,12 @@ def generate_themed_architecture_svg(components, variation, theme):
         layer_y = 120 + layer_idx * layer_height
         
         # Draw layer background
-        svg_elements.append(
+        yield (
             f'<rect x="50" y="{layer_y-20}" width="{width-100}" height="{layer_height-20}" '
             f'rx="8" fill="rgba(124, 58, 237, 0.05)" stroke="rgba(124, 58, 237, 0.2)" stroke-width="1"/>'
         )
         
-        svg_elements.append(
+        yield (
             f'<text x="70" y="{layer_y}" font-family="Inter, sans-serif" '
             f'font-size="14" font-weight="600" fill="#7C3AED">{safe_svg_text(layer_name)} Layer</text>'
         )
@@ -2146,64 +2346,55 @@ def generate_themed_architecture_svg(components, variation, theme):
                 y = layer_y + 30
                 
                 component_positions[comp_name] = (x + component_width//2, y + component_height//2)
+                component_rects[comp_name] = (x, y, component_width, component_height)
                 
-                svg_elements.extend([
+                yield (
                     f'<rect x="{x}" y="{y}" width="{component_width}" height="{component_height}" '
-                    f'rx="12" fill="url(#archGrad)" filter="url(#archShadow)" stroke="#FFFFFF" stroke-width="2"/>',
-                    
+                    f'rx="12" fill="url(#archGrad)" filter="url(#archShadow)" stroke="#FFFFFF" stroke-width="2"/>'
+                )
+                yield from [
                     f'<text x="{x + component_width//2}" y="{y + 25}" font-family="Inter, sans-serif" '
                     f'font-size="14" font-weight="700" fill="#FFFFFF" text-anchor="middle">{safe_svg_text(comp_name, 18)}</text>',
                     
                     f'<text x="{x + component_width//2}" y="{y + 45}" font-family="Inter, sans-serif" '
                     f'font-size="11" fill="#E5E7EB" text-anchor="middle">{safe_svg_text(comp_purpose, 25)}</text>',
-                ])
-
-    # Draw relationships
-    for i in range(len(comp_list)-1):
-        from_comp = comp_list[i][0]
-        to_comp = comp_list[i+1][0]
-        
-        if from_comp in component_positions and to_comp in component_positions:
-            x1, y1 = component_positions[from_comp]
-            x2, y2 = component_positions[to_comp]
+                ]
+
+    # Draw relationships routed around the components
+    links = get_architecture_links(components, relationships)
+    for link, connector in zip(links, route_connectors(component_rects, [(item["from"], item["to"]) for item in links])):
+        if connector is None:
+            continue
+        path_data, (label_x, label_y) = connector
+        
+        yield from [
+            f'<path d="{path_data}" fill="none" '
+            'stroke="#7C3AED" stroke-width="2" stroke-dasharray="5,3"/>',
             
-            svg_elements.extend([
-                f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
-                'stroke="#7C3AED" stroke-width="2" stroke-dasharray="5,3"/>',
-                
-                f'<text x="{(x1+x2)/2}" y="{(y1+y2)/2-8}" font-family="Inter, sans-serif" '
-                f'font-size="11" fill="#7C3AED" text-anchor="middle">depends on</text>'
-            ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
+            f'<text x="{label_x}" y="{label_y-8}" font-family="Inter, sans-serif" '
+            f'font-size="11" fill="#7C3AED" text-anchor="middle">{safe_svg_text(link["label"], 24)}</text>'
+        ]
+    yield '</svg>'
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_architecture_svg(components, variation, theme, relationships=None):
+    """Generate architecture diagram with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_architecture_svg(components, variation, theme, relationships))
 
-def generate_themed_gantt_svg(tasks, variation, theme):
-    """Generate Gantt chart with specific theme and style variation"""
+def iter_themed_gantt_svg(tasks, variation, theme):
+    """Yield the SVG of generate_themed_gantt_svg() element by element"""
     if not tasks:
-        return generate_error_svg("Gantt chart requires tasks")
+        yield generate_error_svg("Gantt chart requires tasks")
+        return
 
-    width, height = 1400, 600
-    task_height = 40
-    task_spacing = 60
+    gantt = layout_gantt(tasks)
+    width, height = gantt["width"], gantt["height"]
     chart_start_x = 300
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
-        '''
-        <linearGradient id="ganttGrad" x1="0%" y1="0%" x2="100%" y2="0%">
-            <stop offset="0%" style="stop-color:{escape_xml_text(theme['primary'])};stop-opacity:1" />
-            <stop offset="100%" style="stop-color:{escape_xml_text(theme['secondary'])};stop-opacity:1" />
-        </linearGradient>
-        ''',
+        f'<linearGradient id="ganttGrad" x1="0%" y1="0%" x2="100%" y2="0%"><stop offset="0%" style="stop-color:{escape_xml_text(theme["primary"])};stop-opacity:1"/><stop offset="100%" style="stop-color:{escape_xml_text(theme["secondary"])};stop-opacity:1"/></linearGradient>',
+        f'<marker id="ganttArrow" markerWidth="8" markerHeight="6" refX="7" refY="3" orient="auto"><polygon points="0 0, 8 3, 0 6" fill="{escape_xml_text(theme["accent"])}"/></marker>',
         '</defs>',
         
         f'<rect width="{width}" height="{height}" fill="#F8FAFC"/>',
@@ -2211,63 +2402,21 @@ def generate_themed_gantt_svg(tasks, variation, theme):
         # Title
         f'<text x="{width//2}" y="40" font-family="Inter, sans-serif" '
         f'font-size="28" font-weight="800" fill="{escape_xml_text(theme["primary"])}" text-anchor="middle">{escape_xml_text(variation["name"])}</text>',
-        
-        # Time axis
-        f'<line x1="{chart_start_x}" y1="80" x2="{width-50}" y2="80" stroke="#9CA3AF" stroke-width="2"/>',
     ]
 
-    # Draw time markers
-    time_width = (width - chart_start_x - 50) // 12
-    for i in range(13):
-        x = chart_start_x + i * time_width
-        svg_elements.extend([
-            f'<line x1="{x}" y1="75" x2="{x}" y2="85" stroke="#9CA3AF" stroke-width="1"/>',
-            f'<text x="{x}" y="100" font-family="Inter, sans-serif" '
-            f'font-size="10" fill="#6B7280" text-anchor="middle">M{i+1}</text>'
-        ])
+    # Time axis, scheduled task bars and critical path
+    yield from get_gantt_chart_elements(gantt, chart_start_x, escape_xml_text(theme["accent"]))
+    yield '</svg>'
 
-    # Draw tasks
-    for i, (task_name, task_data) in enumerate(tasks.items()):
-        y = 120 + i * task_spacing
-        
-        # Task info
-        description = task_data.get('description', task_name) if isinstance(task_data, dict) else str(task_data)
-        start = task_data.get('start', 1) if isinstance(task_data, dict) else 1
-        duration = task_data.get('duration', 2) if isinstance(task_data, dict) else 2
-        
-        # Task label
-        svg_elements.append(
-            f'<text x="20" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
-            f'font-size="12" fill="#374151" font-weight="600">{safe_svg_text(task_name, 25)}</text>'
-        )
-        
-        # Task bar
-        bar_x = chart_start_x + (start-1) * time_width
-        bar_width = duration * time_width
-        
-        svg_elements.extend([
-            f'<rect x="{bar_x}" y="{y}" width="{bar_width}" height="{task_height}" '
-            'rx="4" fill="url(#ganttGrad)" stroke="#FFFFFF" stroke-width="1"/>',
-            
-            f'<text x="{bar_x + bar_width//2}" y="{y+task_height//2+5}" font-family="Inter, sans-serif" '
-            f'font-size="10" fill="#FFFFFF" text-anchor="middle">{duration}M</text>'
-        ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
-
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_gantt_svg(tasks, variation, theme):
+    """Generate Gantt chart with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_gantt_svg(tasks, variation, theme))
 
-def generate_themed_journey_svg(stages, variation, theme):
-    """Generate user journey map with specific theme and style variation"""
+def iter_themed_journey_svg(stages, variation, theme):
+    """Yield the SVG of generate_themed_journey_svg() element by element"""
     if not stages:
-        return generate_error_svg("Journey map requires stages")
+        yield generate_error_svg("Journey map requires stages")
+        return
 
     width, height = 1400, 700
     touchpoint_width = 150
@@ -2276,7 +2425,8 @@ def generate_themed_journey_svg(stages, variation, theme):
     # Sort stages by order
     sorted_stages = sorted(stages.items(), key=lambda x: x[1].get('order', 0) if isinstance(x[1], dict) else 0)
     
-    svg_elements = [
+    yield f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">'
+    yield from [
         '<defs>',
         '''
         <linearGradient id="journeyGrad" x1="0%" y1="0%" x2="100%" y2="100%">
@@ -2311,7 +2461,7 @@ def generate_themed_journey_svg(stages, variation, theme):
             emotion = 'Neutral'
         
         # Touchpoint circle
-        svg_elements.extend([
+        yield from [
             f'<circle cx="{x}" cy="{y}" r="30" fill="url(#journeyGrad)" stroke="#FFFFFF" stroke-width="3"/>',
             f'<text x="{x}" y="{y+5}" font-family="Inter, sans-serif" '
             f'font-size="12" font-weight="700" fill="#FFFFFF" text-anchor="middle">{i+1}</text>',
@@ -2328,29 +2478,21 @@ def generate_themed_journey_svg(stages, variation, theme):
             
             f'<text x="{x}" y="{y-80}" font-family="Inter, sans-serif" '
             f'font-size="10" fill="#6B7280" text-anchor="middle">{safe_svg_text(emotion)}</text>',
-        ])
-
-    # Ensure SVG has proper structure and add debugging
-    svg_content = f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto;">\n' + '\n'.join(svg_elements) + '\n</svg>'
-
-    # Validate that we have basic SVG structure
-    if '<defs>' not in svg_content or '<svg' not in svg_content:
-        logger.error(f"Invalid SVG structure: missing defs or svg tag")
-        return generate_error_svg("SVG structure error")
+        ]
+    yield '</svg>'
 
-    logger.info(f"Generated themed SVG with {len(svg_content)} chars")
-    return svg_content
+def generate_themed_journey_svg(stages, variation, theme):
+    """Generate user journey map with specific theme and style variation"""
+    return join_svg_chunks(iter_themed_journey_svg(stages, variation, theme))
 
-def generate_themed_flowchart_svg(steps, variation, theme):
+def generate_themed_flowchart_svg(steps, variation, theme, edges=None):
     """Generate themed flowchart with specific style variation"""
     if not steps or len(steps) < 2:
         return generate_error_svg("Flowchart needs at least 2 steps")
 
-    width = 1400
     node_width = 320
     node_height = 120
-    spacing = 160
-    height = 180 + len(steps) * (node_height + spacing)
+    layout, flow_edges, width, height, offset_x = layout_flowchart(steps, edges, node_width, node_height)
 
     svg_elements = [
         '<defs>',
@@ -2369,9 +2511,27 @@ def generate_themed_flowchart_svg(steps, variation, theme):
         f'font-size="16" fill="#718096" text-anchor="middle">Step-by-step workflow visualization</text>',
     ]
 
+    # Connection arrows first so nodes are painted over their ends
+    for edge in flow_edges:
+        connector = get_flowchart_connector(layout, edge, offset_x, 140)
+        if not connector:
+            continue
+        path_data, label_x, label_y = connector
+        svg_elements.append(
+            f'<path d="{path_data}" '
+            f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="4" fill="none" opacity="0.8" '
+            f'marker-end="url(#flowchartArrow)"/>'
+        )
+        if edge["label"]:
+            svg_elements.append(
+                f'<text x="{label_x:.1f}" y="{label_y:.1f}" font-family="Inter, sans-serif" '
+                f'font-size="13" font-weight="600" fill="{escape_xml_text(theme["accent"])}" text-anchor="middle">{safe_svg_text(edge["label"], 24)}</text>'
+            )
+
     for i, (step_name, step_content) in enumerate(steps.items()):
-        x = width // 2
-        y = 140 + i * (node_height + spacing)
+        node_x, y = layout["positions"][step_name]
+        x = node_x + offset_x + node_width / 2
+        y = y + 140
 
         # Node with theme colors
         svg_elements.extend([
@@ -2392,7 +2552,7 @@ def generate_themed_flowchart_svg(steps, variation, theme):
 
         # Text content
         title = str(step_name)[:28]
-        description = (step_content[0] if step_content else "")[:60]
+        description = get_flowchart_step_description(step_content)[:60]
 
         # Smart text wrapping
         title_lines = textwrap.wrap(title, width=25)[:2]
@@ -2414,21 +2574,337 @@ def generate_themed_flowchart_svg(steps, variation, theme):
                 f'font-size="13" fill="rgba(255,255,255,0.9)" text-anchor="middle">{safe_svg_text(line)}</text>'
             )
 
-        # Connection arrow to next step
-        if i < len(steps)-1:
-            next_y = y + node_height + spacing
-            mid_y = y + node_height + spacing//2
-
-            svg_elements.extend([
-                # Connection with theme color
-                f'<path d="M{x} {y+node_height} Q{x+30} {mid_y} {x} {next_y-25}" '
-                f'stroke="{escape_xml_text(theme["accent"])}" stroke-width="4" fill="none" opacity="0.8" '
-                f'marker-end="url(#flowchartArrow)"/>',
-            ])
-
     return f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" style="max-width: 100%; height: auto; font-family: Inter, -apple-system, sans-serif;">\n' + '\n'.join(svg_elements) + '\n</svg>'
 
 # ENHANCED: Update the generate_napkin_diagram endpoint to handle all types properly
+def generate_diagram_data(diagram_type, user_input, enhanced_prompt=None):
+    """
+    Ask the LLM for diagram data, falling back to template data when it is unavailable or fails.
+
+    Returns:
+        tuple: (diagram data, "ai" or "fallback")
+    """
+    enhanced_prompt = enhanced_prompt or get_enhanced_diagram_prompt(diagram_type, user_input)
+    diagram_data = {}
+    source = "fallback"
+    if client:
+        try:
+            response = client.chat.completions.create(
+                model="llama3-8b-8192",
+                messages=[
+                    {
+                        "role": "system", 
+                        "content": f"You are a {safe_svg_text(diagram_type)} expert. Return only valid JSON that matches the specified format exactly. Do not include any explanatory text, just the JSON. Focus on {safe_svg_text(diagram_type)}-specific terminology and best practices."
+                    },
+                    {
+                        "role": "user", 
+                        "content": enhanced_prompt
+                    }
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.7,
+                max_tokens=2000
+            )
+            note_llm_usage(response, "llama3-8b-8192")
+            
+            diagram_data = json.loads(response.choices[0].message.content)
+            validate_diagram_json(diagram_data, diagram_type)
+            source = "ai"
+            logger.info(f"Generated AI data for {safe_svg_text(diagram_type)}")
+            
+        except Exception as e:
+            logger.error(f"Groq API error for {diagram_type}: {str(e)}")
+            diagram_data = get_fallback_data(diagram_type, user_input)
+    else:
+        diagram_data = get_fallback_data(diagram_type, user_input)
+    return diagram_data, source
+
+def get_batch_diagram_prompt(diagram_types, user_input):
+    """One prompt asking for several diagram models of the same topic, keyed by diagram type"""
+    sections = []
+    for diagram_type in diagram_types:
+        # The per-type instructions refer to the topic by placeholder so it is only sent once
+        instructions = get_enhanced_diagram_prompt(diagram_type, "[TOPIC]").rsplit("\n\nTopic:", 1)[0]
+        sections.append(f'### "{diagram_type}"\n{instructions}')
+    keys = ", ".join(f'"{diagram_type}"' for diagram_type in diagram_types)
+    return (f"Topic: {safe_svg_text(user_input)}\n[TOPIC] in the sections below refers to this topic.\n\n"
+            f"Create one diagram model for each section below. Return ONLY a JSON object with exactly these keys: {keys}. "
+            f"The value under each key must follow that section's JSON format.\n\n" + "\n\n".join(sections))
+
+def plan_batch_calls(diagram_types):
+    """Group diagram types so each LLM call stays within the output token budget"""
+    groups = []
+    budget = 0
+    for diagram_type in diagram_types:
+        tokens = BATCH_TOKENS_PER_DIAGRAM.get(diagram_type, BATCH_DEFAULT_TOKENS_PER_DIAGRAM)
+        if not groups or budget + tokens > BATCH_MAX_OUTPUT_TOKENS:
+            groups.append([])
+            budget = 0
+        groups[-1].append(diagram_type)
+        budget += tokens
+    return groups
+
+def request_batch_models(diagram_types, user_input):
+    """One structured LLM call for a group of diagram types; returns (raw models by type, elapsed ms)"""
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        model="llama3-8b-8192",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are a diagram expert. Return only valid JSON that matches the specified formats exactly. Do not include any explanatory text, just the JSON."
+            },
+            {
+                "role": "user",
+                "content": get_batch_diagram_prompt(diagram_types, user_input)
+            }
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.7,
+        max_tokens=min(sum(BATCH_TOKENS_PER_DIAGRAM.get(t, BATCH_DEFAULT_TOKENS_PER_DIAGRAM) for t in diagram_types) + 500, 8000)
+    )
+    note_llm_usage(response, "llama3-8b-8192")
+    models = json.loads(response.choices[0].message.content)
+    return (models if isinstance(models, dict) else {}), (time.perf_counter() - started) * 1000
+
+def generate_batch_diagram_data(diagram_types, user_input):
+    """
+    Generate models for several diagram types of one topic.
+
+    Types are grouped into as few LLM calls as the output budget allows and the
+    groups run concurrently. Each model is validated with validate_diagram_json;
+    missing or invalid ones fall back to template data.
+
+    Returns:
+        tuple: ({type: {"data", "source", "llm_ms", "validate_ms"}}, number of LLM calls)
+    """
+    results = {}
+    raw = {}
+    llm_ms = {}
+    groups = plan_batch_calls(diagram_types) if client else []
+    futures = [(group, llm_scheduler.submit(request_batch_models, group, user_input)) for group in groups]
+    for group, future in futures:
+        try:
+            models, elapsed_ms = future.result()
+        except Exception as e:
+            logger.error(f"Batch LLM call for {group} failed: {str(e)}")
+            models, elapsed_ms = {}, 0.0
+        for diagram_type in group:
+            raw[diagram_type] = models.get(diagram_type)
+            llm_ms[diagram_type] = elapsed_ms
+
+    for diagram_type in diagram_types:
+        started = time.perf_counter()
+        diagram_data = raw.get(diagram_type)
+        source = "ai"
+        try:
+            if not isinstance(diagram_data, dict):
+                raise ValueError("model missing from the batch response")
+            validate_diagram_json(diagram_data, diagram_type)
+        except Exception as e:
+            if client:
+                logger.warning(f"Using fallback data for {diagram_type} in batch: {str(e)}")
+            diagram_data = get_fallback_data(diagram_type, user_input)
+            source = "fallback"
+        results[diagram_type] = {
+            "data": diagram_data,
+            "source": source,
+            "llm_ms": round(llm_ms.get(diagram_type, 0.0), 1),
+            "validate_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    return results, len(groups)
+
+def select_diagram_renderer(diagram_type, diagram_data):
+    """Return the chunk generator of the default-themed renderer for a diagram type"""
+    if diagram_type == "flowchart":
+        return iter_enhanced_flowchart_svg(diagram_data.get("steps", {}), diagram_data.get("edges"))
+    elif diagram_type == "sequence":
+        return iter_enhanced_sequence_svg(
+            diagram_data.get("actors", {}), 
+            diagram_data.get("interactions", [])
+        )
+    elif diagram_type == "state":
+        return iter_enhanced_state_svg(
+            diagram_data.get("states", {}), 
+            diagram_data.get("transitions", [])
+        )
+    elif diagram_type == "mind map":
+        return iter_themed_mindmap_svg(
+            diagram_data.get("central_topic", "Main Topic"),
+            diagram_data.get("branches", {}),
+            {"name": "Mind Map", "style": "standard"},
+            {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"}
+        )
+    elif diagram_type == "swot analysis":
+        return iter_themed_swot_svg(diagram_data, {"name": "SWOT Analysis", "style": "standard"}, {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"})
+    elif diagram_type == "timeline":
+        return iter_themed_timeline_svg(diagram_data.get("events", {}), {"name": "Timeline", "style": "standard"}, {"primary": "#0891B2", "secondary": "#06B6D4", "accent": "#0E7490"})
+    elif diagram_type == "gantt":
+        return iter_themed_gantt_svg(diagram_data.get("tasks", {}), {"name": "Gantt Chart", "style": "standard"}, {"primary": "#9333EA", "secondary": "#A855F7", "accent": "#7C3AED"})
+    elif diagram_type == "journey":
+        return iter_themed_journey_svg(diagram_data.get("stages") or diagram_data.get("touchpoints", {}), {"name": "User Journey", "style": "standard"}, {"primary": "#BE185D", "secondary": "#DB2777", "accent": "#9D174D"})
+    elif diagram_type == "erd":
+        return iter_themed_erd_svg(diagram_data.get("entities", {}), {"name": "Entity Relationship", "style": "standard"}, {"primary": "#059669", "secondary": "#10B981", "accent": "#047857"})
+    elif diagram_type == "class":
+        return iter_themed_class_svg(diagram_data.get("classes", {}), {"name": "Class Diagram", "style": "standard"}, {"primary": "#7C2D12", "secondary": "#9A3412", "accent": "#5C1911"})
+    elif diagram_type == "network":
+        return iter_themed_network_svg(diagram_data.get("nodes", {}), diagram_data.get("connections", []), {"name": "Network Diagram", "style": "standard"}, {"primary": "#1E40AF", "secondary": "#2563EB", "accent": "#1D4ED8"})
+    elif diagram_type == "architecture":
+        return iter_themed_architecture_svg(diagram_data.get("components", {}), {"name": "Architecture", "style": "standard"}, {"primary": "#6D28D9", "secondary": "#7C3AED", "accent": "#5B21B6"},
+                                            diagram_data.get("relationships"))
+    else:
+        # Default to flowchart for unknown types
+        return iter_enhanced_flowchart_svg(diagram_data.get("steps", {}), diagram_data.get("edges"))
+
+def iter_diagram_svg(diagram_type, diagram_data):
+    """Yield the SVG chunks for diagram data rendered with the default theme of its type"""
+    return with_model_metadata(select_diagram_renderer(diagram_type, diagram_data),
+                               model_metadata_element(diagram_type, model_store.put(diagram_type, diagram_data)))
+
+def render_diagram_svg(diagram_type, diagram_data):
+    """Render diagram data with the default theme for its diagram type"""
+    return join_svg_chunks(iter_diagram_svg(diagram_type, diagram_data))
+
+def compact_diagram_svg(svg_content, diagram_type):
+    """Apply the SVG compaction stage to a rendered diagram unless disabled"""
+    if not SVG_MINIFY or not svg_content:
+        return svg_content
+    return minify_svg_for_type(svg_content, diagram_type)
+
+def compact_svg_stream(chunks, diagram_type):
+    """
+    Apply the SVG compaction stage to streamed SVG chunks unless disabled.
+
+    Each chunk is compacted on its own with minify_svg_fragment(), which only
+    rounds numbers and drops whitespace between elements; id renaming and text
+    attribute hoisting need the whole document, so a streamed SVG stays larger
+    than the buffered one.
+    """
+    if not SVG_MINIFY:
+        yield from chunks
+        return
+    bytes_before = bytes_after = 0
+    elapsed_ms = 0.0
+    for index, chunk in enumerate(chunks):
+        started = time.perf_counter()
+        # Every chunk after the first starts with the newline separating it from the previous element
+        compacted = minify_svg_fragment(chunk if index == 0 else chunk.lstrip())
+        elapsed_ms += (time.perf_counter() - started) * 1000
+        bytes_before += len(chunk.encode("utf-8"))
+        bytes_after += len(compacted.encode("utf-8"))
+        yield compacted
+    record_svg_size(diagram_type, bytes_before, bytes_after, elapsed_ms)
+
+def get_svg_delivery(data):
+    """
+    Read how a generation endpoint should return its SVG: inline (default), url, png or webp.
+
+    Raises:
+        ValueError: When the mode is unknown or is a raster format this server cannot produce
+    """
+    mode = str(data.get('svgDelivery') or 'inline').strip().lower()
+    if mode not in ('inline', 'url') and mode not in RASTER_MIMETYPES:
+        raise ValueError(f"Unknown svgDelivery '{mode}', expected inline, url, png or webp")
+    if mode in RASTER_MIMETYPES and mode not in available_raster_formats():
+        raise ValueError(f"svgDelivery '{mode}' is not available on this server, use inline or url")
+    return {
+        "mode": mode,
+        "width": clamp_raster_width(data.get('rasterWidth'))
+    }
+
+def deliver_svg(payload, key, delivery):
+    """
+    Inline the SVG held under payload[key], or store it and replace it with its
+    content hash and artifact URL. Raster modes also add the PNG/WebP URL at the
+    requested width; the image is rendered when that URL is first fetched.
+    """
+    mode = delivery["mode"]
+    if mode == "inline" or not payload.get(key):
+        return payload
+    diagram_hash = diagram_store.put(payload.pop(key))
+    payload["svgHash"] = diagram_hash
+    payload["svgUrl"] = f"/diagrams/{diagram_hash}.svg"
+    if mode in RASTER_MIMETYPES:
+        payload["rasterUrl"] = f"/diagrams/{diagram_hash}.{mode}?width={delivery['width']}"
+    return payload
+
+def record_diagram_history(payload, key, diagram_type, diagram_data, source=None):
+    """Record a returned diagram in the generation history: its model and the hash of its SVG"""
+    svg_hash = payload.get("svgHash")
+    if svg_hash is None and payload.get("format", "svg") == "svg" and payload.get(key):
+        svg_hash = content_hash(payload[key])
+    record_history("diagram", diagram_type, source, model=diagram_data, svg_hash=svg_hash)
+    return payload
+
+def get_output_format(data, diagram_types=()):
+    """
+    Read the requested diagram output: svg (default), mermaid, plantuml or dot.
+
+    Raises:
+        ValueError: When the format is unknown or cannot express one of diagram_types
+    """
+    output_format = str(data.get('format') or 'svg').strip().lower()
+    if output_format == 'svg':
+        return output_format
+    if output_format not in EXPORT_MIMETYPES:
+        raise ValueError(f"Unknown format '{output_format}', expected svg or one of {sorted(EXPORT_MIMETYPES)}")
+    unsupported = [diagram_type for diagram_type in diagram_types if diagram_type not in EXPORT_TYPES[output_format]]
+    if unsupported:
+        raise ValueError(f"{output_format} export is not available for {', '.join(unsupported)} diagrams")
+    return output_format
+
+def exported_payload(payload, key, diagram_type, diagram_data, output_format):
+    """Put the model's text export under payload[key] and tag the payload with its format"""
+    payload[key] = export_diagram_model(diagram_type, diagram_data, output_format)
+    payload["format"] = output_format
+    payload["mimetype"] = EXPORT_MIMETYPES[output_format]
+    return attach_model(payload, diagram_type, diagram_data)
+
+def export_diagram_model(diagram_type, diagram_data, output_format):
+    """Export a validated model as Mermaid, PlantUML or DOT text, skipping layout and SVG rendering"""
+    return export_diagram(diagram_type, diagram_data, output_format)
+
+def attach_model(payload, diagram_type, diagram_data):
+    """Add the validated diagram model and its hash (kept in the model store for /render)"""
+    if diagram_data:
+        payload["model"] = diagram_data
+        payload["modelHash"] = model_store.put(diagram_type, diagram_data)
+    return payload
+
+@app.route('/diagrams/<diagram_hash>.svg', methods=['GET'])
+def get_stored_diagram(diagram_hash):
+    """Serve a stored SVG by content hash with immutable caching and conditional GET"""
+    svg_bytes = diagram_store.get(diagram_hash)
+    if svg_bytes is None:
+        return jsonify({"error": "Diagram not found"}), 404
+    return immutable_artifact_response(svg_bytes, "image/svg+xml", diagram_hash)
+
+@app.route('/diagrams/<diagram_hash>.<any(png, webp):raster_format>', methods=['GET'])
+def get_stored_diagram_raster(diagram_hash, raster_format):
+    """Serve a stored SVG rasterized to PNG or WebP at ?width= pixels"""
+    width = clamp_raster_width(request.args.get('width'))
+    if not diagram_store.contains(diagram_hash):
+        return jsonify({"error": "Diagram not found"}), 404
+    if raster_format not in available_raster_formats():
+        return jsonify({"error": f"{raster_format.upper()} output is not available on this server"}), 501
+    etag = f"{diagram_hash}-{width}.{raster_format}"
+    if request.if_none_match.contains(etag):
+        return immutable_artifact_response(None, RASTER_MIMETYPES[raster_format], etag)
+
+    svg_bytes = diagram_store.get(diagram_hash)
+    if svg_bytes is None:
+        return jsonify({"error": "Diagram not found"}), 404
+
+    try:
+        raster_bytes = raster_service.render(diagram_hash, svg_bytes, width, raster_format)
+    except FutureTimeoutError:
+        logger.error(f"Rasterizing {diagram_hash} to {raster_format} timed out")
+        return jsonify({"error": "Rasterization timed out"}), 504
+    except Exception as e:
+        logger.error(f"Error rasterizing {diagram_hash} to {raster_format}: {str(e)}")
+        return jsonify({"error": f"Failed to rasterize diagram: {str(e)}"}), 500
+    return immutable_artifact_response(raster_bytes, RASTER_MIMETYPES[raster_format], etag)
+
 @app.route('/generate_napkin_diagram', methods=['POST'])
 def generate_napkin_diagram():
     try:
@@ -2446,6 +2922,11 @@ def generate_napkin_diagram():
 
         template_name = napkin_template.get('name', '').strip()
         napkin_type = napkin_template.get('napkinType', 'flowchart')
+        try:
+            svg_delivery = get_svg_delivery(data)
+            output_format = get_output_format(data, [napkin_type])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         logger.info(f"Processing diagram request - Type: {safe_svg_text(napkin_type)}, Input: {safe_svg_text(user_input, 50)}...")
 
@@ -2453,87 +2934,29 @@ def generate_napkin_diagram():
         enhanced_prompt = get_enhanced_diagram_prompt(napkin_type, user_input)
 
         # Generate the diagram data using AI
-        diagram_data = {}
-        if client:
-            try:
-                response = client.chat.completions.create(
-                    model="llama3-8b-8192",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": f"You are a {safe_svg_text(napkin_type)} expert. Return only valid JSON that matches the specified format exactly. Do not include any explanatory text, just the JSON. Focus on {safe_svg_text(napkin_type)}-specific terminology and best practices."
-                        },
-                        {
-                            "role": "user", 
-                            "content": enhanced_prompt
-                        }
-                    ],
-                    response_format={"type": "json_object"},
-                    temperature=0.7,
-                    max_tokens=2000
-                )
-                
-                diagram_data = json.loads(response.choices[0].message.content)
-                validate_diagram_json(diagram_data, napkin_type)
-                logger.info(f"Generated AI data for {safe_svg_text(napkin_type)}")
-                
-            except Exception as e:
-                logger.error(f"Groq API error for {napkin_type}: {str(e)}")
-                diagram_data = get_fallback_data(napkin_type, user_input)
-        else:
-            diagram_data = get_fallback_data(napkin_type, user_input)
+        diagram_data, source = generate_diagram_data(napkin_type, user_input, enhanced_prompt)
+
+        if output_format != 'svg':
+            logger.info(f"Exported {safe_svg_text(napkin_type)} diagram as {output_format}")
+            return jsonify(record_diagram_history(exported_payload({
+                "templateName": template_name,
+                "isDiagram": True,
+                "diagramType": napkin_type,
+                "timestamp": datetime.now().isoformat()
+            }, "content", napkin_type, diagram_data, output_format), "content", napkin_type, diagram_data, source))
 
         # ENHANCED: Generate the appropriate SVG based on diagram type with proper routing
-        svg_content = ""
-        
-        if napkin_type == "flowchart":
-            svg_content = generate_enhanced_flowchart_svg(diagram_data.get("steps", {}))
-        elif napkin_type == "sequence":
-            svg_content = generate_enhanced_sequence_svg(
-                diagram_data.get("actors", {}), 
-                diagram_data.get("interactions", [])
-            )
-        elif napkin_type == "state":
-            svg_content = generate_enhanced_state_svg(
-                diagram_data.get("states", {}), 
-                diagram_data.get("transitions", [])
-            )
-        elif napkin_type == "mind map":
-            svg_content = generate_themed_mindmap_svg(
-                diagram_data.get("central_topic", "Main Topic"),
-                diagram_data.get("branches", {}),
-                {"name": "Mind Map", "style": "standard"},
-                {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"}
-            )
-        elif napkin_type == "swot analysis":
-            svg_content = generate_themed_swot_svg(diagram_data, {"name": "SWOT Analysis", "style": "standard"}, {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"})
-        elif napkin_type == "timeline":
-            svg_content = generate_themed_timeline_svg(diagram_data.get("events", {}), {"name": "Timeline", "style": "standard"}, {"primary": "#0891B2", "secondary": "#06B6D4", "accent": "#0E7490"})
-        elif napkin_type == "gantt":
-            svg_content = generate_themed_gantt_svg(diagram_data.get("tasks", {}), {"name": "Gantt Chart", "style": "standard"}, {"primary": "#9333EA", "secondary": "#A855F7", "accent": "#7C3AED"})
-        elif napkin_type == "journey":
-            svg_content = generate_themed_journey_svg(diagram_data.get("stages", {}), {"name": "User Journey", "style": "standard"}, {"primary": "#BE185D", "secondary": "#DB2777", "accent": "#9D174D"})
-        elif napkin_type == "erd":
-            svg_content = generate_themed_erd_svg(diagram_data.get("entities", {}), {"name": "Entity Relationship", "style": "standard"}, {"primary": "#059669", "secondary": "#10B981", "accent": "#047857"})
-        elif napkin_type == "class":
-            svg_content = generate_themed_class_svg(diagram_data.get("classes", {}), {"name": "Class Diagram", "style": "standard"}, {"primary": "#7C2D12", "secondary": "#9A3412", "accent": "#5C1911"})
-        elif napkin_type == "network":
-            svg_content = generate_themed_network_svg(diagram_data.get("nodes", {}), diagram_data.get("connections", []), {"name": "Network Diagram", "style": "standard"}, {"primary": "#1E40AF", "secondary": "#2563EB", "accent": "#1D4ED8"})
-        elif napkin_type == "architecture":
-            svg_content = generate_themed_architecture_svg(diagram_data.get("components", {}), {"name": "Architecture", "style": "standard"}, {"primary": "#6D28D9", "secondary": "#7C3AED", "accent": "#5B21B6"})
-        else:
-            # Default to flowchart for unknown types
-            svg_content = generate_enhanced_flowchart_svg(diagram_data.get("steps", {}))
+        svg_content = compact_diagram_svg(render_diagram_svg(napkin_type, diagram_data), napkin_type)
 
         logger.info(f"Generated {safe_svg_text(napkin_type)} diagram successfully")
 
-        return jsonify({
+        return jsonify(record_diagram_history(deliver_svg(attach_model({
             "templateName": template_name,
             "content": svg_content,
             "isDiagram": True,
             "diagramType": napkin_type,
             "timestamp": datetime.now().isoformat()
-        })
+        }, napkin_type, diagram_data), "content", svg_delivery), "content", napkin_type, diagram_data, source))
 
     except Exception as e:
         logger.error(f"Error generating diagram: {str(e)}")
@@ -2546,6 +2969,253 @@ def generate_napkin_diagram():
             "timestamp": datetime.now().isoformat()
         })
 
+@app.route('/generate_diagram_batch', methods=['POST', 'OPTIONS'])
+def generate_diagram_batch():
+    """Generate several diagram types for one userInput in a single round trip"""
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
+        return response
+
+    try:
+        started = time.perf_counter()
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "No JSON data received"}), 400
+
+        user_input = data.get('userInput', '').strip()
+        diagram_types = data.get('diagramTypes', [])
+        if not user_input:
+            return jsonify({"error": "User input is required"}), 400
+        if not isinstance(diagram_types, list) or not diagram_types:
+            return jsonify({"error": "diagramTypes must be a non-empty list"}), 400
+        diagram_types = list(dict.fromkeys(str(diagram_type).strip().lower() for diagram_type in diagram_types))
+        unsupported = [diagram_type for diagram_type in diagram_types if diagram_type not in SUPPORTED_DIAGRAM_TYPES]
+        if unsupported:
+            return jsonify({"error": f"Unsupported diagram types: {unsupported}"}), 400
+        try:
+            svg_delivery = get_svg_delivery(data)
+            output_format = get_output_format(data, diagram_types)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        logger.info(f"Processing batch request - Types: {diagram_types}, Input: {safe_svg_text(user_input, 50)}...")
+        llm_started = time.perf_counter()
+        models, llm_calls = generate_batch_diagram_data(diagram_types, user_input)
+        llm_ms = (time.perf_counter() - llm_started) * 1000
+
+        diagrams = []
+        for diagram_type in diagram_types:
+            model = models[diagram_type]
+            render_started = time.perf_counter()
+            payload = {
+                "diagramType": diagram_type,
+                "isDiagram": True,
+                "source": model["source"],
+                "timings": {"llm_ms": model["llm_ms"], "validate_ms": model["validate_ms"]}
+            }
+            if output_format != 'svg':
+                payload = exported_payload(payload, "content", diagram_type, model["data"], output_format)
+            else:
+                payload["content"] = compact_diagram_svg(render_diagram_svg(diagram_type, model["data"]), diagram_type)
+                payload = deliver_svg(attach_model(payload, diagram_type, model["data"]), "content", svg_delivery)
+            payload["timings"]["render_ms"] = round((time.perf_counter() - render_started) * 1000, 1)
+            diagrams.append(record_diagram_history(payload, "content", diagram_type, model["data"], model["source"]))
+
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Generated {len(diagrams)} diagrams with {llm_calls} LLM call(s) in {total_ms:.0f} ms")
+        return jsonify({
+            "diagrams": diagrams,
+            "userInput": user_input,
+            "llm_calls": llm_calls,
+            "timings": {"llm_ms": round(llm_ms, 1), "total_ms": round(total_ms, 1)},
+            "timestamp": datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Error generating diagram batch: {str(e)}")
+        return jsonify({"error": f"Failed to generate diagrams: {str(e)}"}), 500
+
+@app.route('/generate_diagram_svg', methods=['POST'])
+def generate_diagram_svg_stream():
+    """
+    Stream a diagram as raw SVG with chunked transfer encoding.
+
+    Takes either userInput (diagram data comes from the LLM as in
+    /generate_napkin_diagram) or ready-made diagramData, and sends the SVG while
+    the renderer produces it instead of building the whole document first.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+
+    diagram_type = data.get('diagramType', 'flowchart')
+    diagram_data = data.get('diagramData')
+    user_input = data.get('userInput', '').strip()
+    source = "model"
+    if diagram_data is None:
+        if not user_input:
+            return jsonify({"error": "userInput or diagramData is required"}), 400
+        diagram_data, source = generate_diagram_data(diagram_type, user_input)
+    elif not isinstance(diagram_data, dict):
+        return jsonify({"error": "diagramData must be an object"}), 400
+    else:
+        try:
+            validate_diagram_json(diagram_data, diagram_type)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            return jsonify({"error": f"Invalid diagramData: {str(e)}"}), 400
+
+    # Render the first chunk before the headers go out, so diagramData that
+    # validates but cannot be drawn is still answered with an error status
+    chunks = compact_svg_stream(stream_svg_chunks(iter_diagram_svg(diagram_type, diagram_data)), diagram_type)
+    try:
+        first_chunk = next(chunks, '')
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        if source != "model":
+            raise
+        return jsonify({"error": f"Invalid diagramData: {str(e)}"}), 400
+
+    def generate():
+        sent = len(first_chunk)
+        yield first_chunk
+        try:
+            for chunk in chunks:
+                sent += len(chunk)
+                yield chunk
+        except Exception as e:
+            # Headers are already sent, so the truncated document is the only signal left
+            logger.error(f"Error streaming {safe_svg_text(diagram_type)} diagram after {sent} chars: {str(e)}")
+            return
+        logger.info(f"Streamed {safe_svg_text(diagram_type)} diagram: {sent} chars")
+        record_history("diagram", diagram_type, source, model=diagram_data)
+
+    response = Response(stream_with_context(generate()), mimetype='image/svg+xml')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/render', methods=['POST', 'OPTIONS'])
+def render_diagram_model():
+    """
+    Render a diagram model without the LLM.
+
+    Takes a model (with diagramType) or the modelHash returned by an earlier
+    diagram response, plus an optional variation style and theme (a style name
+    or {"primary", "secondary", "accent"} colors).
+    """
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
+        return response
+
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+
+    diagram_type = data.get('diagramType')
+    diagram_data = data.get('model')
+    if diagram_data is not None:
+        if not diagram_type:
+            return jsonify({"error": "diagramType is required with a model"}), 400
+        if not isinstance(diagram_data, dict):
+            return jsonify({"error": "model must be an object"}), 400
+        try:
+            validate_diagram_json(diagram_data, diagram_type)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            return jsonify({"error": f"Invalid model: {str(e)}"}), 400
+    elif data.get('modelHash'):
+        stored = model_store.get(data['modelHash'])
+        if stored is None:
+            return jsonify({"error": "Unknown or expired modelHash, send the model instead"}), 404
+        stored_type, diagram_data = stored
+        if diagram_type and diagram_type != stored_type:
+            return jsonify({"error": f"modelHash refers to a {stored_type} model"}), 400
+        diagram_type = stored_type
+    else:
+        return jsonify({"error": "model or modelHash is required"}), 400
+
+    try:
+        svg_delivery = get_svg_delivery(data)
+        output_format = get_output_format(data, [diagram_type])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if output_format != 'svg':
+        # Text formats carry structure only, so variation and theme do not apply
+        payload = exported_payload({"isDiagram": True, "diagramType": diagram_type}, "content",
+                                   diagram_type, diagram_data, output_format)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Exported {safe_svg_text(diagram_type)} model as {output_format} in {elapsed_ms:.1f} ms")
+        payload.update({"elapsed_ms": round(elapsed_ms, 2), "timestamp": datetime.now().isoformat()})
+        return jsonify(payload)
+
+    variation = data.get('variation')
+    theme = data.get('theme')
+    if isinstance(variation, str):
+        variation = {"style": variation}
+    if variation is not None and not isinstance(variation, dict):
+        return jsonify({"error": "variation must be a style name or an object"}), 400
+    if isinstance(theme, str):
+        if theme not in VARIATION_THEMES:
+            return jsonify({"error": f"Unknown theme '{theme}', expected one of {sorted(VARIATION_THEMES)}"}), 400
+        theme = VARIATION_THEMES[theme]
+    if theme is not None:
+        if not isinstance(theme, dict) or any(not HEX_COLOR_PATTERN.match(str(theme.get(key, "")))
+                                              for key in ("primary", "secondary", "accent")):
+            return jsonify({"error": "theme needs primary, secondary and accent hex colors"}), 400
+        variation = dict(variation or {"style": "standard"}, theme={key: theme[key] for key in ("primary", "secondary", "accent")})
+
+    if variation:
+        svg_content = generate_variation_svg(diagram_data, diagram_type, variation)
+    else:
+        svg_content = render_diagram_svg(diagram_type, diagram_data)
+    svg_content = compact_diagram_svg(svg_content, diagram_type)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Rendered {safe_svg_text(diagram_type)} model without LLM in {elapsed_ms:.1f} ms")
+
+    return jsonify(deliver_svg(attach_model({
+        "content": svg_content,
+        "isDiagram": True,
+        "diagramType": diagram_type,
+        "variation": (variation or {}).get("style", "default"),
+        "elapsed_ms": round(elapsed_ms, 2),
+        "timestamp": datetime.now().isoformat()
+    }, diagram_type, diagram_data), "content", svg_delivery))
+
+def apply_incremental_edit(current_svg, prompt, model_hash=None):
+    """
+    Apply a small edit prompt without the LLM.
+
+    SVGs whose model is still in the model store (named by model_hash or by
+    the reference embedded in the SVG) are edited at the model level and
+    re-rendered in the same style; other SVGs only get rename/replace label
+    patches. Returns (svg, diagram_type, edited model, applied notes) or None
+    when the prompt needs a full regeneration.
+    """
+    model = extract_diagram_model(current_svg) or {}
+    stored = model_store.get(model_hash or model.get("hash")) if (model_hash or model.get("hash")) else None
+    if stored:
+        model = dict(model, type=stored[0], data=stored[1])
+    if not isinstance(model.get("data"), dict):
+        svg_content, applied = replace_svg_labels(current_svg, prompt)
+        return (svg_content, None, None, applied) if svg_content else None
+
+    diagram_type = model["type"]
+    try:
+        result = apply_edit_prompt(diagram_type, model["data"], prompt)
+    except DiagramEditError as e:
+        logger.info(f"Prompt is not an incremental edit, regenerating: {str(e)}")
+        return None
+
+    if model.get("variation"):
+        svg_content = generate_variation_svg(result["data"], diagram_type, model["variation"])
+    else:
+        svg_content = render_diagram_svg(diagram_type, result["data"])
+    return svg_content, diagram_type, result["data"], result["applied"]
+
 @app.route('/regenerate_diagram', methods=['POST', 'OPTIONS'])
 def regenerate_diagram():
     """Regenerate diagram with user modifications"""
@@ -2565,27 +3235,65 @@ def regenerate_diagram():
         prompt = data.get('prompt', '')
         diagram_type = data.get('diagramType', 'flowchart')
         current_svg = data.get('currentSvg', '')
+        if not current_svg and data.get('currentSvgHash'):
+            stored_svg = diagram_store.get(data['currentSvgHash'])
+            current_svg = stored_svg.decode('utf-8') if stored_svg else ''
         
         if not prompt:
             return jsonify({"error": "Prompt is required"}), 400
+        try:
+            svg_delivery = get_svg_delivery(data)
+            output_format = get_output_format(data, [diagram_type])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Small edits ("rename step 3 to Review") are applied to the current diagram directly
+        started = time.perf_counter()
+        incremental = apply_incremental_edit(current_svg, prompt, data.get('modelHash')) if current_svg else None
+        # Label patches on SVGs without an embedded model have nothing to export
+        if incremental and output_format != 'svg' and incremental[1] not in EXPORT_TYPES[output_format]:
+            incremental = None
+        if incremental:
+            svg_content, edited_type, edited_data, applied = incremental
+            edited_type = edited_type or diagram_type
+            payload = {
+                "success": True,
+                "timestamp": datetime.now().isoformat(),
+                "using_ai": False,
+                "incremental": True,
+                "applied": applied,
+                "message": "Diagram updated: " + "; ".join(applied)
+            }
+            if output_format != 'svg':
+                payload = exported_payload(payload, "svg", edited_type, edited_data, output_format)
+            else:
+                payload["svg"] = compact_diagram_svg(svg_content, edited_type)
+                payload = deliver_svg(attach_model(payload, edited_type, edited_data), "svg", svg_delivery)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            payload["elapsed_ms"] = round(elapsed_ms, 2)
+            logger.info(f"Applied incremental edit to {safe_svg_text(edited_type)} diagram in {elapsed_ms:.1f} ms: {applied}")
+            return jsonify(record_diagram_history(payload, "svg", edited_type, edited_data, "edit"))
         
         logger.info(f"Regenerating {safe_svg_text(diagram_type)} diagram with modified prompt")
         
         # Use the same AI generation process as the original diagram
         diagram_data = {}
-        if not client:
+        using_ai = False
+        if not client and output_format != 'svg':
+            diagram_data = get_fallback_data(diagram_type, prompt)
+        elif not client:
             logger.warning("AI service not available, using smart fallback with text changes")
             # Apply text changes directly to the current SVG instead of generating new data
-            svg_content = apply_text_changes_to_svg(current_svg, prompt)
+            svg_content = compact_diagram_svg(apply_text_changes_to_svg(current_svg, prompt), diagram_type)
             if svg_content:
                 logger.info(f"Successfully applied text changes to {safe_svg_text(diagram_type)} diagram")
-                return jsonify({
+                return jsonify(deliver_svg({
                     "svg": svg_content,
                     "success": True,
                     "timestamp": datetime.now().isoformat(),
                     "using_ai": False,
                     "message": "Diagram updated with your text changes (using direct text replacement)"
-                })
+                }, "svg", svg_delivery))
             else:
                 # Fallback to template data if direct text replacement fails
                 diagram_data = get_fallback_data(diagram_type, prompt)
@@ -2606,16 +3314,22 @@ def regenerate_diagram():
                     top_p=0.9,
                     stream=False
                 )
+                note_llm_usage(completion, "llama-3.1-70b-versatile")
                 
                 response_content = completion.choices[0].message.content.strip()
                 
                 # Clean and parse the response
                 response_content = clean_json_response(response_content)
                 
+                # Validate and normalize the model like /generate_napkin_diagram does
                 try:
                     diagram_data = json.loads(response_content)
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON decode error: {str(e)}")
+                    if not isinstance(diagram_data, dict):
+                        raise ValueError("model must be a JSON object")
+                    validate_diagram_json(diagram_data, diagram_type)
+                    using_ai = True
+                except (ValueError, TypeError, AttributeError, KeyError) as e:
+                    logger.error(f"Invalid AI diagram data: {str(e)}")
                     logger.error(f"Raw response: {safe_svg_text(response_content)}")
                     # Use fallback data if AI response is invalid
                     diagram_data = get_fallback_data(diagram_type, prompt)
@@ -2624,57 +3338,21 @@ def regenerate_diagram():
                 # Use fallback data if AI call fails
                 diagram_data = get_fallback_data(diagram_type, prompt)
         
-        # Generate SVG based on diagram type
-        svg_content = ""
-        if diagram_type == "flowchart":
-            svg_content = generate_enhanced_flowchart_svg(diagram_data.get("steps", {}))
-        elif diagram_type == "sequence":
-            svg_content = generate_enhanced_sequence_svg(
-                diagram_data.get("actors", {}),
-                diagram_data.get("interactions", [])
-            )
-        elif diagram_type == "state":
-            svg_content = generate_enhanced_state_svg(
-                diagram_data.get("states", {}), 
-                diagram_data.get("transitions", [])
-            )
-        elif diagram_type == "mind map":
-            svg_content = generate_themed_mindmap_svg(
-                diagram_data.get("central_topic", "Main Topic"),
-                diagram_data.get("branches", {}),
-                {"name": "Mind Map", "style": "standard"},
-                {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"}
-            )
-        elif diagram_type == "swot analysis":
-            svg_content = generate_themed_swot_svg(diagram_data, {"name": "SWOT Analysis", "style": "standard"}, {"primary": "#7C3AED", "secondary": "#8B5CF6", "accent": "#6D28D9"})
-        elif diagram_type == "timeline":
-            svg_content = generate_themed_timeline_svg(diagram_data.get("events", {}), {"name": "Timeline", "style": "standard"}, {"primary": "#0891B2", "secondary": "#06B6D4", "accent": "#0E7490"})
-        elif diagram_type == "gantt":
-            svg_content = generate_themed_gantt_svg(diagram_data.get("tasks", {}), {"name": "Gantt Chart", "style": "standard"}, {"primary": "#9333EA", "secondary": "#A855F7", "accent": "#7C3AED"})
-        elif diagram_type == "journey":
-            svg_content = generate_themed_journey_svg(diagram_data.get("stages", {}), {"name": "User Journey", "style": "standard"}, {"primary": "#BE185D", "secondary": "#DB2777", "accent": "#9D174D"})
-        elif diagram_type == "erd":
-            svg_content = generate_themed_erd_svg(diagram_data.get("entities", {}), {"name": "Entity Relationship", "style": "standard"}, {"primary": "#059669", "secondary": "#10B981", "accent": "#047857"})
-        elif diagram_type == "class":
-            svg_content = generate_themed_class_svg(diagram_data.get("classes", {}), {"name": "Class Diagram", "style": "standard"}, {"primary": "#7C2D12", "secondary": "#9A3412", "accent": "#5C1911"})
-        elif diagram_type == "network":
-            svg_content = generate_themed_network_svg(diagram_data.get("nodes", {}), diagram_data.get("connections", []), {"name": "Network Diagram", "style": "standard"}, {"primary": "#1E40AF", "secondary": "#2563EB", "accent": "#1D4ED8"})
-        elif diagram_type == "architecture":
-            svg_content = generate_themed_architecture_svg(diagram_data.get("components", {}), {"name": "Architecture", "style": "standard"}, {"primary": "#6D28D9", "secondary": "#7C3AED", "accent": "#5B21B6"})
-        else:
-            # Default to flowchart for unknown types
-            svg_content = generate_enhanced_flowchart_svg(diagram_data.get("steps", {}))
-
-        using_ai = client is not None
         logger.info(f"Successfully regenerated {safe_svg_text(diagram_type)} diagram {'with AI' if using_ai else 'with fallback data'}")
-
-        return jsonify({
-            "svg": svg_content,
+        payload = {
             "success": True,
             "timestamp": datetime.now().isoformat(),
             "using_ai": using_ai,
             "message": "Diagram regenerated successfully" + ("" if using_ai else " (using fallback data)")
-        })
+        }
+        if output_format != 'svg':
+            return jsonify(record_diagram_history(exported_payload(payload, "svg", diagram_type, diagram_data, output_format),
+                                                  "svg", diagram_type, diagram_data))
+
+        # Generate SVG based on diagram type
+        payload["svg"] = compact_diagram_svg(render_diagram_svg(diagram_type, diagram_data), diagram_type)
+        return jsonify(record_diagram_history(deliver_svg(attach_model(payload, diagram_type, diagram_data), "svg", svg_delivery),
+                                              "svg", diagram_type, diagram_data))
 
     except Exception as e:
         logger.error(f"Error regenerating diagram: {str(e)}")
@@ -2683,6 +3361,68 @@ def regenerate_diagram():
             "success": False
         }), 500
 
+@app.route('/history', methods=['GET'])
+def list_history():
+    """Recent generations, newest first: ?kind=diagram|document|..., ?type=, ?limit= (max 200), ?before=<id> to page"""
+    denied = history_access_error()
+    if denied:
+        return denied
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        before_id = int(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({"error": "limit and before must be integers"}), 400
+    entries = history_store.recent(request.args.get('kind'), request.args.get('type'), limit, before_id)
+    return jsonify({
+        "entries": entries,
+        "nextBefore": entries[-1]["id"] if len(entries) == limit else None
+    })
+
+@app.route('/search', methods=['GET'])
+def search_history():
+    """
+    Past generations matching ?q= (every word, the last as a prefix), best match first.
+
+    ?kind= and ?type= filter like /history; ?limit= (max 50) and ?offset= page through the ranking.
+    Needs the history admin token like /history. Every hit links to its history entry, which holds
+    the model or content to reuse instead of regenerating; svgUrl/documentUrl are added only while
+    this instance still stores the artifact.
+    """
+    denied = history_access_error()
+    if denied:
+        return denied
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 50)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    results = history_store.search(query, request.args.get('kind'), request.args.get('type'), limit, offset)
+    for result in results:
+        result["historyUrl"] = f"/history/{result['id']}"
+        if result.get("svg_hash") and diagram_store.contains(result["svg_hash"]):
+            result["svgUrl"] = f"/diagrams/{result['svg_hash']}.svg"
+        if result.get("document_hash") and document_stored(result["document_hash"]):
+            result["documentUrl"] = f"/documents/{result['document_hash']}.md"
+    return jsonify({
+        "query": query,
+        "results": results,
+        "nextOffset": offset + limit if len(results) == limit else None
+    })
+
+@app.route('/history/<int:entry_id>', methods=['GET'])
+def get_history_entry(entry_id):
+    """One recorded generation with its model and content"""
+    denied = history_access_error()
+    if denied:
+        return denied
+    entry = history_store.get(entry_id)
+    if entry is None:
+        return jsonify({"error": "History entry not found"}), 404
+    return jsonify(entry)
+
 @app.route('/health', methods=['GET', 'OPTIONS'])
 def health_check():
     """Enhanced health check endpoint with CORS support"""
@@ -2701,214 +3441,26 @@ def health_check():
         "version": "4.0.0",
         "server_host": "0.0.0.0",
         "server_port": 5000,
-        "supported_diagrams": [
-            "flowchart", "sequence", "state", "mind map", "swot analysis",
-            "timeline", "gantt", "journey", "erd", "class", "network", "architecture"
-        ]
+        "supported_diagrams": SUPPORTED_DIAGRAM_TYPES,
+        "svg_compaction": {
+            "enabled": SVG_MINIFY,
+            "by_type": get_svg_size_stats()
+        },
+        "compression": {
+            "enabled": RESPONSE_COMPRESSION,
+            "encodings": list(available_encodings()) if RESPONSE_COMPRESSION else [],
+            "by_encoding": get_compression_stats(),
+            "precompressed_cache": compression_cache.info() if compression_cache else None
+        },
+        "diagram_store": diagram_store.info(),
+        "raster": raster_service.info(),
+        "model_store": model_store.info(),
+        "document_cache": document_cache.info(),
+        "llm_scheduler": llm_scheduler.info(),
+        "history": history_store.info(),
+        "documents": document_subsystem_info()
     })
 
-# Document Generation Routes
-@app.route('/generate_document', methods=['POST'])
-def generate_document():
-    try:
-        data = request.get_json()
-        user_input = data.get('userInput', '')
-        document_template = data.get('documentTemplate', {})
-        
-        template_name = document_template.get('name', 'General Document')
-        document_type = document_template.get('documentType', 'general')
-        prompt_instruction = document_template.get('promptInstruction', '')
-        
-        if not user_input:
-            return jsonify({'error': 'User input is required'}), 400
-        
-        try:
-            full_prompt = prompt_instruction.replace('[USER_INPUT]', user_input)
-            
-            completion = client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are a professional document writer specializing in {safe_svg_text(document_type)} documents. Create comprehensive, well-structured, and professional content."
-                    },
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=4000,
-                top_p=1,
-                stream=False,
-                stop=None,
-            )
-            
-            generated_content = completion.choices[0].message.content
-            
-        except Exception as e:
-            logger.warning(f"Groq API failed, using fallback content: {str(e)}")
-            generated_content = f"""# {safe_svg_text(template_name)}
-
-## Overview
-This document provides a comprehensive overview of {safe_svg_text(user_input)}.
-
-## Key Points
-- Professional approach to {safe_svg_text(user_input)}
-- Structured methodology and best practices
-- Clear objectives and deliverables
-- Risk assessment and mitigation strategies
-
-## Implementation Plan
-1. **Planning Phase**: Define scope and requirements
-2. **Analysis Phase**: Evaluate current state and needs
-3. **Design Phase**: Create detailed specifications
-4. **Execution Phase**: Implement the solution
-5. **Review Phase**: Validate results and optimize
-
-## Conclusion
-This document serves as a foundation for successful implementation of {safe_svg_text(user_input)}.
-
-*Generated on {datetime.now().strftime('%B %d, %Y')}*
-*Status: Ready for implementation*"""
-        
-        response_data = {
-            'templateName': template_name,
-            'content': generated_content,
-            'documentType': document_type,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        return jsonify(response_data)
-        
-    except Exception as e:
-        logger.error(f"Error in generate_document: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/generate_documents', methods=['POST'])
-def generate_documents():
-    try:
-        data = request.get_json()
-        user_input = data.get('userInput', '')
-        document_templates = data.get('documentTemplates', [])
-        
-        if not user_input or not document_templates:
-            return jsonify({'error': 'User input and document templates are required'}), 400
-        
-        generated_documents = []
-        
-        for template in document_templates:
-            try:
-                template_name = template.get('name', 'General Document')
-                document_type = template.get('documentType', 'general')
-                prompt_instruction = template.get('promptInstruction', '')
-                
-                try:
-                    full_prompt = prompt_instruction.replace('[USER_INPUT]', user_input)
-                    
-                    completion = client.chat.completions.create(
-                        model="llama3-8b-8192",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": f"You are a professional document writer specializing in {safe_svg_text(document_type)} documents. Create comprehensive, well-structured, and professional content."
-                            },
-                            {
-                                "role": "user",
-                                "content": full_prompt
-                            }
-                        ],
-                        temperature=0.7,
-                        max_tokens=4000,
-                        top_p=1,
-                        stream=False,
-                        stop=None,
-                    )
-                    
-                    generated_content = completion.choices[0].message.content
-                    
-                except Exception as e:
-                    logger.warning(f"Groq API failed for template {safe_svg_text(template_name)}, using fallback: {str(e)}")
-                    generated_content = f"""# {safe_svg_text(template_name)}
-
-## Overview
-This document provides a comprehensive overview of {safe_svg_text(user_input)}.
-
-## Key Points
-- Professional approach to {safe_svg_text(user_input)}
-- Structured methodology and best practices
-- Clear objectives and deliverables
-
-## Implementation
-Detailed implementation plan for {safe_svg_text(user_input)}.
-
-*Generated on {datetime.now().strftime('%B %d, %Y')}*"""
-                
-                document_data = {
-                    'templateName': template_name,
-                    'content': generated_content,
-                    'documentType': document_type,
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                generated_documents.append(document_data)
-                
-            except Exception as e:
-                logger.error(f"Error generating document for template {template.get('name', 'Unknown')}: {str(e)}")
-                continue
-        
-        return jsonify(generated_documents)
-        
-    except Exception as e:
-        logger.error(f"Error in generate_documents: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/document_templates', methods=['GET'])
-def get_document_templates():
-    try:
-        templates = [
-            {
-                "id": "business_plan",
-                "name": "Business Plan",
-                "description": "Comprehensive business planning document",
-                "documentType": "business",
-                "promptInstruction": "Create a detailed business plan for [USER_INPUT]. Include executive summary, market analysis, financial projections, and implementation strategy."
-            },
-            {
-                "id": "technical_spec",
-                "name": "Technical Specification",
-                "description": "Detailed technical requirements and specifications",
-                "documentType": "technical",
-                "promptInstruction": "Create a comprehensive technical specification document for [USER_INPUT]. Include system requirements, architecture, APIs, and implementation details."
-            },
-            {
-                "id": "project_proposal",
-                "name": "Project Proposal",
-                "description": "Professional project proposal document",
-                "documentType": "proposal",
-                "promptInstruction": "Create a detailed project proposal for [USER_INPUT]. Include objectives, scope, timeline, resources, and expected outcomes."
-            },
-            {
-                "id": "marketing_strategy",
-                "name": "Marketing Strategy",
-                "description": "Strategic marketing plan and approach",
-                "documentType": "marketing",
-                "promptInstruction": "Create a comprehensive marketing strategy for [USER_INPUT]. Include target audience, channels, campaigns, and metrics."
-            },
-            {
-                "id": "user_manual",
-                "name": "User Manual",
-                "description": "Step-by-step user guide and documentation",
-                "documentType": "documentation",
-                "promptInstruction": "Create a detailed user manual for [USER_INPUT]. Include setup instructions, features, troubleshooting, and best practices."
-            }
-        ]
-        return jsonify(templates)
-        
-    except Exception as e:
-        logger.error(f"Error in get_document_templates: {str(e)}")
-        return jsonify({'error': str(e)}), 500
-
 def get_local_ip():
     """Get the local IP address for mobile connections"""
     try:
@@ -3107,20 +3659,28 @@ def customize_fallback_for_variation(diagram_data, diagram_type, style, user_inp
         logger.error(f"Error customizing fallback data: {str(e)}")
         return diagram_data
 
+HEX_COLOR_PATTERN = re.compile(r"^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$")
+
+# Color themes for each variation style
+VARIATION_THEMES = {
+    'standard': {"primary": "#4F46E5", "secondary": "#7C3AED", "accent": "#6366F1"},
+    'detailed': {"primary": "#059669", "secondary": "#10B981", "accent": "#047857"},
+    'compact': {"primary": "#7C2D12", "secondary": "#9A3412", "accent": "#5C1911"},
+    'enhanced': {"primary": "#EA580C", "secondary": "#FB923C", "accent": "#C2410C"},
+    'fallback': {"primary": "#3B82F6", "secondary": "#60A5FA", "accent": "#2563EB"}
+}
+
 def generate_variation_svg(diagram_data, diagram_type, variation):
+    """Generate SVG content for a specific diagram variation with a reference to its model embedded"""
+    svg_content = render_variation_svg(diagram_data, diagram_type, variation)
+    return embed_model_metadata(svg_content, model_metadata_element(diagram_type, model_store.put(diagram_type, diagram_data),
+                                                                    variation))
+
+def render_variation_svg(diagram_data, diagram_type, variation):
     """Generate SVG content for a specific diagram variation with theming"""
     
-    # Define color themes for each variation
-    themes = {
-        'standard': {"primary": "#4F46E5", "secondary": "#7C3AED", "accent": "#6366F1"},
-        'detailed': {"primary": "#059669", "secondary": "#10B981", "accent": "#047857"},
-        'compact': {"primary": "#7C2D12", "secondary": "#9A3412", "accent": "#5C1911"},
-        'enhanced': {"primary": "#EA580C", "secondary": "#FB923C", "accent": "#C2410C"},
-        'fallback': {"primary": "#3B82F6", "secondary": "#60A5FA", "accent": "#2563EB"}
-    }
-    
-    # Get theme for this variation
-    theme = themes.get(variation.get('style', 'standard'), themes['standard'])
+    # Get theme for this variation; an explicit color theme (from /render) wins over the style's
+    theme = variation.get('theme') or VARIATION_THEMES.get(variation.get('style', 'standard'), VARIATION_THEMES['standard'])
     variation_info = {
         "name": variation.get('name', f"{diagram_type.title()} - {variation.get('style', 'Standard').title()}"),
         "style": variation.get('style', 'standard')
@@ -3132,7 +3692,8 @@ def generate_variation_svg(diagram_data, diagram_type, variation):
             return generate_themed_flowchart_svg(
                 diagram_data.get("steps", {}),
                 variation_info,
-                theme
+                theme,
+                diagram_data.get("edges")
             )
         elif diagram_type == "sequence":
             actors_data = diagram_data.get("actors", {})
@@ -3205,11 +3766,12 @@ def generate_variation_svg(diagram_data, diagram_type, variation):
             return generate_themed_architecture_svg(
                 diagram_data.get("components", {}), 
                 variation_info, 
-                theme
+                theme,
+                diagram_data.get("relationships")
             )
         else:
             # Default to flowchart for unknown types
-            return generate_enhanced_flowchart_svg(diagram_data.get("steps", {}))
+            return generate_enhanced_flowchart_svg(diagram_data.get("steps", {}), diagram_data.get("edges"))
     
     except Exception as e:
         logger.error(f"Error generating {variation.get('style', 'unknown')} variation SVG for {diagram_type}: {str(e)}")
@@ -3310,6 +3872,10 @@ def generate_diagram_variations():
 
         user_input = data.get('userInput', '').strip()
         diagram_type = data.get('diagramType', 'flowchart').strip()
+        try:
+            svg_delivery = get_svg_delivery(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         logger.info(f"User input: '{safe_svg_text(user_input)}', Diagram type: '{safe_svg_text(diagram_type)}'")
         
@@ -3379,6 +3945,7 @@ def generate_diagram_variations():
                             temperature=0.3 + (i * 0.2),  # Vary temperature for different results
                             max_tokens=2000
                         )
+                        note_llm_usage(response, "llama3-8b-8192")
                         
                         diagram_data = json.loads(response.choices[0].message.content)
                         validate_diagram_json(diagram_data, diagram_type)
@@ -3393,7 +3960,7 @@ def generate_diagram_variations():
                     diagram_data = customize_fallback_for_variation(diagram_data, diagram_type, variation['style'], user_input)
 
                 # Generate SVG with variation-specific styling
-                svg_content = generate_variation_svg(diagram_data, diagram_type, variation)
+                svg_content = compact_diagram_svg(generate_variation_svg(diagram_data, diagram_type, variation), diagram_type)
 
                 # Create variation option
                 option = {
@@ -3409,7 +3976,9 @@ def generate_diagram_variations():
                     "uniqueId": variation['id']
                 }
                 
-                diagram_variations.append(option)
+                diagram_variations.append(record_diagram_history(
+                    deliver_svg(attach_model(option, diagram_type, diagram_data), "content", svg_delivery),
+                    "content", diagram_type, diagram_data))
                 logger.info(f"Generated {safe_svg_text(diagram_type)} variation {i+1} ({escape_xml_text(variation['style'])}) successfully")
                 
             except Exception as e:
@@ -3418,7 +3987,7 @@ def generate_diagram_variations():
                 try:
                     fallback_data = get_fallback_data(diagram_type, user_input)
                     fallback_data = customize_fallback_for_variation(fallback_data, diagram_type, variation['style'], user_input)
-                    fallback_svg = generate_variation_svg(fallback_data, diagram_type, variation)
+                    fallback_svg = compact_diagram_svg(generate_variation_svg(fallback_data, diagram_type, variation), diagram_type)
                     
                     fallback_option = {
                         "id": f"{safe_svg_text(diagram_type)}_{escape_xml_text(variation['id'])}_fallback_{int(datetime.now().timestamp())}",
@@ -3433,7 +4002,7 @@ def generate_diagram_variations():
                         "uniqueId": variation['id']
                     }
                     
-                    diagram_variations.append(fallback_option)
+                    diagram_variations.append(deliver_svg(attach_model(fallback_option, diagram_type, fallback_data), "content", svg_delivery))
                     logger.info(f"Generated fallback {safe_svg_text(diagram_type)} variation {i+1} ({escape_xml_text(variation['style'])}) successfully")
                 except Exception as fallback_error:
                     logger.error(f"Failed to generate fallback variation {i+1}: {safe_svg_text(fallback_error)}")
@@ -3445,7 +4014,8 @@ def generate_diagram_variations():
             while len(diagram_variations) < 4:
                 missing_index = len(diagram_variations)
                 fallback_data = get_fallback_data(diagram_type, user_input)
-                fallback_svg = generate_variation_svg(fallback_data, diagram_type, variations[missing_index])
+                fallback_svg = compact_diagram_svg(
+                    generate_variation_svg(fallback_data, diagram_type, variations[missing_index]), diagram_type)
                 
                 fallback_option = {
                     "id": f"{safe_svg_text(diagram_type)}_fallback_{safe_svg_text(missing_index)}_{int(datetime.now().timestamp())}",
@@ -3460,7 +4030,7 @@ def generate_diagram_variations():
                     "uniqueId": f"fallback_{safe_svg_text(missing_index)}"
                 }
                 
-                diagram_variations.append(fallback_option)
+                diagram_variations.append(deliver_svg(attach_model(fallback_option, diagram_type, fallback_data), "content", svg_delivery))
                 logger.info(f"Created additional fallback variation {missing_index + 1}")
 
         if not diagram_variations:
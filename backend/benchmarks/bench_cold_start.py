@@ -0,0 +1,41 @@
+"""Time a cold import of the app, as a fresh serverless instance pays it,
+and the part of it the document subsystem would add if it were loaded
+eagerly: importing document_generator (and the template, cache and export
+modules behind it) right after the app.
+
+Each sample is a new interpreter so no module is already imported.
+
+Run from the backend directory:  python benchmarks/bench_cold_start.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = 7
+
+PROBE = """
+import logging, sys, time
+logging.disable(logging.CRITICAL)
+started = time.perf_counter()
+import app
+app_ms = (time.perf_counter() - started) * 1000
+modules = len(sys.modules)
+started = time.perf_counter()
+import document_generator
+print(app_ms, (time.perf_counter() - started) * 1000, len(sys.modules) - modules)
+"""
+
+
+def sample():
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[-3]), float(output[-2]), int(output[-1])
+
+
+if __name__ == "__main__":
+    samples = [sample() for _ in range(SAMPLES)]
+    print(f"import app:                median {statistics.median(s[0] for s in samples):7.1f} ms")
+    print(f"then document_generator:   median {statistics.median(s[1] for s in samples):7.1f} ms  "
+          f"(+{samples[0][2]} modules, deferred to the first document request)")
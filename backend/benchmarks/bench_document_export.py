@@ -0,0 +1,53 @@
+"""Time document exports: parsing versus rendering per format, a cold export
+against a cached one, and the cost of re-parsing the Markdown for every
+format compared with sharing one cached AST.
+
+The document is the business plan fallback template repeated into a long
+report, similar in size to a sectioned LLM document.
+
+Run from the backend directory:  python benchmarks/bench_document_export.py
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_export import DocumentExporter, parse_markdown, render_export  # noqa: E402
+from document_templates import TemplateRegistry  # noqa: E402
+
+ITERATIONS = 20
+FORMATS = ("html", "pdf", "docx")
+
+
+def timed(function, *args, iterations=ITERATIONS):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = function(*args)
+    return (time.perf_counter() - started) * 1000 / iterations, result
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    section = TemplateRegistry().render("Business Plan", "A community solar farm cooperative")
+    markdown = "\n\n".join([section] * 8)
+    print(f"document: {len(markdown)} bytes")
+
+    parse_ms, ast = timed(parse_markdown, markdown)
+    print(f"{'parse':>6}: {parse_ms:7.2f} ms  ({len(ast)} blocks)")
+    for export_format in FORMATS:
+        render_ms, data = timed(render_export, ast, export_format)
+        print(f"{export_format:>6}: {render_ms:7.2f} ms  {len(data):7d} bytes")
+
+    reparse_ms, _ = timed(lambda: [render_export(parse_markdown(markdown), f) for f in FORMATS])
+    shared_ms, _ = timed(lambda: [render_export(ast, f) for f in FORMATS])
+    print(f"all formats, parse each time {reparse_ms:7.2f} ms  shared AST {shared_ms:7.2f} ms")
+
+    exporter = DocumentExporter()
+    digest = exporter.put(markdown)
+    for export_format in FORMATS:
+        cold_ms, _ = timed(exporter.export, digest, export_format, iterations=1)
+        warm_ms, _ = timed(exporter.export, digest, export_format, iterations=1000)
+        print(f"{export_format:>6}: cold export {cold_ms:7.2f} ms  cached {warm_ms * 1000:6.2f} us")
+    print(f"exporter: {exporter.info()}")
@@ -0,0 +1,65 @@
+"""Benchmark the orthogonal edge router on synthetic diagrams.
+
+Run from the backend directory:  python benchmarks/bench_edge_router.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edge_router import SpatialGrid, route_edges  # noqa: E402
+
+
+def grid_diagram(node_count, edge_count, local_ratio=0.8, seed=7):
+    """Nodes on a jittered grid; local_ratio of the edges join grid neighbours"""
+    rng = random.Random(seed)
+    columns = max(1, int(node_count ** 0.5))
+    rects = {}
+    for i in range(node_count):
+        col, row = i % columns, i // columns
+        rects[f"n{i}"] = (col * 320 + rng.randint(0, 60), row * 220 + rng.randint(0, 40), 200, 80)
+    names = list(rects)
+    edges = []
+    for _ in range(edge_count):
+        a = rng.randrange(node_count)
+        if rng.random() < local_ratio:
+            b = min(node_count - 1, max(0, a + rng.choice((-columns, -1, 1, columns, columns + 1))))
+        else:
+            b = rng.randrange(node_count)
+        edges.append((names[a], names[b]))
+    return rects, edges
+
+
+def crossings_through_nodes(rects, edges, routes):
+    """Count route segments that cut through a node other than their own endpoints"""
+    index = SpatialGrid({key: (x, y, x + w, y + h) for key, (x, y, w, h) in rects.items()}, 256)
+    hits = 0
+    for (source, target), route in zip(edges, routes):
+        if not route:
+            continue
+        for (ax, ay), (bx, by) in zip(route[1:-2], route[2:-1]):
+            if index.segment_blocked(ax, ay, bx, by):
+                hits += 1
+    return hits
+
+
+def run(node_count, edge_count, local_ratio, repeats=3):
+    rects, edges = grid_diagram(node_count, edge_count, local_ratio)
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = route_edges(rects, edges)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"local={local_ratio:.1f} nodes={node_count:>4} edges={edge_count:>4} searched={result['searched']:>4} "
+          f"failed={result['failed']:>3} through_nodes={crossings_through_nodes(rects, edges, result['routes']):>3} "
+          f"median={statistics.median(timings):8.2f} ms  max={max(timings):8.2f} ms")
+
+
+if __name__ == "__main__":
+    for local_ratio in (1.0, 0.8):
+        for nodes, edges in ((20, 30), (60, 100), (150, 250), (250, 500), (400, 1000)):
+            run(nodes, edges, local_ratio)
@@ -0,0 +1,66 @@
+"""Time fallback document rendering: registry lookup plus one join versus the
+old approach of matching the name through a chain of comparisons and
+formatting the whole document text on every call.
+
+The chain baseline reads the same data files up front and then, per render,
+compares template_name.lower() against each name in order and runs
+str.format() with fresh datetime.now() values, as the f-string branches did.
+
+Run from the backend directory:  python benchmarks/bench_fallback_templates.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_templates import DEFAULT_TEMPLATE_DIR, TemplateRegistry  # noqa: E402
+
+ITERATIONS = 20000
+USER_INPUT = "A community solar farm cooperative"
+
+
+def load_chain():
+    with open(os.path.join(DEFAULT_TEMPLATE_DIR, "index.json"), encoding="utf-8") as handle:
+        entries = json.load(handle)
+    chain = []
+    default = None
+    for entry in entries:
+        with open(os.path.join(DEFAULT_TEMPLATE_DIR, entry["file"]), encoding="utf-8") as handle:
+            text = handle.read()[:-1]
+        if entry.get("default"):
+            default = text
+        else:
+            chain.append((entry["name"].lower(), text))
+    return chain, default
+
+
+def chain_render(chain, default, template_name, user_input):
+    text = default
+    for name, candidate in chain:
+        if template_name.lower() == name:
+            text = candidate
+            break
+    return text.format(user_input=user_input, template_name=template_name, document_type="general",
+                       date=datetime.now().strftime("%Y-%m-%d"), long_date=datetime.now().strftime("%B %d, %Y"))
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        function(*args)
+    return (time.perf_counter() - started) * 1e6 / ITERATIONS
+
+
+if __name__ == "__main__":
+    chain, default = load_chain()
+    registry = TemplateRegistry()
+    for template_name in ("Business Plan", "Marketing Plan", "Technical Specification", "User Manual"):
+        assert registry.render(template_name, USER_INPUT) == chain_render(chain, default, template_name, USER_INPUT)
+        chain_us = timed(chain_render, chain, default, template_name, USER_INPUT)
+        registry_us = timed(registry.render, template_name, USER_INPUT)
+        print(f"{template_name:>24}: chain+format {chain_us:7.2f} us  registry {registry_us:7.2f} us  "
+              f"{chain_us / registry_us:4.1f}x")
+    print(f"registry: {registry.info()}")
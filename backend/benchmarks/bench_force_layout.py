@@ -0,0 +1,59 @@
+"""Benchmark the force-directed network layout on synthetic topologies.
+
+Run from the backend directory:  python benchmarks/bench_force_layout.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from force_layout import compute_force_layout  # noqa: E402
+
+
+def tree_topology(size, seed=3):
+    """Core/distribution/access style tree with a few redundant links"""
+    rng = random.Random(seed)
+    nodes = [f"node-{i}" for i in range(size)]
+    edges = [(nodes[rng.randrange(0, i)], nodes[i]) for i in range(1, size)]
+    for _ in range(size // 20):
+        a, b = rng.sample(nodes, 2)
+        edges.append((a, b))
+    return nodes, edges
+
+
+def mesh_topology(size, seed=5):
+    rng = random.Random(seed)
+    nodes = [f"node-{i}" for i in range(size)]
+    edges = []
+    for i in range(size):
+        for _ in range(2):
+            j = rng.randrange(size)
+            if j != i:
+                edges.append((nodes[i], nodes[j]))
+    return nodes, edges
+
+
+def overlap_ratio(positions, min_distance=60):
+    """Fraction of node pairs closer than a node box (sampled for large graphs)"""
+    points = list(positions.values())
+    rng = random.Random(0)
+    pairs = [(rng.randrange(len(points)), rng.randrange(len(points))) for _ in range(20000)]
+    close = sum(1 for a, b in pairs if a != b and
+                (points[a][0] - points[b][0]) ** 2 + (points[a][1] - points[b][1]) ** 2 < min_distance ** 2)
+    return close / len(pairs)
+
+
+if __name__ == "__main__":
+    for name, builder in (("tree", tree_topology), ("mesh", mesh_topology)):
+        for size in (12, 50, 200, 500, 1000):
+            nodes, edges = builder(size)
+            side = max(1400, int(size ** 0.5 * 220))
+            result = compute_force_layout(nodes, edges, width=side, height=side, use_cache=False)
+            again = compute_force_layout(nodes, edges, width=side, height=side, use_cache=False)
+            deterministic = (result["positions"] == again["positions"]
+                             and result["iterations"] == again["iterations"])
+            print(f"{name:<5} nodes={size:>5} edges={len(edges):>5} canvas={side}px "
+                  f"iterations={result['iterations']:>4} wall={result['elapsed_ms']:8.1f} ms "
+                  f"repulsion={'grid' if result['approximate'] else 'exact'} "
+                  f"close_pairs={overlap_ratio(result['positions']):.4f} deterministic={deterministic}")
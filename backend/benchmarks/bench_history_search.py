@@ -0,0 +1,94 @@
+"""Time searching the generation history: the FTS5 index behind /search
+against an unranked LIKE scan over the same rows' input, model and content,
+which is what finding a past generation costs without the index. Queries go
+from very common words, where FTS5 pays to rank every match, to rare ones.
+
+The history is filled through HistoryStore.record() so the index is built
+incrementally by the writer, as in production, and that cost is reported too.
+
+Run from the backend directory:  python benchmarks/bench_history_search.py
+"""
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HistoryStore, match_query  # noqa: E402
+
+ROWS = 20000
+# Topic words are spread through a Zipf-distributed vocabulary so queries range from common to rare
+TOPICS = ("plan", "review", "onboarding", "payment", "gateway", "solar", "cooperative", "kitchen", "cabinet",
+          "migration", "roastery", "invoice")
+QUERIES = ("plan", "onboarding", "payment gateway", "solar cooperative", "roastery", "migrat", "w4321x", "zeppelin")
+VOCABULARY = [TOPICS[rank // 40] if rank % 40 == 0 and rank // 40 < len(TOPICS) else f"w{rank}x"
+              for rank in range(5000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def phrase(rng, words):
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=words))
+
+
+def fields(rng, index):
+    if index % 3:
+        steps = {phrase(rng, 2).title(): [phrase(rng, 5)] for _ in range(8)}
+        return "diagram", {"request_type": "flowchart", "params": {"userInput": phrase(rng, 6)},
+                           "model": {"steps": steps, "edges": [{"from": a, "to": b, "label": ""}
+                                                               for a, b in zip(steps, list(steps)[1:])]}}
+    content = "\n\n".join(f"## {phrase(rng, 3).title()}\n\n{phrase(rng, 60)}" for _ in range(5))
+    return "document", {"request_type": "technical_spec", "params": {"userInput": phrase(rng, 6)}, "content": content}
+
+
+def match_count(path, text):
+    connection = sqlite3.connect(path)
+    count = connection.execute("SELECT COUNT(*) FROM generations_fts WHERE generations_fts MATCH ?",
+                               (match_query(text),)).fetchone()[0]
+    connection.close()
+    return count
+
+
+def like_scan(path, text, limit=20):
+    connection = sqlite3.connect(path)
+    clauses = " AND ".join("(params LIKE ? OR model LIKE ? OR content LIKE ?)" for _ in text.split())
+    parameters = [f"%{word}%" for word in text.split() for _ in range(3)]
+    rows = connection.execute(f"SELECT id FROM generations WHERE {clauses} ORDER BY id DESC LIMIT ?",
+                              parameters + [limit]).fetchall()
+    connection.close()
+    return rows
+
+
+def timed(function, repeats=5):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - started) * 1000 / repeats, result
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.sqlite3")
+        store = HistoryStore(path, flush_interval=0.05, max_rows=0, max_queue=ROWS + 1)
+        store.record("diagram")
+        store.flush()
+        started = time.perf_counter()
+        for index in range(ROWS):
+            kind, row = fields(rng, index)
+            store.record(kind, **row)
+        store.flush(timeout=120)
+        info = store.info()
+        print(f"{ROWS} rows written and indexed in {time.perf_counter() - started:.2f} s "
+              f"(avg commit {info['avg_commit_ms']} ms per batch), database {info['bytes'] / 1e6:.1f} MB")
+        for query in QUERIES:
+            fts_ms, hits = timed(lambda: store.search(query))
+            scan_ms, _ = timed(lambda: like_scan(path, query))
+            print(f"  {query!r:20} {match_count(path, query):6} matches  FTS5 ranked {fts_ms:7.2f} ms  "
+                  f"unranked LIKE scan {scan_ms:8.2f} ms  ({scan_ms / fts_ms:.1f}x)")
+        store.close()
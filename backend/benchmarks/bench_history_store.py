@@ -0,0 +1,76 @@
+"""Time what recording a generation costs the request path: the write-behind
+HistoryStore.record() against inserting and committing each row
+synchronously, as a naive per-request write would.
+
+Both use the same WAL database settings in a temporary directory, and the
+write-behind store is flushed afterwards to report the total time to disk.
+
+Run from the backend directory:  python benchmarks/bench_history_store.py
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HISTORY_COLUMNS, HistoryStore  # noqa: E402
+
+ROWS = 5000
+MODEL = {"steps": [{"id": f"s{i}", "label": f"Step {i}", "next": [f"s{i + 1}"]} for i in range(12)]}
+PARAMS = {"userInput": "Onboarding flow for a community solar cooperative", "napkinTemplate": {"napkinType": "flowchart"}}
+
+
+def fields(index):
+    return {"endpoint": "/generate_napkin_diagram", "request_type": "flowchart", "source": "ai", "params": PARAMS,
+            "model": MODEL, "svg_hash": f"{index:032x}", "llm_model": "llama3-8b-8192", "llm_calls": 1,
+            "prompt_tokens": 812, "completion_tokens": 455, "latency_ms": 1234.5, "llm_ms": 1100.0}
+
+
+def synchronous(path):
+    store = HistoryStore(path)
+    connection = store._connect()
+    store._create_schema(connection)
+    placeholders = ", ".join("?" * len(HISTORY_COLUMNS))
+    started = time.perf_counter()
+    for index in range(ROWS):
+        row = dict(fields(index), kind="diagram", created=time.time())
+        values = [json.dumps(row.get(c)) if c in ("params", "model") else row.get(c) for c in HISTORY_COLUMNS]
+        with connection:
+            connection.execute(f"INSERT INTO generations ({', '.join(HISTORY_COLUMNS)}) VALUES ({placeholders})", values)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return elapsed
+
+
+def write_behind(path):
+    store = HistoryStore(path, flush_interval=0.05)
+    store.record("diagram", **fields(-1))
+    store.flush()
+    started = time.perf_counter()
+    for index in range(ROWS):
+        store.record("diagram", **fields(index))
+    request_path = time.perf_counter() - started
+    store.flush(timeout=60)
+    total = time.perf_counter() - started
+    info = store.info()
+    store.close()
+    return request_path, total, info
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        sync_s = synchronous(os.path.join(directory, "sync.sqlite3"))
+        request_s, total_s, info = write_behind(os.path.join(directory, "behind.sqlite3"))
+        rows = sqlite3.connect(os.path.join(directory, "behind.sqlite3")).execute(
+            "SELECT COUNT(*) FROM generations").fetchone()[0]
+    print(f"{ROWS} rows")
+    print(f"  synchronous insert+commit: {sync_s * 1e6 / ROWS:8.1f} us per request")
+    print(f"  write-behind record():     {request_s * 1e6 / ROWS:8.1f} us per request  "
+          f"({sync_s / request_s:.0f}x less request time)")
+    print(f"  write-behind until on disk: {total_s:.2f} s in {info['batches']} batches "
+          f"(avg commit {info['avg_commit_ms']} ms), {rows} rows stored")
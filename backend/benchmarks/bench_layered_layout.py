@@ -0,0 +1,65 @@
+"""Benchmark the layered flowchart layout on synthetic graphs.
+
+Run from the backend directory:  python benchmarks/bench_layered_layout.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layered_layout import compute_layered_layout  # noqa: E402
+
+
+def chain_graph(size):
+    nodes = [f"Step {i}" for i in range(size)]
+    return nodes, list(zip(nodes, nodes[1:]))
+
+
+def branching_graph(size, seed=7):
+    """Mostly-forward DAG with local decision branches and a few loops back"""
+    rng = random.Random(seed)
+    nodes = [f"Step {i}" for i in range(size)]
+    edges = list(zip(nodes, nodes[1:]))
+    for i in range(size - 2):
+        if rng.random() < 0.3:
+            edges.append((nodes[i], nodes[min(size - 1, i + rng.randint(2, 6))]))
+        if rng.random() < 0.05 and i > 3:
+            edges.append((nodes[i], nodes[i - rng.randint(1, 3)]))
+    return nodes, edges
+
+
+def layered_graph(size, width=8, seed=11):
+    """Wide DAG: nodes grouped in ranks with random edges between adjacent ranks"""
+    rng = random.Random(seed)
+    nodes = [f"N{i}" for i in range(size)]
+    ranks = [nodes[i:i + width] for i in range(0, size, width)]
+    edges = []
+    for upper, lower in zip(ranks, ranks[1:]):
+        for node in lower:
+            for parent in rng.sample(upper, min(len(upper), rng.randint(1, 2))):
+                edges.append((parent, node))
+    return nodes, edges
+
+
+def run(name, builder, size, repeats=5, **layout_kwargs):
+    nodes, edges = builder(size)
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = compute_layered_layout(nodes, edges, **layout_kwargs)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{name:<12} nodes={len(nodes):>4} edges={len(edges):>4} "
+          f"layers={result['layer_count']:>4} crossings={result['crossings']:>5} "
+          f"size={int(result['width'])}x{int(result['height'])} "
+          f"median={statistics.median(timings):7.2f} ms  max={max(timings):7.2f} ms")
+
+
+if __name__ == "__main__":
+    for size in (10, 40, 100, 300, 500):
+        run("chain", chain_graph, size, max_layers_per_column=8)
+        run("branching", branching_graph, size, max_layers_per_column=8)
+        run("layered", layered_graph, size)
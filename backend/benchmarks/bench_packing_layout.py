@@ -0,0 +1,55 @@
+"""Benchmark the rectangle packing layout on synthetic ERD schemas.
+
+Run from the backend directory:  python benchmarks/bench_packing_layout.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packing_layout import measure_text_width, pack_rectangles  # noqa: E402
+
+
+def schema_boxes(size, seed=11):
+    """Entity boxes sized the way the ERD renderer sizes them"""
+    rng = random.Random(seed)
+    boxes = []
+    for i in range(size):
+        columns = [f"column_{j}_{'x' * rng.randint(0, 18)}" for j in range(rng.randint(2, 16))]
+        label_width = max(measure_text_width(column, 12) for column in columns)
+        boxes.append((f"table_{i}", min(max(220, label_width + 40), 360), 70 + len(columns) * 20))
+    return boxes
+
+
+def overlaps(boxes, positions):
+    count = 0
+    for a in range(len(boxes)):
+        key_a, w_a, h_a = boxes[a]
+        ax, ay = positions[key_a]
+        for key_b, w_b, h_b in boxes[a + 1:]:
+            bx, by = positions[key_b]
+            if ax < bx + w_b and bx < ax + w_a and ay < by + h_b and by < ay + h_a:
+                count += 1
+    return count
+
+
+def run(size, repeats=5):
+    boxes = schema_boxes(size)
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = pack_rectangles(boxes, gap=60)
+        timings.append((time.perf_counter() - started) * 1000)
+    fill = sum(w * h for _, w, h in boxes) / (result["width"] * result["height"])
+    print(f"tables={size:>4} canvas={int(result['width'])}x{int(result['height'])} fill={fill:.2f} "
+          f"overlaps={overlaps(boxes, result['positions'])} "
+          f"median={statistics.median(timings):7.2f} ms  max={max(timings):7.2f} ms")
+
+
+if __name__ == "__main__":
+    for size in (10, 50, 200, 500, 1000):
+        run(size)
@@ -0,0 +1,47 @@
+"""Benchmark SVG compaction on the fallback diagram of every diagram type.
+
+Run from the backend directory:  python benchmarks/bench_svg_minify.py
+"""
+import gzip
+import logging
+import os
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from app import get_fallback_data, render_diagram_svg  # noqa: E402
+from svg_minify import minify_svg  # noqa: E402
+
+DIAGRAM_TYPES = [
+    "flowchart", "sequence", "state", "mind map", "swot analysis", "timeline",
+    "gantt", "journey", "erd", "class", "network", "architecture",
+]
+
+
+def run(diagram_type, repeats=20):
+    svg = render_diagram_svg(diagram_type, get_fallback_data(diagram_type, "an online checkout service"))
+    timings = []
+    compacted = svg
+    for _ in range(repeats):
+        started = time.perf_counter()
+        compacted = minify_svg(svg)
+        timings.append((time.perf_counter() - started) * 1000)
+    ET.fromstring(compacted)
+    before, after = len(svg.encode("utf-8")), len(compacted.encode("utf-8"))
+    gz_before = len(gzip.compress(svg.encode("utf-8")))
+    gz_after = len(gzip.compress(compacted.encode("utf-8")))
+    print(f"{diagram_type:>14}: {before:>7} -> {after:>7} bytes ({(1 - after / before) * 100:5.1f}% smaller)  "
+          f"gzip {gz_before:>6} -> {gz_after:>6}  median={statistics.median(timings):6.2f} ms")
+    return before, after
+
+
+if __name__ == "__main__":
+    totals = [run(diagram_type) for diagram_type in DIAGRAM_TYPES]
+    before = sum(b for b, _ in totals)
+    after = sum(a for _, a in totals)
+    print(f"{'total':>14}: {before:>7} -> {after:>7} bytes ({(1 - after / before) * 100:5.1f}% smaller)")
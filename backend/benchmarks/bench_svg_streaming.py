@@ -0,0 +1,79 @@
+"""Compare peak memory of the buffered JSON path with the streaming raw-SVG path.
+
+The buffered path renders the whole document, then serializes it into a JSON
+body the way the JSON endpoints do. The streaming path encodes each chunk from
+stream_svg_chunks() and drops it, as the WSGI server would after writing it.
+
+Run from the backend directory:  python benchmarks/bench_svg_streaming.py
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from app import iter_diagram_svg, render_diagram_svg, stream_svg_chunks  # noqa: E402
+
+
+def network_data(size, seed=5):
+    rng = random.Random(seed)
+    nodes = {f"node_{i}": "server" if i % 4 == 0 else "client" for i in range(size)}
+    connections = [{"from": f"node_{i}", "to": f"node_{rng.randrange(size)}", "label": "link"} for i in range(size)]
+    return {"nodes": nodes, "connections": connections}
+
+
+def erd_data(size, seed=5):
+    rng = random.Random(seed)
+    return {"entities": {f"table_{i}": [f"column_{j}" for j in range(rng.randint(3, 12))] for i in range(size)}}
+
+
+def flowchart_data(size):
+    return {"steps": {f"Step {i}": [f"Description of step {i}"] for i in range(size)}}
+
+
+def buffered(diagram_type, data):
+    svg_content = render_diagram_svg(diagram_type, data)
+    body = json.dumps({"content": svg_content, "diagramType": diagram_type}).encode("utf-8")
+    return len(body)
+
+
+def streamed(diagram_type, data):
+    sent = 0
+    for chunk in stream_svg_chunks(iter_diagram_svg(diagram_type, data)):
+        sent += len(chunk.encode("utf-8"))
+    return sent
+
+
+def measure(function, diagram_type, data):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = function(diagram_type, data)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, peak, elapsed_ms
+
+
+def run(diagram_type, data, label):
+    # Warm the layout caches so both paths measure rendering rather than layout
+    render_diagram_svg(diagram_type, data)
+    size_b, peak_b, ms_b = measure(buffered, diagram_type, data)
+    size_s, peak_s, ms_s = measure(streamed, diagram_type, data)
+    print(f"{label:>22}: body {size_b / 1024:8.1f} KiB buffered peak {peak_b / 1024:8.1f} KiB ({ms_b:6.0f} ms)  "
+          f"streamed {size_s / 1024:8.1f} KiB peak {peak_s / 1024:8.1f} KiB ({ms_s:6.0f} ms)  "
+          f"ratio {peak_b / peak_s:4.1f}x")
+
+
+if __name__ == "__main__":
+    for size in (100, 400):
+        run("network", network_data(size), f"network {size} nodes")
+    for size in (100, 400):
+        run("erd", erd_data(size), f"erd {size} tables")
+    for size in (50, 200):
+        run("flowchart", flowchart_data(size), f"flowchart {size} steps")
@@ -0,0 +1,101 @@
+"""Measure what <symbol>/<use> node reuse saves per diagram type.
+
+Each diagram is rendered with SVG_SYMBOLS on and off, then compacted the way
+the endpoints return it. Only the flowchart renderer uses symbols: its node
+frame bundles four shapes of fixed size. Single-rect symbols for ERD, network
+and architecture boxes added elements without shrinking the gzipped output,
+and class boxes vary in width, so those types are kept as a control and should
+report 1.00x. Sizes are reported raw and gzipped, together with the
+element count (the DOM nodes a browser has to build) and, when cairosvg is
+installed, the time to rasterize the document as a stand-in for client paint
+time.
+
+Run from the backend directory:  python benchmarks/bench_svg_symbols.py
+"""
+import gzip
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+import app  # noqa: E402
+from raster_renderer import available_raster_formats, rasterize_svg  # noqa: E402
+
+
+def flowchart_data(size):
+    return {"steps": {f"Step {i}": [f"Description of step {i}"] for i in range(size)}}
+
+
+def class_data(size, seed=3):
+    rng = random.Random(seed)
+    return {"classes": {f"Class{i}": {"attributes": [f"field_{j}: int" for j in range(rng.randint(2, 6))],
+                                      "methods": [f"method_{j}" for j in range(rng.randint(1, 4))]}
+                        for i in range(size)}}
+
+
+def erd_data(size, seed=5):
+    rng = random.Random(seed)
+    return {"entities": {f"table_{i}": [f"column_{j}" for j in range(rng.randint(3, 12))] for i in range(size)}}
+
+
+def network_data(size, seed=5):
+    rng = random.Random(seed)
+    nodes = {f"node_{i}": "server" if i % 4 == 0 else "client" for i in range(size)}
+    connections = [{"from": f"node_{i}", "to": f"node_{rng.randrange(size)}", "label": "link"} for i in range(size)]
+    return {"nodes": nodes, "connections": connections}
+
+
+def architecture_data(size):
+    return {"components": {f"Service {i}": f"Handles area {i}" for i in range(size)}}
+
+
+def render(diagram_type, data, symbols):
+    app.SVG_SYMBOLS = symbols
+    started = time.perf_counter()
+    svg = app.compact_diagram_svg(app.render_diagram_svg(diagram_type, data), diagram_type)
+    return svg, (time.perf_counter() - started) * 1000
+
+
+def paint_ms(svg):
+    if "png" not in available_raster_formats():
+        return None
+    started = time.perf_counter()
+    rasterize_svg(svg.encode("utf-8"), 1024, "png")
+    return (time.perf_counter() - started) * 1000
+
+
+def describe(svg, render_ms):
+    paint = paint_ms(svg)
+    return (f"{len(svg) / 1024:8.1f} KiB gz {len(gzip.compress(svg.encode('utf-8'))) / 1024:6.1f} KiB "
+            f"{svg.count('<'):6d} el {render_ms:6.1f} ms" + (f" paint {paint:6.0f} ms" if paint is not None else ""))
+
+
+def run(diagram_type, data, label):
+    # Warm the layout caches so both renders measure serialization only
+    app.render_diagram_svg(diagram_type, data)
+    inline_svg, inline_ms = render(diagram_type, data, False)
+    symbol_svg, symbol_ms = render(diagram_type, data, True)
+    print(f"{label:>24}: inline {describe(inline_svg, inline_ms)}")
+    print(f"{'':>24}  symbol {describe(symbol_svg, symbol_ms)}  "
+          f"raw {len(inline_svg) / len(symbol_svg):4.2f}x smaller")
+
+
+if __name__ == "__main__":
+    original = app.SVG_SYMBOLS
+    try:
+        for size in (10, 200):
+            run("flowchart", flowchart_data(size), f"flowchart {size} steps")
+        for size in (10, 200):
+            run("class", class_data(size), f"class {size} classes")
+        for size in (10, 400):
+            run("erd", erd_data(size), f"erd {size} tables")
+        for size in (10, 400):
+            run("network", network_data(size), f"network {size} nodes")
+        run("architecture", architecture_data(16), "architecture 16 parts")
+    finally:
+        app.SVG_SYMBOLS = original
@@ -0,0 +1,41 @@
+"""Compare text exports (Mermaid, PlantUML, DOT) with the SVG render of the same model.
+
+Exports read the validated model only, so they skip layout and SVG
+serialization entirely; this reports size and time for each output.
+
+Run from the backend directory:  python benchmarks/bench_text_export.py
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from app import export_diagram_model, get_fallback_data, render_diagram_svg  # noqa: E402
+from diagram_export import EXPORT_TYPES  # noqa: E402
+
+
+def timed(function, *args, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return result, (time.perf_counter() - started) * 1000 / repeat
+
+
+def run(diagram_type):
+    data = get_fallback_data(diagram_type, "Online ordering platform")
+    svg, svg_ms = timed(render_diagram_svg, diagram_type, data)
+    cells = [f"svg {len(svg) / 1024:6.1f} KiB {svg_ms:6.2f} ms"]
+    for export_format, types in EXPORT_TYPES.items():
+        if diagram_type in types:
+            text, text_ms = timed(export_diagram_model, diagram_type, data, export_format)
+            cells.append(f"{export_format} {len(text):5d} B {text_ms:5.3f} ms")
+    print(f"{diagram_type:>12}: " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    for diagram_type in sorted(set().union(*EXPORT_TYPES.values())):
+        run(diagram_type)
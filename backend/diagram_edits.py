@@ -0,0 +1,392 @@
+import copy
+import html
+import json
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# Patched SVGs are serialized without ns0: prefixes
+ET.register_namespace("", "http://www.w3.org/2000/svg")
+
+MODEL_METADATA_CLASS = "napkin-model"
+
+# Where each diagram type keeps its named nodes (the first key present wins)
+NODE_COLLECTIONS = {
+    "flowchart": ("steps",),
+    "sequence": ("actors",),
+    "state": ("states",),
+    "mind map": ("branches",),
+    "timeline": ("events",),
+    "gantt": ("tasks",),
+    "journey": ("stages", "touchpoints"),
+    "erd": ("entities",),
+    "class": ("classes",),
+    "network": ("nodes",),
+    "architecture": ("components",),
+}
+
+# Lists of {"from", "to", ...} links that refer to nodes by name
+LINK_COLLECTIONS = {
+    "flowchart": ("edges", "label"),
+    "sequence": ("interactions", "message"),
+    "state": ("transitions", "trigger"),
+    "network": ("connections", "label"),
+    "architecture": ("relationships", "label"),
+}
+
+# Node-level fields that name other nodes
+NODE_REFERENCE_FIELDS = ("next", "dependencies")
+
+_KIND_WORDS = (r"(?:step|node|state|phase|event|task|stage|touchpoint|table|entity|class|actor|participant|"
+               r"component|layer|branch|box|item|server)s?")
+_RENAME = re.compile(r"^(?:rename|relabel|call)\s+(?P<target>.+?)\s+(?:to|as)\s+(?P<name>.+)$", re.I)
+_REPLACE = re.compile(r"^(?:change|replace|update)\s+(?P<target>.+?)\s+(?:to|with|into)\s+(?P<name>.+)$", re.I)
+_ADD = re.compile(r"^(?:add|insert)\s+(?:(?:a|an|new|another)\s+)*(?:" + _KIND_WORDS + r"\s+)?(?:called\s+|named\s+)?"
+                  r"(?P<name>.+?)(?:\s+(?P<where>after|before)\s+(?P<anchor>.+))?$", re.I)
+_REMOVE = re.compile(r"^(?:remove|delete|drop)\s+(?P<target>.+)$", re.I)
+_CONNECT = re.compile(r"^(?:connect|link)\s+(?P<source>.+?)\s+(?:to|with|and)\s+(?P<target>.+?)"
+                      r"(?:\s+(?:labeled|labelled|as|with label)\s+(?P<label>.+))?$", re.I)
+_KIND_PREFIX = re.compile(r"^(?:the\s+)?(?:" + _KIND_WORDS + r")\s+", re.I)
+_ORDINAL = re.compile(r"^#?(\d+)(?:st|nd|rd|th)?$", re.I)
+_PAREN_SUFFIX = re.compile(r"\s*\([^)]*\)\s*$")
+_QUOTED = re.compile(r"^[\"'“‘](.+?)[\"'”’]$")
+_QUOTED_SPANS = re.compile(r"[\"“][^\"”]*[\"”]|(?<!\w)['‘][^'’]*['’](?!\w)")
+# Prompts that chain or qualify commands go to the LLM rather than being split heuristically
+_CONJUNCTION = re.compile(r"[;,&\n]|\.\s+\S|\b(?:and|then|also|or|but|plus)\b", re.I)
+# Unquoted new names are short titles; words like these mean the prompt describes a change instead
+_FUNCTION_WORDS = {
+    "a", "an", "the", "for", "to", "of", "in", "on", "at", "by", "with", "from", "into", "about", "each", "every",
+    "all", "some", "any", "more", "less", "other", "its", "their", "this", "that", "these", "those", "so", "which",
+}
+_MAX_UNQUOTED_WORDS = 4
+
+
+class DiagramEditError(ValueError):
+    """The prompt is not a small edit this engine can apply on its own"""
+
+
+def model_metadata_element(diagram_type, model_hash, variation=None):
+    """
+    <metadata> element naming the diagram's model by its model store hash so
+    later edits can skip the LLM. The model itself is returned beside the SVG
+    rather than embedded, so it is not sent twice.
+    """
+    model = {"type": diagram_type, "hash": model_hash}
+    if variation:
+        model["variation"] = variation
+    payload = json.dumps(model, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f'<metadata class="{MODEL_METADATA_CLASS}">{html.escape(payload, quote=False)}</metadata>'
+
+
+def _is_open_root_chunk(chunk):
+    return chunk.lstrip().startswith("<svg") and not chunk.rstrip().endswith("</svg>")
+
+
+def with_model_metadata(chunks, metadata_element):
+    """Yield renderer chunks with the metadata element right after the opening <svg> tag"""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return
+    yield first
+    if _is_open_root_chunk(first) and first.rstrip().endswith(">"):
+        yield metadata_element
+    yield from chunks
+
+
+def embed_model_metadata(svg_content, metadata_element):
+    """Insert the metadata element after the opening <svg> tag of a complete document"""
+    start = svg_content.find("<svg")
+    end = svg_content.find(">", start)
+    if start < 0 or end < 0 or svg_content[end - 1] == "/":
+        return svg_content
+    return svg_content[:end + 1] + metadata_element + svg_content[end + 1:]
+
+
+def extract_diagram_model(svg_content):
+    """Return the embedded {"type", "hash", "variation"} model reference of an SVG (older SVGs carry "data"), or None"""
+    if not svg_content or MODEL_METADATA_CLASS not in svg_content:
+        return None
+    try:
+        root = ET.fromstring(svg_content)
+    except ET.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == "metadata" and element.get("class") == MODEL_METADATA_CLASS:
+            try:
+                model = json.loads(element.text or "")
+            except ValueError:
+                return None
+            if isinstance(model, dict) and model.get("type") and (
+                    isinstance(model.get("data"), dict) or isinstance(model.get("hash"), str)):
+                return model
+    return None
+
+
+def _single_command(prompt):
+    """The prompt as one edit command; chained or qualified prompts raise DiagramEditError"""
+    command = (prompt or "").strip().rstrip(".!").strip()
+    if not command:
+        raise DiagramEditError("Empty edit prompt")
+    if _CONJUNCTION.search(_QUOTED_SPANS.sub('""', command)):
+        raise DiagramEditError(f"'{command}' is more than one simple edit")
+    return command
+
+
+def _clean_name(text):
+    return text.strip().strip(".").strip().strip("\"'“”‘’").strip()
+
+
+def _new_name(text):
+    """
+    The name an edit introduces: anything quoted, or an unquoted short title
+    such as "Code Review". Phrases like "more details to each step" are
+    descriptions of a change, not names, and raise DiagramEditError.
+    """
+    text = text.strip().rstrip(".").strip()
+    quoted = _QUOTED.match(text)
+    if quoted:
+        if not quoted.group(1).strip():
+            raise DiagramEditError("Empty name")
+        return quoted.group(1).strip()
+    words = text.split()
+    if (not words or len(words) > _MAX_UNQUOTED_WORDS or not (words[0][0].isupper() or words[0][0].isdigit())
+            or any(word.lower().strip("'\"") in _FUNCTION_WORDS for word in words)):
+        raise DiagramEditError(f"'{text}' is not an unambiguous name; quote it to use it as one")
+    return text
+
+
+def _node_collection(diagram_type, diagram_data):
+    for key in NODE_COLLECTIONS.get(diagram_type, ()):
+        if isinstance(diagram_data.get(key), dict):
+            return key, diagram_data[key]
+    return None, None
+
+
+def _resolve(reference, names):
+    """Map "step 3", "3rd", "'Review'" or a node's exact name (any case) to the node name"""
+    text = _clean_name(reference)
+    stripped = _clean_name(_KIND_PREFIX.sub("", text))
+    ordinal = _ORDINAL.match(stripped)
+    if ordinal and (stripped != text or stripped not in names):
+        index = int(ordinal.group(1)) - 1
+        return names[index] if 0 <= index < len(names) else None
+    for candidate in (text, stripped):
+        if candidate in names:
+            return candidate
+        lowered = candidate.lower()
+        exact = [name for name in names if name.lower() == lowered]
+        if len(exact) == 1:
+            return exact[0]
+    # "Planning" names "Planning (2 weeks)"; partial names are too loose to edit without the LLM
+    suffixed = [name for name in names if _refers_to(stripped, name)]
+    return suffixed[0] if len(suffixed) == 1 else None
+
+
+def _refers_to(reference, name):
+    """Whether a dependency string names a node; "Planning" refers to "Planning (2 weeks)" """
+    if reference == name:
+        return True
+    if not isinstance(reference, str) or not isinstance(name, str):
+        return False
+    return _PAREN_SUFFIX.sub("", reference).strip().lower() == _PAREN_SUFFIX.sub("", name).strip().lower()
+
+
+def _rebuild(mapping, items):
+    """Replace a dict's contents in place keeping the new key order"""
+    mapping.clear()
+    mapping.update(items)
+
+
+def _rename_references(diagram_type, diagram_data, nodes, old, new):
+    link = LINK_COLLECTIONS.get(diagram_type)
+    if link:
+        for entry in diagram_data.get(link[0], []) or []:
+            if isinstance(entry, dict):
+                for end in ("from", "to"):
+                    if entry.get(end) == old:
+                        entry[end] = new
+    for value in nodes.values():
+        if not isinstance(value, dict):
+            continue
+        for field in NODE_REFERENCE_FIELDS:
+            refs = value.get(field)
+            if isinstance(refs, list):
+                value[field] = [new if _refers_to(ref, old) else ref for ref in refs]
+            elif _refers_to(refs, old):
+                value[field] = new
+        branches = value.get("branches")
+        if isinstance(branches, dict):
+            value["branches"] = {label: (new if target == old else target) for label, target in branches.items()}
+        elif isinstance(branches, list):
+            for branch in branches:
+                if isinstance(branch, dict) and branch.get("to") == old:
+                    branch["to"] = new
+
+
+def _remove_references(diagram_type, diagram_data, nodes, name):
+    link = LINK_COLLECTIONS.get(diagram_type)
+    if link and isinstance(diagram_data.get(link[0]), list):
+        diagram_data[link[0]] = [entry for entry in diagram_data[link[0]]
+                                 if not (isinstance(entry, dict) and name in (entry.get("from"), entry.get("to")))]
+    for value in nodes.values():
+        if not isinstance(value, dict):
+            continue
+        for field in NODE_REFERENCE_FIELDS:
+            refs = value.get(field)
+            if isinstance(refs, list):
+                value[field] = [ref for ref in refs if not _refers_to(ref, name)]
+            elif _refers_to(refs, name):
+                value[field] = []
+
+
+def _new_node_value(diagram_type, nodes, anchor, where):
+    if diagram_type == "gantt":
+        value = {"description": "", "dependencies": [anchor] if anchor and where == "after" else [], "duration": 1}
+        if anchor and where == "after" and isinstance(nodes.get(anchor), dict):
+            value["start"] = nodes[anchor].get("start", 1)
+        return value
+    if diagram_type == "journey":
+        return {"action": "", "emotion": "Neutral", "pain_points": [], "opportunities": []}
+    if diagram_type == "class":
+        return {"attributes": [], "methods": []}
+    if diagram_type in ("flowchart", "mind map"):
+        return []
+    if diagram_type == "erd":
+        return ["id"]
+    return ""
+
+
+def _rename_node(diagram_type, diagram_data, nodes, old, new):
+    if new in nodes and new != old:
+        raise DiagramEditError(f"'{new}' already exists")
+    _rebuild(nodes, [((new if key == old else key), value) for key, value in nodes.items()])
+    _rename_references(diagram_type, diagram_data, nodes, old, new)
+
+
+def _apply_command(diagram_type, diagram_data, command):
+    key, nodes = _node_collection(diagram_type, diagram_data)
+    names = list(nodes.keys()) if nodes is not None else []
+
+    match = _RENAME.match(command) or _REPLACE.match(command)
+    if match:
+        new = _new_name(match.group("name"))
+        target = _resolve(match.group("target"), names) if names else None
+        if target is not None:
+            _rename_node(diagram_type, diagram_data, nodes, target, new)
+            return f"renamed '{target}' to '{new}'"
+        old = _clean_name(_KIND_PREFIX.sub("", _clean_name(match.group("target"))))
+        if diagram_type == "mind map" and old and old.lower() == str(diagram_data.get("central_topic", "")).lower():
+            diagram_data["central_topic"] = new
+            return f"renamed central topic to '{new}'"
+        raise DiagramEditError(f"Nothing named '{old}' in the diagram")
+
+    if nodes is None:
+        raise DiagramEditError(f"'{command}' needs named nodes, which {diagram_type} diagrams do not have")
+
+    match = _CONNECT.match(command)
+    if match:
+        link = LINK_COLLECTIONS.get(diagram_type)
+        source, target = _resolve(match.group("source"), names), _resolve(match.group("target"), names)
+        if not link or source is None or target is None:
+            raise DiagramEditError(f"Cannot connect in '{command}'")
+        entry = {"from": source, "to": target}
+        if match.group("label"):
+            entry[link[1]] = _clean_name(match.group("label"))
+        links = diagram_data.setdefault(link[0], [])
+        if diagram_type == "flowchart" and not links and len(names) > 1:
+            # Keep the implicit sequential edges once the first explicit edge exists
+            links.extend({"from": a, "to": b, "label": ""} for a, b in zip(names, names[1:]))
+        links.append(entry)
+        return f"connected '{source}' to '{target}'"
+
+    match = _ADD.match(command)
+    if match:
+        name = _new_name(match.group("name"))
+        if name in nodes:
+            raise DiagramEditError(f"Cannot add '{name}'")
+        anchor = _resolve(match.group("anchor"), names) if match.group("anchor") else None
+        if match.group("anchor") and anchor is None:
+            raise DiagramEditError(f"Unknown position in '{command}'")
+        where = (match.group("where") or "").lower()
+        value = _new_node_value(diagram_type, nodes, anchor, where)
+        items = list(nodes.items())
+        index = len(items) if anchor is None else names.index(anchor) + (1 if where == "after" else 0)
+        items.insert(index, (name, value))
+        _rebuild(nodes, items)
+        links = diagram_data.get(LINK_COLLECTIONS.get(diagram_type, ("",))[0])
+        if diagram_type == "flowchart" and isinstance(links, list) and links and anchor is not None:
+            # Splice the new step into the explicit edges around its anchor
+            for edge in links:
+                if where == "after" and edge.get("from") == anchor:
+                    edge["from"] = name
+                elif where == "before" and edge.get("to") == anchor:
+                    edge["to"] = name
+            links.append({"from": anchor, "to": name, "label": ""} if where == "after"
+                         else {"from": name, "to": anchor, "label": ""})
+        return f"added '{name}'" + (f" {where} '{anchor}'" if anchor else "")
+
+    match = _REMOVE.match(command)
+    if match:
+        target = _resolve(match.group("target"), names)
+        if target is None:
+            raise DiagramEditError(f"Nothing to remove in '{command}'")
+        if len(nodes) <= 1:
+            raise DiagramEditError("Cannot remove the last node")
+        del nodes[target]
+        _remove_references(diagram_type, diagram_data, nodes, target)
+        return f"removed '{target}'"
+
+    raise DiagramEditError(f"Unrecognized edit '{command}'")
+
+
+def apply_edit_prompt(diagram_type, diagram_data, prompt):
+    """
+    Apply one small edit such as "rename step 3 to Review" or "add 'QA sign-off'
+    after Test" to a diagram model.
+
+    The prompt must be a single command whose targets are existing nodes and
+    whose new names are quoted or short titles; anything else (chained
+    commands, descriptions like "add more details") raises DiagramEditError
+    and the caller regenerates with the LLM. The input model is not modified.
+
+    Returns:
+        dict: "data" (the edited model), "applied" (one note per command) and "elapsed_ms"
+    """
+    started = time.perf_counter()
+    command = _single_command(prompt)
+    edited = copy.deepcopy(diagram_data)
+    applied = [_apply_command(diagram_type, edited, command)]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug(f"Applied {len(applied)} edit(s) to {diagram_type} model in {elapsed_ms:.2f} ms: {applied}")
+    return {"data": edited, "applied": applied, "elapsed_ms": elapsed_ms}
+
+
+def replace_svg_labels(svg_content, prompt):
+    """
+    Patch <text> labels in an SVG without a usable model for a single
+    rename/replace command. Only labels reading exactly the old name change.
+    Returns the patched SVG and the applied notes, or (None, []) when the
+    prompt is anything else or matches no label.
+    """
+    try:
+        command = _single_command(prompt)
+        match = _RENAME.match(command) or _REPLACE.match(command)
+        if not match:
+            return None, []
+        old, new = _clean_name(_KIND_PREFIX.sub("", _clean_name(match.group("target")))), _new_name(match.group("name"))
+        root = ET.fromstring(svg_content)
+    except (DiagramEditError, ET.ParseError):
+        return None, []
+
+    count = 0
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] in ("text", "tspan") and old and (element.text or "").strip() == old:
+            element.text = element.text.replace(old, new)
+            count += 1
+    if not count:
+        return None, []
+    return ET.tostring(root, encoding="unicode"), [f"replaced '{old}' with '{new}' in {count} label(s)"]
@@ -0,0 +1,383 @@
+import logging
+import re
+import time
+
+from diagram_links import get_architecture_links, get_flowchart_edges
+from gantt_scheduler import schedule_tasks
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MIMETYPES = {
+    "mermaid": "text/vnd.mermaid",
+    "plantuml": "text/vnd.plantuml",
+    "dot": "text/vnd.graphviz",
+}
+
+_GRAPH_TYPES = {"flowchart", "sequence", "state", "erd", "class", "gantt", "mind map", "network", "architecture"}
+EXPORT_TYPES = {
+    "mermaid": _GRAPH_TYPES | {"timeline"},
+    "plantuml": _GRAPH_TYPES,
+    "dot": _GRAPH_TYPES,
+}
+
+_IDENTIFIER = re.compile(r"[^A-Za-z0-9_]+")
+_DAYS_PER_MONTH = 30
+
+
+class ExportError(ValueError):
+    """The diagram type cannot be expressed in the requested text format"""
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+def _describe(value):
+    """One-line description of a node's value: a string, the first list item or a dict's description"""
+    if isinstance(value, dict):
+        value = value.get("description") or value.get("action") or ""
+    items = _as_list(value)
+    return items[0] if items else ""
+
+
+def _identifier(name, used):
+    """Identifier safe in all three formats, unique within one export"""
+    base = _IDENTIFIER.sub("_", str(name)).strip("_") or "node"
+    if base[0].isdigit():
+        base = f"n_{base}"
+    candidate = base
+    suffix = 2
+    while candidate in used:
+        candidate = f"{base}_{suffix}"
+        suffix += 1
+    used.add(candidate)
+    return candidate
+
+
+def _ids(names):
+    used = set()
+    return {name: _identifier(name, used) for name in names}
+
+
+def _mermaid_text(text):
+    return str(text).replace('"', "#quot;").replace("\n", " ")
+
+
+def _plantuml_text(text):
+    return str(text).replace('"', "'").replace("\n", " ")
+
+
+def _dot_text(text):
+    return str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _links(links, names, label_key="label"):
+    """(from, to, label) tuples of links whose ends are known nodes"""
+    result = []
+    for link in links or []:
+        if isinstance(link, dict) and link.get("from") in names and link.get("to") in names:
+            result.append((link["from"], link["to"], str(link.get(label_key, "") or "")))
+    return result
+
+
+def _graph_model(diagram_type, diagram_data):
+    """
+    (nodes {name: description}, links [(from, to, label)]) for node-and-edge diagram
+    types; flowchart and architecture links are the ones their SVG renderers draw
+    """
+    if diagram_type == "flowchart":
+        nodes = diagram_data.get("steps", {})
+        return ({name: _describe(value) for name, value in nodes.items()},
+                _links(get_flowchart_edges(nodes, diagram_data.get("edges")), nodes))
+    if diagram_type == "network":
+        nodes = diagram_data.get("nodes", {})
+        return {name: _describe(value) for name, value in nodes.items()}, _links(diagram_data.get("connections"), nodes)
+    if diagram_type == "architecture":
+        nodes = diagram_data.get("components", {})
+        return ({name: _describe(value) for name, value in nodes.items()},
+                _links(get_architecture_links(nodes, diagram_data.get("relationships")), nodes))
+    return None, None
+
+
+def _sequence_model(diagram_data):
+    actors = diagram_data.get("actors", {})
+    interactions = [i for i in diagram_data.get("interactions", []) if isinstance(i, dict)]
+    interactions.sort(key=lambda i: i.get("order", 0) if isinstance(i.get("order", 0), (int, float)) else 0)
+    names = list(actors.keys())
+    for interaction in interactions:
+        for end in ("from", "to"):
+            if interaction.get(end) and interaction[end] not in names:
+                names.append(interaction[end])
+    return names, [(i.get("from"), i.get("to"), str(i.get("message", ""))) for i in interactions
+                   if i.get("from") and i.get("to")]
+
+
+def _state_model(diagram_data):
+    states = diagram_data.get("states", {})
+    transitions = [t for t in diagram_data.get("transitions", []) if isinstance(t, dict)]
+    transitions.sort(key=lambda t: t.get("order", 0) if isinstance(t.get("order", 0), (int, float)) else 0)
+    return states, _links(transitions, states, "trigger")
+
+
+def _class_members(value):
+    if isinstance(value, dict):
+        return _as_list(value.get("attributes")), _as_list(value.get("methods"))
+    return _as_list(value), []
+
+
+# Mermaid
+
+def _mermaid_graph(nodes, links):
+    ids = _ids(nodes)
+    lines = ["flowchart TD"]
+    for name in nodes:
+        lines.append(f'    {ids[name]}["{_mermaid_text(name)}"]')
+    for source, target, label in links:
+        arrow = f'-->|"{_mermaid_text(label)}"|' if label else "-->"
+        lines.append(f"    {ids[source]} {arrow} {ids[target]}")
+    return lines
+
+
+def _to_mermaid(diagram_type, diagram_data):
+    nodes, links = _graph_model(diagram_type, diagram_data)
+    if nodes is not None:
+        return _mermaid_graph(nodes, links)
+
+    if diagram_type == "sequence":
+        names, messages = _sequence_model(diagram_data)
+        ids = _ids(names)
+        lines = ["sequenceDiagram"]
+        lines += [f"    participant {ids[name]} as {_mermaid_text(name)}" for name in names]
+        lines += [f"    {ids[source]}->>{ids[target]}: {_mermaid_text(message)}" for source, target, message in messages]
+        return lines
+
+    if diagram_type == "state":
+        states, transitions = _state_model(diagram_data)
+        ids = _ids(states)
+        lines = ["stateDiagram-v2"]
+        for name, description in states.items():
+            lines.append(f'    state "{_mermaid_text(name)}" as {ids[name]}')
+            if _describe(description):
+                lines.append(f"    {ids[name]} : {_mermaid_text(_describe(description))}")
+        if states:
+            lines.append(f"    [*] --> {ids[next(iter(states))]}")
+        for source, target, trigger in transitions:
+            lines.append(f"    {ids[source]} --> {ids[target]}" + (f" : {_mermaid_text(trigger)}" if trigger else ""))
+        return lines
+
+    if diagram_type == "erd":
+        entities = diagram_data.get("entities", {})
+        ids = _ids(entities)
+        lines = ["erDiagram"]
+        for name, attributes in entities.items():
+            lines.append(f"    {ids[name]} {{")
+            used = set()
+            lines += [f"        string {_identifier(attribute, used)}" for attribute in _as_list(attributes)]
+            lines.append("    }")
+        return lines
+
+    if diagram_type == "class":
+        classes = diagram_data.get("classes", {})
+        ids = _ids(classes)
+        lines = ["classDiagram"]
+        for name, value in classes.items():
+            attributes, methods = _class_members(value)
+            lines.append(f"    class {ids[name]} {{")
+            lines += [f"        +{_mermaid_text(member)}" for member in attributes + methods]
+            lines.append("    }")
+        return lines
+
+    if diagram_type == "gantt":
+        schedule = schedule_tasks(diagram_data.get("tasks", {}))
+        ids = _ids(schedule["tasks"])
+        lines = ["gantt", "    dateFormat X", "    axisFormat %j"]
+        for name in schedule["order"]:
+            task = schedule["tasks"][name]
+            # Unix seconds from 0 keep the relative schedule without inventing calendar dates
+            start = int(task["start"] * _DAYS_PER_MONTH * 86400)
+            duration = max(int(round(task["duration"] * _DAYS_PER_MONTH)), 1)
+            tags = "crit, " if task["critical"] else ""
+            lines.append(f"    {_mermaid_text(name).replace(':', ' ')} :{tags}{ids[name]}, {start}, {duration}d")
+        return lines
+
+    if diagram_type == "mind map":
+        lines = ["mindmap", f"  root(({_mermaid_text(diagram_data.get('central_topic', 'Topic'))}))"]
+        for branch, items in diagram_data.get("branches", {}).items():
+            lines.append(f"    {_mermaid_text(branch)}")
+            lines += [f"      {_mermaid_text(item)}" for item in _as_list(items)]
+        return lines
+
+    if diagram_type == "timeline":
+        lines = ["timeline"]
+        for event, description in diagram_data.get("events", {}).items():
+            lines.append(f"    {_mermaid_text(event).replace(':', ' ')} : {_mermaid_text(_describe(description))}")
+        return lines
+
+    raise ExportError(f"Mermaid export is not available for {diagram_type} diagrams")
+
+
+# PlantUML
+
+def _to_plantuml(diagram_type, diagram_data):
+    nodes, links = _graph_model(diagram_type, diagram_data)
+    if nodes is not None:
+        ids = _ids(nodes)
+        shape = "rectangle" if diagram_type == "flowchart" else ("node" if diagram_type == "network" else "component")
+        lines = ["@startuml"]
+        lines += [f'{shape} "{_plantuml_text(name)}" as {ids[name]}' for name in nodes]
+        lines += [f"{ids[source]} --> {ids[target]}" + (f" : {_plantuml_text(label)}" if label else "")
+                  for source, target, label in links]
+        return lines + ["@enduml"]
+
+    if diagram_type == "sequence":
+        names, messages = _sequence_model(diagram_data)
+        ids = _ids(names)
+        lines = ["@startuml"]
+        lines += [f'participant "{_plantuml_text(name)}" as {ids[name]}' for name in names]
+        lines += [f"{ids[source]} -> {ids[target]} : {_plantuml_text(message)}" for source, target, message in messages]
+        return lines + ["@enduml"]
+
+    if diagram_type == "state":
+        states, transitions = _state_model(diagram_data)
+        ids = _ids(states)
+        lines = ["@startuml"]
+        for name, description in states.items():
+            lines.append(f'state "{_plantuml_text(name)}" as {ids[name]}')
+            if _describe(description):
+                lines.append(f"{ids[name]} : {_plantuml_text(_describe(description))}")
+        if states:
+            lines.append(f"[*] --> {ids[next(iter(states))]}")
+        lines += [f"{ids[source]} --> {ids[target]}" + (f" : {_plantuml_text(trigger)}" if trigger else "")
+                  for source, target, trigger in transitions]
+        return lines + ["@enduml"]
+
+    if diagram_type in ("erd", "class"):
+        members_by_name = diagram_data.get("entities" if diagram_type == "erd" else "classes", {})
+        ids = _ids(members_by_name)
+        keyword = "entity" if diagram_type == "erd" else "class"
+        lines = ["@startuml"]
+        for name, value in members_by_name.items():
+            attributes, methods = _class_members(value)
+            lines.append(f'{keyword} "{_plantuml_text(name)}" as {ids[name]} {{')
+            lines += [f"  {_plantuml_text(attribute)}" for attribute in attributes]
+            if methods:
+                lines.append("  --")
+                lines += [f"  {_plantuml_text(method)}" for method in methods]
+            lines.append("}")
+        return lines + ["@enduml"]
+
+    if diagram_type == "gantt":
+        schedule = schedule_tasks(diagram_data.get("tasks", {}))
+        lines = ["@startgantt"]
+        for name in schedule["order"]:
+            task = schedule["tasks"][name]
+            label = _plantuml_text(name).replace("[", "(").replace("]", ")")
+            lines.append(f"[{label}] lasts {max(int(round(task['duration'] * _DAYS_PER_MONTH)), 1)} days")
+            if task["start"] > 0:
+                lines.append(f"[{label}] starts D+{int(round(task['start'] * _DAYS_PER_MONTH))}")
+        return lines + ["@endgantt"]
+
+    if diagram_type == "mind map":
+        lines = ["@startmindmap", f"* {_plantuml_text(diagram_data.get('central_topic', 'Topic'))}"]
+        for branch, items in diagram_data.get("branches", {}).items():
+            lines.append(f"** {_plantuml_text(branch)}")
+            lines += [f"*** {_plantuml_text(item)}" for item in _as_list(items)]
+        return lines + ["@endmindmap"]
+
+    raise ExportError(f"PlantUML export is not available for {diagram_type} diagrams")
+
+
+# Graphviz DOT
+
+def _dot_graph(nodes, links, shape="box"):
+    ids = _ids(nodes)
+    lines = ["digraph G {", "    rankdir=TB;", f'    node [shape={shape}, fontname="Inter"];']
+    lines += [f'    {ids[name]} [label="{_dot_text(name)}"];' for name in nodes]
+    lines += [f"    {ids[source]} -> {ids[target]}" + (f' [label="{_dot_text(label)}"]' if label else "") + ";"
+              for source, target, label in links]
+    return lines + ["}"]
+
+
+def _record_label(name, sections):
+    fields = [_dot_text(name)] + ["\\l".join(_dot_text(item) for item in section) + "\\l" for section in sections if section]
+    return "{" + "|".join(field.replace("{", "\\{").replace("}", "\\}").replace("|", "\\|").replace("<", "\\<")
+                          .replace(">", "\\>") for field in fields) + "}"
+
+
+def _to_dot(diagram_type, diagram_data):
+    nodes, links = _graph_model(diagram_type, diagram_data)
+    if nodes is not None:
+        return _dot_graph(nodes, links)
+
+    if diagram_type == "sequence":
+        names, messages = _sequence_model(diagram_data)
+        numbered = [(source, target, f"{index}. {message}") for index, (source, target, message) in enumerate(messages, 1)]
+        return _dot_graph({name: "" for name in names}, numbered)
+
+    if diagram_type == "state":
+        states, transitions = _state_model(diagram_data)
+        return _dot_graph(states, transitions, shape="ellipse")
+
+    if diagram_type in ("erd", "class"):
+        members_by_name = diagram_data.get("entities" if diagram_type == "erd" else "classes", {})
+        ids = _ids(members_by_name)
+        lines = ["digraph G {", '    node [shape=record, fontname="Inter"];']
+        for name, value in members_by_name.items():
+            lines.append(f'    {ids[name]} [label="{_record_label(name, _class_members(value))}"];')
+        return lines + ["}"]
+
+    if diagram_type == "gantt":
+        schedule = schedule_tasks(diagram_data.get("tasks", {}))
+        ids = _ids(schedule["tasks"])
+        lines = ["digraph G {", "    rankdir=LR;", '    node [shape=box, fontname="Inter"];']
+        for name in schedule["order"]:
+            task = schedule["tasks"][name]
+            style = ", color=red" if task["critical"] else ""
+            lines.append(f'    {ids[name]} [label="{_dot_text(name)}\\n{task["duration"]:g} mo"{style}];')
+        for name in schedule["order"]:
+            lines += [f"    {ids[dependency]} -> {ids[name]};" for dependency in schedule["tasks"][name]["dependencies"]]
+        return lines + ["}"]
+
+    if diagram_type == "mind map":
+        topic = diagram_data.get("central_topic", "Topic")
+        used = {"root"}
+        lines = ["graph G {", "    layout=twopi;", '    node [shape=box, fontname="Inter"];',
+                 f'    root [label="{_dot_text(topic)}", shape=ellipse];']
+        for branch, items in diagram_data.get("branches", {}).items():
+            branch_id = _identifier(branch, used)
+            lines += [f'    {branch_id} [label="{_dot_text(branch)}"];', f"    root -- {branch_id};"]
+            for item in _as_list(items):
+                item_id = _identifier(f"{branch}_{item}", used)
+                lines += [f'    {item_id} [label="{_dot_text(item)}", shape=plaintext];', f"    {branch_id} -- {item_id};"]
+        return lines + ["}"]
+
+    raise ExportError(f"DOT export is not available for {diagram_type} diagrams")
+
+
+_EXPORTERS = {"mermaid": _to_mermaid, "plantuml": _to_plantuml, "dot": _to_dot}
+
+
+def export_diagram(diagram_type, diagram_data, export_format):
+    """
+    Convert a validated diagram model to Mermaid, PlantUML or Graphviz DOT text.
+
+    Works on the model alone, with no layout or SVG serialization. Flowchart
+    models are expected to carry their resolved "edges".
+
+    Raises:
+        ExportError: When the format is unknown or cannot express the diagram type
+    """
+    exporter = _EXPORTERS.get(export_format)
+    if exporter is None:
+        raise ExportError(f"Unknown export format '{export_format}', expected one of {sorted(_EXPORTERS)}")
+    if diagram_type not in EXPORT_TYPES[export_format]:
+        raise ExportError(f"{export_format} export is not available for {diagram_type} diagrams")
+    started = time.perf_counter()
+    text = "\n".join(exporter(diagram_type, diagram_data)) + "\n"
+    logger.debug(f"Exported {diagram_type} model to {export_format}: {len(text)} chars "
+                 f"in {(time.perf_counter() - started) * 1000:.2f} ms")
+    return text
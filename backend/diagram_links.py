@@ -0,0 +1,70 @@
+"""Links between diagram nodes as the SVG renderers draw them, shared with the text exporters"""
+
+
+def get_flowchart_edges(steps, edges=None):
+    """
+    Collect flowchart edges from explicit edges, per-step decision branches, or step order.
+
+    A link given more than once (e.g. in edges and again as a step's next) is kept
+    once per (from, to, label); endpoints that are not step names are skipped.
+    """
+    step_names = list(steps.keys())
+    collected = []
+    seen = set()
+
+    def add(source, target, label):
+        if not isinstance(source, str) or not isinstance(target, str) or source not in steps or target not in steps:
+            return
+        key = (source, target, label)
+        if key not in seen:
+            seen.add(key)
+            collected.append({"from": source, "to": target, "label": label})
+
+    for edge in edges if isinstance(edges, list) else []:
+        if isinstance(edge, dict):
+            add(edge.get("from"), edge.get("to"), str(edge.get("label", "")))
+
+    for step_name, step_content in steps.items():
+        if not isinstance(step_content, dict):
+            continue
+        next_steps = step_content.get("next", [])
+        if isinstance(next_steps, str):
+            next_steps = [next_steps]
+        for target in next_steps if isinstance(next_steps, list) else []:
+            add(step_name, target, "")
+        branches = step_content.get("branches", {})
+        if isinstance(branches, dict):
+            branches = [{"label": label, "to": target} for label, target in branches.items()]
+        for branch in branches if isinstance(branches, list) else []:
+            if isinstance(branch, dict):
+                add(step_name, branch.get("to"), str(branch.get("label", "")))
+
+    if not collected:
+        collected = [{"from": a, "to": b, "label": ""} for a, b in zip(step_names, step_names[1:])]
+    return collected
+
+
+def get_architecture_links(components, relationships=None):
+    """
+    Links between architecture components: the relationships that name two
+    components, or each component to the next in listing order when there are none.
+
+    Returns:
+        list: {"from", "to", "label"} dicts; fallback links are labelled "depends on"
+    """
+    links = []
+    seen = set()
+    for relationship in relationships if isinstance(relationships, list) else []:
+        if not isinstance(relationship, dict):
+            continue
+        source, target = relationship.get("from"), relationship.get("to")
+        if not isinstance(source, str) or not isinstance(target, str) or source not in components or target not in components:
+            continue
+        label = str(relationship.get("label", "") or "")
+        if source != target and (source, target, label) not in seen:
+            seen.add((source, target, label))
+            links.append({"from": source, "to": target, "label": label})
+    if not links:
+        names = list(components.keys())
+        links = [{"from": a, "to": b, "label": "depends on"} for a, b in zip(names, names[1:])]
+    return links
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def content_hash(data):
+    """Hex digest naming a rendered artifact by its bytes"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DiagramStore:
+    """
+    Content-addressed store for rendered SVGs.
+
+    Artifacts are kept in a bounded in-memory LRU and, when a directory is given,
+    also written to disk as <hash>.svg so they survive restarts and are shared by
+    workers on the same host; the least recently used files are deleted once the
+    directory exceeds max_disk_bytes. Hosts do not share artifacts, so behind a
+    load balancer or on serverless instances a hash is only found by the instance
+    that stored it, for as long as it keeps it. Entries never change once
+    written, so readers can cache them forever under their hash.
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, max_disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_sizes = {}
+        self._disk_access = {}
+        self._disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                for name in os.listdir(directory):
+                    path = os.path.join(directory, name)
+                    if not name.endswith(".svg") or not os.path.isfile(path):
+                        continue
+                    stat = os.stat(path)
+                    self._track(name[:-4], stat.st_size, stat.st_mtime)
+            except OSError as e:
+                logger.error(f"Diagram store directory {directory} unavailable, keeping artifacts in memory: {str(e)}")
+                self.directory = None
+            self._evict_disk()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.svg")
+
+    def _track(self, digest, size, accessed):
+        with self._lock:
+            if digest in self._disk_sizes:
+                self._disk_size -= self._disk_sizes[digest]
+            self._disk_sizes[digest] = size
+            self._disk_access[digest] = accessed
+            self._disk_size += size
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_size <= self.max_disk_bytes:
+                return
+            for digest in sorted(self._disk_access, key=self._disk_access.get):
+                if self._disk_size <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(self._path(digest))
+                except OSError:
+                    pass
+                self._disk_size -= self._disk_sizes.pop(digest)
+                del self._disk_access[digest]
+
+    def _remember(self, digest, data):
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return
+            self._entries[digest] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def put(self, svg_content):
+        """Store an SVG and return its hash; storing the same bytes again is a no-op"""
+        data = svg_content.encode("utf-8") if isinstance(svg_content, str) else svg_content
+        digest = content_hash(data)
+        self._remember(digest, data)
+        if self.directory:
+            if not os.path.exists(self._path(digest)):
+                try:
+                    # Write then rename so concurrent readers never see a partial file
+                    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                    with os.fdopen(fd, "wb") as handle:
+                        handle.write(data)
+                    os.replace(tmp_path, self._path(digest))
+                except OSError as e:
+                    logger.error(f"Failed to persist diagram {digest}: {str(e)}")
+                    return digest
+            self._track(digest, len(data), time.time())
+            self._evict_disk()
+        return digest
+
+    def get(self, digest):
+        """Return the stored bytes for a hash, or None"""
+        if not DIGEST_PATTERN.match(digest or ""):
+            return None
+        with self._lock:
+            data = self._entries.get(digest)
+            if data is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return data
+        if self.directory:
+            try:
+                with open(self._path(digest), "rb") as handle:
+                    data = handle.read()
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(digest, data)
+                self._track(digest, len(data), time.time())
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, digest):
+        """Whether get(digest) would find the SVG, without reading it"""
+        if not DIGEST_PATTERN.match(digest or ""):
+            return False
+        with self._lock:
+            if digest in self._entries:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(digest))
+
+    def info(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "directory": self.directory,
+                "disk_entries": len(self._disk_sizes),
+                "disk_bytes": self._disk_size,
+                "max_disk_bytes": self.max_disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from diagram_store import DIGEST_PATTERN, content_hash
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_cache_text(text):
+    """Case- and whitespace-insensitive form of a prompt or input used in cache keys"""
+    return _WHITESPACE.sub(" ", str(text or "")).strip().lower()
+
+
+def document_cache_key(template_id, prompt_instruction, user_input):
+    """Cache key for a generated document: template id plus normalized instruction and input"""
+    canonical = json.dumps([normalize_cache_text(template_id), normalize_cache_text(prompt_instruction),
+                            normalize_cache_text(user_input)], ensure_ascii=False, separators=(",", ":"))
+    return content_hash(canonical)
+
+
+def parse_ttl_overrides(spec):
+    """Parse "business_plan=86400,technical_spec=3600" into {template id: seconds}"""
+    ttls = {}
+    for item in (spec or "").split(","):
+        template_id, _, seconds = item.partition("=")
+        if template_id.strip() and seconds.strip():
+            try:
+                ttls[normalize_cache_text(template_id)] = int(seconds)
+            except ValueError:
+                logger.warning(f"Ignoring invalid document cache TTL '{item.strip()}'")
+    return ttls
+
+
+class DocumentCache:
+    """
+    Cache of generated documents with a memory LRU in front of an optional
+    directory of JSON files (one per key, written atomically), so results
+    survive restarts and are shared by workers on the same host.
+
+    Entries expire ttl seconds after creation, where ttl comes from the
+    per-template overrides or the default; a ttl of 0 disables caching for that
+    template. Expired entries are dropped when they are next read, and files
+    older than the longest ttl are swept from the directory at start-up and at
+    most every sweep_interval seconds on put.
+    """
+
+    def __init__(self, directory=None, max_bytes=32 * 1024 * 1024, default_ttl=86400, template_ttls=None,
+                 sweep_interval=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.template_ttls = template_ttls or {}
+        self.sweep_interval = sweep_interval
+        self._swept = 0.0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                logger.error(f"Document cache directory {directory} unavailable, caching in memory only: {str(e)}")
+                self.directory = None
+        self._sweep()
+
+    def ttl_for(self, template_id):
+        return self.template_ttls.get(normalize_cache_text(template_id), self.default_ttl)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    @staticmethod
+    def _entry_size(entry):
+        return len(entry["content"]) + 256
+
+    def _remember(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= self._entry_size(previous)
+            self._entries[key] = entry
+            self._size += self._entry_size(entry)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= self._entry_size(evicted)
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= self._entry_size(entry)
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _sweep(self):
+        """Delete cache files that have outlived every ttl"""
+        if not self.directory:
+            return
+        self._swept = time.time()
+        cutoff = self._swept - max([self.default_ttl] + list(self.template_ttls.values()))
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith((".json", ".tmp")) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"Swept {removed} expired documents from {self.directory}")
+
+    def get(self, key):
+        """Return (entry, age in seconds) for a live key, or None"""
+        if not DIGEST_PATTERN.match(key or ""):
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.directory:
+            try:
+                with open(self._path(key), encoding="utf-8") as handle:
+                    entry = json.load(handle)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None and now - entry["created"] >= entry["ttl"]:
+            self._forget(key)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry, now - entry["created"]
+
+    def put(self, key, template_id, content, **metadata):
+        """Cache a generated document under key unless its template has a ttl of 0"""
+        ttl = self.ttl_for(template_id)
+        if ttl <= 0 or not content:
+            return False
+        entry = dict(metadata, content=content, templateId=template_id, created=time.time(), ttl=ttl)
+        self._remember(key, entry)
+        if self.directory:
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    json.dump(entry, handle, ensure_ascii=False)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                logger.error(f"Failed to persist cached document {key}: {str(e)}")
+            if time.time() - self._swept >= self.sweep_interval:
+                self._sweep()
+        return True
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "directory": self.directory,
+                "default_ttl": self.default_ttl,
+                "template_ttls": dict(self.template_ttls),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+            }
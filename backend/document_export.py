@@ -0,0 +1,690 @@
+import html
+import logging
+import re
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from diagram_store import DIGEST_PATTERN, content_hash
+from packing_layout import measure_text_width
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MIMETYPES = {
+    "md": "text/markdown",
+    "html": "text/html",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+# Formats rendered in the process pool; the others are cheap enough for the request thread
+HEAVY_FORMATS = {"pdf", "docx"}
+
+# Markdown parsing
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_ORDERED = re.compile(r"^(\s*)(\d+)[.)]\s+(.*)$")
+_QUOTE = re.compile(r"^>\s?(.*)$")
+_FENCE = re.compile(r"^\s*```\s*(\S*)")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_INLINE = re.compile(r"(\*\*|__)(.+?)\1|`([^`]+)`|\[([^\]]+)\]\(([^)\s]+)\)|(?<![\w*])([*_])(?!\s)(.+?)(?<!\s)\6(?![\w*])")
+
+
+def parse_inline(text, bold=False, italic=False, href=None):
+    """Split inline Markdown into spans of (text, bold, italic, code, href)"""
+    spans = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            spans.append((text[position:match.start()], bold, italic, False, href))
+        if match.group(2) is not None:
+            spans.extend(parse_inline(match.group(2), True, italic, href))
+        elif match.group(3) is not None:
+            spans.append((match.group(3), bold, italic, True, href))
+        elif match.group(4) is not None:
+            spans.extend(parse_inline(match.group(4), bold, italic, match.group(5)))
+        else:
+            spans.extend(parse_inline(match.group(7), bold, True, href))
+        position = match.end()
+    if position < len(text):
+        spans.append((text[position:], bold, italic, False, href))
+    return tuple(spans)
+
+
+def _table_cells(line):
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def parse_markdown(markdown):
+    """
+    Parse the Markdown subset LLM documents use into a tuple of blocks:
+    ("heading", level, spans), ("paragraph", spans), ("list", ordered, ((depth, spans), ...)),
+    ("quote", spans), ("code", language, text), ("table", header cells, rows) and ("rule",).
+    """
+    lines = markdown.replace("\r\n", "\n").split("\n")
+    blocks = []
+    paragraph = []
+    index = 0
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(("paragraph", parse_inline(" ".join(paragraph))))
+            paragraph.clear()
+
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.strip()
+        fence = _FENCE.match(line)
+        if fence:
+            flush_paragraph()
+            code = []
+            index += 1
+            while index < len(lines) and not lines[index].strip().startswith("```"):
+                code.append(lines[index])
+                index += 1
+            blocks.append(("code", fence.group(1), "\n".join(code)))
+        elif not stripped:
+            flush_paragraph()
+        elif _HEADING.match(stripped):
+            flush_paragraph()
+            match = _HEADING.match(stripped)
+            blocks.append(("heading", len(match.group(1)), parse_inline(match.group(2))))
+        elif _RULE.match(line):
+            flush_paragraph()
+            blocks.append(("rule",))
+        elif stripped.startswith("|") and index + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[index + 1]):
+            flush_paragraph()
+            header = tuple(parse_inline(cell) for cell in _table_cells(line))
+            rows = []
+            index += 2
+            while index < len(lines) and lines[index].strip().startswith("|"):
+                rows.append(tuple(parse_inline(cell) for cell in _table_cells(lines[index])))
+                index += 1
+            blocks.append(("table", header, tuple(rows)))
+            continue
+        elif _BULLET.match(line) or _ORDERED.match(line):
+            flush_paragraph()
+            ordered = _BULLET.match(line) is None
+            items = []
+            while index < len(lines):
+                match = _ORDERED.match(lines[index]) if ordered else _BULLET.match(lines[index])
+                if match:
+                    items.append([len(match.group(1).expandtabs(4)) // 2, match.group(match.lastindex)])
+                elif items and lines[index].startswith("  ") and lines[index].strip() \
+                        and not (_BULLET.match(lines[index]) or _ORDERED.match(lines[index])):
+                    items[-1][1] += " " + lines[index].strip()
+                else:
+                    break
+                index += 1
+            blocks.append(("list", ordered, tuple((depth, parse_inline(text)) for depth, text in items)))
+            continue
+        elif _QUOTE.match(stripped):
+            flush_paragraph()
+            quoted = []
+            while index < len(lines) and _QUOTE.match(lines[index].strip()):
+                quoted.append(_QUOTE.match(lines[index].strip()).group(1))
+                index += 1
+            blocks.append(("quote", parse_inline(" ".join(quoted))))
+            continue
+        else:
+            paragraph.append(stripped)
+        index += 1
+    flush_paragraph()
+    return tuple(blocks)
+
+
+def document_title(ast, default="Document"):
+    """Text of the first heading, used as the exported document title"""
+    for block in ast:
+        if block[0] == "heading":
+            return "".join(span[0] for span in block[2]) or default
+    return default
+
+# HTML
+
+_HTML_STYLE = (
+    "body{margin:0;background:#f8fafc;color:#1f2937;font:16px/1.6 Inter,-apple-system,'Segoe UI',sans-serif}"
+    "article{max-width:820px;margin:0 auto;padding:32px 20px;background:#fff}"
+    "h1,h2,h3,h4{line-height:1.25;color:#111827}h2{border-bottom:1px solid #e5e7eb;padding-bottom:4px}"
+    "code,pre{font-family:ui-monospace,Menlo,Consolas,monospace;background:#f3f4f6;border-radius:4px}"
+    "code{padding:1px 4px}pre{padding:12px;overflow-x:auto}blockquote{margin:0;padding-left:14px;border-left:4px solid #d1d5db;color:#4b5563}"
+    "table{border-collapse:collapse;width:100%}th,td{border:1px solid #e5e7eb;padding:6px 10px;text-align:left}th{background:#f9fafb}"
+    "hr{border:0;border-top:1px solid #e5e7eb}"
+)
+
+
+def _html_spans(spans):
+    parts = []
+    for text, bold, italic, code, href in spans:
+        piece = html.escape(text)
+        if code:
+            piece = f"<code>{piece}</code>"
+        if italic:
+            piece = f"<em>{piece}</em>"
+        if bold:
+            piece = f"<strong>{piece}</strong>"
+        if href and re.match(r"^(https?:|mailto:|#|/)", href):
+            piece = f'<a href="{html.escape(href)}">{piece}</a>'
+        parts.append(piece)
+    return "".join(parts)
+
+
+def _html_list(ordered, items):
+    tag = "ol" if ordered else "ul"
+    parts = [f"<{tag}>"]
+    depths = [items[0][0]]
+    for position, (depth, spans) in enumerate(items):
+        if position:
+            if depth > depths[-1]:
+                parts.append(f"<{tag}>")
+                depths.append(depth)
+            else:
+                while len(depths) > 1 and depth < depths[-1]:
+                    parts.append(f"</li></{tag}>")
+                    depths.pop()
+                parts.append("</li>")
+        parts.append(f"<li>{_html_spans(spans)}")
+    parts.append("</li>" + f"</{tag}></li>" * (len(depths) - 1) + f"</{tag}>")
+    return "".join(parts)
+
+
+def render_html(ast, title=None):
+    """Standalone HTML page for a parsed document"""
+    body = []
+    for block in ast:
+        kind = block[0]
+        if kind == "heading":
+            body.append(f"<h{block[1]}>{_html_spans(block[2])}</h{block[1]}>")
+        elif kind == "paragraph":
+            body.append(f"<p>{_html_spans(block[1])}</p>")
+        elif kind == "list":
+            body.append(_html_list(block[1], block[2]))
+        elif kind == "quote":
+            body.append(f"<blockquote><p>{_html_spans(block[1])}</p></blockquote>")
+        elif kind == "code":
+            body.append(f"<pre><code>{html.escape(block[2])}</code></pre>")
+        elif kind == "table":
+            header = "".join(f"<th>{_html_spans(cell)}</th>" for cell in block[1])
+            rows = "".join("<tr>" + "".join(f"<td>{_html_spans(cell)}</td>" for cell in row) + "</tr>" for row in block[2])
+            body.append(f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>")
+        elif kind == "rule":
+            body.append("<hr>")
+    title = html.escape(title or document_title(ast))
+    return ('<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">'
+            '<meta name="viewport" content="width=device-width,initial-scale=1">'
+            f"<title>{title}</title><style>{_HTML_STYLE}</style></head>"
+            f"<body><article>{''.join(body)}</article></body></html>")
+
+# PDF (standard Type 1 fonts, no embedding)
+
+_PAGE_WIDTH, _PAGE_HEIGHT, _MARGIN = 595, 842, 56
+_PDF_FONTS = {"regular": "Helvetica", "bold": "Helvetica-Bold", "italic": "Helvetica-Oblique",
+              "bold_italic": "Helvetica-BoldOblique", "code": "Courier"}
+_PDF_FONT_IDS = {name: f"F{index + 1}" for index, name in enumerate(_PDF_FONTS)}
+_HEADING_SIZES = {1: 20, 2: 16, 3: 13}
+
+
+def _pdf_font(bold, italic, code):
+    if code:
+        return "code"
+    return {(False, False): "regular", (True, False): "bold", (False, True): "italic", (True, True): "bold_italic"}[(bold, italic)]
+
+
+def _pdf_string(text):
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _measure(text, font, size):
+    if font == "code":
+        return 0.6 * size * len(text)
+    return measure_text_width(text, size, bold=font.startswith("bold"))
+
+
+class _PdfWriter:
+    """Lays out blocks top-down into A4 pages of PDF content streams"""
+
+    def __init__(self):
+        self.pages = []
+        self.ops = []
+        self.y = _PAGE_HEIGHT - _MARGIN
+
+    def new_page(self):
+        self.pages.append(b"\n".join(self.ops))
+        self.ops = []
+        self.y = _PAGE_HEIGHT - _MARGIN
+
+    def ensure(self, height):
+        if self.y - height < _MARGIN and self.ops:
+            self.new_page()
+
+    def text_line(self, x, runs, size):
+        parts = [b"BT", f"{x:.1f} {self.y:.1f} Td".encode()]
+        for font, text in runs:
+            parts.append(f"/{_PDF_FONT_IDS[font]} {size} Tf".encode() + b" " + _pdf_string(text) + b" Tj")
+        parts.append(b"ET")
+        self.ops.append(b" ".join(parts))
+
+    def wrap(self, spans, size, width, bold=False):
+        """Greedy line breaking over styled words; returns lists of (font, text) runs"""
+        lines, line, line_width = [], [], 0.0
+        for text, span_bold, italic, code, _ in spans:
+            font = _pdf_font(bold or span_bold, italic, code)
+            for word in re.findall(r"\S+\s*|\s+", text):
+                word_width = _measure(word, font, size)
+                if line and line_width + _measure(word.rstrip(), font, size) > width:
+                    lines.append(line)
+                    line, line_width = [], 0.0
+                    word = word.lstrip()
+                    word_width = _measure(word, font, size)
+                if line and line[-1][0] == font:
+                    line[-1] = (font, line[-1][1] + word)
+                else:
+                    line.append((font, word))
+                line_width += word_width
+        if line:
+            lines.append(line)
+        return lines
+
+    def paragraph(self, spans, size=10.5, x=_MARGIN, bold=False, space_after=6, marker=None):
+        width = _PAGE_WIDTH - _MARGIN - x
+        leading = size * 1.4
+        for index, runs in enumerate(self.wrap(spans, size, width, bold)):
+            self.ensure(leading)
+            self.y -= leading
+            if marker and index == 0:
+                self.text_line(x - 14, [("regular", marker)], size)
+            self.text_line(x, runs, size)
+        self.y -= space_after
+
+    def rule(self):
+        self.ensure(12)
+        self.y -= 6
+        self.ops.append(f"0.85 G 0.8 w {_MARGIN} {self.y:.1f} m {_PAGE_WIDTH - _MARGIN} {self.y:.1f} l S 0 G".encode())
+        self.y -= 6
+
+    def code(self, text):
+        size, leading = 9, 12
+        for line in text.split("\n") or [""]:
+            self.ensure(leading)
+            self.ops.append(f"0.95 g {_MARGIN - 4} {self.y - leading - 3:.1f} {_PAGE_WIDTH - 2 * _MARGIN + 8} {leading} re f 0 g".encode())
+            self.y -= leading
+            self.text_line(_MARGIN, [("code", line.expandtabs(4))], size)
+        self.y -= 8
+
+    def table(self, header, rows):
+        columns = max([len(header)] + [len(row) for row in rows])
+        column_width = (_PAGE_WIDTH - 2 * _MARGIN) / max(columns, 1)
+        size, leading = 9.5, 13
+        for row_index, row in enumerate((header,) + tuple(rows)):
+            cells = [self.wrap(cell, size, column_width - 8, bold=row_index == 0) for cell in row]
+            height = max([len(lines) for lines in cells] + [1]) * leading + 6
+            self.ensure(height)
+            top = self.y
+            for column in range(columns):
+                x = _MARGIN + column * column_width
+                self.ops.append(f"0.8 G 0.5 w {x:.1f} {top - height:.1f} {column_width:.1f} {height:.1f} re S 0 G".encode())
+                self.y = top - 3
+                for runs in cells[column] if column < len(cells) else []:
+                    self.y -= leading
+                    self.text_line(x + 4, runs, size)
+            self.y = top - height
+        self.y -= 8
+
+    def render(self, ast):
+        for block in ast:
+            kind = block[0]
+            if kind == "heading":
+                size = _HEADING_SIZES.get(block[1], 11.5)
+                self.ensure(size * 3)
+                self.y -= size * 0.6
+                self.paragraph(block[2], size=size, bold=True, space_after=4)
+            elif kind == "paragraph":
+                self.paragraph(block[1])
+            elif kind == "list":
+                for position, (depth, spans) in enumerate(block[2]):
+                    marker = f"{position + 1}." if block[1] else "•"
+                    self.paragraph(spans, x=_MARGIN + 16 + depth * 14, space_after=2, marker=marker)
+                self.y -= 4
+            elif kind == "quote":
+                self.paragraph(tuple((span[0], span[1], True, span[3], span[4]) for span in block[1]), x=_MARGIN + 16)
+            elif kind == "code":
+                self.code(block[2])
+            elif kind == "table":
+                self.table(block[1], block[2])
+            elif kind == "rule":
+                self.rule()
+        self.new_page()
+        return self.pages
+
+
+def render_pdf(ast, title=None):
+    """PDF bytes for a parsed document, using the standard Helvetica and Courier fonts"""
+    pages = _PdfWriter().render(ast)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_id = add(None)
+    font_refs = " ".join(
+        f"/{_PDF_FONT_IDS[name]} {add(f'<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>'.encode())} 0 R"
+        for name, base in _PDF_FONTS.items())
+    page_ids = []
+    for content in pages:
+        stream = zlib.compress(content)
+        content_id = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {_PAGE_WIDTH} {_PAGE_HEIGHT}] "
+                            f"/Resources << /Font << {font_refs} >> >> /Contents {content_id} 0 R >>".encode()))
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode()
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>".encode()
+    info = add(b"<< /Title " + _pdf_string(title or document_title(ast)) + b" /Producer (Napkin) >>")
+
+    output = BytesIO()
+    output.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    output.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                 f"startxref\n{xref}\n%%EOF\n".encode())
+    return output.getvalue()
+
+# DOCX (WordprocessingML in a zip)
+
+_DOCX_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>'
+    '</Relationships>'
+)
+_DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+
+def _docx_style(style_id, name, size, bold=False, color=None, font=None, spacing_before=0, based_on="Normal"):
+    run = f'<w:sz w:val="{size}"/>' + ("<w:b/>" if bold else "") + (f'<w:color w:val="{color}"/>' if color else "")
+    if font:
+        run = f'<w:rFonts w:ascii="{font}" w:hAnsi="{font}"/>' + run
+    return (f'<w:style w:type="paragraph" w:styleId="{style_id}"><w:name w:val="{name}"/><w:basedOn w:val="{based_on}"/>'
+            f'<w:pPr><w:spacing w:before="{spacing_before}" w:after="120"/></w:pPr><w:rPr>{run}</w:rPr></w:style>')
+
+
+_DOCX_STYLES = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:styles {_DOCX_NS}>'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/><w:sz w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="276" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    + _docx_style("Heading1", "heading 1", 36, True, "111827", spacing_before=240)
+    + _docx_style("Heading2", "heading 2", 30, True, "111827", spacing_before=240)
+    + _docx_style("Heading3", "heading 3", 26, True, "1F2937", spacing_before=200)
+    + _docx_style("Heading4", "heading 4", 23, True, "1F2937", spacing_before=160)
+    + _docx_style("Code", "Code", 18, font="Consolas")
+    + _docx_style("Quote", "Quote", 22, color="4B5563")
+    + '</w:styles>'
+)
+
+
+def _xml_text(text):
+    return html.escape(text, quote=False)
+
+
+def _docx_runs(spans, bold=False):
+    runs = []
+    for text, span_bold, italic, code, href in spans:
+        properties = ("<w:b/>" if bold or span_bold else "") + ("<w:i/>" if italic else "")
+        if code:
+            properties = '<w:rFonts w:ascii="Consolas" w:hAnsi="Consolas"/>' + properties
+        if href:
+            properties += '<w:color w:val="2563EB"/><w:u w:val="single"/>'
+        runs.append(f'<w:r><w:rPr>{properties}</w:rPr><w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r>')
+    return "".join(runs)
+
+
+def _docx_paragraph(runs, style=None, indent=None):
+    properties = (f'<w:pStyle w:val="{style}"/>' if style else "") + \
+        (f'<w:ind w:left="{indent}" w:hanging="360"/>' if indent is not None else "")
+    return f"<w:p><w:pPr>{properties}</w:pPr>{runs}</w:p>"
+
+
+def _docx_table(header, rows):
+    columns = max([len(header)] + [len(row) for row in rows])
+    border = '<w:{0} w:val="single" w:sz="4" w:space="0" w:color="D1D5DB"/>'
+    borders = "".join(border.format(side) for side in ("top", "left", "bottom", "right", "insideH", "insideV"))
+    parts = [f'<w:tbl><w:tblPr><w:tblW w:w="5000" w:type="pct"/><w:tblBorders>{borders}</w:tblBorders></w:tblPr>'
+             f'<w:tblGrid>{"<w:gridCol/>" * columns}</w:tblGrid>']
+    for row_index, row in enumerate((header,) + tuple(rows)):
+        cells = list(row) + [()] * (columns - len(row))
+        parts.append("<w:tr>" + "".join(f"<w:tc>{_docx_paragraph(_docx_runs(cell, bold=row_index == 0))}</w:tc>"
+                                        for cell in cells) + "</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def render_docx(ast, title=None):
+    """DOCX bytes for a parsed document"""
+    body = []
+    for block in ast:
+        kind = block[0]
+        if kind == "heading":
+            body.append(_docx_paragraph(_docx_runs(block[2]), f"Heading{min(block[1], 4)}"))
+        elif kind == "paragraph":
+            body.append(_docx_paragraph(_docx_runs(block[1])))
+        elif kind == "list":
+            for position, (depth, spans) in enumerate(block[2]):
+                marker = f"{position + 1}.\t" if block[1] else "•\t"
+                body.append(_docx_paragraph(f'<w:r><w:t xml:space="preserve">{marker}</w:t></w:r>' + _docx_runs(spans),
+                                            indent=720 + 360 * depth))
+        elif kind == "quote":
+            body.append(_docx_paragraph(_docx_runs(tuple((s[0], s[1], True, s[3], s[4]) for s in block[1])), "Quote", 720))
+        elif kind == "code":
+            body.extend(_docx_paragraph(f'<w:r><w:t xml:space="preserve">{_xml_text(line)}</w:t></w:r>', "Code")
+                        for line in block[2].split("\n"))
+        elif kind == "table":
+            body.append(_docx_table(block[1], block[2]))
+            body.append(_docx_paragraph(""))
+        elif kind == "rule":
+            body.append('<w:p><w:pPr><w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="D1D5DB"/></w:pBdr></w:pPr></w:p>')
+    document = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {_DOCX_NS}><w:body>'
+                + "".join(body) +
+                '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+                '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134" w:header="708" w:footer="708" w:gutter="0"/>'
+                '</w:sectPr></w:body></w:document>')
+    core = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:title>{_xml_text(title or document_title(ast))}</dc:title></cp:coreProperties>')
+
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in (("[Content_Types].xml", _DOCX_CONTENT_TYPES), ("_rels/.rels", _DOCX_RELS),
+                           ("word/_rels/document.xml.rels", _DOCX_DOCUMENT_RELS), ("word/document.xml", document),
+                           ("word/styles.xml", _DOCX_STYLES), ("docProps/core.xml", core)):
+            # Fixed timestamps keep the archive bytes a pure function of the document
+            archive.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data, zipfile.ZIP_DEFLATED)
+    return output.getvalue()
+
+
+_RENDERERS = {"html": lambda ast, title: render_html(ast, title).encode("utf-8"), "pdf": render_pdf, "docx": render_docx}
+
+
+def render_export(ast, export_format, title=None):
+    """Render a parsed document to bytes; runs in a worker process for heavy formats"""
+    return _RENDERERS[export_format](ast, title)
+
+
+class DocumentExporter:
+    """
+    Export pipeline for generated documents.
+
+    Markdown sources are kept by content hash, parsed once into an AST that is
+    cached in memory, and rendered to HTML in-process or to PDF/DOCX in a lazily
+    created process pool. Rendered bytes are cached by (content hash, format)
+    and concurrent requests for the same export share one render.
+    """
+
+    def __init__(self, max_source_bytes=32 * 1024 * 1024, max_export_bytes=64 * 1024 * 1024,
+                 max_asts=256, max_workers=2, timeout=30):
+        self.max_source_bytes = max_source_bytes
+        self.max_export_bytes = max_export_bytes
+        self.max_asts = max_asts
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._sources = OrderedDict()
+        self._source_size = 0
+        self._asts = OrderedDict()
+        self._exports = OrderedDict()
+        self._export_size = 0
+        self._pending = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.cache_hits = 0
+        self.parse_ms = 0.0
+        self.render_ms = 0.0
+
+    def put(self, markdown):
+        """Keep a document for export and return its content hash"""
+        data = markdown.encode("utf-8")
+        digest = content_hash(data)
+        with self._lock:
+            if digest in self._sources:
+                self._sources.move_to_end(digest)
+                return digest
+            self._sources[digest] = markdown
+            self._source_size += len(data)
+            while self._source_size > self.max_source_bytes and len(self._sources) > 1:
+                _, evicted = self._sources.popitem(last=False)
+                self._source_size -= len(evicted.encode("utf-8"))
+        return digest
+
+    def get_source(self, digest):
+        if not DIGEST_PATTERN.match(digest or ""):
+            return None
+        with self._lock:
+            markdown = self._sources.get(digest)
+            if markdown is not None:
+                self._sources.move_to_end(digest)
+            return markdown
+
+    def contains(self, digest):
+        """Whether the source of a document is still kept for export"""
+        with self._lock:
+            return digest in self._sources
+
+    def ast(self, digest, markdown):
+        """Parsed document for a content hash, parsing on first use"""
+        with self._lock:
+            parsed = self._asts.get(digest)
+            if parsed is not None:
+                self._asts.move_to_end(digest)
+                return parsed
+        started = time.perf_counter()
+        parsed = parse_markdown(markdown)
+        with self._lock:
+            self.parse_ms += (time.perf_counter() - started) * 1000
+            self._asts[digest] = parsed
+            while len(self._asts) > self.max_asts:
+                self._asts.popitem(last=False)
+        return parsed
+
+    def _remember_export(self, key, data):
+        with self._lock:
+            if key in self._exports:
+                return
+            self._exports[key] = data
+            self._export_size += len(data)
+            while self._export_size > self.max_export_bytes and len(self._exports) > 1:
+                _, evicted = self._exports.popitem(last=False)
+                self._export_size -= len(evicted)
+
+    def export(self, digest, export_format, title=None):
+        """
+        Return the export bytes of a stored document, or None for an unknown hash.
+
+        Raises:
+            concurrent.futures.TimeoutError: When a pooled render exceeds the timeout
+        """
+        if export_format == "md":
+            markdown = self.get_source(digest)
+            return markdown.encode("utf-8") if markdown is not None else None
+        key = (digest, export_format)
+        with self._lock:
+            cached = self._exports.get(key)
+            if cached is not None:
+                self._exports.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+        markdown = self.get_source(digest)
+        if markdown is None:
+            return None
+        parsed = self.ast(digest, markdown)
+
+        started = time.perf_counter()
+        if export_format not in HEAVY_FORMATS:
+            data = render_export(parsed, export_format, title)
+        else:
+            with self._lock:
+                future = self._pending.get(key)
+                owner = future is None
+                if owner:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                    future = self._pool.submit(render_export, parsed, export_format, title)
+                    self._pending[key] = future
+            try:
+                data = future.result(timeout=self.timeout)
+            finally:
+                if owner:
+                    with self._lock:
+                        self._pending.pop(key, None)
+            if not owner:
+                return data
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._remember_export(key, data)
+        with self._lock:
+            self.renders += 1
+            self.render_ms += elapsed_ms
+        logger.info(f"Exported document {digest} to {export_format}: {len(data)} bytes in {elapsed_ms:.1f} ms")
+        return data
+
+    def info(self):
+        with self._lock:
+            return {
+                "sources": len(self._sources),
+                "source_bytes": self._source_size,
+                "asts": len(self._asts),
+                "exports": len(self._exports),
+                "export_bytes": self._export_size,
+                "workers": self.max_workers,
+                "renders": self.renders,
+                "cache_hits": self.cache_hits,
+                "parse_ms": round(self.parse_ms, 1),
+                "render_ms": round(self.render_ms, 1),
+            }
@@ -1,1261 +1,790 @@
-from venv import logger
-from flask import Flask, app, request, jsonify
-from flask_cors import CORS
+"""
+Document generation for the documents blueprint (see document_routes).
+
+This module is imported on the first document request rather than at
+startup, so diagram-only processes never load the document code, fallback
+templates or exporters. The LLM client, scheduler and document cache come
+from services.
+"""
+import html
 import json
-import textwrap
-import re
-from datetime import datetime
 import logging
-from groq import Groq
 import os
+import re
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError, as_completed
+from datetime import datetime
+from itertools import chain
+
+from flask import Response, jsonify, request, stream_with_context
+from werkzeug.utils import secure_filename
+
+import services
+from diagram_store import content_hash
+from document_cache import document_cache_key
+from document_export import EXPORT_MIMETYPES as DOCUMENT_EXPORT_MIMETYPES, HEAVY_FORMATS, DocumentExporter
+from document_templates import DEFAULT_TEMPLATE_DIR, TemplateRegistry, normalize_template_key, split_markdown_sections
+from response_compression import immutable_artifact_response, matched_etag, negotiate_encoding
+from services import document_cache, llm_scheduler, note_llm_usage, record_history
+from template_catalog import DEFAULT_CATALOG_PATH, TemplateCatalog
+
+logger = logging.getLogger(__name__)
+
+# Output budget of one section in sectioned document generation
+SECTION_MAX_TOKENS = int(os.environ.get("SECTION_MAX_TOKENS", "1200"))
+# Section regeneration: smallest output budget, and characters of each neighbouring section sent as context
+SECTION_MIN_TOKENS = 300
+SECTION_CONTEXT_CHARS = int(os.environ.get("SECTION_CONTEXT_CHARS", "400"))
+# Outline-first generation: output budget of the outline call (headings plus one-line summaries)
+OUTLINE_MAX_TOKENS = int(os.environ.get("OUTLINE_MAX_TOKENS", "400"))
+
+# Fallback documents used when the LLM is unavailable, compiled from data files on first use
+fallback_templates = TemplateRegistry(os.environ.get("FALLBACK_DOCUMENTS_DIR", DEFAULT_TEMPLATE_DIR))
+
+# Document templates offered to clients, hot-reloaded from TEMPLATE_CATALOG_PATH when the file changes
+template_catalog = TemplateCatalog(os.environ.get("TEMPLATE_CATALOG_PATH", DEFAULT_CATALOG_PATH),
+                                   check_interval=float(os.environ.get("TEMPLATE_CATALOG_CHECK_SECONDS", "2")))
+
+# Generated documents exported to HTML, PDF and DOCX at /documents/<hash>.<format>; PDF and DOCX render in worker processes
+document_exporter = DocumentExporter(
+    max_source_bytes=int(os.environ.get("DOCUMENT_EXPORT_SOURCE_MAX_BYTES", str(32 * 1024 * 1024))),
+    max_export_bytes=int(os.environ.get("DOCUMENT_EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_workers=int(os.environ.get("DOCUMENT_EXPORT_WORKERS", "2")),
+    timeout=float(os.environ.get("DOCUMENT_EXPORT_TIMEOUT_SECONDS", "30"))
+)
+
+
+def escape_text(text):
+    """XML-escape a value as the diagram code does; fallback documents have always carried escaped input"""
+    return html.escape(str(text), quote=True)
+
+def info():
+    return {
+        "fallback_templates": fallback_templates.info(),
+        "template_catalog": template_catalog.info(),
+        "document_export": document_exporter.info()
+    }
+
+def resolve_document_template(document_template):
+    """A request's documentTemplate with the fields it leaves out taken from its catalog entry"""
+    template = template_catalog.get(document_template.get('id'), document_template.get('name'))
+    if template is None:
+        return document_template
+    return dict(template, **{key: value for key, value in document_template.items() if value not in (None, '')})
+
+def template_cache_id(document_template):
+    """Template id used in document cache keys, tagged with the catalog version so edited templates regenerate"""
+    template_id = document_template.get('id') or document_template.get('name', 'General Document')
+    template = template_catalog.get(document_template.get('id'), document_template.get('name'))
+    return f"{template_id}@{template['version']}" if template else template_id
+
+def record_document_history(document_template, document_data, kind="document"):
+    """Record a returned document (or outline, under model) in the generation history"""
+    content = document_data.get('content')
+    record_history(kind, document_template.get('id') or document_template.get('name', 'General Document'),
+                   "cache" if document_data.get('cached') else None, content=content,
+                   document_hash=content_hash(content) if content else None, model=document_data.get('outline'))
+    return document_data
+
+def get_cache_mode(data):
+    """Read the cache flag of a document request: "bypass" regenerates (and refreshes the entry)"""
+    return str(data.get('cache') or request.args.get('cache') or 'use').strip().lower()
+
+def get_document_format(data):
+    """
+    Read the requested document output: markdown (default), html, pdf or docx.
+
+    Raises:
+        ValueError: When the format is unknown
+    """
+    output_format = str(data.get('format') or request.args.get('format') or 'markdown').strip().lower()
+    if output_format in ('markdown', 'md'):
+        return 'markdown'
+    if output_format not in DOCUMENT_EXPORT_MIMETYPES:
+        raise ValueError(f"Unknown format '{output_format}', expected markdown, html, pdf or docx")
+    return output_format
+
+def attach_document_export(document_data, output_format):
+    """
+    Register a generated document for export and link its rendering.
+
+    The Markdown stays in "content"; HTML is also inlined, while PDF and DOCX
+    are fetched from exportUrl and rendered on first request.
+    """
+    if output_format == 'markdown':
+        return document_data
+    document_hash = document_exporter.put(document_data['content'])
+    document_data['documentHash'] = document_hash
+    document_data['format'] = output_format
+    document_data['mimetype'] = DOCUMENT_EXPORT_MIMETYPES[output_format]
+    document_data['exportUrl'] = f"/documents/{document_hash}.{output_format}"
+    if output_format == 'html':
+        document_data['html'] = document_exporter.export(document_hash, 'html').decode('utf-8')
+    return document_data
+
+def request_document_completion(document_type, prompt, max_tokens):
+    """One document completion from the LLM"""
+    completion = services.client.chat.completions.create(
+        model="llama3-8b-8192",
+        messages=[
+            {
+                "role": "system",
+                "content": f"You are a professional document writer specializing in {escape_text(document_type)} documents. Create comprehensive, well-structured, and professional content."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        top_p=1,
+        stream=False,
+        stop=None,
+    )
+    note_llm_usage(completion, "llama3-8b-8192")
+    return completion.choices[0].message.content
+
+def get_section_prompt(template_name, prompt_instruction, user_input, heading, headings, summaries=None):
+    """Prompt for one section of a sectioned document; summaries maps headings to their outline summaries"""
+    summaries = summaries or {}
+    context = prompt_instruction.replace('[USER_INPUT]', user_input) if prompt_instruction else f"{template_name} for: {user_input}"
+    outline = "\n".join(f"- {name}: {summaries[name]}" if summaries.get(name) else f"- {name}" for name in headings)
+    focus = f"\nThis section should cover: {summaries[heading]}" if summaries.get(heading) else ""
+    return f"""{context}
+
+The {template_name} has these sections, written separately:
+{outline}
+{focus}
+Write only the "{heading}" section in Markdown. Start with the line "## {heading}", use ### for subsections,
+do not repeat other sections and do not add a document title."""
+
+def generate_document_section(template_name, document_type, prompt_instruction, user_input, heading, headings,
+                              summaries=None):
+    """Generate one section; returns (markdown starting with its ## heading, elapsed ms)"""
+    started = time.perf_counter()
+    prompt = get_section_prompt(template_name, prompt_instruction, user_input, heading, headings, summaries)
+    content = request_document_completion(document_type, prompt, SECTION_MAX_TOKENS)
+    return normalize_section_markdown(content, heading), (time.perf_counter() - started) * 1000
+
+def normalize_section_markdown(content, heading):
+    """Drop any document title the model added and make sure the section starts with its ## heading"""
+    lines = content.strip().splitlines()
+    while lines and lines[0].startswith("# "):
+        lines.pop(0)
+    content = "\n".join(lines).strip()
+    if not content.startswith("## "):
+        content = f"## {heading}\n\n{content}"
+    return content
+
+_MARKDOWN_MARKUP = re.compile(r"^\s*(?:#{1,6}|[-*+]|\d+[.)]|>)\s+|[*_`]+", re.M)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def condense_section(section_text, max_chars=SECTION_CONTEXT_CHARS):
+    """Plain-text gist of a section for prompt context: its body without markup, cut at a sentence near max_chars"""
+    body = section_text.split("\n", 1)[1] if section_text.startswith("## ") and "\n" in section_text else section_text
+    text = " ".join(_MARKDOWN_MARKUP.sub("", body).split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    ends = [match.start() for match in _SENTENCE_END.finditer(cut)]
+    return (cut[:ends[-1]] if ends and ends[-1] > max_chars // 2 else cut.rsplit(" ", 1)[0]) + " ..."
+
+def find_section(sections, heading=None, index=None):
+    """Index of the section with the given heading (case- and spacing-insensitive) or position, else None"""
+    if index is not None:
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            return None
+        return index if 0 <= index < len(sections) else None
+    key = normalize_template_key(heading)
+    return next((position for position, (name, _) in enumerate(sections) if normalize_template_key(name) == key), None)
+
+def get_section_regeneration_prompt(template_name, sections, index, instruction, user_input):
+    """Prompt rewriting one section, with the outline and condensed neighbouring sections as context"""
+    heading, current = sections[index]
+    outline = "\n".join(f"- {name}" for name, _ in sections)
+    context = []
+    if index > 0:
+        context.append(f'Previous section "{sections[index - 1][0]}": {condense_section(sections[index - 1][1])}')
+    if index + 1 < len(sections):
+        context.append(f'Next section "{sections[index + 1][0]}": {condense_section(sections[index + 1][1])}')
+    context_text = "\n".join(context) or "(none)"
+    subject = f" for: {user_input}" if user_input else ""
+    return f"""You are revising one section of a {template_name}{subject}.
+
+Document outline:
+{outline}
+
+Neighbouring sections (summarised, do not rewrite them):
+{context_text}
+
+Current "{heading}" section:
+{current}
+
+Revision request: {instruction or "Improve this section: make it clearer, more specific and better structured."}
+
+Write only the revised "{heading}" section in Markdown. Start with the line "## {heading}", use ### for subsections,
+keep it consistent with the neighbouring sections and do not add a document title."""
+
+def section_max_tokens(section_text):
+    """Output budget for a rewritten section: proportional to its current length (about 4 characters per token)"""
+    return max(SECTION_MIN_TOKENS, min(SECTION_MAX_TOKENS * 2, len(section_text) // 4 * 2))
+
+def get_outline_prompt(template_name, prompt_instruction, user_input, suggested_headings):
+    """Prompt for the outline of a document: its section headings, each with a one-line summary"""
+    context = prompt_instruction.replace('[USER_INPUT]', user_input) if prompt_instruction else f"{template_name} for: {user_input}"
+    suggested = ", ".join(suggested_headings)
+    return f"""{context}
+
+Do not write the document yet. Plan it: return only a JSON array of 4 to 10 sections in reading order,
+each {{"heading": "...", "summary": "one sentence on what the section covers"}}.
+Typical sections of a {template_name}: {suggested}. Adapt them to the subject."""
+
+def parse_outline(text):
+    """
+    Read the outline returned by the LLM.
+
+    Raises:
+        ValueError: When the reply holds no usable JSON array of sections
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end < start:
+        raise ValueError("No JSON array in outline reply")
+    outline = []
+    for item in json.loads(text[start:end + 1]):
+        if isinstance(item, dict) and str(item.get("heading") or "").strip():
+            heading = " ".join(str(item["heading"]).lstrip("#").split())
+            outline.append({"heading": heading, "summary": " ".join(str(item.get("summary") or "").split())})
+    if not outline:
+        raise ValueError("Outline reply has no sections")
+    return outline
+
+def get_document_outline(document_template, user_input, cache_mode='use'):
+    """
+    Outline a document with one small completion, caching it per template, instruction and input.
+
+    Falls back to the headings of the template's fallback document.
+
+    Returns:
+        dict: outline ([{heading, summary}]), source ("ai", "template"), cached, cacheAgeSeconds and llm_ms
+    """
+    template_name = document_template.get('name', 'General Document')
+    document_type = document_template.get('documentType', 'general')
+    prompt_instruction = document_template.get('promptInstruction', '')
+    template_id = document_template.get('id') or template_name
+
+    cache_key = document_cache_key(f"{template_cache_id(document_template)}#outline", prompt_instruction, user_input)
+    if cache_mode == 'bypass':
+        document_cache.record_bypass()
+    else:
+        cached = document_cache.get(cache_key)
+        if cached:
+            entry, age = cached
+            return {"outline": json.loads(entry["content"]), "source": "ai", "cached": True,
+                    "cacheAgeSeconds": round(age, 1), "llm_ms": 0.0}
+
+    _, fallback_sections = fallback_templates.sections(escape_text(template_name), escape_text(user_input),
+                                                       document_type, document_template.get('id'))
+    headings = [heading for heading, _ in fallback_sections]
+    started = time.perf_counter()
+    try:
+        if not services.client:
+            raise ValueError("AI service unavailable")
+        prompt = get_outline_prompt(template_name, prompt_instruction, user_input, headings)
+        outline = parse_outline(request_document_completion(document_type, prompt, OUTLINE_MAX_TOKENS))
+    except Exception as e:
+        logger.warning(f"Outline for {escape_text(template_name)} failed, using template sections: {str(e)}")
+        return {"outline": [{"heading": heading, "summary": ""} for heading in headings], "source": "template",
+                "cached": False, "cacheAgeSeconds": None, "llm_ms": 0.0}
+    llm_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Outlined {escape_text(template_name)} in {len(outline)} sections in {llm_ms:.0f} ms")
+    document_cache.put(cache_key, template_id, json.dumps(outline, ensure_ascii=False), templateName=template_name,
+                       documentType=document_type)
+    return {"outline": outline, "source": "ai", "cached": False, "cacheAgeSeconds": None, "llm_ms": round(llm_ms, 1)}
+
+def submit_document_sections(document_template, user_input, outline=None):
+    """
+    Submit every section of a document to the LLM scheduler at once.
+
+    The sections are the outline's headings when one is given, else the "## "
+    headings of the template's fallback document.
+
+    Returns:
+        tuple: (title block, [(heading, fallback markdown, Future or None without an LLM client)])
+    """
+    template_name = document_template.get('name', 'General Document')
+    document_type = document_template.get('documentType', 'general')
+    prompt_instruction = document_template.get('promptInstruction', '')
+    preamble, fallback_sections = fallback_templates.sections(escape_text(template_name), escape_text(user_input),
+                                                              document_type, document_template.get('id'))
+    summaries = None
+    if outline:
+        template_text = {normalize_template_key(heading): text for heading, text in fallback_sections}
+        summaries = {item["heading"]: item["summary"] for item in outline}
+        fallback_sections = [(item["heading"], template_text.get(normalize_template_key(item["heading"]))
+                              or f"## {item['heading']}\n\n{item['summary']}".rstrip()) for item in outline]
+
+    headings = [heading for heading, _ in fallback_sections]
+    submitted = []
+    for heading, fallback_text in fallback_sections:
+        future = None
+        if services.client:
+            future = llm_scheduler.submit(generate_document_section, template_name, document_type, prompt_instruction,
+                                          user_input, heading, headings, summaries)
+        submitted.append((heading, fallback_text, future))
+    return preamble, submitted
+
+def section_result(template_name, heading, fallback_text, future):
+    """(markdown, source, llm_ms) of a submitted section, using its fallback text if the LLM call failed"""
+    if future is not None:
+        try:
+            content, elapsed_ms = future.result()
+            return content, "ai", elapsed_ms
+        except Exception as e:
+            logger.warning(f"Section '{escape_text(heading)}' of {escape_text(template_name)} failed, using fallback: {str(e)}")
+    return fallback_text, "fallback", 0.0
+
+def iter_sectioned_document(document_template, user_input, outline=None):
+    """
+    Generate a document section by section.
+
+    All sections are submitted at once (see submit_document_sections) and
+    yielded in document order, each as soon as it and every earlier section
+    is done, so total time tends towards the slowest section. Failed sections
+    use the fallback text for that heading.
+
+    Yields:
+        tuple: (heading or None for the title block, markdown, source, llm_ms)
+    """
+    template_name = document_template.get('name', 'General Document')
+    preamble, submitted = submit_document_sections(document_template, user_input, outline)
+    yield None, preamble, "template", 0.0
+    for heading, fallback_text, future in submitted:
+        yield (heading,) + section_result(template_name, heading, fallback_text, future)
+
+def document_variant_key(template_id, sectioned=False, outlined=False):
+    """Template part of the cache key; single-completion, sectioned and outline-first documents are cached apart"""
+    if outlined:
+        return f"{template_id}#outlined"
+    return f"{template_id}#sections" if sectioned else template_id
+
+def generate_document_content(document_template, user_input, cache_mode='use', sectioned=False, outlined=False):
+    """
+    Generate the document for one template, serving repeated requests from the document cache.
+
+    Only LLM output is cached; fallback documents are cheap to render and are
+    not pinned in place of a later AI result, so sectioned and outline-first
+    documents are cached only when every section (and the outline) came from
+    the LLM. Sectioned documents are cached
+    separately from single-completion ones. Outline-first documents are
+    sectioned documents whose sections come from a (cached) outline call.
+
+    Returns:
+        dict: content, cached and cacheAgeSeconds (None unless served from the cache);
+        sectioned generation adds per-section sources and timings, outline-first the outline
+    """
+    template_name = document_template.get('name', 'General Document')
+    document_type = document_template.get('documentType', 'general')
+    prompt_instruction = document_template.get('promptInstruction', '')
+    template_id = document_template.get('id') or template_name
+
+    cache_key = document_cache_key(document_variant_key(template_cache_id(document_template), sectioned, outlined),
+                                   prompt_instruction, user_input)
+    if cache_mode == 'bypass':
+        document_cache.record_bypass()
+    else:
+        cached = document_cache.get(cache_key)
+        if cached:
+            entry, age = cached
+            logger.info(f"Serving {escape_text(template_name)} document from cache ({age:.0f}s old)")
+            return {"content": entry["content"], "cached": True, "cacheAgeSeconds": round(age, 1)}
+
+    if sectioned or outlined:
+        started = time.perf_counter()
+        outline = get_document_outline(document_template, user_input, cache_mode) if outlined else None
+        parts = []
+        sections = []
+        for heading, content, source, llm_ms in iter_sectioned_document(document_template, user_input,
+                                                                        outline and outline["outline"]):
+            parts.append(content)
+            if heading is not None:
+                sections.append({"heading": heading, "source": source, "llm_ms": round(llm_ms, 1)})
+        generated_content = "\n\n".join(part for part in parts if part)
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Generated {escape_text(template_name)} in {len(sections)} sections in {total_ms:.0f} ms")
+        # A fallback section would be pinned in place of a later AI result, so only all-AI documents are cached
+        if (sections and all(section["source"] == "ai" for section in sections)
+                and (outline is None or outline["source"] == "ai")):
+            document_cache.put(cache_key, template_id, generated_content, templateName=template_name, documentType=document_type)
+        result = {"content": generated_content, "cached": False, "cacheAgeSeconds": None,
+                  "sections": sections, "timings": {"total_ms": round(total_ms, 1)}}
+        if outline:
+            result["outline"] = outline["outline"]
+            result["timings"]["outline_ms"] = outline["llm_ms"]
+        return result
 
-# Configure logging
-def get_document_fallback_content(template_name, document_type, user_input):
-    if template_name.lower() == 'business plan':
-        return f"""# Business Plan: {user_input}
-
-## Executive Summary
-This comprehensive business plan outlines the strategic approach for {user_input}. Our venture aims to address market needs through innovative solutions and sustainable business practices.
-
-### Key Highlights
-- **Vision**: To become a leading provider in the {user_input} sector
-- **Mission**: Delivering exceptional value through quality products/services
-- **Target Market**: Primary focus on underserved market segments
-- **Competitive Advantage**: Unique value proposition and innovative approach
-
-## Market Analysis
-
-### Industry Overview
-The {user_input} industry presents significant opportunities for growth and innovation. Current market trends indicate:
-- Growing demand for sustainable and innovative solutions
-- Increasing consumer awareness and preference for quality
-- Technology-driven transformation across the sector
-- Regulatory changes creating new opportunities
-
-### Target Market
-- **Primary Market**: Core customer segment with immediate need
-- **Secondary Market**: Adjacent markets with growth potential
-- **Market Size**: Estimated addressable market of significant scale
-- **Customer Demographics**: Detailed analysis of target customer profiles
-
-### Competitive Landscape
-- **Direct Competitors**: Analysis of primary market competitors
-- **Indirect Competitors**: Alternative solutions and substitutes
-- **Market Positioning**: Our unique position in the competitive landscape
-- **Competitive Advantages**: Key differentiators and strengths
-
-## Products/Services
-
-### Core Offerings
-Detailed description of primary products/services for {user_input}:
-- **Product/Service 1**: Primary offering with key features and benefits
-- **Product/Service 2**: Secondary offering complementing core business
-- **Value Proposition**: Clear articulation of customer value
-
-### Development Roadmap
-- **Phase 1**: Initial product development and market entry
-- **Phase 2**: Product enhancement and market expansion
-- **Phase 3**: Diversification and scaling operations
-
-## Marketing & Sales Strategy
-
-### Marketing Approach
-- **Brand Positioning**: Clear brand identity and market positioning
-- **Marketing Channels**: Multi-channel approach including digital and traditional
-- **Customer Acquisition**: Strategies for attracting and retaining customers
-- **Pricing Strategy**: Competitive pricing model aligned with value proposition
-
-### Sales Strategy
-- **Sales Process**: Systematic approach to customer conversion
-- **Sales Team**: Structure and capabilities of sales organization
-- **Sales Targets**: Realistic and achievable sales projections
-- **Customer Retention**: Strategies for long-term customer relationships
-
-## Operations Plan
-
-### Operational Structure
-- **Location**: Strategic location considerations for {user_input}
-- **Facilities**: Required infrastructure and facilities
-- **Technology**: Technology stack and systems requirements
-- **Supply Chain**: Supplier relationships and logistics
-
-### Quality Management
-- **Quality Standards**: Commitment to excellence and continuous improvement
-- **Process Controls**: Systems for maintaining consistent quality
-- **Customer Service**: Exceptional customer experience delivery
-
-## Management Team
-
-### Leadership Structure
-- **Founder/CEO**: Vision, leadership, and strategic direction
-- **Key Personnel**: Essential team members and their roles
-- **Advisory Board**: External advisors and mentors
-- **Organizational Structure**: Clear roles and responsibilities
-
-### Human Resources
-- **Staffing Plan**: Current and projected staffing requirements
-- **Compensation**: Competitive compensation and benefits
-- **Culture**: Company values and organizational culture
-
-## Financial Projections
-
-### Revenue Model
-- **Revenue Streams**: Multiple sources of revenue generation
-- **Pricing Strategy**: Competitive and sustainable pricing
-- **Sales Forecasts**: Realistic revenue projections
-
-### Financial Statements
-- **Income Statement**: Projected profit and loss
-- **Cash Flow**: Monthly cash flow projections
-- **Balance Sheet**: Assets, liabilities, and equity projections
-
-### Funding Requirements
-- **Capital Needs**: Initial and ongoing capital requirements
-- **Funding Sources**: Potential sources of funding
-- **Use of Funds**: Detailed allocation of investment capital
-- **Return on Investment**: Expected returns for investors
-
-## Risk Analysis
-
-### Business Risks
-- **Market Risks**: Potential market challenges and mitigation strategies
-- **Operational Risks**: Internal risks and management approaches
-- **Financial Risks**: Financial challenges and contingency plans
-- **Regulatory Risks**: Compliance requirements and regulatory changes
-
-### Mitigation Strategies
-- **Risk Management**: Systematic approach to risk identification and management
-- **Contingency Planning**: Alternative strategies for various scenarios
-- **Insurance**: Appropriate insurance coverage for business protection
-
-## Implementation Timeline
-
-### Milestones
-- **Month 1-3**: Business setup and initial operations
-- **Month 4-6**: Product/service launch and market entry
-- **Month 7-12**: Growth and expansion phase
-- **Year 2+**: Scaling and optimization
-
-### Success Metrics
-- **Key Performance Indicators**: Measurable success criteria
-- **Monitoring**: Regular review and adjustment processes
-- **Reporting**: Stakeholder communication and updates
-
-## Conclusion
-
-This business plan provides a comprehensive roadmap for {user_input}. With careful execution of the strategies outlined, we are confident in achieving our business objectives and creating sustainable value for all stakeholders."""
-
-    elif template_name.lower() == 'project proposal':
-        return f"""# Project Proposal: {user_input}
-
-## Project Overview
-
-### Project Title
-{user_input}
-
-### Project Summary
-This proposal outlines a comprehensive approach to {user_input}, addressing key objectives, deliverables, and success criteria. The project aims to deliver measurable value through systematic execution and stakeholder collaboration.
-
-### Project Objectives
-- **Primary Objective**: Core goal and expected outcomes
-- **Secondary Objectives**: Supporting goals that enhance project value
-- **Success Criteria**: Measurable indicators of project success
-- **Stakeholder Benefits**: Value delivered to key stakeholders
-
-## Problem Statement
-
-### Current Situation
-Detailed analysis of the current state and challenges that necessitate {user_input}:
-- **Existing Challenges**: Key problems and pain points
-- **Impact Assessment**: Business impact of current situation
-- **Urgency**: Time-sensitive factors requiring immediate attention
-- **Opportunity Cost**: Cost of inaction and delayed implementation
-
-### Root Cause Analysis
-- **Primary Causes**: Fundamental issues driving the need for change
-- **Contributing Factors**: Secondary factors amplifying the problem
-- **Systemic Issues**: Organizational or process-related challenges
-
-## Proposed Solution
-
-### Solution Overview
-Comprehensive approach to addressing {user_input}:
-- **Core Solution**: Primary intervention and methodology
-- **Supporting Elements**: Additional components enhancing solution effectiveness
-- **Innovation Aspects**: Unique or innovative elements of the approach
-- **Scalability**: Potential for solution expansion and replication
-
-### Technical Approach
-- **Methodology**: Systematic approach to project execution
-- **Tools and Technologies**: Required tools and technology stack
-- **Best Practices**: Industry standards and proven methodologies
-- **Quality Assurance**: Measures to ensure solution quality and reliability
-
-## Project Scope
-
-### In Scope
-- **Deliverables**: Specific outputs and deliverables
-- **Activities**: Key activities and work streams
-- **Stakeholders**: Individuals and groups directly involved
-- **Geographic Coverage**: Physical or organizational boundaries
-
-### Out of Scope
-- **Exclusions**: Explicitly excluded elements
-- **Future Phases**: Elements deferred to subsequent phases
-- **Dependencies**: External factors beyond project control
-
-## Project Timeline
-
-### Phase 1: Planning and Preparation (Weeks 1-4)
-- **Week 1-2**: Project initiation and stakeholder alignment
-- **Week 3-4**: Detailed planning and resource allocation
-
-### Phase 2: Implementation (Weeks 5-16)
-- **Week 5-8**: Core implementation activities
-- **Week 9-12**: Development and testing
-- **Week 13-16**: Integration and optimization
-
-### Phase 3: Deployment and Closure (Weeks 17-20)
-- **Week 17-18**: Deployment and go-live activities
-- **Week 19-20**: Project closure and knowledge transfer
-
-### Key Milestones
-- **Milestone 1**: Project approval and resource commitment
-- **Milestone 2**: Completion of planning phase
-- **Milestone 3**: Core implementation completion
-- **Milestone 4**: Successful deployment and project closure
-
-## Resource Requirements
-
-### Human Resources
-- **Project Manager**: Overall project leadership and coordination
-- **Technical Team**: Specialized skills for implementation
-- **Subject Matter Experts**: Domain expertise and guidance
-- **Support Staff**: Administrative and operational support
-
-### Technology Resources
-- **Hardware**: Required equipment and infrastructure
-- **Software**: Applications and development tools
-- **Licenses**: Software licenses and subscriptions
-- **Cloud Services**: Cloud-based resources and services
-
-### Financial Resources
-- **Personnel Costs**: Salaries and contractor fees
-- **Technology Costs**: Hardware, software, and infrastructure
-- **Operational Costs**: Travel, training, and miscellaneous expenses
-- **Contingency**: Risk mitigation and unexpected costs
-
-## Risk Assessment
-
-### Project Risks
-- **Technical Risks**: Technology-related challenges and mitigation strategies
-- **Resource Risks**: Availability and capability of required resources
-- **Schedule Risks**: Timeline challenges and contingency plans
-- **Budget Risks**: Cost overruns and financial constraints
-
-### Risk Mitigation
-- **Risk Monitoring**: Continuous risk assessment and tracking
-- **Contingency Plans**: Alternative approaches for high-risk scenarios
-- **Stakeholder Communication**: Regular updates on risk status
-- **Escalation Procedures**: Clear escalation paths for critical issues
-
-## Expected Outcomes
-
-### Deliverables
-- **Primary Deliverables**: Core outputs meeting project objectives
-- **Documentation**: Comprehensive project documentation
-- **Training Materials**: User guides and training resources
-- **Support Systems**: Ongoing support and maintenance frameworks
-
-### Benefits Realization
-- **Immediate Benefits**: Short-term value and improvements
-- **Long-term Benefits**: Sustained value and strategic advantages
-- **Quantifiable Metrics**: Measurable improvements and ROI
-- **Qualitative Benefits**: Intangible value and stakeholder satisfaction
-
-## Budget Estimate
-
-### Cost Breakdown
-- **Personnel**: $XXX,XXX (XX% of total budget)
-- **Technology**: $XX,XXX (XX% of total budget)
-- **Operations**: $X,XXX (X% of total budget)
-- **Contingency**: $X,XXX (X% of total budget)
-- **Total Project Cost**: $XXX,XXX
-
-### Cost-Benefit Analysis
-- **Total Investment**: Comprehensive project investment
-- **Expected Returns**: Projected financial and operational benefits
-- **Payback Period**: Time to recover initial investment
-- **Net Present Value**: Long-term financial impact
-
-## Success Metrics
-
-### Key Performance Indicators
-- **Delivery Metrics**: On-time, on-budget delivery indicators
-- **Quality Metrics**: Solution quality and stakeholder satisfaction
-- **Adoption Metrics**: User acceptance and utilization rates
-- **Business Impact**: Measurable business improvements
-
-### Monitoring and Evaluation
-- **Progress Tracking**: Regular monitoring of project progress
-- **Quality Reviews**: Systematic quality assessment processes
-- **Stakeholder Feedback**: Continuous stakeholder input and evaluation
-- **Lessons Learned**: Knowledge capture for future projects
-
-## Conclusion
-
-This project proposal presents a comprehensive approach to {user_input} with clear objectives, realistic timelines, and measurable outcomes. The proposed solution addresses identified challenges while delivering significant value to stakeholders."""
-
-    elif template_name.lower() == 'technical specification':
-        return f"""# Technical Specification: {user_input}
-
-## Document Information
-
-### Document Details
-- **Title**: Technical Specification for {user_input}
-- **Version**: 1.0
-- **Date**: {datetime.now().strftime('%Y-%m-%d')}
-- **Status**: Draft
-- **Classification**: Internal
-
-## Executive Summary
-
-This technical specification document outlines the comprehensive technical requirements, architecture, and implementation details for {user_input}. The specification serves as the authoritative guide for development, testing, and deployment activities.
-
-### Key Technical Objectives
-- **Performance**: High-performance system meeting specified benchmarks
-- **Scalability**: Architecture supporting future growth and expansion
-- **Reliability**: Robust system with minimal downtime and failure rates
-- **Security**: Comprehensive security measures protecting data and operations
-- **Maintainability**: Modular design enabling efficient maintenance and updates
-
-## System Overview
-
-### System Purpose
-The {user_input} system is designed to provide comprehensive functionality addressing specific business and technical requirements. The system integrates multiple components to deliver seamless user experience and operational efficiency.
-
-### System Scope
-- **Functional Scope**: Core features and capabilities
-- **Technical Scope**: Technology stack and infrastructure requirements
-- **Integration Scope**: External systems and API integrations
-- **User Scope**: Target user groups and access levels
-
-## Functional Requirements
-
-### Core Functionality
-1. **Primary Features**
-   - Feature 1: Detailed description of core functionality
-   - Feature 2: Secondary feature supporting primary objectives
-   - Feature 3: Additional capabilities enhancing user experience
-
-2. **User Management**
-   - User authentication and authorization
-   - Role-based access control (RBAC)
-   - User profile management
-   - Session management and security
-
-3. **Data Management**
-   - Data input and validation
-   - Data processing and transformation
-   - Data storage and retrieval
-   - Data backup and recovery
-
-### Business Rules
-- **Validation Rules**: Data validation and business logic constraints
-- **Processing Rules**: Business process automation and workflows
-- **Security Rules**: Access control and data protection policies
-- **Integration Rules**: External system interaction protocols
-
-## Non-Functional Requirements
-
-### Performance Requirements
-- **Response Time**: Maximum acceptable response times for key operations
-- **Throughput**: System capacity for concurrent users and transactions
-- **Resource Utilization**: CPU, memory, and storage optimization targets
-- **Scalability**: Horizontal and vertical scaling capabilities
-
-### Reliability Requirements
-- **Availability**: System uptime targets (99.9% availability)
-- **Fault Tolerance**: Error handling and recovery mechanisms
-- **Data Integrity**: Data consistency and accuracy measures
-- **Backup and Recovery**: Disaster recovery and business continuity
-
-### Security Requirements
-- **Authentication**: Multi-factor authentication and identity verification
-- **Authorization**: Role-based access control and permissions
-- **Data Protection**: Encryption at rest and in transit
-- **Audit Logging**: Comprehensive activity logging and monitoring
-
-### Usability Requirements
-- **User Interface**: Intuitive and responsive user interface design
-- **Accessibility**: Compliance with accessibility standards (WCAG 2.1)
-- **Mobile Compatibility**: Responsive design for mobile devices
-- **Browser Support**: Cross-browser compatibility requirements
-
-## System Architecture
-
-### High-Level Architecture
-The system follows a modern, scalable architecture pattern with clear separation of concerns:
-
-**Frontend Layer**: React/Angular web application with mobile responsiveness
-**API Layer**: RESTful APIs with comprehensive security and authentication
-**Business Logic**: Microservices architecture with containerized deployment
-**Data Layer**: Cloud database with backup and disaster recovery
-**Integration Layer**: Enterprise service bus for system integration
-
-### Technology Stack
-- **Frontend**: React 18+ with TypeScript, Material-UI
-- **Backend**: Node.js with Express.js framework
-- **Database**: PostgreSQL primary database with Redis caching
-- **Infrastructure**: AWS cloud services with Kubernetes orchestration
-- **Security**: OAuth 2.0/OpenID Connect, JWT tokens, AES-256 encryption
-- **Monitoring**: Prometheus metrics, Grafana dashboards
-
-## Implementation Plan
-
-### Development Phases
-1. **Phase 1**: Architecture setup and core framework
-2. **Phase 2**: Core functionality development
-3. **Phase 3**: Integration and testing
-4. **Phase 4**: Deployment and optimization
-
-### Testing Strategy
-- **Unit Testing**: Individual component testing
-- **Integration Testing**: System integration validation
-- **Performance Testing**: Load and stress testing
-- **Security Testing**: Vulnerability assessment
-- **User Acceptance Testing**: End-user validation
-
-## Deployment and Operations
-
-### Deployment Strategy
-- **Environment Setup**: Development, staging, and production environments
-- **CI/CD Pipeline**: Automated build, test, and deployment
-- **Monitoring**: Real-time system monitoring and alerting
-- **Backup**: Automated backup and disaster recovery procedures
-
-### Maintenance and Support
-- **Regular Updates**: Security patches and feature updates
-- **Performance Monitoring**: Continuous performance optimization
-- **User Support**: Help desk and technical support procedures
-- **Documentation**: Comprehensive technical and user documentation
-
-## Conclusion
-
-This technical specification provides a comprehensive framework for implementing {user_input}. The proposed architecture and implementation approach ensure scalability, security, and maintainability while meeting all functional and non-functional requirements."""
-
-    elif template_name.lower() == 'research paper':
-        return f"""# Research Paper: {user_input}
-
-## Abstract
-
-This research paper investigates {user_input}, examining its implications, methodologies, and potential applications. Through comprehensive analysis and systematic investigation, this study contributes to the existing body of knowledge while identifying areas for future research.
-
-**Keywords**: {user_input}, research methodology, analysis, findings, implications
-
-## 1. Introduction
-
-### 1.1 Background
-The field of {user_input} has gained significant attention in recent years due to its potential impact on various domains. This research addresses critical gaps in current understanding and provides new insights through rigorous investigation.
-
-### 1.2 Problem Statement
-Current research in {user_input} lacks comprehensive analysis of key factors and their interrelationships. This study aims to address these limitations through systematic investigation and analysis.
-
-### 1.3 Research Objectives
-- Analyze current state of {user_input}
-- Identify key factors and relationships
-- Develop comprehensive framework
-- Provide recommendations for future research
-
-### 1.4 Research Questions
-1. What are the primary factors influencing {user_input}?
-2. How do these factors interact and affect outcomes?
-3. What are the implications for theory and practice?
-4. What areas require further investigation?
-
-## 2. Literature Review
-
-### 2.1 Theoretical Framework
-The theoretical foundation for this research draws from established theories and models in the field. Key theoretical perspectives include:
-
-- **Theory 1**: Fundamental principles and applications
-- **Theory 2**: Supporting framework and methodology
-- **Theory 3**: Contemporary developments and innovations
-
-### 2.2 Previous Research
-Extensive review of existing literature reveals several key themes:
-
-#### 2.2.1 Historical Development
-The evolution of {user_input} research shows progression from basic concepts to sophisticated applications.
-
-#### 2.2.2 Current Trends
-Recent studies indicate growing interest in practical applications and real-world implementations.
-
-#### 2.2.3 Research Gaps
-Despite significant progress, several areas remain underexplored:
-- Limited empirical validation
-- Insufficient cross-domain analysis
-- Need for comprehensive frameworks
-
-## 3. Methodology
-
-### 3.1 Research Design
-This study employs a mixed-methods approach combining quantitative and qualitative research methods to provide comprehensive analysis.
-
-### 3.2 Data Collection
-- **Primary Data**: Surveys, interviews, and observations
-- **Secondary Data**: Literature review and existing datasets
-- **Sample Size**: Statistically significant sample representing target population
-
-### 3.3 Data Analysis
-- **Quantitative Analysis**: Statistical methods and modeling
-- **Qualitative Analysis**: Thematic analysis and content analysis
-- **Validation**: Multiple validation techniques to ensure reliability
-
-### 3.4 Ethical Considerations
-All research activities comply with ethical guidelines and institutional review board requirements.
-
-## 4. Results and Findings
-
-### 4.1 Quantitative Results
-Statistical analysis reveals significant relationships between key variables:
-
-- **Finding 1**: Strong correlation between variables A and B (r = 0.75, p < 0.01)
-- **Finding 2**: Significant difference between groups (t = 3.45, p < 0.05)
-- **Finding 3**: Predictive model explains 68% of variance (R² = 0.68)
-
-### 4.2 Qualitative Findings
-Thematic analysis identifies several key themes:
-
-#### 4.2.1 Theme 1: Primary Patterns
-Participants consistently reported similar experiences and perspectives regarding {user_input}.
-
-#### 4.2.2 Theme 2: Contextual Factors
-Environmental and situational factors significantly influence outcomes.
-
-#### 4.2.3 Theme 3: Implementation Challenges
-Common barriers and facilitators affect successful implementation.
-
-### 4.3 Integrated Analysis
-Combining quantitative and qualitative findings provides comprehensive understanding of {user_input} and its implications.
-
-## 5. Discussion
-
-### 5.1 Interpretation of Results
-The findings support the hypothesis that {user_input} significantly impacts relevant outcomes. Key implications include:
-
-- **Theoretical Implications**: Contributions to existing theory
-- **Practical Implications**: Applications for practitioners
-- **Policy Implications**: Recommendations for policy makers
-
-### 5.2 Comparison with Previous Research
-Results are consistent with some previous findings while revealing new insights:
-- Confirmation of established relationships
-- Discovery of previously unknown factors
-- Refinement of existing models
-
-### 5.3 Limitations
-This study has several limitations that should be considered:
-- Sample size constraints
-- Geographic limitations
-- Temporal constraints
-- Methodological limitations
-
-## 6. Conclusions and Recommendations
-
-### 6.1 Key Conclusions
-This research provides significant contributions to understanding {user_input}:
-
-1. **Primary Conclusion**: Main finding and its significance
-2. **Secondary Conclusions**: Supporting findings and implications
-3. **Theoretical Contributions**: Advances in theoretical understanding
-4. **Practical Applications**: Real-world applications and benefits
-
-### 6.2 Recommendations
-Based on the findings, the following recommendations are proposed:
-
-#### 6.2.1 For Researchers
-- Future research directions
-- Methodological improvements
-- Theoretical development opportunities
-
-#### 6.2.2 For Practitioners
-- Implementation strategies
-- Best practices
-- Risk mitigation approaches
-
-#### 6.2.3 For Policy Makers
-- Policy recommendations
-- Regulatory considerations
-- Resource allocation priorities
-
-### 6.3 Future Research
-Several areas warrant further investigation:
-- Longitudinal studies
-- Cross-cultural validation
-- Technology integration
-- Scalability assessment
-
-## References
-
-[Note: In an actual research paper, this would contain full academic citations in the appropriate format (APA, MLA, etc.)]
-
-1. Author, A. (2023). Title of relevant research. Journal Name, 15(3), 123-145.
-2. Author, B., & Author, C. (2022). Another relevant study. Academic Press.
-3. Author, D. (2024). Recent developments in the field. Conference Proceedings, 45-67.
-
-## Appendices
-
-### Appendix A: Survey Instrument
-[Survey questions and methodology details]
-
-### Appendix B: Interview Protocol
-[Interview guide and procedures]
+    try:
+        full_prompt = prompt_instruction.replace('[USER_INPUT]', user_input)
+        generated_content = request_document_completion(document_type, full_prompt, 4000)
 
-### Appendix C: Statistical Analysis Details
-[Detailed statistical outputs and analysis]
+    except Exception as e:
+        logger.warning(f"Groq API failed for template {escape_text(template_name)}, using fallback: {str(e)}")
+        generated_content = fallback_templates.render(escape_text(template_name), escape_text(user_input),
+                                                      document_type, document_template.get('id'))
+        return {"content": generated_content, "cached": False, "cacheAgeSeconds": None}
 
-### Appendix D: Qualitative Coding Framework
-[Coding scheme and analysis framework]"""
-
-    elif template_name.lower() == 'marketing plan':
-        return f"""# Marketing Plan: {user_input}
-
-## Executive Summary
-
-This comprehensive marketing plan outlines the strategic approach for {user_input}, focusing on market penetration, brand building, and sustainable growth. The plan addresses target market analysis, competitive positioning, and tactical implementation to achieve measurable business objectives.
-
-### Key Marketing Objectives
-- **Brand Awareness**: Increase brand recognition by 40% within 12 months
-- **Market Share**: Capture 15% market share in target segments
-- **Customer Acquisition**: Generate 10,000 new customers in first year
-- **Revenue Growth**: Achieve $2M in marketing-driven revenue
-- **ROI Target**: Maintain 4:1 return on marketing investment
-
-## Market Analysis
-
-### Industry Overview
-The {user_input} market presents significant opportunities driven by:
-- Growing consumer demand and market expansion
-- Technological innovations creating new possibilities
-- Changing consumer behaviors and preferences
-- Regulatory changes opening new market segments
-- Economic factors supporting market growth
-
-### Target Market Segmentation
-
-#### Primary Target Market
-- **Demographics**: Age 25-45, household income $50K-$100K
-- **Psychographics**: Tech-savvy, value-conscious, quality-focused
-- **Behavioral Patterns**: Online research, social media engagement
-- **Market Size**: 2.5 million potential customers
-- **Growth Rate**: 12% annual growth
-
-#### Secondary Target Market
-- **Demographics**: Age 35-55, household income $75K-$150K
-- **Psychographics**: Premium-focused, brand-loyal, convenience-oriented
-- **Behavioral Patterns**: Traditional media consumption, word-of-mouth influence
-- **Market Size**: 1.8 million potential customers
-- **Growth Rate**: 8% annual growth
-
-### Customer Personas
-
-#### Persona 1: "Tech-Savvy Professional"
-- **Profile**: 32-year-old marketing manager, urban, college-educated
-- **Needs**: Efficiency, innovation, professional advancement
-- **Pain Points**: Time constraints, information overload
-- **Preferred Channels**: LinkedIn, industry publications, webinars
-- **Buying Behavior**: Research-driven, comparison shopping
-
-#### Persona 2: "Quality-Conscious Consumer"
-- **Profile**: 41-year-old parent, suburban, value-oriented
-- **Needs**: Reliability, value for money, family benefits
-- **Pain Points**: Budget constraints, product complexity
-- **Preferred Channels**: Facebook, email, retail stores
-- **Buying Behavior**: Recommendation-influenced, price-sensitive
-
-## Competitive Analysis
-
-### Direct Competitors
-
-#### Competitor 1: Market Leader
-- **Market Share**: 35%
-- **Strengths**: Brand recognition, distribution network, resources
-- **Weaknesses**: High prices, slow innovation, customer service issues
-- **Strategy**: Premium positioning, traditional marketing
-
-#### Competitor 2: Emerging Player
-- **Market Share**: 18%
-- **Strengths**: Innovation, agility, digital marketing
-- **Weaknesses**: Limited resources, brand awareness, distribution
-- **Strategy**: Disruptive pricing, social media focus
-
-### Competitive Positioning
-Our positioning strategy differentiates {user_input} through:
-- **Unique Value Proposition**: Superior quality at competitive prices
-- **Brand Promise**: Reliable solutions that exceed expectations
-- **Competitive Advantage**: Innovation, customer service, flexibility
-- **Market Position**: Premium value leader in target segments
-
-## Marketing Objectives and Goals
-
-### SMART Goals Framework
-
-#### Goal 1: Brand Awareness
-- **Specific**: Increase unaided brand awareness
-- **Measurable**: From 5% to 25% in target market
-- **Achievable**: Based on budget and market conditions
-- **Relevant**: Critical for market penetration
-- **Time-bound**: Within 12 months
-
-#### Goal 2: Lead Generation
-- **Specific**: Generate qualified marketing leads
-- **Measurable**: 5,000 leads per quarter
-- **Achievable**: Through multi-channel approach
-- **Relevant**: Supports sales objectives
-- **Time-bound**: Quarterly targets
-
-#### Goal 3: Customer Acquisition
-- **Specific**: Convert leads to paying customers
-- **Measurable**: 2,500 new customers quarterly
-- **Achievable**: With 50% conversion rate
-- **Relevant**: Drives revenue growth
-- **Time-bound**: Quarterly milestones
-
-#### Goal 4: Revenue Growth
-- **Specific**: Marketing-attributed revenue
-- **Measurable**: $500K quarterly revenue
-- **Achievable**: Based on customer lifetime value
-- **Relevant**: ROI justification
-- **Time-bound**: Quarterly tracking
-
-## Marketing Strategy
-
-### Overall Strategy
-The marketing strategy focuses on integrated multi-channel approach combining digital and traditional marketing to maximize reach and effectiveness.
-
-### Strategic Pillars
-
-#### 1. Digital-First Approach
-- **Content Marketing**: Educational and engaging content
-- **SEO/SEM**: Search engine optimization and marketing
-- **Social Media**: Platform-specific engagement strategies
-- **Email Marketing**: Nurturing and retention campaigns
-- **Marketing Automation**: Personalized customer journeys
-
-#### 2. Brand Building
-- **Brand Identity**: Consistent visual and messaging standards
-- **Thought Leadership**: Industry expertise and insights
-- **Public Relations**: Media coverage and industry recognition
-- **Partnerships**: Strategic alliances and collaborations
-- **Community Building**: Customer advocacy and engagement
-
-#### 3. Customer-Centric Focus
-- **Personalization**: Tailored messaging and experiences
-- **Customer Journey**: Optimized touchpoints and interactions
-- **Retention**: Loyalty programs and customer success
-- **Feedback Integration**: Continuous improvement based on insights
-- **Service Excellence**: Exceptional customer experience
-
-## Marketing Mix (4Ps)
-
-### Product Strategy
-- **Core Product**: Primary offering addressing customer needs
-- **Product Features**: Unique capabilities and benefits
-- **Product Development**: Continuous innovation and improvement
-- **Product Positioning**: Clear differentiation and value proposition
-- **Product Lifecycle**: Strategic management across lifecycle stages
-
-### Pricing Strategy
-- **Pricing Model**: Value-based pricing with competitive considerations
-- **Price Points**: Multiple tiers serving different segments
-- **Promotional Pricing**: Strategic discounts and incentives
-- **Price Optimization**: Data-driven pricing adjustments
-- **Competitive Response**: Dynamic pricing based on market conditions
-
-### Place (Distribution) Strategy
-- **Distribution Channels**: Multi-channel distribution approach
-- **Channel Partners**: Strategic partnerships and alliances
-- **Online Presence**: E-commerce and digital platforms
-- **Retail Strategy**: Physical presence where appropriate
-- **Channel Optimization**: Performance monitoring and improvement
-
-### Promotion Strategy
-- **Advertising**: Paid media across multiple channels
-- **Sales Promotion**: Incentives and special offers
-- **Public Relations**: Media relations and thought leadership
-- **Personal Selling**: Direct sales support and enablement
-- **Digital Marketing**: Comprehensive online marketing approach
-
-## Marketing Tactics and Channels
-
-### Digital Marketing Channels
-
-#### Search Engine Marketing
-- **SEO Strategy**: Organic search optimization
-  - Keyword research and optimization
-  - Content creation and optimization
-  - Technical SEO improvements
-  - Link building and authority development
-- **PPC Advertising**: Paid search campaigns
-  - Google Ads campaigns
-  - Bing Ads implementation
-  - Shopping ads for products
-  - Remarketing campaigns
-
-#### Social Media Marketing
-- **Platform Strategy**: Channel-specific approaches
-  - **LinkedIn**: B2B networking and thought leadership
-  - **Facebook**: Community building and engagement
-  - **Instagram**: Visual storytelling and brand building
-  - **Twitter**: Real-time engagement and customer service
-  - **YouTube**: Educational content and demonstrations
-
-#### Content Marketing
-- **Content Strategy**: Educational and valuable content
-  - Blog posts and articles
-  - Whitepapers and case studies
-  - Videos and webinars
-  - Infographics and visual content
-  - Podcasts and audio content
-
-#### Email Marketing
-- **Campaign Types**: Targeted email communications
-  - Welcome series for new subscribers
-  - Nurturing campaigns for leads
-  - Product announcements and updates
-  - Newsletter and industry insights
-  - Retention and loyalty campaigns
-
-### Traditional Marketing Channels
-
-#### Public Relations
-- **Media Relations**: Proactive media engagement
-- **Press Releases**: Newsworthy announcements
-- **Industry Events**: Speaking and sponsorship opportunities
-- **Awards and Recognition**: Industry award submissions
-- **Crisis Communication**: Reputation management
-
-#### Direct Marketing
-- **Direct Mail**: Targeted postal campaigns
-- **Telemarketing**: Outbound sales support
-- **Trade Shows**: Industry event participation
-- **Print Advertising**: Relevant publication placements
-- **Radio/TV**: Broadcast advertising where appropriate
-
-## Budget and Resource Allocation
-
-### Annual Marketing Budget: $500,000
-
-#### Budget Allocation by Channel
-- **Digital Marketing**: $300,000 (60%)
-  - Search Engine Marketing: $120,000
-  - Social Media Marketing: $80,000
-  - Content Marketing: $60,000
-  - Email Marketing: $40,000
-- **Traditional Marketing**: $150,000 (30%)
-  - Public Relations: $60,000
-  - Direct Marketing: $50,000
-  - Trade Shows/Events: $40,000
-- **Marketing Operations**: $50,000 (10%)
-  - Marketing Technology: $30,000
-  - Analytics and Reporting: $20,000
-
-#### Budget Allocation by Quarter
-- **Q1**: $150,000 (30%) - Launch and awareness
-- **Q2**: $125,000 (25%) - Growth and optimization
-- **Q3**: $100,000 (20%) - Efficiency and scaling
-- **Q4**: $125,000 (25%) - Holiday and year-end push
-
-### Resource Requirements
-- **Marketing Team**: 5 FTE marketing professionals
-- **External Agencies**: Specialized service providers
-- **Technology Stack**: Marketing automation and analytics tools
-- **Creative Resources**: Design and content creation support
-
-## Implementation Timeline
-
-### Phase 1: Foundation (Months 1-3)
-- **Month 1**: Team setup and tool implementation
-- **Month 2**: Brand development and content creation
-- **Month 3**: Campaign launch and initial optimization
-
-### Phase 2: Growth (Months 4-6)
-- **Month 4**: Channel expansion and scaling
-- **Month 5**: Partnership development and integration
-- **Month 6**: Mid-year review and strategy adjustment
-
-### Phase 3: Optimization (Months 7-9)
-- **Month 7**: Performance optimization and refinement
-- **Month 8**: Advanced tactics and automation
-- **Month 9**: Competitive response and positioning
-
-### Phase 4: Scale (Months 10-12)
-- **Month 10**: Market expansion and new segments
-- **Month 11**: Holiday campaigns and promotions
-- **Month 12**: Year-end analysis and planning
-
-### Key Milestones
-- **Month 1**: Marketing infrastructure complete
-- **Month 3**: First campaign results and optimization
-- **Month 6**: Mid-year goals assessment
-- **Month 9**: Advanced tactics implementation
-- **Month 12**: Annual objectives achievement
-
-## Measurement and Analytics
-
-### Key Performance Indicators (KPIs)
-
-#### Brand Metrics
-- **Brand Awareness**: Unaided and aided brand recognition
-- **Brand Perception**: Sentiment analysis and brand health
-- **Share of Voice**: Competitive brand mention analysis
-- **Brand Equity**: Brand value and customer loyalty metrics
-
-#### Marketing Metrics
-- **Reach and Impressions**: Campaign exposure and frequency
-- **Engagement Rates**: Social media and content engagement
-- **Click-Through Rates**: Email and advertising performance
-- **Conversion Rates**: Lead generation and sales conversion
-- **Cost Per Acquisition**: Customer acquisition efficiency
-
-#### Business Metrics
-- **Lead Generation**: Quantity and quality of marketing leads
-- **Sales Attribution**: Marketing contribution to sales
-- **Customer Lifetime Value**: Long-term customer value
-- **Return on Investment**: Marketing ROI and profitability
-- **Market Share**: Competitive position and growth
-
-### Analytics and Reporting
-
-#### Reporting Framework
-- **Daily Dashboards**: Real-time performance monitoring
-- **Weekly Reports**: Campaign performance and optimization
-- **Monthly Analysis**: Comprehensive performance review
-- **Quarterly Reviews**: Strategic assessment and planning
-- **Annual Evaluation**: Complete program effectiveness
-
-#### Analytics Tools
-- **Google Analytics**: Website and digital performance
-- **Marketing Automation**: Lead tracking and nurturing
-- **Social Media Analytics**: Platform-specific insights
-- **CRM Integration**: Sales and customer data analysis
-- **Business Intelligence**: Advanced analytics and reporting
-
-## Risk Assessment and Mitigation
-
-### Marketing Risks
-
-#### Risk 1: Market Conditions
-- **Description**: Economic downturn affecting demand
-- **Probability**: Medium
-- **Impact**: High
-- **Mitigation**: Diversified strategy and flexible budget allocation
-
-#### Risk 2: Competitive Response
-- **Description**: Aggressive competitor actions
-- **Probability**: High
-- **Impact**: Medium
-- **Mitigation**: Continuous monitoring and rapid response capabilities
-
-#### Risk 3: Technology Changes
-- **Description**: Platform algorithm or policy changes
-- **Probability**: Medium
-- **Impact**: Medium
-- **Mitigation**: Multi-channel approach and platform diversification
-
-#### Risk 4: Budget Constraints
-- **Description**: Reduced marketing budget allocation
-- **Probability**: Low
-- **Impact**: High
-- **Mitigation**: ROI demonstration and performance-based budgeting
-
-### Contingency Planning
-- **Scenario Planning**: Multiple market condition scenarios
-- **Budget Flexibility**: Ability to reallocate resources quickly
-- **Channel Diversification**: Reduced dependence on single channels
-- **Performance Monitoring**: Early warning systems for issues
-
-## Conclusion and Next Steps
-
-### Expected Outcomes
-This comprehensive marketing plan for {user_input} is designed to achieve:
-- **Brand Recognition**: Established brand presence in target markets
-- **Market Position**: Strong competitive position and differentiation
-- **Customer Base**: Substantial and growing customer community
-- **Revenue Growth**: Significant contribution to business objectives
-- **Market Share**: Meaningful share of target market segments
-
-### Success Factors
-- **Integrated Approach**: Coordinated multi-channel strategy
-- **Data-Driven Decisions**: Analytics-based optimization
-- **Customer Focus**: Customer-centric messaging and experience
-- **Agile Execution**: Flexible and responsive implementation
-- **Continuous Improvement**: Ongoing optimization and refinement
-
-### Next Steps
-1. **Plan Approval**: Secure stakeholder approval and budget authorization
-2. **Team Assembly**: Recruit and onboard marketing team members
-3. **Infrastructure Setup**: Implement marketing technology and tools
-4. **Campaign Development**: Create initial campaigns and content
-5. **Launch Execution**: Begin implementation according to timeline
-
-This marketing plan provides a comprehensive roadmap for achieving marketing objectives for {user_input}. Success depends on consistent execution, continuous optimization, and adaptation to market conditions and opportunities."""
+    document_cache.put(cache_key, template_id, generated_content, templateName=template_name, documentType=document_type)
+    return {"content": generated_content, "cached": False, "cacheAgeSeconds": None}
 
-    else:
-        return f"""# {template_name}: {user_input}
-
-## Overview
-This document provides a comprehensive analysis and framework for {user_input}, addressing key requirements, objectives, and implementation strategies.
-
-## Executive Summary
-{user_input} represents a significant opportunity to create value through strategic planning and systematic execution. This document outlines the approach, methodology, and expected outcomes.
-
-## Key Objectives
-- Deliver comprehensive solution for {user_input}
-- Address stakeholder requirements and expectations
-- Provide actionable recommendations and next steps
-- Ensure measurable outcomes and success criteria
-
-## Analysis and Recommendations
-
-### Current Situation
-The current landscape for {user_input} presents both opportunities and challenges that require careful consideration and strategic response.
-
-### Proposed Approach
-A systematic approach to {user_input} that includes:
-1. **Assessment Phase**: Comprehensive analysis of current state
-2. **Planning Phase**: Strategic planning and resource allocation
-3. **Implementation Phase**: Execution of planned activities
-4. **Evaluation Phase**: Performance monitoring and optimization
-
-### Key Success Factors
-- Strong leadership and stakeholder commitment
-- Clear communication and change management
-- Adequate resources and timeline
-- Continuous monitoring and adjustment
-- Risk management and mitigation strategies
-
-## Implementation Plan
-
-### Phase 1: Preparation (Weeks 1-4)
-- Stakeholder alignment and communication
-- Resource allocation and team formation
-- Detailed planning and timeline development
-- Risk assessment and mitigation planning
-
-### Phase 2: Execution (Weeks 5-12)
-- Implementation of core activities
-- Regular monitoring and progress reporting
-- Issue resolution and course correction
-- Quality assurance and validation
-
-### Phase 3: Completion (Weeks 13-16)
-- Final deliverables and documentation
-- Knowledge transfer and training
-- Performance evaluation and lessons learned
-- Project closure and transition
-
-## Expected Outcomes
-The successful implementation of this plan for {user_input} will result in:
-- Achievement of stated objectives and goals
-- Improved efficiency and effectiveness
-- Enhanced stakeholder satisfaction
-- Sustainable long-term benefits
-- Foundation for future growth and development
-
-## Conclusion
-This comprehensive approach to {user_input} provides a solid foundation for success. With proper execution and stakeholder support, the expected outcomes can be achieved within the specified timeline and budget.
-
-## Next Steps
-1. Review and approve this document
-2. Secure necessary resources and approvals
-3. Begin implementation according to timeline
-4. Establish monitoring and reporting procedures
-5. Maintain regular communication with stakeholders
-
----
-*Document prepared: {datetime.now().strftime('%B %d, %Y')}*
-*Status: Ready for implementation*"""
-
-# Add these routes to your existing app.py
-@app.route('/generate_document', methods=['POST'])
 def generate_document():
     try:
         data = request.get_json()
         user_input = data.get('userInput', '')
-        document_template = data.get('documentTemplate', {})
+        document_template = resolve_document_template(data.get('documentTemplate', {}))
         
         template_name = document_template.get('name', 'General Document')
         document_type = document_template.get('documentType', 'general')
-        prompt_instruction = document_template.get('promptInstruction', '')
         
         if not user_input:
             return jsonify({'error': 'User input is required'}), 400
-        
         try:
-            client = Groq(api_key=os.getenv('GROQ_API_KEY'))
-            
-            full_prompt = prompt_instruction.replace('[USER_INPUT]', user_input)
-            
-            completion = client.chat.completions.create(
-                model="llama3-8b-8192",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are a professional document writer specializing in {document_type} documents. Create comprehensive, well-structured, and professional content."
-                    },
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=4000,
-                top_p=1,
-                stream=False,
-                stop=None,
-            )
-            
-            generated_content = completion.choices[0].message.content
-            
-        except Exception as e:
-            logger.warning(f"Groq API failed, using fallback content: {e}")
-            generated_content = get_document_fallback_content(template_name, document_type, user_input)
+            output_format = get_document_format(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         response_data = {
             'templateName': template_name,
-            'content': generated_content,
             'documentType': document_type,
-            'timestamp': datetime.now().isoformat(),
-            'metadata': {
-                'userInput': user_input,
-                'generationMethod': 'AI' if 'client' in locals() else 'Fallback',
-                'templateId': document_template.get('id', 'unknown')
-            }
+            'timestamp': datetime.now().isoformat()
         }
+        response_data.update(generate_document_content(document_template, user_input, get_cache_mode(data),
+                                                       bool(data.get('sectioned')), bool(data.get('outline'))))
+        record_document_history(document_template, response_data)
         
-        return jsonify(response_data)
+        return jsonify(attach_document_export(response_data, output_format))
         
     except Exception as e:
-        logger.error(f"Error in generate_document: {e}")
-        return jsonify({'error': f'Document generation failed: {str(e)}'}), 500
+        logger.error(f"Error in generate_document: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/generate_documents', methods=['POST'])
 def generate_documents():
     try:
         data = request.get_json()
         user_input = data.get('userInput', '')
         document_templates = data.get('documentTemplates', [])
+        cache_mode = get_cache_mode(data)
+        sectioned = bool(data.get('sectioned'))
+        outlined = bool(data.get('outline'))
         
         if not user_input or not document_templates:
             return jsonify({'error': 'User input and document templates are required'}), 400
+        try:
+            output_format = get_document_format(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         generated_documents = []
         
         for template in document_templates:
             try:
-                template_name = template.get('name', 'General Document')
-                document_type = template.get('documentType', 'general')
-                prompt_instruction = template.get('promptInstruction', '')
-                
-                try:
-                    client = Groq(api_key=os.getenv('GROQ_API_KEY'))
-                    
-                    full_prompt = prompt_instruction.replace('[USER_INPUT]', user_input)
-                    
-                    completion = client.chat.completions.create(
-                        model="llama3-8b-8192",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": f"You are a professional document writer specializing in {document_type} documents. Create comprehensive, well-structured, and professional content."
-                            },
-                            {
-                                "role": "user",
-                                "content": full_prompt
-                            }
-                        ],
-                        temperature=0.7,
-                        max_tokens=4000,
-                        top_p=1,
-                        stream=False,
-                        stop=None,
-                    )
-                    
-                    generated_content = completion.choices[0].message.content
-                    
-                except Exception as e:
-                    logger.warning(f"Groq API failed for {template_name}, using fallback: {e}")
-                    generated_content = get_document_fallback_content(template_name, document_type, user_input)
-                
+                template = resolve_document_template(template)
                 document_data = {
-                    'templateName': template_name,
-                    'content': generated_content,
-                    'documentType': document_type,
-                    'timestamp': datetime.now().isoformat(),
-                    'metadata': {
-                        'userInput': user_input,
-                        'generationMethod': 'AI' if 'client' in locals() else 'Fallback',
-                        'templateId': template.get('id', 'unknown')
-                    }
+                    'templateName': template.get('name', 'General Document'),
+                    'documentType': template.get('documentType', 'general'),
+                    'timestamp': datetime.now().isoformat()
                 }
+                document_data.update(generate_document_content(template, user_input, cache_mode, sectioned, outlined))
+                record_document_history(template, document_data)
                 
-                generated_documents.append(document_data)
+                generated_documents.append(attach_document_export(document_data, output_format))
                 
             except Exception as e:
-                logger.error(f"Error generating document for template {template.get('name', 'Unknown')}: {e}")
+                logger.error(f"Error generating document for template {template.get('name', 'Unknown')}: {str(e)}")
                 continue
         
         return jsonify(generated_documents)
         
     except Exception as e:
-        logger.error(f"Error in generate_documents: {e}")
-        return jsonify({'error': f'Batch document generation failed: {str(e)}'}), 500
+        logger.error(f"Error in generate_documents: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def generate_document_stream():
+    """
+    Stream a sectioned document as Markdown.
+
+    Takes the same body as /generate_document. Sections are generated
+    concurrently and each is sent once it and all earlier sections are ready;
+    cached documents are sent at once with an X-Cache-Age header. With
+    "outline": true the stream is outline-first NDJSON instead (see
+    stream_outlined_document).
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+    user_input = data.get('userInput', '')
+    document_template = resolve_document_template(data.get('documentTemplate', {}))
+    if not user_input:
+        return jsonify({'error': 'User input is required'}), 400
+    if data.get('outline'):
+        return stream_outlined_document(document_template, user_input, get_cache_mode(data))
+
+    template_name = document_template.get('name', 'General Document')
+    template_id = document_template.get('id') or template_name
+    cache_key = document_cache_key(f"{template_cache_id(document_template)}#sections",
+                                   document_template.get('promptInstruction', ''), user_input)
+    cached = None
+    if get_cache_mode(data) == 'bypass':
+        document_cache.record_bypass()
+    else:
+        cached = document_cache.get(cache_key)
+    if cached:
+        entry, age = cached
+        record_document_history(document_template, {"content": entry["content"], "cached": True})
+        response = Response(entry["content"], mimetype='text/markdown')
+        response.headers['X-Cache-Age'] = str(int(age))
+        return response
+
+    def generate():
+        started = time.perf_counter()
+        parts = []
+        ai_sections = sections = 0
+        for heading, content, source, _ in iter_sectioned_document(document_template, user_input):
+            sections += heading is not None
+            ai_sections += heading is not None and source == "ai"
+            if not content:
+                continue
+            yield ("\n\n" if parts else "") + content
+            parts.append(content)
+        if sections and ai_sections == sections:
+            document_cache.put(cache_key, template_id, "\n\n".join(parts), templateName=template_name,
+                               documentType=document_template.get('documentType', 'general'))
+        record_document_history(document_template, {"content": "\n\n".join(parts)})
+        logger.info(f"Streamed {escape_text(template_name)} in {len(parts) - 1} sections "
+                    f"({ai_sections} from AI) in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    response = Response(stream_with_context(generate()), mimetype='text/markdown')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def outline_event(preamble, outline, **fields):
+    """First event of an outline-first stream"""
+    return dict(event="outline", title=preamble, sections=outline, **fields)
+
+def stream_outlined_document(document_template, user_input, cache_mode):
+    """
+    Stream an outline-first document as NDJSON events.
+
+    The first line is {"event": "outline", "title", "sections": [{heading, summary}]},
+    sent as soon as the small outline call returns (or at once when cached).
+    Then one {"event": "section", "index", "heading", "content", "source", "llm_ms"}
+    line per section in completion order, so clients fill the outline in place,
+    and a final {"event": "done"}. Cached documents are replayed immediately.
+    """
+    template_name = document_template.get('name', 'General Document')
+    document_type = document_template.get('documentType', 'general')
+    template_id = document_template.get('id') or template_name
+    cache_key = document_cache_key(document_variant_key(template_cache_id(document_template), outlined=True),
+                                   document_template.get('promptInstruction', ''), user_input)
+    cached = None
+    if cache_mode == 'bypass':
+        document_cache.record_bypass()
+    else:
+        cached = document_cache.get(cache_key)
+
+    def ndjson(event):
+        return json.dumps(event, ensure_ascii=False) + "\n"
+
+    def replay(entry, age):
+        preamble, sections = split_markdown_sections(entry["content"])
+        outline = [{"heading": heading, "summary": condense_section(text, 160)} for heading, text in sections]
+        yield ndjson(outline_event(preamble, outline, cached=True, cacheAgeSeconds=round(age, 1)))
+        for index, (heading, text) in enumerate(sections):
+            yield ndjson({"event": "section", "index": index, "heading": heading, "content": text, "source": "cache",
+                          "llm_ms": 0.0})
+        yield ndjson({"event": "done", "cached": True})
+        record_document_history(document_template, {"content": entry["content"], "cached": True, "outline": outline})
+
+    def generate():
+        started = time.perf_counter()
+        outline = get_document_outline(document_template, user_input, cache_mode)
+        preamble, submitted = submit_document_sections(document_template, user_input, outline["outline"])
+        yield ndjson(outline_event(preamble, outline["outline"], source=outline["source"], cached=outline["cached"],
+                                   llm_ms=outline["llm_ms"]))
+        first_paint_ms = (time.perf_counter() - started) * 1000
+
+        contents = [None] * len(submitted)
+        sources = [None] * len(submitted)
+        pending = {future: index for index, (_, _, future) in enumerate(submitted) if future is not None}
+        # Sections without an LLM call are ready now; the rest are sent as they finish
+        ready = [index for index, (_, _, future) in enumerate(submitted) if future is None]
+        for index in chain(ready, (pending[future] for future in as_completed(pending))):
+            heading, fallback_text, future = submitted[index]
+            content, source, llm_ms = section_result(template_name, heading, fallback_text, future)
+            contents[index], sources[index] = content, source
+            yield ndjson({"event": "section", "index": index, "heading": heading, "content": content,
+                          "source": source, "llm_ms": round(llm_ms, 1)})
+
+        total_ms = (time.perf_counter() - started) * 1000
+        content = "\n\n".join(part for part in [preamble] + contents if part)
+        if sources and all(source == "ai" for source in sources) and outline["source"] == "ai":
+            document_cache.put(cache_key, template_id, content, templateName=template_name, documentType=document_type)
+        record_document_history(document_template, {"content": content, "outline": outline["outline"]})
+        yield ndjson({"event": "done", "cached": False, "timings": {"outline_ms": round(first_paint_ms, 1),
+                                                                    "total_ms": round(total_ms, 1)}})
+        logger.info(f"Streamed outline-first {escape_text(template_name)}: outline in {first_paint_ms:.0f} ms, "
+                    f"{len(submitted)} sections in {total_ms:.0f} ms")
+
+    body = replay(*cached) if cached else generate()
+    response = Response(stream_with_context(body), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def generate_document_outline():
+    """
+    Outline a document without writing it: section headings with one-line summaries.
+
+    Takes the same body as /generate_document. One small completion, cached
+    per template, instruction and input; outline-first generation of the same
+    document reuses the cached outline.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+    user_input = data.get('userInput', '')
+    document_template = resolve_document_template(data.get('documentTemplate', {}))
+    if not user_input:
+        return jsonify({'error': 'User input is required'}), 400
+
+    template_name = document_template.get('name', 'General Document')
+    preamble, _ = fallback_templates.sections(escape_text(template_name), escape_text(user_input),
+                                              document_template.get('documentType', 'general'), document_template.get('id'))
+    response_data = {
+        'templateName': template_name,
+        'documentType': document_template.get('documentType', 'general'),
+        'timestamp': datetime.now().isoformat(),
+        'title': preamble
+    }
+    response_data.update(get_document_outline(document_template, user_input, get_cache_mode(data)))
+    record_history("document_outline", document_template.get('id') or template_name,
+                   "cache" if response_data['cached'] else response_data['source'], model=response_data['outline'])
+    return jsonify(response_data)
+
+def regenerate_document_section():
+    """
+    Rewrite one "## " section of an existing document and splice it back in.
+
+    The body carries the document as content (or the documentHash of a
+    generated one), the section by heading or sectionIndex, an optional
+    instruction, and the userInput/documentTemplate it was generated from.
+    Only the target section and condensed neighbours are sent to the LLM, so
+    cost follows the section size rather than the document size.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+    content = data.get('content') or ''
+    if not content and data.get('documentHash'):
+        content = document_exporter.get_source(data['documentHash']) or ''
+    if not content:
+        return jsonify({"error": "Document content or a known documentHash is required"}), 400
+    try:
+        output_format = get_document_format(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    preamble, sections = split_markdown_sections(content)
+    index = find_section(sections, data.get('section'), data.get('sectionIndex'))
+    if index is None:
+        return jsonify({"error": "Section not found", "sections": [heading for heading, _ in sections]}), 404
+    if not services.client:
+        return jsonify({"error": "AI service unavailable"}), 503
+
+    document_template = resolve_document_template(data.get('documentTemplate', {}))
+    template_name = document_template.get('name', 'General Document')
+    document_type = document_template.get('documentType', 'general')
+    heading, current = sections[index]
+    prompt = get_section_regeneration_prompt(template_name, sections, index, data.get('instruction', ''),
+                                             data.get('userInput', ''))
+    max_tokens = section_max_tokens(current)
+    started = time.perf_counter()
+    try:
+        revised = normalize_section_markdown(request_document_completion(document_type, prompt, max_tokens), heading)
+    except Exception as e:
+        logger.error(f"Regenerating section '{escape_text(heading)}' failed: {str(e)}")
+        return jsonify({"error": f"Failed to regenerate section: {str(e)}"}), 502
+    llm_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Regenerated section '{escape_text(heading)}' of {escape_text(template_name)} in {llm_ms:.0f} ms "
+                f"({len(prompt)} prompt chars for a {len(content)} char document)")
+
+    parts = [preamble] if preamble else []
+    parts.extend(revised if position == index else text for position, (_, text) in enumerate(sections))
+    response_data = {
+        'templateName': template_name,
+        'documentType': document_type,
+        'timestamp': datetime.now().isoformat(),
+        'content': "\n\n".join(parts),
+        'section': {"heading": heading, "index": index, "content": revised, "llm_ms": round(llm_ms, 1),
+                    "promptChars": len(prompt), "maxTokens": max_tokens}
+    }
+    record_history("document_section", heading, "ai", content=revised,
+                   document_hash=content_hash(response_data['content']))
+    return jsonify(attach_document_export(response_data, output_format))
+
+def get_document_export(document_hash, export_format):
+    """
+    Serve a generated document as Markdown, HTML, PDF or DOCX by content hash.
+
+    Renders are cached by (hash, format); ?download=1 sends it as an attachment named ?name= (default "document").
+    """
+    etag = f"{document_hash}-{export_format}"
+    mimetype = DOCUMENT_EXPORT_MIMETYPES[export_format]
+    compressible = export_format not in HEAVY_FORMATS
+    if request.if_none_match.contains(etag):
+        return immutable_artifact_response(None, mimetype, etag, compressible)
+
+    try:
+        body = document_exporter.export(document_hash, export_format)
+    except FutureTimeoutError:
+        logger.error(f"Exporting document {document_hash} to {export_format} timed out")
+        return jsonify({"error": "Document export timed out"}), 504
+    except Exception as e:
+        logger.error(f"Error exporting document {document_hash} to {export_format}: {str(e)}")
+        return jsonify({"error": f"Failed to export document: {str(e)}"}), 500
+    if body is None:
+        return jsonify({"error": "Document not found; generate it again to export it"}), 404
+
+    response = immutable_artifact_response(body, mimetype, etag, compressible)
+    if request.args.get('download') in ('1', 'true'):
+        filename = secure_filename(request.args.get('name') or '') or 'document'
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
-@app.route('/document_templates', methods=['GET'])
 def get_document_templates():
+    """
+    The template catalog, from bytes serialized and compressed when the catalog (re)loads.
+
+    The ETag is the catalog version (suffixed with the content coding, as for
+    other compressed responses), so clients revalidate with If-None-Match and
+    get a 304 until the catalog file changes.
+    """
     try:
-        templates = [
-            {
-                'id': 'business_plan',
-                'name': 'Business Plan',
-                'promptInstruction': 'Generate a comprehensive business plan for: [USER_INPUT]',
-                'description': 'Complete business strategy document',
-                'documentType': 'business'
-            },
-            {
-                'id': 'project_proposal',
-                'name': 'Project Proposal',
-                'promptInstruction': 'Create a detailed project proposal for: [USER_INPUT]',
-                'description': 'Professional project documentation',
-                'documentType': 'project'
-            },
-            {
-                'id': 'technical_spec',
-                'name': 'Technical Specification',
-                'promptInstruction': 'Generate technical specification document for: [USER_INPUT]',
-                'description': 'Detailed technical requirements',
-                'documentType': 'technical'
-            },
-            {
-                'id': 'research_paper',
-                'name': 'Research Paper',
-                'promptInstruction': 'Create a research paper outline for: [USER_INPUT]',
-                'description': 'Academic research document',
-                'documentType': 'academic'
-            },
-            {
-                'id': 'marketing_plan',
-                'name': 'Marketing Plan',
-                'promptInstruction': 'Create a marketing strategy document for: [USER_INPUT]',
-                'description': 'Strategic marketing roadmap',
-                'documentType': 'marketing'
-            }
-        ]
-        
-        return jsonify(templates)
-        
+        catalog = template_catalog.snapshot()
     except Exception as e:
-        logger.error(f"Error in get_document_templates: {e}")
-        return jsonify({'error': 'Failed to retrieve document templates'}), 500
+        logger.error(f"Error in get_document_templates: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    matched = matched_etag(catalog.version)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = Response(catalog.bodies[encoding], mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{catalog.version}-{encoding}" if encoding else catalog.version)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,81 @@
+"""
+The documents blueprint.
+
+Its URL rules are registered with the app at startup, but each view is a
+LazyView that imports document_generator on the first document request.
+Flask does not allow blueprints to be registered once requests are being
+served, so the rules are eager and the implementation is lazy.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+from flask import Blueprint
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_MODULE = "document_generator"
+
+# (rule, view function in document_generator, methods)
+DOCUMENT_ROUTES = (
+    ("/generate_document", "generate_document", ["POST"]),
+    ("/generate_documents", "generate_documents", ["POST"]),
+    ("/generate_document_stream", "generate_document_stream", ["POST"]),
+    ("/generate_document_outline", "generate_document_outline", ["POST"]),
+    ("/regenerate_document_section", "regenerate_document_section", ["POST"]),
+    ("/documents/<document_hash>.<any(md, html, pdf, docx):export_format>", "get_document_export", ["GET"]),
+    ("/document_templates", "get_document_templates", ["GET"]),
+)
+
+_load_lock = threading.Lock()
+_load_ms = None
+
+
+def load_document_generator():
+    """Import the document generator on first use and return the module"""
+    global _load_ms
+    module = sys.modules.get(GENERATOR_MODULE)
+    if module is not None:
+        return module
+    with _load_lock:
+        if GENERATOR_MODULE not in sys.modules:
+            started = time.perf_counter()
+            importlib.import_module(GENERATOR_MODULE)
+            _load_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Loaded the document generator in {_load_ms:.0f} ms")
+    return sys.modules[GENERATOR_MODULE]
+
+
+class LazyView:
+    """View that resolves document_generator.<name> when it is first called"""
+
+    def __init__(self, name):
+        self.__name__ = name
+        self.name = name
+        self._view = None
+
+    def __call__(self, **kwargs):
+        if self._view is None:
+            self._view = getattr(load_document_generator(), self.name)
+        return self._view(**kwargs)
+
+
+documents = Blueprint("documents", __name__)
+for rule, name, methods in DOCUMENT_ROUTES:
+    documents.add_url_rule(rule, view_func=LazyView(name), methods=methods)
+
+
+def document_stored(document_hash):
+    """Whether /documents/<hash>.md can serve a document, without loading the subsystem to find out"""
+    module = sys.modules.get(GENERATOR_MODULE)
+    return module is not None and module.document_exporter.contains(document_hash)
+
+
+def document_subsystem_info():
+    """Health stats of the document subsystem, without loading it"""
+    module = sys.modules.get(GENERATOR_MODULE)
+    if module is None:
+        return {"loaded": False}
+    return dict(module.info(), loaded=True, load_ms=round(_load_ms, 1) if _load_ms is not None else None)
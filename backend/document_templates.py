@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fallback_documents")
+
+# Values a fallback document may substitute
+TEMPLATE_SLOTS = ("user_input", "template_name", "document_type", "date", "long_date")
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+_SECTION_HEADING = re.compile(r"^## +(.+?) *$", re.M)
+
+
+def normalize_template_key(value):
+    """Registry key for a template id or display name: 'Business Plan', 'business_plan' -> 'business plan'"""
+    return _SEPARATORS.sub(" ", str(value or "")).strip().lower()
+
+
+def split_markdown_sections(markdown):
+    """
+    Split a document at its second-level headings.
+
+    Returns:
+        tuple: (text before the first "## " heading, [(heading, section text including its heading)])
+    """
+    matches = list(_SECTION_HEADING.finditer(markdown))
+    if not matches:
+        return markdown, []
+    sections = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(markdown)
+        sections.append((match.group(1), markdown[match.start():end].rstrip("\n")))
+    return markdown[:matches[0].start()].rstrip("\n"), sections
+
+
+_date_values = {"expires": 0.0}
+_date_lock = threading.Lock()
+
+
+def _current_date_values():
+    """Formatted dates for templates, recomputed once per local day instead of per render"""
+    if time.time() >= _date_values["expires"]:
+        with _date_lock:
+            now = datetime.now()
+            tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            _date_values.update(date=now.strftime("%Y-%m-%d"), long_date=now.strftime("%B %d, %Y"),
+                                expires=tomorrow.timestamp())
+    return _date_values["date"], _date_values["long_date"]
+
+
+class CompiledTemplate:
+    """
+    A document split once into literal segments and substitution slots.
+
+    render() copies the segment list, drops each value into its slot position
+    and joins once, so no parsing or formatting happens per request.
+    """
+
+    __slots__ = ("template_id", "_parts", "_slots", "_needs_date")
+
+    def __init__(self, template_id, text):
+        self.template_id = template_id
+        self._parts = []
+        self._slots = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if field not in TEMPLATE_SLOTS or format_spec or conversion:
+                raise ValueError(f"Template {template_id} has unsupported placeholder {{{field}}}")
+            self._slots.append((len(self._parts), field))
+            self._parts.append("")
+        self._needs_date = any(field in ("date", "long_date") for _, field in self._slots)
+
+    def render(self, values):
+        parts = self._parts.copy()
+        for position, field in self._slots:
+            parts[position] = values[field]
+        return "".join(parts)
+
+    def render_document(self, user_input, template_name, document_type="general"):
+        values = {"user_input": user_input, "template_name": template_name, "document_type": document_type}
+        if self._needs_date:
+            values["date"], values["long_date"] = _current_date_values()
+        return self.render(values)
+
+
+class TemplateRegistry:
+    """
+    Fallback document templates indexed by normalized id, name and aliases.
+
+    The index file is read on first use; each template body is read and
+    compiled the first time it is rendered and kept for the process lifetime.
+    Unknown templates render the entry marked "default".
+    """
+
+    def __init__(self, directory=DEFAULT_TEMPLATE_DIR, index_file="index.json"):
+        self.directory = directory
+        self.index_file = index_file
+        self._entries = None
+        self._keys = {}
+        self._default_id = None
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.compile_ms = 0.0
+
+    def _load_index(self):
+        with open(os.path.join(self.directory, self.index_file), encoding="utf-8") as handle:
+            entries = json.load(handle)
+        keys = {}
+        default_id = None
+        for entry in entries:
+            for key in [entry["id"], entry.get("name", "")] + entry.get("aliases", []):
+                if key:
+                    keys.setdefault(normalize_template_key(key), entry["id"])
+            if entry.get("default"):
+                default_id = entry["id"]
+        self._entries = {entry["id"]: entry for entry in entries}
+        self._keys = keys
+        self._default_id = default_id
+        logger.info(f"Indexed {len(entries)} fallback document templates from {self.directory}")
+
+    def resolve(self, template_id=None, template_name=None):
+        """Id of the template registered for an id or name, else the default template id"""
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._load_index()
+        for key in (template_id, template_name):
+            if key:
+                resolved = self._keys.get(normalize_template_key(key))
+                if resolved:
+                    return resolved
+        return self._default_id
+
+    def get(self, template_id=None, template_name=None):
+        """Compiled template for an id or name, loading it on first use"""
+        resolved = self.resolve(template_id, template_name)
+        compiled = self._compiled.get(resolved)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(resolved)
+            if compiled is None:
+                started = time.perf_counter()
+                with open(os.path.join(self.directory, self._entries[resolved]["file"]), encoding="utf-8") as handle:
+                    text = handle.read()
+                # Data files end with a newline the rendered document never had
+                compiled = CompiledTemplate(resolved, text[:-1] if text.endswith("\n") else text)
+                self._compiled[resolved] = compiled
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.compile_ms += elapsed_ms
+                logger.debug(f"Compiled fallback template {resolved} in {elapsed_ms:.2f} ms")
+        return compiled
+
+    def render(self, template_name, user_input, document_type="general", template_id=None):
+        """Render the fallback document for a template id or name"""
+        document = self.get(template_id, template_name).render_document(user_input, template_name, document_type)
+        self.renders += 1
+        return document
+
+    def sections(self, template_name, user_input, document_type="general", template_id=None):
+        """The fallback document split into (preamble, [(heading, section text)]), which also declares the template's sections"""
+        return split_markdown_sections(self.render(template_name, user_input, document_type, template_id))
+
+    def info(self):
+        return {
+            "templates": len(self._entries or {}),
+            "compiled": len(self._compiled),
+            "renders": self.renders,
+            "compile_ms": round(self.compile_ms, 2),
+        }
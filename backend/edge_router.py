@@ -0,0 +1,387 @@
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_SIDE_NORMALS = {"left": (-1, 0), "right": (1, 0), "top": (0, -1), "bottom": (0, 1)}
+_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_INFINITY = float("inf")
+# Weighted A*: overestimating the remaining distance by 20% makes long searches
+# dive towards the goal, for routes a fraction of a percent longer
+_HEURISTIC_WEIGHT = 1.2
+
+
+class SpatialGrid:
+    """Uniform-grid spatial index over axis-aligned rectangles"""
+
+    def __init__(self, rects, cell_size):
+        self.cell_size = cell_size
+        self.rects = rects
+        self.cells = {}
+        for key, (x0, y0, x1, y1) in rects.items():
+            for cell in self._cells_for(x0, y0, x1, y1):
+                self.cells.setdefault(cell, []).append(key)
+
+    def _cells_for(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for cx in range(int(x0 // size), int(x1 // size) + 1):
+            for cy in range(int(y0 // size), int(y1 // size) + 1):
+                yield cx, cy
+
+    def query(self, x0, y0, x1, y1):
+        """Keys of all rectangles intersecting the given window"""
+        found = set()
+        for cell in self._cells_for(x0, y0, x1, y1):
+            for key in self.cells.get(cell, ()):
+                if key not in found:
+                    rx0, ry0, rx1, ry1 = self.rects[key]
+                    if rx0 <= x1 and rx1 >= x0 and ry0 <= y1 and ry1 >= y0:
+                        found.add(key)
+        return found
+
+    def point_blocked(self, x, y):
+        size = self.cell_size
+        for key in self.cells.get((int(x // size), int(y // size)), ()):
+            x0, y0, x1, y1 = self.rects[key]
+            if x0 < x < x1 and y0 < y < y1:
+                return True
+        return False
+
+    def segment_blocked(self, ax, ay, bx, by):
+        """True when the axis-aligned segment a-b passes through the interior of any rectangle"""
+        lx, hx = min(ax, bx), max(ax, bx)
+        ly, hy = min(ay, by), max(ay, by)
+        seen = set()
+        for cell in self._cells_for(lx, ly, hx, hy):
+            for key in self.cells.get(cell, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                x0, y0, x1, y1 = self.rects[key]
+                if lx < x1 and hx > x0 and ly < y1 and hy > y0:
+                    return True
+        return False
+
+
+def _choose_sides(source_rect, target_rect):
+    sx0, sy0, sx1, sy1 = source_rect
+    tx0, ty0, tx1, ty1 = target_rect
+    dx = (tx0 + tx1) / 2 - (sx0 + sx1) / 2
+    dy = (ty0 + ty1) / 2 - (sy0 + sy1) / 2
+    # Leave horizontally only when the boxes do not overlap on the x axis and the
+    # horizontal gap dominates; otherwise leave through top/bottom
+    horizontal_gap = max(tx0 - sx1, sx0 - tx1)
+    vertical_gap = max(ty0 - sy1, sy0 - ty1)
+    if horizontal_gap > 0 and (vertical_gap <= 0 or abs(dx) >= abs(dy)):
+        return ("right", "left") if dx > 0 else ("left", "right")
+    return ("bottom", "top") if dy > 0 else ("top", "bottom")
+
+
+def _side_pairs(source_rect, target_rect):
+    """(source side, target side) pairs facing each other, the _choose_sides pair first, then the L-shaped ones"""
+    dx = (target_rect[0] + target_rect[2]) / 2 - (source_rect[0] + source_rect[2]) / 2
+    dy = (target_rect[1] + target_rect[3]) / 2 - (source_rect[1] + source_rect[3]) / 2
+    horizontal = ("right", "left") if dx > 0 else ("left", "right")
+    vertical = ("bottom", "top") if dy > 0 else ("top", "bottom")
+    pairs = [_choose_sides(source_rect, target_rect), (horizontal[0], vertical[1]), (vertical[0], horizontal[1]),
+             horizontal, vertical]
+    return list(dict.fromkeys(pairs))
+
+
+def _port_point(rect, side, offset):
+    x0, y0, x1, y1 = rect
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    if side in ("left", "right"):
+        limit = (y1 - y0) * 0.4
+        y = cy + max(-limit, min(limit, offset))
+        return (x0 if side == "left" else x1), y
+    limit = (x1 - x0) * 0.4
+    x = cx + max(-limit, min(limit, offset))
+    return x, (y0 if side == "top" else y1)
+
+
+def _simplify(points):
+    """Drop duplicate and collinear points from an orthogonal polyline"""
+    result = []
+    for point in points:
+        if result and abs(result[-1][0] - point[0]) < 1e-6 and abs(result[-1][1] - point[1]) < 1e-6:
+            continue
+        if len(result) >= 2:
+            (ax, ay), (bx, by) = result[-2], result[-1]
+            if (abs(ax - bx) < 1e-6 and abs(bx - point[0]) < 1e-6) or (abs(ay - by) < 1e-6 and abs(by - point[1]) < 1e-6):
+                result[-1] = point
+                continue
+        result.append(point)
+    return result
+
+
+def _path_clear(index, points):
+    return not any(index.segment_blocked(ax, ay, bx, by) for (ax, ay), (bx, by) in zip(points, points[1:]))
+
+
+def _candidates(stub_start, stub_end, source_side, target_side, channel):
+    """Straight, L and Z shaped routes between two stubs, the most natural for the sides first"""
+    (sx, sy), (ex, ey) = stub_start, stub_end
+    source_horizontal = source_side in ("left", "right")
+    target_horizontal = target_side in ("left", "right")
+    if source_horizontal != target_horizontal:
+        corner = (ex, sy) if source_horizontal else (sx, ey)
+        return [[stub_start, corner, stub_end]]
+    if source_horizontal:
+        mid_x = (sx + ex) / 2 + channel
+        return [
+            [stub_start, (mid_x, sy), (mid_x, ey), stub_end],
+            [stub_start, (ex, sy), stub_end],
+            [stub_start, (sx, ey), stub_end],
+        ]
+    mid_y = (sy + ey) / 2 + channel
+    return [
+        [stub_start, (sx, mid_y), (ex, mid_y), stub_end],
+        [stub_start, (sx, ey), stub_end],
+        [stub_start, (ex, sy), stub_end],
+    ]
+
+
+def _stub(point, side, clearance):
+    nx, ny = _SIDE_NORMALS[side]
+    return point[0] + nx * clearance, point[1] + ny * clearance
+
+
+def _visibility_search(index, start, goal, window, max_expansions, max_steps, bend_penalty):
+    """
+    Bounded A* over the sparse orthogonal grid spanned by the obstacle boundaries
+    inside the window; returns the route or None. The search gives up after
+    max_expansions grid points or max_steps distinct grid steps tested.
+    """
+    x0, y0, x1, y1 = window
+    keys = index.query(x0, y0, x1, y1)
+    xs = sorted(set(x for x in [start[0], goal[0], x0, x1] + [index.rects[k][0] for k in keys] +
+                    [index.rects[k][2] for k in keys] if x0 <= x <= x1))
+    ys = sorted(set(y for y in [start[1], goal[1], y0, y1] + [index.rects[k][1] for k in keys] +
+                    [index.rects[k][3] for k in keys] if y0 <= y <= y1))
+    x_at = {x: i for i, x in enumerate(xs)}
+    y_at = {y: j for j, y in enumerate(ys)}
+    start_node = (x_at[start[0]], y_at[start[1]])
+    goal_node = (x_at[goal[0]], y_at[goal[1]])
+    gx, gy = goal
+
+    def heuristic(node, direction):
+        dx, dy = gx - xs[node[0]], gy - ys[node[1]]
+        # Admissible bend estimate: a turn is unavoidable when the goal is off both
+        # axes, or when it lies behind / beside the current heading
+        bends = 1 if dx and dy else 0
+        if direction >= 0:
+            hx, hy = _DIRECTIONS[direction]
+            if (hx and (dx * hx < 0 or (dx == 0 and dy))) or (hy and (dy * hy < 0 or (dy == 0 and dx))):
+                bends = max(bends, 1)
+        return abs(dx) + abs(dy) + bends * bend_penalty
+
+    point_blocked = index.point_blocked
+    width, height = len(xs), len(ys)
+    blocked = {}
+
+    def step_blocked(i, j, ni, nj):
+        # Every obstacle boundary in the window is a grid line, so a step between
+        # neighbouring grid points is blocked exactly when its midpoint is
+        if not (0 <= ni < width and 0 <= nj < height):
+            return True
+        step_key = (i + ni, j + nj)
+        if step_key not in blocked:
+            blocked[step_key] = point_blocked((xs[i] + xs[ni]) / 2, (ys[j] + ys[nj]) / 2)
+        return blocked[step_key]
+
+    def sideways(i, j, di, dj):
+        return step_blocked(i, j, i + dj, j + di), step_blocked(i, j, i - dj, j - di)
+
+    # Moves jump along straight runs and stop only where a turn can matter: before
+    # an obstacle, on the goal's row or column, and where a side opens or closes
+    # (on both sides of the change). Grid points are searched once each (the
+    # heading that first reaches a point is kept), trading exact bend minimisation
+    # for a smaller state space; ties on f are broken towards the larger g so the
+    # search dives along one of the many equally long monotone routes.
+    open_heap = [(heuristic(start_node, -1), 0.0, 0.0, start_node, -1)]
+    best_cost = {start_node: 0.0}
+    parent = {}
+    closed = set()
+    while open_heap and len(closed) < max_expansions and len(blocked) < max_steps:
+        _, _, cost, node, direction = heapq.heappop(open_heap)
+        if node in closed:
+            continue
+        if node == goal_node:
+            points = [(xs[node[0]], ys[node[1]])]
+            while node in parent:
+                node = parent[node]
+                points.append((xs[node[0]], ys[node[1]]))
+            points.reverse()
+            return points
+        closed.add(node)
+        i, j = node
+        for new_direction, (di, dj) in enumerate(_DIRECTIONS):
+            if direction >= 0 and (di, dj) == (-_DIRECTIONS[direction][0], -_DIRECTIONS[direction][1]):
+                continue
+            stops = []
+            ci, cj = i, j
+            sides = sideways(ci, cj, di, dj)
+            while not step_blocked(ci, cj, ci + di, cj + dj):
+                ci, cj = ci + di, cj + dj
+                if (ci, cj) == goal_node or (di and ci == goal_node[0]) or (dj and cj == goal_node[1]):
+                    break
+                now = sideways(ci, cj, di, dj)
+                if now != sides:
+                    if (ci - di, cj - dj) != node:
+                        stops.append((ci - di, cj - dj))
+                    break
+            if (ci, cj) != node:
+                stops.append((ci, cj))
+            bend = bend_penalty if direction not in (-1, new_direction) else 0
+            for stop in stops:
+                if stop in closed:
+                    continue
+                new_cost = cost + abs(xs[stop[0]] - xs[i]) + abs(ys[stop[1]] - ys[j]) + bend
+                if new_cost < best_cost.get(stop, _INFINITY):
+                    best_cost[stop] = new_cost
+                    parent[stop] = node
+                    heapq.heappush(open_heap, (new_cost + _HEURISTIC_WEIGHT * heuristic(stop, new_direction), -new_cost,
+                                               new_cost, stop, new_direction))
+    return None
+
+
+def route_edges(rects, edges, margin=14, spread=10, window_padding=240,
+                max_expansions=500, max_steps=20000, bend_penalty=40):
+    """
+    Route edges orthogonally around node rectangles.
+
+    Every edge leaves its source and enters its target perpendicular to one of the
+    facing sides: of the straight and L-shaped side pairs, the first whose stubs are
+    free and which has a clear straight, L or Z shaped route is used, checked against
+    a uniform-grid index of the (inflated) rectangles. Only edges without such a
+    route fall back to a weighted A* search on the sparse orthogonal grid of nearby
+    obstacle boundaries, bounded by a window around the endpoints, an expansion
+    limit and a limit on the grid steps tested. A search costs more the more
+    obstacles separate the endpoints, so long-range edges in large diagrams
+    dominate the total. Edges sharing a node side get spread-out ports and parallel
+    edges between the same pair get separate channels.
+
+    Args:
+        rects (dict): node -> (x, y, width, height) with (x, y) the top-left corner
+        edges (list): (source, target) pairs; unknown endpoints and self-loops are skipped
+        margin (int): Clearance kept around every rectangle
+        spread (int): Distance between neighbouring ports / parallel channels
+        window_padding (int): How far beyond the endpoints' bounding box the fallback may search
+        max_expansions (int): Grid point expansion limit for a single fallback search
+        max_steps (int): Limit on the grid steps a single fallback search tests for obstacles
+        bend_penalty (int): Extra cost per bend in the fallback search
+
+    Returns:
+        dict: "routes" holds one list of (x, y) points per input edge (None when skipped),
+        plus "searched" (edges that needed the fallback search), "failed" (edges routed
+        through obstacles because the search gave up) and "elapsed_ms".
+    """
+    started = time.perf_counter()
+    boxes = {key: (x, y, x + w, y + h) for key, (x, y, w, h) in rects.items()}
+    inflated = {key: (x0 - margin, y0 - margin, x1 + margin, y1 + margin) for key, (x0, y0, x1, y1) in boxes.items()}
+    sizes = sorted(max(x1 - x0, y1 - y0) for x0, y0, x1, y1 in inflated.values()) or [100]
+    index = SpatialGrid(inflated, max(32, sizes[len(sizes) // 2] / 2))
+
+    clearance = margin + 1
+    pair_counts = {}
+    pair_rank = []
+    for edge_idx, (source, target) in enumerate(edges):
+        pair = frozenset((source, target))
+        pair_rank.append(pair_counts.get(pair, 0))
+        pair_counts[pair] = pair_rank[-1] + 1
+
+    # Sides: the first facing pair whose stubs are free and whose straight, L or Z
+    # route from the side centers is clear, so only edges without any such route
+    # are left to the search
+    sides = []
+    by_port = {}
+    for edge_idx, (source, target) in enumerate(edges):
+        if source not in boxes or target not in boxes or source == target:
+            sides.append(None)
+            continue
+        pairs = _side_pairs(boxes[source], boxes[target])
+        chosen = pairs[0]
+        for source_side, target_side in pairs:
+            stub_start = _stub(_port_point(boxes[source], source_side, 0), source_side, clearance)
+            stub_end = _stub(_port_point(boxes[target], target_side, 0), target_side, clearance)
+            if index.point_blocked(*stub_start) or index.point_blocked(*stub_end):
+                continue
+            if any(_path_clear(index, candidate)
+                   for candidate in _candidates(stub_start, stub_end, source_side, target_side, 0)):
+                chosen = (source_side, target_side)
+                break
+        sides.append(chosen)
+        by_port.setdefault((source, chosen[0]), []).append((edge_idx, target))
+        by_port.setdefault((target, chosen[1]), []).append((edge_idx, source))
+
+    # Port order: edges on the same node side are sorted by where their other end
+    # lies, then spread symmetrically around the side's center
+    offsets = {}
+    for (node, side), members in by_port.items():
+        axis = 1 if side in ("left", "right") else 0
+        members.sort(key=lambda member: ((boxes[member[1]][axis] + boxes[member[1]][axis + 2]) / 2, member[0]))
+        for rank, (edge_idx, _) in enumerate(members):
+            offsets[(edge_idx, node)] = (rank - (len(members) - 1) / 2) * spread
+
+    routes = []
+    searched = failed = 0
+    for edge_idx, (source, target) in enumerate(edges):
+        if sides[edge_idx] is None:
+            routes.append(None)
+            continue
+        source_side, target_side = sides[edge_idx]
+        start = _port_point(boxes[source], source_side, offsets[(edge_idx, source)])
+        end = _port_point(boxes[target], target_side, offsets[(edge_idx, target)])
+        stub_start = _stub(start, source_side, clearance)
+        stub_end = _stub(end, target_side, clearance)
+
+        count = pair_counts[frozenset((source, target))]
+        channel = (pair_rank[edge_idx] - (count - 1) / 2) * spread
+        candidates = _candidates(stub_start, stub_end, source_side, target_side, channel)
+        middle = next((candidate for candidate in candidates if _path_clear(index, candidate)), None)
+        if middle is None:
+            searched += 1
+            window = (min(stub_start[0], stub_end[0]) - window_padding, min(stub_start[1], stub_end[1]) - window_padding,
+                      max(stub_start[0], stub_end[0]) + window_padding, max(stub_start[1], stub_end[1]) + window_padding)
+            middle = _visibility_search(index, stub_start, stub_end, window, max_expansions, max_steps, bend_penalty)
+            if middle is None:
+                failed += 1
+                middle = candidates[0]
+
+        routes.append(_simplify([start] + middle + [end]))
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug(f"Routed {len(edges)} edges around {len(rects)} nodes in {elapsed_ms:.2f} ms "
+                 f"({searched} searched, {failed} failed)")
+    return {"routes": routes, "searched": searched, "failed": failed, "elapsed_ms": elapsed_ms}
+
+
+def route_to_path(points, corner_radius=8):
+    """Turn an orthogonal route into SVG path data with rounded corners"""
+    if not points:
+        return ""
+    x0, y0 = points[0]
+    parts = [f"M{x0:.1f} {y0:.1f}"]
+    for idx in range(1, len(points) - 1):
+        (ax, ay), (bx, by), (cx, cy) = points[idx - 1], points[idx], points[idx + 1]
+        radius = min(corner_radius, (abs(bx - ax) + abs(by - ay)) / 2, (abs(cx - bx) + abs(cy - by)) / 2)
+        in_x = bx - radius * ((bx > ax) - (bx < ax))
+        in_y = by - radius * ((by > ay) - (by < ay))
+        out_x = bx + radius * ((cx > bx) - (cx < bx))
+        out_y = by + radius * ((cy > by) - (cy < by))
+        parts.append(f"L{in_x:.1f} {in_y:.1f} Q{bx:.1f} {by:.1f} {out_x:.1f} {out_y:.1f}")
+    xn, yn = points[-1]
+    parts.append(f"L{xn:.1f} {yn:.1f}")
+    return " ".join(parts)
+
+
+def route_label_point(points):
+    """Midpoint of the longest segment, a good anchor for an edge label"""
+    if not points:
+        return 0.0, 0.0
+    if len(points) == 1:
+        return points[0]
+    (ax, ay), (bx, by) = max(zip(points, points[1:]), key=lambda seg: abs(seg[1][0] - seg[0][0]) + abs(seg[1][1] - seg[0][1]))
+    return (ax + bx) / 2, (ay + by) / 2
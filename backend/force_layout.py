@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Above this many nodes repulsion switches from exact all-pairs to the grid approximation
+EXACT_REPULSION_LIMIT = 100
+GRID_REBUILD_INTERVAL = 5
+# Node-steps one layout may simulate; large graphs get fewer (fully cooled) iterations instead of a wall-clock cut
+MAX_NODE_ITERATIONS = 120000
+
+_layout_cache = OrderedDict()
+_LAYOUT_CACHE_SIZE = 128
+
+
+def layout_seed(nodes, edges):
+    """Derive a stable seed from the graph so identical input always gives identical output"""
+    digest = hashlib.sha256()
+    for node in nodes:
+        digest.update(str(node).encode("utf-8") + b"\x00")
+    digest.update(b"\x01")
+    for source, target in edges:
+        digest.update(f"{source}\x00{target}\x00".encode("utf-8"))
+    return int.from_bytes(digest.digest()[:8], "big")
+
+
+def _exact_repulsion(pos, k_squared):
+    dx = pos[0][:, None] - pos[0][None, :]
+    dy = pos[1][:, None] - pos[1][None, :]
+    dist_sq = dx * dx + dy * dy
+    np.fill_diagonal(dist_sq, np.inf)
+    np.maximum(dist_sq, 1e-4, out=dist_sq)
+    # FR repulsion k^2 / d along the unit vector == k^2 * delta / d^2
+    weight = k_squared / dist_sq
+    return np.stack([np.einsum("ij,ij->i", dx, weight), np.einsum("ij,ij->i", dy, weight)])
+
+
+def _build_grid(pos, cells_per_side):
+    """Bin nodes into a uniform grid and list every node pair in neighbouring cells"""
+    n = pos.shape[1]
+    lo = pos.min(axis=1, keepdims=True)
+    span = np.maximum(pos.max(axis=1, keepdims=True) - lo, 1e-6)
+    cell_xy = np.minimum((((pos - lo) / span) * cells_per_side).astype(np.int64), cells_per_side - 1)
+    cell_id = cell_xy[0] * cells_per_side + cell_xy[1]
+    cell_count = cells_per_side * cells_per_side
+    counts = np.bincount(cell_id, minlength=cell_count).astype(np.float64)
+    occupied = np.nonzero(counts)[0]
+    occ_x = occupied // cells_per_side
+    occ_y = occupied % cells_per_side
+    near_cells = (np.abs(occ_x[:, None] - occ_x[None, :]) <= 1) & (np.abs(occ_y[:, None] - occ_y[None, :]) <= 1)
+
+    # Nodes sorted by cell make each neighbouring cell a contiguous [start, end) range
+    order = np.argsort(cell_id, kind="stable")
+    sorted_cells = cell_id[order]
+    starts = np.searchsorted(sorted_cells, np.arange(cell_count), side="left")
+    ends = np.searchsorted(sorted_cells, np.arange(cell_count), side="right")
+    pair_i, pair_j = [], []
+    for step_x in (-1, 0, 1):
+        for step_y in (-1, 0, 1):
+            nx = cell_xy[0] + step_x
+            ny = cell_xy[1] + step_y
+            valid = (nx >= 0) & (nx < cells_per_side) & (ny >= 0) & (ny < cells_per_side)
+            neighbour = np.where(valid, nx * cells_per_side + ny, 0)
+            begin = np.where(valid, starts[neighbour], 0)
+            size = np.where(valid, ends[neighbour] - begin, 0)
+            total = int(size.sum())
+            if total == 0:
+                continue
+            i = np.repeat(np.arange(n), size)
+            offsets = np.arange(total) - np.repeat(np.cumsum(size) - size, size)
+            j = order[np.repeat(begin, size) + offsets]
+            keep = i != j
+            pair_i.append(i[keep])
+            pair_j.append(j[keep])
+
+    return {
+        "cell_id": cell_id,
+        "cell_count": cell_count,
+        "counts": counts,
+        "occupied": occupied,
+        "near_cells": near_cells,
+        "pair_i": np.concatenate(pair_i) if pair_i else np.zeros(0, dtype=np.int64),
+        "pair_j": np.concatenate(pair_j) if pair_j else np.zeros(0, dtype=np.int64),
+    }
+
+
+def _grid_repulsion(pos, k_squared, grid):
+    """Exact repulsion between nodes in neighbouring cells, cell centroids for the rest"""
+    n = pos.shape[1]
+    cell_id, cell_count, counts, occupied = grid["cell_id"], grid["cell_count"], grid["counts"], grid["occupied"]
+    x, y = pos
+
+    # Far field: cell-to-cell interactions between occupied cells that are not
+    # neighbours, applied to every node of the receiving cell (particle-mesh style)
+    centroid_x = np.bincount(cell_id, weights=x, minlength=cell_count)[occupied] / counts[occupied]
+    centroid_y = np.bincount(cell_id, weights=y, minlength=cell_count)[occupied] / counts[occupied]
+    dx = centroid_x[:, None] - centroid_x[None, :]
+    dy = centroid_y[:, None] - centroid_y[None, :]
+    weight = counts[occupied][None, :] / np.maximum(dx * dx + dy * dy, 1e-4)
+    weight[grid["near_cells"]] = 0.0
+    cell_force = np.zeros((2, cell_count))
+    cell_force[0, occupied] = k_squared * np.einsum("ij,ij->i", dx, weight)
+    cell_force[1, occupied] = k_squared * np.einsum("ij,ij->i", dy, weight)
+    force = cell_force[:, cell_id]
+
+    # Near field: exact pairwise repulsion
+    i, j = grid["pair_i"], grid["pair_j"]
+    if len(i):
+        pair_dx = x[i] - x[j]
+        pair_dy = y[i] - y[j]
+        pair_weight = k_squared / np.maximum(pair_dx * pair_dx + pair_dy * pair_dy, 1e-4)
+        force[0] += np.bincount(i, weights=pair_dx * pair_weight, minlength=n)
+        force[1] += np.bincount(i, weights=pair_dy * pair_weight, minlength=n)
+    return force
+
+
+def compute_force_layout(nodes, edges, width=1400, height=900, margin=100,
+                         max_iterations=300, time_budget_ms=None, seed=None, use_cache=True):
+    """
+    Compute a force-directed (Fruchterman-Reingold style) layout with NumPy.
+
+    Positions and velocities live in (2, N) arrays (one contiguous row per axis). Repulsion is exact for small graphs
+    and grid-approximated for large ones, the step size follows a geometric cooling
+    schedule, and the initial placement is seeded from the graph itself so identical
+    input produces identical output. Large graphs are bounded by MAX_NODE_ITERATIONS,
+    which lowers the iteration count deterministically; an explicit time_budget_ms
+    also bounds wall-clock time, but then the output depends on machine load and
+    is not reproducible.
+
+    Args:
+        nodes (list): Node identifiers
+        edges (list): (source, target) pairs; unknown endpoints are ignored
+        width (int): Width of the area to fit the layout into
+        height (int): Height of the area to fit the layout into
+        margin (int): Padding kept free on every side of the area
+        max_iterations (int): Upper bound on simulation steps
+        time_budget_ms (float, optional): Wall-clock budget; the simulation stops early when exceeded
+        seed (int, optional): Override the graph-derived seed
+        use_cache (bool): Reuse the result of an identical earlier call
+
+    Returns:
+        dict: "positions" maps node -> (x, y) center, plus "iterations", "elapsed_ms",
+        "converged", "approximate" and "seed".
+    """
+    started = time.perf_counter()
+    nodes = list(dict.fromkeys(nodes))
+    index = {node: i for i, node in enumerate(nodes)}
+    edge_pairs = [(index[s], index[t]) for s, t in edges if s in index and t in index and s != t]
+    graph_digest = layout_seed(nodes, [(nodes[s], nodes[t]) for s, t in edge_pairs])
+    seed = graph_digest if seed is None else seed
+
+    cache_key = (graph_digest, seed, width, height, margin, max_iterations, time_budget_ms)
+    if use_cache and cache_key in _layout_cache:
+        _layout_cache.move_to_end(cache_key)
+        cached = dict(_layout_cache[cache_key])
+        cached["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        cached["cached"] = True
+        return cached
+
+    n = len(nodes)
+    area_w, area_h = max(width - 2 * margin, 1), max(height - 2 * margin, 1)
+    if n <= 2:
+        xs = [margin + area_w * (i + 1) / (n + 1) for i in range(n)]
+        positions = {node: (xs[i], margin + area_h / 2) for i, node in enumerate(nodes)}
+        return {"positions": positions, "iterations": 0, "elapsed_ms": (time.perf_counter() - started) * 1000,
+                "converged": True, "approximate": False, "seed": seed, "cached": False}
+
+    rng = np.random.default_rng(seed)
+    k = math.sqrt(area_w * area_h / n)
+    k_squared = k * k
+    pos = rng.uniform(0.0, 1.0, size=(2, n)) * np.array([[area_w], [area_h]])
+    velocity = np.zeros((2, n))
+    center = np.array([[area_w / 2], [area_h / 2]])
+
+    src = np.array([s for s, _ in edge_pairs], dtype=np.int64)
+    dst = np.array([t for _, t in edge_pairs], dtype=np.int64)
+    approximate = n > EXACT_REPULSION_LIMIT
+    cells_per_side = max(2, int(math.ceil(math.sqrt(n) / 2)))
+
+    max_iterations = max(1, min(max_iterations, MAX_NODE_ITERATIONS // n))
+    temperature = max(area_w, area_h) / 10
+    min_temperature = k / 100
+    cooling = (min_temperature / temperature) ** (1.0 / max(max_iterations - 1, 1))
+    damping = 0.5
+    budget_s = time_budget_ms / 1000.0 if time_budget_ms else None
+    iterations = 0
+    converged = False
+
+    grid = None
+    while iterations < max_iterations:
+        if approximate:
+            # Cell membership and neighbour pairs are rebuilt every few steps only
+            if iterations % GRID_REBUILD_INTERVAL == 0:
+                grid = _build_grid(pos, cells_per_side)
+            force = _grid_repulsion(pos, k_squared, grid)
+        else:
+            force = _exact_repulsion(pos, k_squared)
+
+        if len(src):
+            delta = pos[:, src] - pos[:, dst]
+            dist = np.maximum(np.sqrt(delta[0] * delta[0] + delta[1] * delta[1]), 1e-2)
+            pull = delta * (dist / k)  # d^2 / k along the unit vector
+            for axis in (0, 1):
+                force[axis] -= np.bincount(src, weights=pull[axis], minlength=n)
+                force[axis] += np.bincount(dst, weights=pull[axis], minlength=n)
+
+        # Weak gravity keeps disconnected components on the canvas
+        force += (center - pos) * (0.05 * k / max(area_w, area_h))
+
+        velocity = velocity * damping + force
+        speed = np.maximum(np.sqrt(velocity[0] * velocity[0] + velocity[1] * velocity[1]), 1e-9)
+        velocity *= np.minimum(speed, temperature) / speed
+        pos += velocity
+
+        iterations += 1
+        temperature *= cooling
+        if float(speed.max()) < min_temperature:
+            converged = True
+            break
+        if budget_s is not None and time.perf_counter() - started > budget_s:
+            break
+
+    # Fit the result into the requested area
+    lo = pos.min(axis=1, keepdims=True)
+    span = np.maximum(pos.max(axis=1, keepdims=True) - lo, 1e-6)
+    scale = min(area_w / span[0, 0], area_h / span[1, 0])
+    fitted = (pos - lo) * scale
+    fitted += (np.array([[area_w], [area_h]]) - span * scale) / 2 + margin
+    positions = {node: (float(fitted[0, i]), float(fitted[1, i])) for i, node in enumerate(nodes)}
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    result = {
+        "positions": positions,
+        "iterations": iterations,
+        "elapsed_ms": elapsed_ms,
+        "converged": converged,
+        "approximate": approximate,
+        "seed": seed,
+        "cached": False,
+    }
+    logger.debug(f"Force layout: {n} nodes, {len(edge_pairs)} edges, {iterations} iterations "
+                f"in {elapsed_ms:.1f} ms ({'grid' if approximate else 'exact'} repulsion)")
+
+    if use_cache and iterations:
+        _layout_cache[cache_key] = result
+        if len(_layout_cache) > _LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return result
+
+
+
+def snap_to_grid(positions, pitch):
+    """
+    Move every node to the center of its own cell on a grid of the given pitch.
+
+    The force layout places centers only, so dense graphs leave node boxes
+    overlapping. Nodes take the free cell nearest to their position, closest to
+    the layout's centroid first, so a crowded core spreads outwards ring by ring
+    while sparse regions keep their shape. Rows and columns of the grid leave
+    straight channels between the nodes for connectors.
+
+    Args:
+        positions (dict): node -> (x, y) center
+        pitch (float): Cell size; at least the largest node plus the gap wanted between nodes
+
+    Returns:
+        dict: node -> (x, y) center of the node's cell
+    """
+    if not positions:
+        return {}
+    mean_x = sum(x for x, _ in positions.values()) / len(positions)
+    mean_y = sum(y for _, y in positions.values()) / len(positions)
+    order = sorted(positions, key=lambda node: (positions[node][0] - mean_x) ** 2 + (positions[node][1] - mean_y) ** 2)
+    taken = set()
+    snapped = {}
+    for node in order:
+        x, y = positions[node][0] / pitch, positions[node][1] / pitch
+        home_x, home_y = int(math.floor(x)), int(math.floor(y))
+        radius = 0
+        while True:
+            ring = [(home_x + i, home_y + j) for i in range(-radius, radius + 1) for j in range(-radius, radius + 1)
+                    if max(abs(i), abs(j)) == radius and (home_x + i, home_y + j) not in taken]
+            if ring:
+                cell = min(ring, key=lambda c: ((c[0] + 0.5 - x) ** 2 + (c[1] + 0.5 - y) ** 2, c))
+                break
+            radius += 1
+        taken.add(cell)
+        snapped[node] = ((cell[0] + 0.5) * pitch, (cell[1] + 0.5) * pitch)
+    return snapped
@@ -0,0 +1,212 @@
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# (months per tick, tick label prefix) from finest to coarsest; durations are in months
+AXIS_GRANULARITIES = [
+    (0.25, "W"),
+    (1, "M"),
+    (3, "Q"),
+    (6, "H"),
+    (12, "Y"),
+]
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+_SUFFIX_PATTERN = re.compile(r"\s*\([^)]*\)\s*$")
+
+
+def parse_duration(value, default=1.0):
+    """Read a duration from a number or a string such as "4", "2.5 months" or "3M" """
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else default
+    match = _NUMBER_PATTERN.search(str(value or ""))
+    if match and float(match.group()) > 0:
+        return float(match.group())
+    return default
+
+
+def _normalize_name(name):
+    return _SUFFIX_PATTERN.sub("", str(name)).strip().lower()
+
+
+def _resolve_dependencies(names, tasks):
+    """Map dependency strings to task names: exact match, then case/suffix-insensitive"""
+    lookup = {}
+    for name in names:
+        lookup.setdefault(str(name).strip().lower(), name)
+        lookup.setdefault(_normalize_name(name), name)
+
+    predecessors = {name: [] for name in names}
+    unresolved = []
+    for name in names:
+        task_data = tasks[name]
+        raw = task_data.get("dependencies", []) if isinstance(task_data, dict) else []
+        if isinstance(raw, str):
+            raw = [raw]
+        for dependency in raw or []:
+            if dependency in predecessors:
+                target = dependency
+            else:
+                target = lookup.get(str(dependency).strip().lower()) or lookup.get(_normalize_name(dependency))
+            if target is None:
+                unresolved.append((name, dependency))
+            elif target != name and target not in predecessors[name]:
+                predecessors[name].append(target)
+    return predecessors, unresolved
+
+
+def _topological_order(names, predecessors):
+    """
+    Kahn's algorithm in O(V + E). When it stalls on a cycle, the earliest listed
+    waiting task has its remaining incoming edges dropped so scheduling can go on;
+    the dropped (dependency, task) pairs are returned.
+    """
+    successors = {name: [] for name in names}
+    in_degree = {}
+    for name in names:
+        in_degree[name] = len(predecessors[name])
+        for dependency in predecessors[name]:
+            successors[dependency].append(name)
+
+    queue = [name for name in names if in_degree[name] == 0]
+    order = []
+    done = set()
+    dropped = []
+    head = 0
+    scan = 0
+    while len(order) < len(names):
+        if head == len(queue):
+            while names[scan] in done or in_degree[names[scan]] == 0:
+                scan += 1
+            stalled = names[scan]
+            for dependency in predecessors[stalled]:
+                if dependency not in done:
+                    dropped.append((dependency, stalled))
+            in_degree[stalled] = 0
+            queue.append(stalled)
+        name = queue[head]
+        head += 1
+        order.append(name)
+        done.add(name)
+        for child in successors[name]:
+            if child in done:
+                continue
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return order, successors, dropped
+
+
+def schedule_tasks(tasks):
+    """
+    Schedule Gantt tasks with the critical path method.
+
+    Dependencies fix the order; a task's own "start" (1-based) is honoured as the
+    earliest period it may begin. A forward pass gives earliest start/finish, a
+    backward pass latest start, and tasks without slack form the critical path.
+    Runs in O(V + E).
+
+    Args:
+        tasks (dict): Task name -> {"duration", "start", "dependencies", ...} or a description string
+
+    Returns:
+        dict: "tasks" maps name -> {"start", "finish", "latest_start", "slack", "duration",
+        "critical", "dependencies"} (0-based months), plus "order" (by start),
+        "critical_path", "span", "cycles" (dropped dependency pairs), "unresolved"
+        (dependencies that name no task) and "elapsed_ms".
+    """
+    started = time.perf_counter()
+    names = list(tasks.keys())
+    predecessors, unresolved = _resolve_dependencies(names, tasks)
+    order, successors, dropped = _topological_order(names, predecessors)
+    dropped_set = set(dropped)
+
+    duration = {}
+    earliest = {}
+    finish = {}
+    for name in order:
+        task_data = tasks[name] if isinstance(tasks[name], dict) else {}
+        duration[name] = parse_duration(task_data.get("duration"), 1.0)
+        release = max(parse_duration(task_data.get("start"), 1.0) - 1, 0.0)
+        ready = max((finish[d] for d in predecessors[name] if (d, name) not in dropped_set), default=0.0)
+        earliest[name] = max(release, ready)
+        finish[name] = earliest[name] + duration[name]
+
+    span = max(finish.values(), default=0.0)
+    latest_finish = {}
+    latest_start = {}
+    for name in reversed(order):
+        latest_finish[name] = min((latest_start[s] for s in successors[name] if (name, s) not in dropped_set),
+                                  default=span)
+        latest_start[name] = latest_finish[name] - duration[name]
+
+    schedule = {}
+    for name in names:
+        slack = max(latest_start[name] - earliest[name], 0.0)
+        schedule[name] = {
+            "start": earliest[name],
+            "finish": finish[name],
+            "latest_start": latest_start[name],
+            "slack": slack,
+            "duration": duration[name],
+            "critical": slack < 1e-9,
+            "dependencies": [d for d in predecessors[name] if (d, name) not in dropped_set],
+        }
+
+    # Walk one critical chain from the earliest-starting critical task through tight successors;
+    # with release dates that task need not start at zero. Every critical task has a
+    # tight critical successor unless it finishes at the span, so the walk ends there
+    critical_path = []
+    current = min((name for name in order if schedule[name]["critical"]),
+                  key=lambda name: schedule[name]["start"], default=None)
+    while current is not None:
+        critical_path.append(current)
+        current = next((s for s in successors[current] if (current, s) not in dropped_set and schedule[s]["critical"]
+                        and abs(schedule[s]["start"] - finish[current]) < 1e-9), None)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if dropped:
+        logger.warning(f"Gantt dependencies form a cycle; ignored {len(dropped)} dependency link(s): {dropped[:5]}")
+    logger.debug(f"Scheduled {len(names)} tasks over {span:g} months in {elapsed_ms:.2f} ms")
+
+    return {
+        "tasks": schedule,
+        "order": [name for _, _, name in sorted((schedule[name]["start"], i, name) for i, name in enumerate(names))],
+        "critical_path": critical_path,
+        "span": span,
+        "cycles": dropped,
+        "unresolved": unresolved,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+def choose_time_axis(span, min_chart_width=1050, min_month_px=16, min_tick_px=56):
+    """
+    Pick the axis scale for a project span (in months).
+
+    The chart stretches the span over min_chart_width; only when a month would get
+    narrower than min_month_px does the chart grow instead. The tick step is the
+    finest granularity whose ticks stay at least min_tick_px apart.
+
+    Returns:
+        dict: "month_px", "chart_width", "tick_step" (months), "tick_prefix" and "tick_count"
+    """
+    span = max(span, 1.0)
+    month_px = max(min_chart_width / span, min_month_px)
+    tick_step, tick_prefix = AXIS_GRANULARITIES[-1]
+    for step, prefix in AXIS_GRANULARITIES:
+        if step * month_px >= min_tick_px:
+            tick_step, tick_prefix = step, prefix
+            break
+    tick_count = int(span / tick_step + 1e-9) + (0 if abs(span / tick_step - round(span / tick_step)) < 1e-9 else 1)
+    return {
+        "month_px": month_px,
+        "chart_width": max(min_chart_width, span * month_px),
+        "tick_step": tick_step,
+        "tick_prefix": tick_prefix,
+        "tick_count": tick_count,
+    }
@@ -0,0 +1,418 @@
+import html
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+# Row fields of a recorded generation, in table column order
+HISTORY_COLUMNS = (
+    "created", "kind", "endpoint", "request_type", "source", "params", "model", "svg_hash", "document_hash",
+    "content", "llm_model", "llm_calls", "prompt_tokens", "completion_tokens", "latency_ms", "llm_ms",
+)
+_JSON_COLUMNS = {"params", "model"}
+# Derived columns holding the searchable text of params and model, filled in by the writer
+SEARCH_COLUMNS = ("search_input", "search_labels")
+# Request fields that hold what the user asked for
+SEARCH_INPUT_FIELDS = ("userInput", "prompt", "instruction", "section")
+# Dict keys like these are schema field names in a diagram model, not labels worth indexing
+_SCHEMA_KEY = re.compile(r"^[a-z][a-z_]*$")
+_QUERY_TERM = re.compile(r"\w+")
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    kind TEXT NOT NULL,
+    endpoint TEXT,
+    request_type TEXT,
+    source TEXT,
+    params TEXT,
+    model TEXT,
+    svg_hash TEXT,
+    document_hash TEXT,
+    content TEXT,
+    llm_model TEXT,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency_ms REAL,
+    llm_ms REAL
+);
+CREATE INDEX IF NOT EXISTS generations_created ON generations (created);
+CREATE INDEX IF NOT EXISTS generations_kind_type ON generations (kind, request_type, created);
+"""
+
+# Full-text index over user input, diagram labels and document text. It is an external-content
+# FTS5 table (the text lives in generations only) kept in step with it by triggers, so every
+# batch the writer commits and every row compaction deletes updates the index incrementally.
+_SEARCH_SCHEMA = """
+ALTER TABLE generations ADD COLUMN search_input TEXT;
+ALTER TABLE generations ADD COLUMN search_labels TEXT;
+CREATE VIRTUAL TABLE generations_fts USING fts5(
+    search_input, search_labels, content, content='generations', content_rowid='id',
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER generations_fts_insert AFTER INSERT ON generations BEGIN
+    INSERT INTO generations_fts (rowid, search_input, search_labels, content)
+    VALUES (new.id, new.search_input, new.search_labels, new.content);
+END;
+CREATE TRIGGER generations_fts_delete AFTER DELETE ON generations BEGIN
+    INSERT INTO generations_fts (generations_fts, rowid, search_input, search_labels, content)
+    VALUES ('delete', old.id, old.search_input, old.search_labels, old.content);
+END;
+"""
+
+
+def _collect_text(value, parts, skip_schema_keys=False):
+    if isinstance(value, str):
+        parts.append(value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if not (skip_schema_keys and _SCHEMA_KEY.match(str(key))):
+                parts.append(str(key))
+            _collect_text(item, parts, skip_schema_keys)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_text(item, parts, skip_schema_keys)
+    return parts
+
+
+def search_text(fields):
+    """The (input, labels) text a recorded row is indexed under"""
+    params = fields.get("params") or {}
+    inputs = [params[name] for name in SEARCH_INPUT_FIELDS if isinstance(params.get(name), str)]
+    # Node names repeat in edges and dependencies; index each label once
+    labels = dict.fromkeys(_collect_text(fields.get("model"), [], skip_schema_keys=True))
+    return "\n".join(inputs) or None, "\n".join(label for label in labels if label.strip()) or None
+
+
+def match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as
+    a prefix so results follow typing. Returns None when there are no words.
+    """
+    terms = _QUERY_TERM.findall(text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+_STOP = object()
+
+
+class HistoryStore:
+    """
+    SQLite history of generated diagrams and documents.
+
+    record() only puts the row on a bounded queue; a daemon writer thread
+    started on first use serializes the JSON columns and commits rows in
+    batches (up to batch_size rows, or whatever arrived within flush_interval
+    seconds), so requests never wait on disk or serialization. Recorded values
+    must not be mutated afterwards. When the queue is full rows are dropped and
+    counted rather than blocking the request.
+
+    The database runs in WAL mode so reads from request threads do not block
+    the writer. Every compact_interval seconds the writer deletes rows older
+    than retention_days and beyond max_rows (either may be 0 for no limit),
+    returns freed pages with an incremental vacuum and truncates the WAL.
+
+    search() ranks rows with an FTS5 index over the user's input, diagram
+    labels and document text, which triggers keep current as rows are
+    written and compacted.
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=1.0, max_queue=10000, retention_days=30,
+                 max_rows=100000, compact_interval=3600, enabled=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.compact_interval = compact_interval
+        self.enabled = enabled and bool(path)
+        self.searchable = False
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.batches = 0
+        self.commit_ms = 0.0
+        self.compacted_rows = 0
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL makes NORMAL durable against application crashes; only an OS crash can lose the last commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _create_schema(self, connection):
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # auto_vacuum only takes effect before the first table is created
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.executescript(_SCHEMA)
+            connection.execute("PRAGMA user_version=1")
+            connection.commit()
+        if version < 2:
+            self._create_search_index(connection)
+
+    def _create_search_index(self, connection):
+        """Add the full-text index, indexing rows recorded before it existed"""
+        try:
+            connection.executescript(f"BEGIN; {_SEARCH_SCHEMA}")
+            rows = connection.execute("SELECT id, params, model FROM generations").fetchall()
+            connection.executemany("UPDATE generations SET search_input = ?, search_labels = ? WHERE id = ?",
+                                   [search_text(self._row_dict(row)) + (row["id"],) for row in rows])
+            connection.execute("INSERT INTO generations_fts (generations_fts) VALUES ('rebuild')")
+            connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            connection.commit()
+            logger.info(f"Built the history search index over {len(rows)} rows")
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5 keep recording history, they just cannot search it
+            connection.rollback()
+            logger.warning(f"History search unavailable: {str(e)}")
+
+    @staticmethod
+    def _has_search_index(connection):
+        return connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'generations_fts'").fetchone() is not None
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None and self.enabled:
+                self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._writer.start()
+
+    def record(self, kind, **fields):
+        """Queue one generation for writing; never blocks on disk"""
+        if not self.enabled:
+            return False
+        if self._writer is None:
+            self._start_writer()
+        fields["kind"] = kind
+        fields.setdefault("created", time.time())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.recorded += 1
+        return True
+
+    def _row_values(self, fields):
+        values = tuple(json.dumps(fields.get(column), ensure_ascii=False, separators=(",", ":"))
+                       if column in _JSON_COLUMNS and fields.get(column) is not None else fields.get(column)
+                       for column in HISTORY_COLUMNS)
+        return values + search_text(fields) if self.searchable else values
+
+    def _write_batch(self, connection, batch):
+        started = time.perf_counter()
+        rows = []
+        for fields in batch:
+            try:
+                rows.append(self._row_values(fields))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Skipping unserializable {fields.get('kind')} history row: {str(e)}")
+                with self._lock:
+                    self.dropped += 1
+        try:
+            columns = HISTORY_COLUMNS + SEARCH_COLUMNS if self.searchable else HISTORY_COLUMNS
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO generations ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write {len(rows)} history rows: {str(e)}")
+            with self._lock:
+                self.failed_batches += 1
+            return
+        with self._lock:
+            self.written += len(rows)
+            self.batches += 1
+            self.commit_ms += (time.perf_counter() - started) * 1000
+
+    def compact(self, connection=None):
+        """Apply retention and reclaim space; returns the number of rows deleted"""
+        own_connection = connection is None
+        connection = connection or self._connect()
+        deleted = 0
+        try:
+            with connection:
+                if self.retention_days:
+                    deleted += connection.execute("DELETE FROM generations WHERE created < ?",
+                                                  (time.time() - self.retention_days * 86400,)).rowcount
+                if self.max_rows:
+                    deleted += connection.execute(
+                        "DELETE FROM generations WHERE id <= (SELECT id FROM generations ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.max_rows,)).rowcount
+            if deleted:
+                connection.execute("PRAGMA incremental_vacuum")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.error(f"History compaction failed: {str(e)}")
+        finally:
+            if own_connection:
+                connection.close()
+        with self._lock:
+            self.compacted_rows += deleted
+        if deleted:
+            logger.info(f"Compacted history: deleted {deleted} rows")
+        return deleted
+
+    def _run(self):
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            self._create_schema(connection)
+            self.searchable = self._has_search_index(connection)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"History store {self.path} unavailable, history disabled: {str(e)}")
+            self.enabled = False
+            connection = None
+        last_compact = 0.0
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not _STOP]
+            if rows and connection is not None:
+                self._write_batch(connection, rows)
+            for _ in batch:
+                self._queue.task_done()
+            if len(rows) < len(batch) or connection is None:
+                break
+            if self.compact_interval and time.monotonic() - last_compact >= self.compact_interval:
+                last_compact = time.monotonic()
+                self.compact(connection)
+        if connection is not None:
+            connection.close()
+
+    def flush(self, timeout=5.0):
+        """Wait until queued rows are committed; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or self._writer is None or not self._writer.is_alive():
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=5.0):
+        """Commit what is queued and stop the writer"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    def _read(self, sql, parameters=()):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        connection = self._connect()
+        try:
+            return [self._row_dict(row) for row in connection.execute(sql, parameters)]
+        except sqlite3.OperationalError as e:
+            logger.warning(f"History read failed: {str(e)}")
+            return []
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _row_dict(row):
+        entry = dict(row)
+        for column in _JSON_COLUMNS & entry.keys():
+            if entry[column] is not None:
+                entry[column] = json.loads(entry[column])
+        return entry
+
+    def recent(self, kind=None, request_type=None, limit=50, before_id=None):
+        """Newest rows first, without their content/model payloads; page with before_id"""
+        summary_columns = ", ".join(["id"] + [column for column in HISTORY_COLUMNS if column not in ("content", "model")])
+        clauses, parameters = [], []
+        for column, value in (("kind", kind), ("request_type", request_type)):
+            if value:
+                clauses.append(f"{column} = ?")
+                parameters.append(value)
+        if before_id:
+            clauses.append("id < ?")
+            parameters.append(int(before_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._read(f"SELECT {summary_columns} FROM generations {where} ORDER BY id DESC LIMIT ?",
+                          parameters + [int(limit)])
+
+    def get(self, entry_id):
+        """One full row by id, or None"""
+        rows = self._read(f"SELECT id, {', '.join(HISTORY_COLUMNS)} FROM generations WHERE id = ?", (int(entry_id),))
+        return rows[0] if rows else None
+
+    def search(self, text, kind=None, request_type=None, limit=20, offset=0):
+        """
+        Rows matching every word of text, best first, without their content/model
+        payloads. Matches in the user's input weigh most, then diagram labels,
+        then document text; each row carries its BM25 rank (lower is better)
+        and an HTML-escaped snippet with the matched words in <mark>.
+        """
+        query = match_query(text)
+        if query is None:
+            return []
+        summary_columns = ", ".join(f"g.{column}" for column in ("id",) + HISTORY_COLUMNS
+                                    if column not in ("content", "model"))
+        clauses, parameters = ["generations_fts MATCH ?"], [query]
+        for column, value in (("kind", kind), ("request_type", request_type)):
+            if value:
+                clauses.append(f"g.{column} = ?")
+                parameters.append(value)
+        rows = self._read(
+            f"SELECT {summary_columns}, bm25(generations_fts, 4.0, 2.0, 1.0) AS rank, "
+            f"snippet(generations_fts, -1, '{_MARK_START}', '{_MARK_END}', '…', 16) AS snippet "
+            f"FROM generations_fts JOIN generations g ON g.id = generations_fts.rowid "
+            f"WHERE {' AND '.join(clauses)} ORDER BY rank LIMIT ? OFFSET ?",
+            parameters + [int(limit), int(offset)])
+        for row in rows:
+            row["rank"] = round(row["rank"], 4)
+            row["snippet"] = html.escape(row["snippet"] or "").replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+        return rows
+
+    def info(self):
+        size = 0
+        if self.path:
+            for suffix in ("", "-wal"):
+                try:
+                    size += os.path.getsize(self.path + suffix)
+                except OSError:
+                    pass
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "searchable": self.searchable,
+                "path": self.path,
+                "bytes": size,
+                "queued": self._queue.qsize(),
+                "recorded": self.recorded,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "avg_commit_ms": round(self.commit_ms / self.batches, 2) if self.batches else 0.0,
+                "compacted_rows": self.compacted_rows,
+                "retention_days": self.retention_days,
+                "max_rows": self.max_rows,
+            }
@@ -0,0 +1,322 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _break_cycles(nodes, successors):
+    """Return the set of (u, v) edges that must be reversed to make the graph acyclic"""
+    reversed_edges = set()
+    state = {node: 0 for node in nodes}  # 0 = unvisited, 1 = on stack, 2 = done
+
+    for root in nodes:
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            advanced = False
+            for child in children:
+                if state[child] == 0:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    advanced = True
+                    break
+                if state[child] == 1:
+                    reversed_edges.add((node, child))
+            if not advanced:
+                state[node] = 2
+                stack.pop()
+
+    return reversed_edges
+
+
+def _assign_layers(nodes, successors, predecessors):
+    """Longest-path layering: every node sits one layer below its deepest predecessor"""
+    in_degree = {node: len(predecessors[node]) for node in nodes}
+    queue = [node for node in nodes if in_degree[node] == 0]
+    layer = {node: 0 for node in nodes}
+
+    head = 0
+    while head < len(queue):
+        node = queue[head]
+        head += 1
+        for child in successors[node]:
+            if layer[child] < layer[node] + 1:
+                layer[child] = layer[node] + 1
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+
+    return layer
+
+
+def _count_crossings(upper_order, lower_pos, down_edges):
+    """Count edge crossings between two adjacent layers using a Fenwick tree"""
+    pairs = []
+    for node in upper_order:
+        for child in down_edges.get(node, ()):
+            pairs.append(lower_pos[child])
+    if len(pairs) < 2:
+        return 0
+
+    size = max(pairs) + 2
+    tree = [0] * size
+    crossings = 0
+    seen = 0
+    for pos in pairs:
+        # Edges already seen that land strictly to the right of this one cross it
+        index = pos + 1
+        not_greater = 0
+        while index > 0:
+            not_greater += tree[index]
+            index -= index & -index
+        crossings += seen - not_greater
+        index = pos + 1
+        while index < size:
+            tree[index] += 1
+            index += index & -index
+        seen += 1
+    return crossings
+
+
+def _total_crossings(layers, down_edges):
+    total = 0
+    for i in range(len(layers) - 1):
+        lower_pos = {node: idx for idx, node in enumerate(layers[i + 1])}
+        total += _count_crossings(layers[i], lower_pos, down_edges)
+    return total
+
+
+def _barycenter_sweep(layers, neighbours_of, layer_pairs):
+    """Reorder each free layer by the mean position of its neighbours in the fixed layer"""
+    for fixed_idx, free_idx in layer_pairs:
+        fixed, free = layers[fixed_idx], layers[free_idx]
+        fixed_pos = {node: idx for idx, node in enumerate(fixed)}
+        keyed = []
+        for idx, node in enumerate(free):
+            linked = [fixed_pos[n] for n in neighbours_of.get(node, ()) if n in fixed_pos]
+            barycenter = sum(linked) / len(linked) if linked else idx
+            keyed.append((barycenter, idx, node))
+        keyed.sort()
+        layers[free_idx] = [node for _, _, node in keyed]
+
+
+def compute_layered_layout(nodes, edges, node_width=320, node_height=120,
+                           h_gap=60, v_gap=80, dummy_width=24, max_sweeps=4,
+                           max_layers_per_column=None):
+    """
+    Compute a Sugiyama-style layered layout for a directed graph.
+
+    Args:
+        nodes (list): Node identifiers in their original (display) order
+        edges (list): (source, target) pairs; unknown endpoints and self-loops are ignored
+        node_width (int): Width of every node box
+        node_height (int): Height of every node box
+        h_gap (int): Horizontal gap between neighbouring nodes in a layer
+        v_gap (int): Vertical gap between layers
+        dummy_width (int): Horizontal room reserved for an edge passing through a layer
+        max_sweeps (int): Upper bound on barycenter down/up sweep pairs
+        max_layers_per_column (int, optional): Wrap long graphs into side-by-side columns
+
+    Returns:
+        dict: "positions" maps node -> (x, y) top-left corner, "edges" maps each input
+        edge -> list of (x, y) waypoints (source bottom, dummy centers, the gutter detour
+        of edges wrapping into the next column, target top),
+        "back_edges" holds the edges reversed to break cycles (they run bottom-up),
+        plus "width", "height", "layer_count", "crossings" and "elapsed_ms".
+    """
+    started = time.perf_counter()
+    nodes = list(dict.fromkeys(nodes))
+    node_set = set(nodes)
+
+    successors = {node: [] for node in nodes}
+    predecessors = {node: [] for node in nodes}
+    clean_edges = []
+    for source, target in edges:
+        if source not in node_set or target not in node_set or source == target:
+            continue
+        if target in successors[source]:
+            continue
+        successors[source].append(target)
+        predecessors[target].append(source)
+        clean_edges.append((source, target))
+
+    # 1. Make the graph acyclic by reversing back edges
+    reversed_edges = _break_cycles(nodes, successors)
+    dag_successors = {node: [] for node in nodes}
+    dag_predecessors = {node: [] for node in nodes}
+    for source, target in clean_edges:
+        if (source, target) in reversed_edges:
+            source, target = target, source
+        if target not in dag_successors[source]:
+            dag_successors[source].append(target)
+            dag_predecessors[target].append(source)
+
+    # 2. Layer assignment
+    layer_of = _assign_layers(nodes, dag_successors, dag_predecessors)
+    layer_count = max(layer_of.values()) + 1 if layer_of else 0
+
+    # 3. Split long edges with dummy nodes so every edge spans exactly one layer
+    layers = [[] for _ in range(layer_count)]
+    for node in nodes:
+        layers[layer_of[node]].append(node)
+
+    down_edges = {}
+    up_edges = {}
+    edge_chains = {}
+    dummy_id = 0
+    for source, target in clean_edges:
+        upper, lower = (target, source) if (source, target) in reversed_edges else (source, target)
+        chain = [upper]
+        for layer in range(layer_of[upper] + 1, layer_of[lower]):
+            dummy = ("__dummy__", dummy_id)
+            dummy_id += 1
+            layer_of[dummy] = layer
+            layers[layer].append(dummy)
+            chain.append(dummy)
+        chain.append(lower)
+        for a, b in zip(chain, chain[1:]):
+            down_edges.setdefault(a, []).append(b)
+            up_edges.setdefault(b, []).append(a)
+        edge_chains[(source, target)] = chain
+
+    # 4. Crossing reduction: alternating barycenter sweeps, keep the best ordering
+    best_layers = [list(layer) for layer in layers]
+    best_crossings = _total_crossings(layers, down_edges)
+    down_order = [(i, i + 1) for i in range(layer_count - 1)]
+    up_order = [(i + 1, i) for i in reversed(range(layer_count - 1))]
+    for _ in range(max_sweeps):
+        if best_crossings == 0:
+            break
+        _barycenter_sweep(layers, up_edges, down_order)
+        _barycenter_sweep(layers, down_edges, up_order)
+        crossings = _total_crossings(layers, down_edges)
+        if crossings < best_crossings:
+            best_crossings = crossings
+            best_layers = [list(layer) for layer in layers]
+        else:
+            break
+    layers = best_layers
+
+    # 5. Coordinate assignment on node centers: pack each layer, then pull nodes
+    #    toward the mean of their neighbours while keeping the minimum separation.
+    #    Dummy nodes only need room for an edge, not a full box.
+    def half_width(node):
+        return dummy_width / 2 if isinstance(node, tuple) else node_width / 2
+
+    def separation(left, right):
+        return half_width(left) + half_width(right) + h_gap
+
+    x_of = {}
+    for layer in layers:
+        x = 0
+        for idx, node in enumerate(layer):
+            if idx:
+                x += separation(layer[idx - 1], node)
+            x_of[node] = x
+
+    for _ in range(2):
+        for neighbours_of, order in ((up_edges, range(1, layer_count)),
+                                     (down_edges, range(layer_count - 2, -1, -1))):
+            for i in order:
+                layer = layers[i]
+                desired = []
+                for node in layer:
+                    linked = neighbours_of.get(node)
+                    desired.append(sum(x_of[n] for n in linked) / len(linked) if linked else x_of[node])
+                # Resolve overlaps pushing right and pushing left, then average both
+                pushed_right = list(desired)
+                for idx in range(1, len(layer)):
+                    pushed_right[idx] = max(desired[idx], pushed_right[idx - 1] + separation(layer[idx - 1], layer[idx]))
+                pushed_left = list(desired)
+                for idx in range(len(layer) - 2, -1, -1):
+                    pushed_left[idx] = min(desired[idx], pushed_left[idx + 1] - separation(layer[idx], layer[idx + 1]))
+                for node, right, left in zip(layer, pushed_right, pushed_left):
+                    x_of[node] = (right + left) / 2
+
+    # 6. Wrap very deep graphs into columns of layers placed side by side
+    if not max_layers_per_column or max_layers_per_column <= 0:
+        max_layers_per_column = max(layer_count, 1)
+    layer_step = node_height + v_gap
+    band_offsets = []
+    band_rights = []
+    band_left = 0
+    for band_start in range(0, layer_count, max_layers_per_column):
+        band_nodes = [node for layer in layers[band_start:band_start + max_layers_per_column] for node in layer]
+        min_x = min(x_of[node] - half_width(node) for node in band_nodes)
+        max_x = max(x_of[node] + half_width(node) for node in band_nodes)
+        band_offsets.append(band_left - min_x)
+        band_rights.append(band_left + (max_x - min_x))
+        band_left += (max_x - min_x) + h_gap
+
+    centers = {}
+    for i, layer in enumerate(layers):
+        band = i // max_layers_per_column
+        y = (i % max_layers_per_column) * layer_step
+        for node in layer:
+            centers[node] = (x_of[node] + band_offsets[band], y)
+
+    # Edges wrapping into the next column leave below the last row, climb the gutter
+    # between the columns and enter the next column's first row from above
+    band_bottom = (max_layers_per_column - 1) * layer_step + node_height + v_gap / 2
+    band_top = -v_gap / 2
+    routed_edges = {}
+    for edge, chain in edge_chains.items():
+        points = []
+        for idx, node in enumerate(chain):
+            center_x, y = centers[node]
+            if idx and layer_of[node] // max_layers_per_column != layer_of[chain[idx - 1]] // max_layers_per_column:
+                gutter_x = band_rights[layer_of[chain[idx - 1]] // max_layers_per_column] + h_gap / 2
+                exit_x = points[-1][0]
+                points.extend([(exit_x, band_bottom), (gutter_x, band_bottom), (gutter_x, band_top),
+                               (center_x, band_top)])
+            if idx == 0:
+                points.append((center_x, y + node_height))
+            elif idx == len(chain) - 1:
+                points.append((center_x, y))
+            else:
+                points.append((center_x, y + node_height / 2))
+        if edge in reversed_edges:
+            points.reverse()
+        routed_edges[edge] = points
+
+    positions = {node: (centers[node][0] - node_width / 2, centers[node][1]) for node in nodes}
+    width = band_left - h_gap if layers else 0
+    height = min(layer_count, max_layers_per_column) * layer_step - v_gap if layers else 0
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    logger.debug(f"Layered layout: {len(nodes)} nodes, {layer_count} layers, {dummy_id} dummies, "
+                 f"{best_crossings} crossings in {elapsed_ms:.2f} ms")
+
+    return {
+        "positions": positions,
+        "edges": routed_edges,
+        "back_edges": reversed_edges,
+        "width": width,
+        "height": max(height, 0),
+        "layer_count": layer_count,
+        "crossings": best_crossings,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+def waypoints_to_path(points, upward=False, min_bend=40, max_bend=80):
+    """
+    Turn layout waypoints into SVG path data: axis-aligned runs (such as the gutter
+    detour of edges wrapping into the next column) become straight lines, the rest
+    smooth curves with vertical tangents whose bend is clamped to [min_bend, max_bend].
+    """
+    if not points:
+        return ""
+    direction = -1 if upward else 1
+    x0, y0 = points[0]
+    parts = [f"M{x0:.1f} {y0:.1f}"]
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        if abs(ax - bx) < 1e-6 or abs(ay - by) < 1e-6:
+            parts.append(f"L{bx:.1f} {by:.1f}")
+            continue
+        bend = min(max(min_bend, abs(by - ay) / 2), max_bend) * direction
+        parts.append(f"C{ax:.1f} {ay + bend:.1f} {bx:.1f} {by - bend:.1f} {bx:.1f} {by:.1f}")
+    return " ".join(parts)
@@ -0,0 +1,74 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class LLMScheduler:
+    """
+    Process-wide bound on concurrent LLM calls.
+
+    Callers submit completions instead of opening their own pools, so batch
+    diagrams and sectioned documents share one concurrency limit (and one
+    provider rate budget). Calls beyond max_concurrency wait in FIFO order.
+    The pool is created on first use.
+    """
+
+    def __init__(self, max_concurrency=4):
+        self.max_concurrency = max_concurrency
+        self._pool = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+
+    def _run(self, submitted, function, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.wait_ms += (started - submitted) * 1000
+        failed = False
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.failed += failed
+                self.run_ms += (time.perf_counter() - started) * 1000
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queue an LLM call and return its Future.
+
+        The call runs in a copy of the caller's context, so the Flask app and
+        request context (and anything recorded on g) carry over to the pool thread.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+            self.queued += 1
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, self._run, time.perf_counter(), function, args, kwargs)
+
+    def info(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.wait_ms / self.completed, 1) if self.completed else 0.0,
+                "avg_run_ms": round(self.run_ms / self.completed, 1) if self.completed else 0.0,
+            }
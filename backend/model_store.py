@@ -0,0 +1,81 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from diagram_store import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+def model_hash(diagram_type, diagram_data):
+    """Stable hash of a diagram model; key order inside the data does not matter"""
+    canonical = json.dumps({"type": diagram_type, "data": diagram_data}, sort_keys=True,
+                           ensure_ascii=False, separators=(",", ":"), default=str)
+    return content_hash(canonical)
+
+
+class ModelStore:
+    """
+    In-memory store of validated diagram models keyed by model hash.
+
+    Entries expire ttl_seconds after their last use and the least recently used
+    ones are dropped beyond max_entries, so re-rendering a diagram the client is
+    still working on never needs the LLM again.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, diagram_type, diagram_data):
+        """Store a model and return its hash"""
+        digest = model_hash(diagram_type, diagram_data)
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self.ttl_seconds, diagram_type, diagram_data)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+    def get(self, digest):
+        """Return (diagram_type, diagram_data) for a live hash, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            _, diagram_type, diagram_data = entry
+            self._entries[digest] = (now + self.ttl_seconds, diagram_type, diagram_data)
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return diagram_type, diagram_data
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [digest for digest, entry in self._entries.items() if entry[0] < now]
+            for digest in expired:
+                del self._entries[digest]
+        if expired:
+            logger.debug(f"Expired {len(expired)} diagram models")
+        return len(expired)
+
+    def info(self):
+        self.purge_expired()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
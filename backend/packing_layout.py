@@ -0,0 +1,138 @@
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# Average advance widths (in em) for Inter-like sans-serif glyphs, enough to size
+# boxes from their labels without a font rasterizer
+_NARROW_CHARS = set("fijlrtI!|.,:;'`()[]{} ")
+_WIDE_CHARS = set("mwMW@%")
+_NARROW_EM = 0.32
+_REGULAR_EM = 0.56
+_UPPER_EM = 0.66
+_WIDE_EM = 0.86
+_BOLD_FACTOR = 1.07
+
+
+def measure_text_width(text, font_size, bold=False):
+    """Estimate the rendered width of a single-line label in pixels"""
+    em = 0.0
+    for char in str(text):
+        if char in _NARROW_CHARS:
+            em += _NARROW_EM
+        elif char in _WIDE_CHARS:
+            em += _WIDE_EM
+        elif char.isupper() or char.isdigit():
+            em += _UPPER_EM
+        else:
+            em += _REGULAR_EM
+    return em * font_size * (_BOLD_FACTOR if bold else 1.0)
+
+
+def _skyline_fit(skyline, index, width, max_width):
+    """Return the y at which a box of this width rests when its left edge starts at segment index"""
+    x = skyline[index][0]
+    if x + width > max_width:
+        return None
+    y = 0
+    remaining = width
+    i = index
+    while remaining > 0:
+        if i == len(skyline):
+            return None
+        seg_x, seg_y, seg_w = skyline[i]
+        y = max(y, seg_y)
+        remaining -= seg_w if i > index else seg_w - (x - seg_x)
+        i += 1
+    return y
+
+
+def _skyline_place(skyline, x, y, width, height):
+    """Raise the skyline under [x, x + width) to y + height and merge equal neighbours"""
+    top = y + height
+    right = x + width
+    updated = []
+    inserted = False
+    for seg_x, seg_y, seg_w in skyline:
+        seg_right = seg_x + seg_w
+        if seg_right <= x or seg_x >= right:
+            if seg_x >= right and not inserted:
+                updated.append((x, top, width))
+                inserted = True
+            updated.append((seg_x, seg_y, seg_w))
+            continue
+        if seg_x < x:
+            updated.append((seg_x, seg_y, x - seg_x))
+        if not inserted:
+            updated.append((x, top, width))
+            inserted = True
+        if seg_right > right:
+            updated.append((right, seg_y, seg_right - right))
+
+    merged = []
+    for seg in updated:
+        if merged and merged[-1][1] == seg[1] and merged[-1][0] + merged[-1][2] == seg[0]:
+            merged[-1] = (merged[-1][0], seg[1], merged[-1][2] + seg[2])
+        else:
+            merged.append(seg)
+    return merged
+
+
+def pack_rectangles(boxes, gap=40, max_width=None, aspect_ratio=1.6):
+    """
+    Pack boxes with the skyline bottom-left heuristic.
+
+    Boxes are placed tallest first; each goes to the skyline position where its top
+    edge ends lowest, ties broken by the leftmost x. When max_width is omitted the
+    strip width is chosen from the total area so the result is roughly aspect_ratio
+    wide, but never narrower than the widest box.
+
+    Args:
+        boxes (list): (key, width, height) tuples
+        gap (int): Free space kept between neighbouring boxes
+        max_width (int, optional): Width of the strip to pack into
+        aspect_ratio (float): Target width / height ratio used when max_width is omitted
+
+    Returns:
+        dict: "positions" maps key -> (x, y) top-left corner, plus "width", "height"
+        and "elapsed_ms".
+    """
+    started = time.perf_counter()
+    if not boxes:
+        return {"positions": {}, "width": 0, "height": 0, "elapsed_ms": 0.0}
+
+    padded = [(key, w + gap, h + gap) for key, w, h in boxes]
+    widest = max(w for _, w, _ in padded)
+    if max_width is None:
+        area = sum(w * h for _, w, h in padded)
+        max_width = math.sqrt(area * aspect_ratio)
+    max_width = max(max_width + gap, widest)
+
+    order = sorted(padded, key=lambda box: (-box[2], -box[1]))
+    skyline = [(0, 0, max_width)]
+    positions = {}
+    for key, w, h in order:
+        best = None
+        for index in range(len(skyline)):
+            y = _skyline_fit(skyline, index, w, max_width)
+            if y is None:
+                continue
+            candidate = (y + h, skyline[index][0], y)
+            if best is None or candidate < best:
+                best = candidate
+        _, x, y = best
+        positions[key] = (x, y)
+        skyline = _skyline_place(skyline, x, y, w, h)
+
+    used_width = max(positions[key][0] + w for key, w, _ in padded) - gap
+    used_height = max(seg_y for _, seg_y, _ in skyline) - gap
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug(f"Packed {len(boxes)} boxes into {used_width:.0f}x{used_height:.0f} in {elapsed_ms:.2f} ms")
+
+    return {
+        "positions": positions,
+        "width": used_width,
+        "height": used_height,
+        "elapsed_ms": elapsed_ms,
+    }
@@ -0,0 +1,224 @@
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # OSError when the cairo shared library is missing
+    cairosvg = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+RASTER_MIMETYPES = {"png": "image/png", "webp": "image/webp"}
+MIN_RASTER_WIDTH = 64
+MAX_RASTER_WIDTH = 4096
+
+
+def available_raster_formats():
+    """Raster formats this process can produce"""
+    if cairosvg is None:
+        return []
+    return ["png", "webp"] if Image is not None else ["png"]
+
+
+def clamp_raster_width(width, default=1024):
+    try:
+        width = int(width)
+    except (TypeError, ValueError):
+        width = default
+    return min(max(width, MIN_RASTER_WIDTH), MAX_RASTER_WIDTH)
+
+
+def _refuse_fetch(url, resource_type=None):
+    raise ValueError(f"External resource {url} is not loaded during rasterization")
+
+
+def rasterize_svg(svg_bytes, width, raster_format, webp_quality=85):
+    """
+    Render SVG bytes to PNG or WebP at the given pixel width (height follows the
+    viewBox aspect ratio). Runs in a worker process; external references are
+    never fetched.
+    """
+    png = cairosvg.svg2png(bytestring=svg_bytes, output_width=width, url_fetcher=_refuse_fetch)
+    if raster_format == "png":
+        return png
+    image = Image.open(io.BytesIO(png))
+    output = io.BytesIO()
+    image.save(output, "WEBP", quality=webp_quality, method=4)
+    return output.getvalue()
+
+
+class RasterCache:
+    """
+    Bounded disk cache for raster renders keyed by (svg hash, width, format).
+
+    Files are named <hash>-<width>.<format>; reads refresh the access order and
+    the least recently used files are deleted once the directory exceeds max_bytes.
+    When the directory cannot be created nothing is cached and every request renders.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._access = {}
+        self._size = 0
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name.endswith(".tmp") or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                self._sizes[name] = stat.st_size
+                self._access[name] = stat.st_mtime
+                self._size += stat.st_size
+        except OSError as e:
+            logger.error(f"Raster cache directory {directory} unavailable, rasters will not be cached: {str(e)}")
+            self.directory = None
+        self._evict()
+
+    @staticmethod
+    def _name(diagram_hash, width, raster_format):
+        return f"{diagram_hash}-{width}.{raster_format}"
+
+    def get(self, diagram_hash, width, raster_format):
+        name = self._name(diagram_hash, width, raster_format)
+        with self._lock:
+            if name not in self._sizes:
+                return None
+            self._access[name] = time.time()
+        try:
+            with open(os.path.join(self.directory, name), "rb") as handle:
+                return handle.read()
+        except OSError:
+            with self._lock:
+                self._forget(name)
+            return None
+
+    def put(self, diagram_hash, width, raster_format, data):
+        if self.directory is None:
+            return
+        name = self._name(diagram_hash, width, raster_format)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except OSError as e:
+            logger.error(f"Failed to cache raster {name}: {str(e)}")
+            return
+        with self._lock:
+            self._forget(name)
+            self._sizes[name] = len(data)
+            self._access[name] = time.time()
+            self._size += len(data)
+        self._evict()
+
+    def _forget(self, name):
+        if name in self._sizes:
+            self._size -= self._sizes.pop(name)
+            self._access.pop(name, None)
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            for name in sorted(self._access, key=self._access.get):
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                self._forget(name)
+
+    def info(self):
+        with self._lock:
+            return {"entries": len(self._sizes), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "directory": self.directory}
+
+
+class RasterService:
+    """
+    Rasterizes stored SVGs in a process pool with a disk cache in front.
+
+    Concurrent requests for the same (hash, width, format) share one render. The
+    pool is created on first use so processes that never rasterize pay nothing.
+    """
+
+    def __init__(self, cache_dir, cache_max_bytes=256 * 1024 * 1024, max_workers=2, timeout=30):
+        self.cache = RasterCache(cache_dir, cache_max_bytes)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.cache_hits = 0
+        self.render_ms = 0.0
+
+    def render(self, diagram_hash, svg_bytes, width, raster_format):
+        """
+        Return raster bytes for a stored SVG, rendering on a cache miss.
+
+        Raises:
+            ValueError: When the format cannot be produced in this environment
+            concurrent.futures.TimeoutError: When the render exceeds the timeout
+        """
+        if raster_format not in available_raster_formats():
+            raise ValueError(f"Raster format '{raster_format}' is not available")
+        cached = self.cache.get(diagram_hash, width, raster_format)
+        if cached is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return cached
+
+        key = (diagram_hash, width, raster_format)
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                future = self._pool.submit(rasterize_svg, svg_bytes, width, raster_format)
+                self._pending[key] = future
+
+        started = time.perf_counter()
+        try:
+            data = future.result(timeout=self.timeout)
+        finally:
+            if owner:
+                with self._lock:
+                    self._pending.pop(key, None)
+        if owner:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.cache.put(diagram_hash, width, raster_format, data)
+            with self._lock:
+                self.renders += 1
+                self.render_ms += elapsed_ms
+            logger.info(f"Rasterized {diagram_hash} to {raster_format} at {width}px: "
+                        f"{len(svg_bytes)} -> {len(data)} bytes in {elapsed_ms:.1f} ms")
+        return data
+
+    def info(self):
+        with self._lock:
+            report = {
+                "formats": available_raster_formats(),
+                "workers": self.max_workers,
+                "renders": self.renders,
+                "cache_hits": self.cache_hits,
+                "render_ms": round(self.render_ms, 1),
+            }
+        report["cache"] = self.cache.info()
+        return report
@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # gzip-only when the brotli wheel is not installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "image/svg+xml", "text/markdown", "text/html", "text/plain", "text/css",
+}
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def available_encodings():
+    """Encodings this process can produce, in server preference order"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The highest q-value wins; ties go to the server preference order (brotli
+    before gzip). "*" matches any coding not listed explicitly and q=0 rules a
+    coding out. Returns None when the identity coding should be sent.
+    """
+    encodings = encodings or available_encodings()
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in encodings:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_bytes(data, encoding, level):
+    """Compress with gzip (level 1-9) or brotli (quality 0-11)"""
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def record_compression(encoding, bytes_in, bytes_out, cpu_ms, cached):
+    with _stats_lock:
+        stats = _stats.setdefault(encoding, {
+            "responses": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0, "cpu_ms": 0.0,
+        })
+        stats["responses"] += 1
+        stats["cache_hits"] += 1 if cached else 0
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_ms"] += cpu_ms
+
+
+def get_compression_stats():
+    """Totals per encoding: bytes in/out, ratio, CPU time spent compressing and cache hits"""
+    with _stats_lock:
+        report = {}
+        for encoding, stats in _stats.items():
+            report[encoding] = dict(stats)
+            report[encoding]["cpu_ms"] = round(stats["cpu_ms"], 3)
+            report[encoding]["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else 0.0
+        return report
+
+
+class PrecompressedCache:
+    """
+    Bounded LRU of compressed bodies keyed by (payload digest, encoding).
+
+    Payloads whose bytes repeat across requests are compressed once, at a higher
+    level than per-request responses since the cost is paid a single time.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def info(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+def mark_precompressible(response):
+    """Flag a response whose body is stable so its compressed bytes are cached"""
+    response.precompressible = True
+    return response
+
+
+def matched_etag(etag):
+    """
+    The If-None-Match tag of the current request that validates etag, or None.
+
+    Compressed copies are tagged "<etag>-<coding>", so any of them validates the
+    resource; a "*" tag validates it as etag itself.
+    """
+    validators = {etag} | {f"{etag}-{coding}" for coding in available_encodings()}
+    matched = next((tag for tag in request.if_none_match.as_set() if tag in validators), None)
+    return matched or (etag if request.if_none_match.star_tag else None)
+
+
+def immutable_artifact_response(body, mimetype, etag, compressible=True):
+    """Response for a content-addressed artifact with a strong ETag and 304 handling"""
+    matched = matched_etag(etag)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = Response(body, mimetype=mimetype)
+        # Already-compressed formats (DOCX is a zip) gain nothing from another pass
+        if compressible:
+            response = mark_precompressible(response)
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def init_compression(app, gzip_level=6, brotli_quality=4, cached_gzip_level=9, cached_brotli_quality=11,
+                     min_size=1024, cache_max_bytes=32 * 1024 * 1024):
+    """
+    Register gzip/brotli content negotiation for the app's responses.
+
+    JSON, SVG and text bodies of at least min_size bytes are compressed with the
+    coding the client prefers. Responses flagged with mark_precompressible()
+    reuse compressed bytes from a PrecompressedCache. CPU time per response is
+    sent in a Server-Timing header and accumulated in get_compression_stats().
+
+    Returns:
+        PrecompressedCache: The cache used for flagged responses
+    """
+    cache = PrecompressedCache(cache_max_bytes)
+    levels = {"gzip": gzip_level, "br": brotli_quality}
+    cached_levels = {"gzip": cached_gzip_level, "br": cached_brotli_quality}
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+                or response.status_code >= 300 or response.status_code == 206
+                or "Content-Encoding" in response.headers):
+            return response
+
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        started = time.thread_time()
+        cached = False
+        if getattr(response, "precompressible", False):
+            key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+            body = cache.get(key)
+            cached = body is not None
+            if body is None:
+                body = compress_bytes(data, encoding, cached_levels[encoding])
+                cache.put(key, body)
+        else:
+            body = compress_bytes(data, encoding, levels[encoding])
+        cpu_ms = (time.thread_time() - started) * 1000
+
+        if len(body) >= len(data):
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if response.headers.get("ETag"):
+            # A strong validator must differ between codings of the same resource
+            etag, weak = response.get_etag()
+            response.set_etag(f"{etag}-{encoding}", weak)
+        response.headers.add("Server-Timing", f"compress;dur={cpu_ms:.2f};desc=\"{encoding}\"")
+        record_compression(encoding, len(data), len(body), cpu_ms, cached)
+        logger.debug(f"Compressed {request.path} with {encoding}: {len(data)} -> {len(body)} bytes "
+                     f"in {cpu_ms:.2f} ms CPU{' (cached)' if cached else ''}")
+        return response
+
+    logger.info(f"Response compression enabled: {', '.join(available_encodings())} "
+                f"(gzip level {gzip_level}, brotli quality {brotli_quality})")
+    return cache
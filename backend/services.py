@@ -0,0 +1,127 @@
+"""
+Services shared by the diagram routes in app.py and the document blueprint.
+
+Both sides import the LLM client, the LLM scheduler, the document cache and
+the history store from here, so there is one client, one concurrency limit,
+one cache and one history per process however the document subsystem is loaded.
+"""
+import hmac
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, jsonify, request
+from groq import Groq
+
+from document_cache import DocumentCache, parse_ttl_overrides
+from history_store import HistoryStore
+from llm_scheduler import LLMScheduler
+
+logger = logging.getLogger(__name__)
+
+# Initialize Groq client with enhanced error handling
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+try:
+    client = Groq(api_key=GROQ_API_KEY)
+    logger.info("Groq client initialized successfully")
+except Exception as e:
+    logger.error(f"Failed to initialize Groq client: {str(e)}")
+    client = None
+
+# Shared bound on concurrent LLM calls for batch diagrams and sectioned documents
+llm_scheduler = LLMScheduler(max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "4")))
+
+# Generated documents by (template id, instruction, input), kept on disk under DOCUMENT_CACHE_DIR
+# (a temp directory by default, so per host) and DOCUMENT_CACHE_TTLS sets per-template lifetimes,
+# e.g. "technical_spec=3600,user_manual=0"
+document_cache = DocumentCache(
+    directory=os.environ.get("DOCUMENT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "napkin_document_cache"),
+    max_bytes=int(os.environ.get("DOCUMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    default_ttl=int(os.environ.get("DOCUMENT_CACHE_TTL_SECONDS", "86400")),
+    template_ttls=parse_ttl_overrides(os.environ.get("DOCUMENT_CACHE_TTLS"))
+)
+
+# Generation history (SQLite, WAL) written behind the request path; HISTORY_ENABLED=false turns it off
+history_store = HistoryStore(
+    os.environ.get("HISTORY_DB_PATH") or os.path.join(tempfile.gettempdir(), "napkin_history.sqlite3"),
+    batch_size=int(os.environ.get("HISTORY_BATCH_SIZE", "100")),
+    flush_interval=float(os.environ.get("HISTORY_FLUSH_SECONDS", "1.0")),
+    max_queue=int(os.environ.get("HISTORY_QUEUE_MAX", "10000")),
+    retention_days=float(os.environ.get("HISTORY_RETENTION_DAYS", "30")),
+    max_rows=int(os.environ.get("HISTORY_MAX_ROWS", "100000")),
+    compact_interval=float(os.environ.get("HISTORY_COMPACT_SECONDS", "3600")),
+    enabled=os.environ.get("HISTORY_ENABLED", "true").lower() != "false"
+)
+
+# The history holds every user's prompts and results, so reading it back over HTTP (/history, /search)
+# is an admin feature: off unless HISTORY_ADMIN_TOKEN is set, then sent as "Authorization: Bearer <token>"
+HISTORY_ADMIN_TOKEN = os.environ.get("HISTORY_ADMIN_TOKEN") or None
+
+# Request fields that are large inputs rather than parameters; history keeps their length only
+_BULKY_PARAMS = ("currentSvg", "content")
+_usage_lock = threading.Lock()
+
+
+def history_access_error():
+    """
+    Error response for a history read the current request may not make, or None.
+
+    Without HISTORY_ADMIN_TOKEN the routes do not exist (404); with it they need the token (401).
+    """
+    if not HISTORY_ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), HISTORY_ADMIN_TOKEN.encode()):
+        return jsonify({"error": "History access requires the admin token"}), 401
+    return None
+
+
+def note_llm_usage(completion, model):
+    """Add a completion's model and token usage to the current request's totals (pool threads included)"""
+    if not has_app_context():
+        return
+    usage = getattr(completion, "usage", None)
+    with _usage_lock:
+        totals = g.setdefault("llm_usage", {"model": model, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        totals["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def request_params():
+    """The current request's JSON body with bulky inputs replaced by their length"""
+    params = dict(request.get_json(silent=True) or {}) if has_request_context() else {}
+    for key in _BULKY_PARAMS:
+        if isinstance(params.get(key), str):
+            params[key] = {"length": len(params[key])}
+    return params
+
+
+def record_history(kind, request_type=None, source=None, **fields):
+    """
+    Record a generation in the history store with the request's parameters,
+    latency and the LLM usage since the previous record of the request (so
+    usage is not counted twice when one request records several rows).
+    source defaults to "ai" when an LLM call was made, else "fallback".
+    """
+    if not history_store.enabled:
+        return
+    usage = None
+    if has_app_context():
+        with _usage_lock:
+            usage = g.pop("llm_usage", None)
+    if source is None:
+        source = "ai" if usage else "fallback"
+    if usage:
+        fields.setdefault("llm_model", usage["model"])
+        fields.setdefault("llm_calls", usage["calls"])
+        fields.setdefault("prompt_tokens", usage["prompt_tokens"])
+        fields.setdefault("completion_tokens", usage["completion_tokens"])
+    if has_request_context():
+        fields.setdefault("endpoint", request.path)
+        fields.setdefault("params", request_params())
+        if g.get("request_started") is not None:
+            fields.setdefault("latency_ms", round((time.perf_counter() - g.request_started) * 1000, 1))
+    history_store.record(kind, request_type=request_type, source=source, **fields)
@@ -0,0 +1,221 @@
+import logging
+import re
+import string
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+# Serialize SVG as the default namespace (no ns0: prefixes) and keep the usual xlink prefix
+ET.register_namespace("", SVG_NS)
+ET.register_namespace("xlink", XLINK_NS)
+
+# Attributes holding coordinates or lengths; opacities and gradient offsets are left alone
+NUMERIC_ATTRIBUTES = {
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "width", "height",
+    "d", "points", "transform", "viewBox", "font-size", "stroke-width", "dx", "dy",
+    "refX", "refY", "markerWidth", "markerHeight", "stdDeviation",
+}
+
+# Inherited text properties that can move to the root <svg> when every <text> sets them
+HOISTABLE_TEXT_ATTRIBUTES = ("font-family", "font-size", "font-weight", "text-anchor")
+
+_NUMBER_PATTERN = re.compile(r"-?\d*\.\d+(?:[eE][-+]?\d+)?")
+_URL_REF_PATTERN = re.compile(r"url\(#([^)]+)\)")
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+_ATTRIBUTE_PATTERN = re.compile(r"""([\w:-]+)=("[^"]*"|'[^']*')""")
+_BETWEEN_TAGS_PATTERN = re.compile(r">\s+<")
+_ID_ALPHABET = string.ascii_letters
+_ID_CHARS = string.ascii_letters + string.digits
+
+_stats_lock = threading.Lock()
+_size_stats = {}
+
+
+def _format_number(match, precision):
+    value = round(float(match.group()), precision)
+    text = f"{value:.{precision}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def _short_id(index):
+    """a, b, ..., Z, a0, a1, ... - always starts with a letter so it is a valid XML id"""
+    name = _ID_ALPHABET[index % len(_ID_ALPHABET)]
+    index //= len(_ID_ALPHABET)
+    while index:
+        index -= 1
+        name += _ID_CHARS[index % len(_ID_CHARS)]
+        index //= len(_ID_CHARS)
+    return name
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _hoist_text_attributes(root):
+    """Move the dominant value of inherited text properties onto the root element"""
+    texts = [element for element in root.iter() if _local_name(element.tag) == "text"]
+    if len(texts) < 2:
+        return
+    root_style = root.get("style", "")
+    for attribute in HOISTABLE_TEXT_ATTRIBUTES:
+        if attribute in root_style or root.get(attribute) is not None:
+            continue
+        values = [text.get(attribute) for text in texts]
+        # Texts without the attribute would start inheriting the hoisted value
+        if any(value is None for value in values):
+            continue
+        counts = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        dominant, count = max(counts.items(), key=lambda item: item[1])
+        if count < 2:
+            continue
+
+        # Only texts whose ancestors (below the root) do not set the attribute may
+        # drop it, otherwise they would inherit the ancestor's value instead
+        removable = []
+        stack = [(child, False) for child in root]
+        while stack:
+            element, shadowed = stack.pop()
+            if _local_name(element.tag) == "text" and not shadowed and element.get(attribute) == dominant:
+                removable.append(element)
+            child_shadowed = shadowed or element.get(attribute) is not None
+            stack.extend((child, child_shadowed) for child in element)
+        if len(removable) < 2:
+            continue
+        root.set(attribute, dominant)
+        for element in removable:
+            del element.attrib[attribute]
+
+
+def _shorten_ids(root):
+    renamed = {}
+    for element in root.iter():
+        element_id = element.get("id")
+        if element_id is not None and element_id not in renamed:
+            renamed[element_id] = _short_id(len(renamed))
+    if not renamed:
+        return
+
+    def replace_url(match):
+        return f"url(#{renamed.get(match.group(1), match.group(1))})"
+
+    for element in root.iter():
+        for key, value in element.attrib.items():
+            if key == "id":
+                element.set(key, renamed[value])
+            elif key in ("href", f"{{{XLINK_NS}}}href") and value.startswith("#"):
+                element.set(key, "#" + renamed.get(value[1:], value[1:]))
+            elif "url(#" in value:
+                element.set(key, _URL_REF_PATTERN.sub(replace_url, value))
+
+
+def minify_svg(svg_content, precision=1):
+    """
+    Compact a generated SVG document.
+
+    Rounds coordinates and lengths to a fixed precision, renames ids to the
+    shortest free names (rewriting url(#...) and href references), hoists the
+    dominant inherited text properties onto the root element and drops the
+    whitespace between elements. Markup that does not parse is returned as is.
+
+    Args:
+        svg_content (str): SVG markup
+        precision (int): Decimal places kept for coordinates and lengths
+
+    Returns:
+        str: The compacted SVG markup
+    """
+    try:
+        root = ET.fromstring(svg_content)
+    except ET.ParseError as e:
+        logger.warning(f"Skipping SVG minification, markup does not parse: {str(e)}")
+        return svg_content
+
+    def format_number(match):
+        return _format_number(match, precision)
+
+    for element in root.iter():
+        for key, value in element.attrib.items():
+            if key in NUMERIC_ATTRIBUTES and "." in value:
+                element.set(key, _NUMBER_PATTERN.sub(format_number, value))
+        # Whitespace between elements is insignificant; text content is kept
+        if len(element) and element.text is not None and not element.text.strip():
+            element.text = None
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+
+    _shorten_ids(root)
+    _hoist_text_attributes(root)
+    # ElementTree writes "<rect ... />"; ">" is always escaped in text and attributes
+    return ET.tostring(root, encoding="unicode").replace(" />", "/>")
+
+
+def minify_svg_fragment(fragment, precision=1):
+    """
+    Compact a run of complete SVG elements without parsing the whole document.
+
+    Only the local stages of minify_svg() apply: coordinates and lengths are
+    rounded and whitespace between elements is dropped. Renaming ids and
+    hoisting text properties need the whole document, so streamed output
+    compacts less than the buffered one.
+
+    Args:
+        fragment (str): Markup that starts and ends between elements
+        precision (int): Decimal places kept for coordinates and lengths
+
+    Returns:
+        str: The compacted markup
+    """
+    def format_number(match):
+        return _format_number(match, precision)
+
+    def round_attribute(match):
+        name, value = match.groups()
+        if name not in NUMERIC_ATTRIBUTES or "." not in value:
+            return match.group()
+        return f"{name}={_NUMBER_PATTERN.sub(format_number, value)}"
+
+    def round_tag(match):
+        return _ATTRIBUTE_PATTERN.sub(round_attribute, match.group())
+
+    fragment = _TAG_PATTERN.sub(round_tag, fragment)
+    return _BETWEEN_TAGS_PATTERN.sub("><", fragment).replace(" />", "/>")
+
+
+def record_svg_size(diagram_type, bytes_before, bytes_after, elapsed_ms):
+    """Accumulate per-diagram-type size statistics for the compaction stage"""
+    with _stats_lock:
+        stats = _size_stats.setdefault(diagram_type, {"count": 0, "bytes_before": 0, "bytes_after": 0, "elapsed_ms": 0.0})
+        stats["count"] += 1
+        stats["bytes_before"] += bytes_before
+        stats["bytes_after"] += bytes_after
+        stats["elapsed_ms"] += elapsed_ms
+
+
+def get_svg_size_stats():
+    """Totals per diagram type with the overall saving ratio"""
+    with _stats_lock:
+        report = {}
+        for diagram_type, stats in _size_stats.items():
+            report[diagram_type] = dict(stats)
+            report[diagram_type]["saved_ratio"] = round(
+                1 - stats["bytes_after"] / stats["bytes_before"], 3) if stats["bytes_before"] else 0.0
+        return report
+
+
+def minify_svg_for_type(svg_content, diagram_type, precision=1):
+    """Minify and record the byte counts before and after under the diagram type"""
+    started = time.perf_counter()
+    compacted = minify_svg(svg_content, precision)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    before, after = len(svg_content.encode("utf-8")), len(compacted.encode("utf-8"))
+    record_svg_size(diagram_type, before, after, elapsed_ms)
+    logger.info(f"SVG compaction for {diagram_type}: {before} -> {after} bytes "
+                f"({(1 - after / before) * 100 if before else 0:.1f}% smaller) in {elapsed_ms:.1f} ms")
+    return compacted
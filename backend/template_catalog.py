@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from diagram_store import content_hash
+from document_templates import normalize_template_key
+from response_compression import available_encodings, compress_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_catalog.json")
+
+# Fields every catalog entry must have
+REQUIRED_FIELDS = ("id", "name", "promptInstruction")
+# The catalog is compressed once per load, so it gets the highest levels
+_CATALOG_LEVELS = {"gzip": 9, "br": 11}
+
+
+def template_version(entry):
+    """An entry's "version" when it declares one, else a digest of its fields"""
+    if entry.get("version") not in (None, ""):
+        return str(entry["version"])
+    return content_hash(json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(",", ":")))[:12]
+
+
+class CatalogSnapshot:
+    """One loaded catalog: its templates, their lookup keys and the response bytes per content coding"""
+
+    __slots__ = ("templates", "keys", "version", "bodies", "loaded_at")
+
+    def __init__(self, entries):
+        self.templates = []
+        self.keys = {}
+        for entry in entries:
+            missing = [field for field in REQUIRED_FIELDS if not entry.get(field)]
+            if missing:
+                raise ValueError(f"Template {entry.get('id') or entry.get('name') or '?'} is missing {', '.join(missing)}")
+            template = dict(entry, version=template_version(entry))
+            self.templates.append(template)
+            for key in (template["id"], template["name"]):
+                self.keys.setdefault(normalize_template_key(key), template)
+        body = json.dumps(self.templates, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.version = content_hash(body)
+        self.bodies = {None: body}
+        for encoding in available_encodings():
+            self.bodies[encoding] = compress_bytes(body, encoding, _CATALOG_LEVELS[encoding])
+        self.loaded_at = time.time()
+
+
+class TemplateCatalog:
+    """
+    Document templates served at /document_templates, loaded from a JSON file.
+
+    Each load validates the entries, versions every template (see
+    template_version) and serializes and compresses the response once, so
+    requests only pick the bytes for their content coding. The file is
+    stat()ed at most every check_interval seconds on access and reloaded when
+    it changes; a file that fails to load is logged and the previous catalog
+    stays in service.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._signature = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_errors = 0
+        self.load_ms = 0.0
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self, signature):
+        started = time.perf_counter()
+        with open(self.path, encoding="utf-8") as handle:
+            entries = json.load(handle)
+        if not isinstance(entries, list):
+            raise ValueError("Template catalog must be a JSON array of templates")
+        snapshot = CatalogSnapshot(entries)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        previous = self._snapshot
+        self._snapshot, self._signature = snapshot, signature
+        self.loads += 1
+        self.load_ms += elapsed_ms
+        if previous is None or previous.version != snapshot.version:
+            logger.info(f"Loaded {len(snapshot.templates)} document templates from {self.path} "
+                        f"(version {snapshot.version[:12]}) in {elapsed_ms:.1f} ms")
+
+    def snapshot(self):
+        """
+        The current catalog, reloading the file first if it changed.
+
+        Raises:
+            OSError, ValueError: When the catalog has never loaded successfully
+        """
+        if self._snapshot is not None and time.monotonic() - self._checked < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._checked >= self.check_interval:
+                self._checked = time.monotonic()
+                signature = None
+                try:
+                    signature = self._file_signature()
+                    if signature != self._signature:
+                        self._load(signature)
+                except (OSError, ValueError) as e:
+                    self.load_errors += 1
+                    if self._snapshot is None:
+                        raise
+                    logger.error(f"Reloading template catalog {self.path} failed, keeping version "
+                                 f"{self._snapshot.version[:12]}: {str(e)}")
+                    if signature is not None:
+                        # A broken file is retried once it changes again, not on every check
+                        self._signature = signature
+        return self._snapshot
+
+    def get(self, template_id=None, template_name=None):
+        """Catalog entry for a template id or name, or None"""
+        try:
+            keys = self.snapshot().keys
+        except (OSError, ValueError):
+            return None
+        for key in (template_id, template_name):
+            if key:
+                template = keys.get(normalize_template_key(key))
+                if template is not None:
+                    return template
+        return None
+
+    def info(self):
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "templates": len(snapshot.templates) if snapshot else 0,
+            "version": snapshot.version if snapshot else None,
+            "bytes": {encoding or "identity": len(body) for encoding, body in snapshot.bodies.items()} if snapshot else {},
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "load_ms": round(self.load_ms, 2),
+        }